@@ -0,0 +1,463 @@
+"""
+Figures shown on the admin and staff dashboards.
+
+DashboardMetrics.get() returns the cached metrics and computes them with a
+handful of grouped queries on a miss. Saving or deleting any model the figures
+are derived from clears the cache once the transaction commits; everything
+else (recent activity, course names) is at most DASHBOARD_CACHE_TTL seconds old.
+
+Per-enrollment-day cohort figures are also materialized in
+DailyMetricsSnapshot by refresh_daily_metrics(), which only re-aggregates the
+days touched since its previous run, so long trend charts read a few hundred
+pre-aggregated rows instead of the raw tables.
+"""
+import json
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+CACHE_KEY = 'accounts:dashboard_metrics'
+DEFAULT_TTL = 60
+
+# Consultant performance rows are cached per (consultant, user, year) under a
+# shared version number; invalidation bumps the version instead of hunting keys.
+PERFORMANCE_CACHE_PREFIX = 'accounts:consultant_performance'
+PERFORMANCE_VERSION_KEY = 'accounts:consultant_performance_version'
+PERFORMANCE_TTL = 60 * 60
+
+INVALIDATING_MODELS = [
+    'studentsdb.Student',
+    'paymentdb.Payment',
+    'trainersdb.Trainer',
+]
+
+
+def get_pending_installments_by_month(start_date, end_date):
+    """Unpaid EMI amounts due between the two dates, summed per 'YYYY-MM' month."""
+    from paymentdb.models import PaymentInstallment
+
+    rows = (
+        PaymentInstallment.unpaid()
+        .filter(due_date__range=(start_date, end_date), payment__total_pending_amount__gt=0)
+        .exclude(payment__student__course_status__in=['R', 'D'])
+        .annotate(month=TruncMonth('due_date'))
+        .values('month')
+        .annotate(amount=Sum('amount'))
+        .order_by('month')
+    )
+    return {row['month'].strftime('%Y-%m'): float(row['amount']) for row in rows}
+
+
+def get_upcoming_payments(limit=5):
+    """The next unpaid EMI of each pending payment, earliest due dates first."""
+    from coursedb.models import Course
+    from paymentdb.models import PaymentInstallment
+
+    due = PaymentInstallment.unpaid().filter(due_date__isnull=False)
+    earlier_due = due.filter(payment=OuterRef('payment'), seq__lt=OuterRef('seq'))
+    installments = list(
+        due.filter(payment__total_pending_amount__gt=0)
+        .exclude(payment__student__course_status__in=['R', 'D'])
+        .exclude(Exists(earlier_due))
+        .select_related('payment__student__consultant')
+        .order_by('due_date')[:limit]
+    )
+
+    course_ids = {i.payment.student.course_id for i in installments if i.payment.student.course_id}
+    course_map = dict(Course.objects.filter(id__in=course_ids).values_list('id', 'course_name'))
+
+    upcoming = []
+    for installment in installments:
+        payment = installment.payment
+        student = payment.student
+        total_paid_by_student = payment.amount_paid or 0
+        for j in range(1, 5):
+            total_paid_by_student += getattr(payment, f'emi_{j}_paid_amount') or 0
+        upcoming.append({
+            'student_id': student.student_id,
+            'student_name': f"{student.first_name} {student.last_name or ''}",
+            'mobile': student.phone,
+            'course': course_map.get(student.course_id, 'N/A'),
+            'consultant': student.consultant.name if student.consultant else 'N/A',
+            'emi_number': installment.seq,
+            'course_fee': payment.total_fees or 0,
+            'amount': installment.amount,
+            'paid': total_paid_by_student,
+            'due_date': installment.due_date,
+        })
+    return upcoming
+
+
+def get_enrollments_by_month(start_date, end_date):
+    """
+    Enrollment counts per 'YYYY-MM' month. Days covered by the last metrics
+    refresh come from DailyMetricsSnapshot; later days are counted live.
+    """
+    from studentsdb.models import Student
+    from .models import DailyMetricsSnapshot, MetricsRefreshRun
+
+    counts = {}
+    live_from = start_date
+    last_run = MetricsRefreshRun.last_finished()
+    if last_run is not None:
+        covered_until = timezone.localdate(last_run.started_at)
+        snapshot_rows = (
+            DailyMetricsSnapshot.objects
+            .filter(date__gte=start_date, date__lt=min(covered_until, end_date + timedelta(days=1)))
+            .annotate(month=TruncMonth('date'))
+            .values('month')
+            .annotate(count=Sum('enrollments'))
+        )
+        for row in snapshot_rows:
+            counts[row['month'].strftime('%Y-%m')] = row['count']
+        live_from = max(start_date, covered_until)
+
+    if live_from <= end_date:
+        live_rows = (
+            Student.objects
+            .filter(enrollment_date__range=(live_from, end_date))
+            .annotate(month=TruncMonth('enrollment_date'))
+            .values('month')
+            .annotate(count=Count('id'))
+        )
+        for row in live_rows:
+            key = row['month'].strftime('%Y-%m')
+            counts[key] = counts.get(key, 0) + row['count']
+    return dict(sorted(counts.items()))
+
+
+def get_batch_status_counts(batches):
+    """Total, YTS, IP, hold and completed counts of ``batches`` in one query."""
+    return batches.aggregate(
+        total=Count('id'),
+        yts=Count('id', filter=Q(batch_status='YTS')),
+        ip=Count('id', filter=Q(batch_status='IP')),
+        hold=Count('id', filter=Q(batch_status='H')),
+        completed=Count('id', filter=Q(batch_status='C')),
+    )
+
+
+def _last_six_months(today):
+    months = []
+    current_date = today
+    for _ in range(6):
+        months.append(current_date.strftime('%Y-%m'))
+        # Step back to the last day of the previous month
+        current_date = current_date.replace(day=1) - timedelta(days=1)
+    return sorted(months)
+
+
+class DashboardMetrics:
+    """Everything the admin and staff dashboards display, computed together."""
+
+    def __init__(self, **values):
+        self.__dict__.update(values)
+
+    @classmethod
+    def get(cls):
+        metrics = cache.get(CACHE_KEY)
+        if metrics is None:
+            metrics = cls.compute()
+            cache.set(CACHE_KEY, metrics, getattr(settings, 'DASHBOARD_CACHE_TTL', DEFAULT_TTL))
+        return metrics
+
+    @classmethod
+    def compute(cls, now=None):
+        from paymentdb.models import Payment
+        from settingsdb.models import TransactionLog
+        from studentsdb.models import Student
+        from trainersdb.models import Trainer
+
+        now = now or timezone.now()
+        today = now.date()
+        six_months_ago = today - timedelta(days=180)
+        one_week_ago = today - timedelta(days=7)
+
+        students = Student.objects.aggregate(
+            total=Count('id'),
+            completed=Count('id', filter=Q(course_status='C')),
+            placed=Count('id', filter=Q(course_status='P')),
+            weekly=Count('id', filter=Q(enrollment_date__gte=one_week_ago)),
+        )
+        payments = Payment.objects.aggregate(
+            pending=Sum('total_pending_amount', filter=~Q(student__course_status__in=['R', 'D'])),
+            weekly=Sum('amount_paid', filter=Q(student__enrollment_date__gte=one_week_ago)),
+        )
+        placement_rate = (students['placed'] / students['completed'] * 100) if students['completed'] else 0
+
+        # All six months are present in the chart, even without dues
+        pending_by_month = get_pending_installments_by_month(six_months_ago, today)
+        monthly_pending = [
+            {'month': month, 'amount': pending_by_month.get(month, 0)}
+            for month in _last_six_months(today)
+        ]
+
+        return cls(
+            total_students=students['total'],
+            total_pending_amount=payments['pending'] or 0,
+            active_trainers=Trainer.objects.count(),  # Count all trainers since there's no active status
+            placement_rate=round(placement_rate, 1),
+            weekly_students=students['weekly'],
+            weekly_payments=payments['weekly'] or 0,
+            monthly_pending=monthly_pending,
+            enrollment_data=[
+                {'month': month, 'count': count}
+                for month, count in get_enrollments_by_month(six_months_ago, today).items()
+                if count
+            ],
+            recent_activities=list(TransactionLog.objects.select_related('user').order_by('-timestamp')[:10]),
+            recent_students=list(Student.objects.order_by('-enrollment_date')[:5]),
+            upcoming_payments=get_upcoming_payments(),
+        )
+
+    def as_context(self):
+        return {
+            'total_students': self.total_students,
+            'total_pending_amount': self.total_pending_amount,
+            'active_trainers': self.active_trainers,
+            'placement_rate': self.placement_rate,
+            'weekly_students': self.weekly_students,
+            'weekly_payments': self.weekly_payments,
+            'monthly_pending': json.dumps(self.monthly_pending, cls=DjangoJSONEncoder),
+            'enrollment_data': json.dumps(self.enrollment_data, cls=DjangoJSONEncoder),
+            'recent_activities': self.recent_activities,
+            'recent_students': self.recent_students,
+            'upcoming_payments': self.upcoming_payments,
+        }
+
+
+def _performance_version():
+    version = cache.get(PERFORMANCE_VERSION_KEY)
+    if version is None:
+        cache.add(PERFORMANCE_VERSION_KEY, 1, None)
+        version = cache.get(PERFORMANCE_VERSION_KEY, 1)
+    return version
+
+
+def _monthly_performance(consultant, user, start_year, end_year):
+    """
+    Joinings, revenue and pending amount per enrollment month for the
+    consultant's students (and those the user created), in one grouped query.
+    Returns ``{(year, month): (joinings, revenue, pending)}``.
+    """
+    from paymentdb.pending_sync import total_paid_expression
+    from studentsdb.models import Student
+
+    owned = Q(consultant=consultant)
+    if user is not None:
+        owned |= Q(created_by=user)
+    rows = (
+        Student.objects.filter(owned, enrollment_date__range=(date(start_year, 1, 1), date(end_year, 12, 31)))
+        .annotate(month=TruncMonth('enrollment_date'))
+        .values('month')
+        .annotate(
+            joinings=Count('id'),
+            revenue=Sum(total_paid_expression('payment__')),
+            # Refunded and discontinued students owe nothing
+            pending=Sum('payment__total_pending_amount', filter=~Q(course_status__in=['R', 'D'])),
+        )
+        .order_by('month')
+    )
+    return {
+        (row['month'].year, row['month'].month): (row['joinings'], row['revenue'] or 0, row['pending'] or 0)
+        for row in rows
+    }
+
+
+def get_consultant_performance(consultant, user=None, start_year=None, end_year=None):
+    """
+    Monthly joinings, revenue, pending amount and month-over-month revenue
+    growth for ``start_year`` to ``end_year``. January is compared with the
+    previous December. Each year's figures are cached separately.
+    """
+    start_year = start_year or timezone.now().year
+    end_year = end_year or start_year
+    version = _performance_version()
+    user_pk = user.pk if user is not None else None
+    keys = {
+        year: f'{PERFORMANCE_CACHE_PREFIX}:{version}:{consultant.pk}:{user_pk}:{year}'
+        for year in range(start_year - 1, end_year + 1)
+    }
+    cached = cache.get_many(keys.values())
+    years = {year: cached[key] for year, key in keys.items() if key in cached}
+    missing = [year for year in keys if year not in years]
+    if missing:
+        computed = _monthly_performance(consultant, user, min(missing), max(missing))
+        fresh = {}
+        for year in missing:
+            years[year] = [computed.get((year, month), (0, 0, 0)) for month in range(1, 13)]
+            fresh[keys[year]] = years[year]
+        cache.set_many(fresh, PERFORMANCE_TTL)
+
+    performance = []
+    previous_revenue = years[start_year - 1][11][1]
+    for year in range(start_year, end_year + 1):
+        for month, (joinings, revenue, pending) in enumerate(years[year], start=1):
+            if previous_revenue > 0:
+                growth = (revenue - previous_revenue) / previous_revenue * 100
+            elif revenue > 0:
+                growth = 100  # 100% growth if starting from 0
+            else:
+                growth = 0
+            performance.append({
+                'year': year,
+                'month': month,
+                'month_name': date(year, month, 1).strftime('%B'),
+                'joinings': joinings,
+                'revenue': revenue,
+                'pending': pending,
+                'growth': round(float(growth), 2),
+            })
+            previous_revenue = revenue
+    return performance
+
+
+def _clear_dashboard_caches():
+    cache.delete(CACHE_KEY)
+    try:
+        cache.incr(PERFORMANCE_VERSION_KEY)
+    except ValueError:
+        pass  # Nothing cached yet
+
+
+def invalidate_dashboard_metrics(**kwargs):
+    # Clear after commit so a concurrent request cannot re-cache the old figures.
+    transaction.on_commit(_clear_dashboard_caches)
+
+
+def connect_invalidation_signals():
+    for label in INVALIDATING_MODELS:
+        post_save.connect(invalidate_dashboard_metrics, sender=label, dispatch_uid=f'dashboard_metrics_save_{label}')
+        post_delete.connect(invalidate_dashboard_metrics, sender=label, dispatch_uid=f'dashboard_metrics_delete_{label}')
+
+
+SNAPSHOT_DAYS_PER_QUERY = 500
+
+
+def _old_enrollment_date(action, changes):
+    """The enrollment day a Student UPDATE or DELETE log moved the student out of."""
+    if not isinstance(changes, dict):
+        return None
+    if action == 'DELETE':
+        value = changes.get('enrollment_date')
+    else:
+        value = (changes.get('diff') or {}).get('enrollment_date', {}).get('old')
+    return datetime.fromisoformat(value).date() if value else None
+
+
+def changed_enrollment_days(since):
+    """
+    Enrollment days whose cohort figures may have changed since ``since``:
+    the days of students, payments and pending records written since then
+    (their ``updated_at``), the days students were deleted from or moved
+    away from (snapshots flagged by the signals below, and Student
+    UPDATE/DELETE rows of TransactionLog), and today.
+    """
+    from paymentdb.models import Payment, PendingPaymentRecord
+    from settingsdb.models import TransactionLog
+    from studentsdb.models import Student
+    from .models import DailyMetricsSnapshot
+
+    days = {timezone.localdate()}
+    logs = TransactionLog.objects.filter(
+        timestamp__gte=since, table_name='Student', action__in=['UPDATE', 'DELETE'],
+    ).values_list('action', 'changes')
+    for action, changes in logs.iterator():
+        days.add(_old_enrollment_date(action, changes))
+
+    days.update(Student.objects.filter(updated_at__gte=since).values_list('enrollment_date', flat=True))
+    days.update(Payment.objects.filter(updated_at__gte=since).values_list('student__enrollment_date', flat=True))
+    days.update(
+        PendingPaymentRecord.objects.filter(updated_at__gte=since)
+        .values_list('student__enrollment_date', flat=True)
+    )
+    days.update(DailyMetricsSnapshot.objects.filter(changed_at__gte=since).values_list('date', flat=True))
+    days.discard(None)
+    return days
+
+
+def mark_enrollment_days_changed(days):
+    """Flags the snapshots of ``days`` (dates or a values() queryset) for the next refresh."""
+    from .models import DailyMetricsSnapshot
+
+    DailyMetricsSnapshot.objects.filter(date__in=days).update(changed_at=timezone.now())
+
+
+def student_saved(sender, instance, created, **kwargs):
+    old_date = instance.get_changed_fields().get('enrollment_date', (None,))[0]
+    if old_date is not None:
+        mark_enrollment_days_changed([old_date])
+
+
+def student_deleted(sender, instance, **kwargs):
+    mark_enrollment_days_changed([instance.enrollment_date])
+
+
+def payment_deleted(sender, instance, **kwargs):
+    from studentsdb.models import Student
+
+    mark_enrollment_days_changed(Student.objects.filter(pk=instance.student_id).values('enrollment_date'))
+
+
+def connect_snapshot_signals():
+    # Writes that leave a day are not visible through updated_at, which only
+    # reports the day a student or payment is on now.
+    post_save.connect(student_saved, sender='studentsdb.Student', dispatch_uid='metrics_snapshot_student_save')
+    post_delete.connect(student_deleted, sender='studentsdb.Student', dispatch_uid='metrics_snapshot_student_delete')
+    post_delete.connect(payment_deleted, sender='paymentdb.Payment', dispatch_uid='metrics_snapshot_payment_delete')
+
+
+def refresh_daily_metrics(days):
+    """Re-aggregates DailyMetricsSnapshot rows for the given enrollment days."""
+    from paymentdb.models import Payment
+    from paymentdb.pending_sync import total_paid_expression
+    from studentsdb.models import Student
+    from .models import DailyMetricsSnapshot
+
+    days = sorted(days)
+    now = timezone.now()
+    for start in range(0, len(days), SNAPSHOT_DAYS_PER_QUERY):
+        chunk = days[start:start + SNAPSHOT_DAYS_PER_QUERY]
+        snapshots = {
+            row['enrollment_date']: DailyMetricsSnapshot(
+                date=row['enrollment_date'], enrollments=row['enrollments'],
+                completed=row['completed'], placed=row['placed'], refreshed_at=now,
+            )
+            for row in Student.objects.filter(enrollment_date__in=chunk)
+            .values('enrollment_date')
+            .annotate(
+                enrollments=Count('id'),
+                completed=Count('id', filter=Q(course_status='C')),
+                placed=Count('id', filter=Q(course_status='P')),
+            )
+            .order_by()
+        }
+        payment_rows = (
+            Payment.objects.filter(student__enrollment_date__in=chunk)
+            .values('student__enrollment_date')
+            .annotate(
+                revenue=Sum(total_paid_expression()),
+                pending=Sum('total_pending_amount', filter=~Q(student__course_status__in=['R', 'D'])),
+            )
+            .order_by()
+        )
+        for row in payment_rows:
+            snapshot = snapshots[row['student__enrollment_date']]
+            snapshot.revenue = row['revenue'] or 0
+            snapshot.pending_amount = row['pending'] or 0
+
+        DailyMetricsSnapshot.objects.filter(date__in=chunk).exclude(date__in=list(snapshots)).delete()
+        DailyMetricsSnapshot.objects.bulk_create(
+            snapshots.values(),
+            update_conflicts=True,
+            unique_fields=['date'],
+            update_fields=['enrollments', 'completed', 'placed', 'revenue', 'pending_amount', 'refreshed_at'],
+        )
+    return len(days)
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts.dashboard import changed_enrollment_days, refresh_daily_metrics
+from accounts.models import DailyMetricsSnapshot, MetricsRefreshRun
+from studentsdb.models import Student
+
+
+class Command(BaseCommand):
+    help = 'Refreshes DailyMetricsSnapshot rows for enrollment days changed since the last run'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild every day instead of only changed ones')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        last_run = MetricsRefreshRun.last_finished()
+        full = options['full'] or last_run is None
+        run = MetricsRefreshRun.objects.create(started_at=timezone.now(), full=full)
+
+        if full:
+            days = set(Student.objects.order_by().values_list('enrollment_date', flat=True).distinct())
+            days.update(DailyMetricsSnapshot.objects.values_list('date', flat=True))
+            days.add(timezone.localdate())
+        else:
+            days = changed_enrollment_days(last_run.started_at)
+
+        run.days_refreshed = refresh_daily_metrics(days)
+        run.finished_at = timezone.now()
+        run.save(update_fields=['days_refreshed', 'finished_at'])
+
+        mode = 'Full rebuild' if full else f'Changes since {last_run.started_at:%Y-%m-%d %H:%M}'
+        self.stdout.write(self.style.SUCCESS(
+            f'{mode}: refreshed {run.days_refreshed} day(s) in {time.monotonic() - started:.2f}s'
+        ))
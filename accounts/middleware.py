@@ -5,8 +5,8 @@ from django.urls import reverse, resolve
 # Define role-based access control mappings
 URL_ROLE_MAPPINGS = {
     'staff': [
-        'staff_dashboard', 'student_list', 'create_student', 'update_student', 'import_students', 'download_student_template', 'download_error_report',
-        'batch_list', 'create_batch', 'update_batch', 'import_batches', 'download_batch_template', 'download_error_report_batch',
+        'staff_dashboard', 'student_list', 'create_student', 'update_student', 'import_students', 'download_student_template', 'import_job_detail', 'import_job_status', 'import_job_errors',
+        'batch_list', 'create_batch', 'update_batch', 'import_batches', 'download_batch_template',
         'payment_list', 'payment_update', 'update_emi_date', 'pending_payments',
         'placement_list', 'update_placement',
         'consultant_list', 'create_consultant', 'update_consultant',
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_dailymetricssnapshot_metricsrefreshrun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailymetricssnapshot',
+            name='changed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
 from django.db import models
 from core.utils import profile_pics_upload_to
+from core.mixins import FieldTrackerMixin
 
 class CustomUserManager(BaseUserManager):
     def create_user(self, email, name, role, password=None, is_staff=False, is_superuser=False, **extra_fields):
@@ -22,7 +23,7 @@ class CustomUserManager(BaseUserManager):
         return self.create_user(email, name, role='admin', password=password,
                                 is_staff=True, is_superuser=True, **extra_fields)
 
-class CustomUser(AbstractBaseUser, PermissionsMixin):
+class CustomUser(FieldTrackerMixin, AbstractBaseUser, PermissionsMixin):
 
     ROLE_CHOICES = [
         ('admin', 'Admin'),
@@ -50,3 +51,45 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
 
     def __str__(self):
         return f"{self.email} ({self.role})"
+
+
+class DailyMetricsSnapshot(models.Model):
+    """
+    Pre-aggregated figures for the students who enrolled on one day, kept up
+    to date by the refresh_daily_metrics command. Revenue and pending amounts
+    are as of ``refreshed_at``. ``changed_at`` is set when a student leaves the
+    day (deleted or moved to another enrollment date) or a payment of the day
+    is deleted, so the next run re-aggregates it.
+    """
+    date = models.DateField(unique=True)
+    enrollments = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    placed = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    pending_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    refreshed_at = models.DateTimeField(auto_now=True)
+    changed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['date']
+
+    def __str__(self):
+        return f"Metrics for {self.date}"
+
+
+class MetricsRefreshRun(models.Model):
+    """One run of refresh_daily_metrics; the last finished run is the next run's starting point."""
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    full = models.BooleanField(default=False)
+    days_refreshed = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"Metrics refresh at {self.started_at}"
+
+    @classmethod
+    def last_finished(cls):
+        return cls.objects.filter(finished_at__isnull=False).first()
@@ -1,6 +1,22 @@
+from datetime import date, timedelta
+from io import StringIO
+
 from django.test import TestCase, RequestFactory
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
 from django.urls import reverse
+from django.utils import timezone
+from settingsdb.signals import set_current_user
+from studentsdb.models import Student
+from consultantdb.models import Consultant, ConsultantProfile
+from batchdb.models import Batch
+from trainersdb.models import Trainer, TrainerProfile
+from paymentdb.models import Payment
+from placementdb.models import Placement
+from settingsdb.models import TransactionLog
+from .dashboard import DashboardMetrics, changed_enrollment_days, get_consultant_performance, get_enrollments_by_month
+from .models import DailyMetricsSnapshot, MetricsRefreshRun
 from .middleware import RolePermissionsMiddleware
 
 User = get_user_model()
@@ -47,3 +63,215 @@ class RolePermissionsMiddlewareTest(TestCase):
         request.user = self.admin_user
         response = self.middleware(request)
         self.assertIsNone(response)
+
+
+class DashboardMetricsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin_user = User.objects.create_superuser(email='dash@test.com', name='Dash', password='password')
+
+    def _create_student(self, email, status='YTS'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Student.objects.create(
+                first_name='Dash', email=email, mode_of_class='ON', week_type='WD', course_status=status,
+            )
+
+    def test_metrics_are_cached(self):
+        self._create_student('one@test.com', status='C')
+        metrics = DashboardMetrics.get()
+        self.assertEqual(metrics.total_students, 1)
+        self.assertEqual(metrics.placement_rate, 0)
+        self.assertEqual(len(metrics.monthly_pending), 6)
+
+        with self.assertNumQueries(0):
+            DashboardMetrics.get()
+
+    def test_student_changes_clear_the_cache(self):
+        DashboardMetrics.get()
+        self._create_student('two@test.com')
+        self.assertEqual(DashboardMetrics.get().total_students, 1)
+
+    def test_admin_and_staff_dashboards_share_metrics(self):
+        self._create_student('three@test.com')
+        self.client.force_login(self.admin_user)
+        DashboardMetrics.get()
+
+        for name in ['admin_dashboard', 'staff_dashboard']:
+            response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context['total_students'], 1)
+
+
+class DailyMetricsSnapshotTest(TestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(email='metrics@test.com', name='Metrics', password='password')
+        self.old_day = date(2024, 1, 15)
+        self.other_day = date(2024, 2, 20)
+        with self.captureOnCommitCallbacks(execute=True):
+            for i, day in enumerate([self.old_day, self.old_day, self.other_day]):
+                student = Student.objects.create(
+                    first_name=f'Cohort{i}', email=f'cohort{i}@test.com', mode_of_class='ON', week_type='WD',
+                    course_status='C',
+                )
+                Student.objects.filter(pk=student.pk).update(enrollment_date=day)
+
+    def _refresh(self, *args):
+        out = StringIO()
+        call_command('refresh_daily_metrics', *args, stdout=out)
+        return out.getvalue()
+
+    def test_first_run_is_a_full_rebuild(self):
+        self.assertIn('Full rebuild', self._refresh())
+        snapshot = DailyMetricsSnapshot.objects.get(date=self.old_day)
+        self.assertEqual((snapshot.enrollments, snapshot.completed, snapshot.placed), (2, 2, 0))
+        self.assertTrue(DailyMetricsSnapshot.objects.filter(date=self.other_day).exists())
+
+    def _backdate_last_run(self):
+        MetricsRefreshRun.objects.update(started_at=timezone.now() - timedelta(minutes=5))
+        Student.objects.update(updated_at=timezone.now() - timedelta(minutes=10))
+
+    def test_incremental_run_only_refreshes_changed_days(self):
+        self._refresh()
+        self._backdate_last_run()
+        DailyMetricsSnapshot.objects.filter(date=self.other_day).update(enrollments=99)
+
+        set_current_user(self.admin_user)
+        try:
+            with self.captureOnCommitCallbacks(execute=True):
+                student = Student.objects.get(email='cohort0@test.com')
+                student.course_status = 'P'
+                student.save()
+        finally:
+            set_current_user(None)
+
+        self.assertIn('refreshed 2 day(s)', self._refresh())  # the changed day and today
+        self.assertEqual(DailyMetricsSnapshot.objects.get(date=self.old_day).placed, 1)
+        self.assertEqual(DailyMetricsSnapshot.objects.get(date=self.other_day).enrollments, 99)
+
+    def test_unaudited_moves_and_deletes_refresh_the_days_left(self):
+        self._refresh()
+        self._backdate_last_run()
+
+        # No current user, so none of this reaches TransactionLog
+        student = Student.objects.get(email='cohort0@test.com')
+        student.enrollment_date = self.other_day
+        student.save()
+        Student.objects.get(email='cohort1@test.com').delete()
+
+        self.assertIn('refreshed 3 day(s)', self._refresh())  # both days and today
+        self.assertFalse(DailyMetricsSnapshot.objects.filter(date=self.old_day).exists())
+        self.assertEqual(DailyMetricsSnapshot.objects.get(date=self.other_day).enrollments, 2)
+
+    def test_old_enrollment_date_is_read_from_update_diffs(self):
+        since = timezone.now()
+        TransactionLog.objects.create(
+            user=self.admin_user, table_name='Student', object_id='1', action='UPDATE',
+            changes={'app': 'studentsdb', 'diff': {'enrollment_date': {'old': '2023-05-01', 'new': '2024-01-15'}}},
+        )
+        self.assertIn(date(2023, 5, 1), changed_enrollment_days(since))
+
+    def test_enrollment_chart_combines_snapshot_and_live_counts(self):
+        self._refresh()
+        DailyMetricsSnapshot.objects.filter(date=self.old_day).update(enrollments=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            Student.objects.create(first_name='Today', email='today@test.com', mode_of_class='ON', week_type='WD')
+
+        counts = get_enrollments_by_month(date(2024, 1, 1), timezone.localdate())
+        self.assertEqual(counts['2024-01'], 5)
+        self.assertEqual(counts[timezone.localdate().strftime('%Y-%m')], 1)
+
+    def test_history_endpoint(self):
+        self._refresh()
+        self.client.force_login(self.admin_user)
+        response = self.client.get(reverse('metrics_history'), {'months': 120})
+        months = {row['month']: row for row in response.json()['results']}
+        self.assertEqual(months['2024-01']['enrollments'], 2)
+        self.assertEqual(months['2024-02']['completed'], 1)
+
+
+class ConsultantPerformanceTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.consultant = Consultant.objects.create(name='Perf', phone_number='9000000001', email='perf@test.com')
+        with self.captureOnCommitCallbacks(execute=True):
+            for i, (day, paid) in enumerate([(date(2023, 12, 5), 1000), (date(2024, 1, 10), 1500), (date(2024, 3, 1), 500)]):
+                student = Student.objects.create(
+                    first_name=f'Perf{i}', email=f'perf{i}@test.com', mode_of_class='ON', week_type='WD',
+                    consultant=self.consultant,
+                )
+                Student.objects.filter(pk=student.pk).update(enrollment_date=day)
+                Payment.objects.create(student=student, total_fees=2000, amount_paid=paid)
+
+    def test_one_query_per_uncached_range_and_growth_crosses_years(self):
+        with self.assertNumQueries(1):
+            performance = get_consultant_performance(self.consultant, start_year=2024)
+        self.assertEqual(len(performance), 12)
+        january, february, march = performance[:3]
+        self.assertEqual((january['joinings'], january['revenue'], january['pending']), (1, 1500, 500))
+        self.assertEqual(january['growth'], 50.0)
+        self.assertEqual(february['growth'], -100.0)
+        self.assertEqual(march['growth'], 100)
+
+        with self.assertNumQueries(0):
+            get_consultant_performance(self.consultant, start_year=2024)
+
+    def test_multi_year_range(self):
+        performance = get_consultant_performance(self.consultant, start_year=2023, end_year=2024)
+        self.assertEqual(len(performance), 24)
+        self.assertEqual(performance[11]['joinings'], 1)
+        self.assertEqual(performance[12]['month_name'], 'January')
+
+    def test_payment_changes_invalidate_cached_years(self):
+        get_consultant_performance(self.consultant, start_year=2024)
+        with self.captureOnCommitCallbacks(execute=True):
+            payment = Payment.objects.get(student__email='perf1@test.com')
+            payment.amount_paid = 2000
+            payment.save()
+        self.assertEqual(get_consultant_performance(self.consultant, start_year=2024)[0]['revenue'], 2000)
+
+
+    def test_dashboard_clamps_out_of_range_years(self):
+        user = User.objects.create_user(email='perfuser@test.com', name='Perf', role='consultant', password='password')
+        ConsultantProfile.objects.create(user=user, consultant=self.consultant)
+        self.client.login(username='perfuser@test.com', password='password')
+        for year, expected in [('0', 2000), ('1', 2000), ('10000', timezone.now().year + 1)]:
+            with self.subTest(year=year):
+                response = self.client.get(reverse('consultant_dashboard'), {'year': year})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['selected_year'], expected)
+
+class RoleDashboardRenderTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser(email='dash@test.com', name='Dash', password='password')
+        trainer = Trainer.objects.create(name='Dash Trainer')
+        TrainerProfile.objects.create(user=self.user, trainer=trainer)
+        Batch.objects.create(batch_id='DB01', trainer=trainer, start_date=date(2025, 1, 1), end_date=date(2025, 3, 1), batch_status='IP')
+        Batch.objects.create(batch_id='DB02', trainer=trainer, start_date=date(2025, 1, 1), end_date=date(2025, 3, 1), batch_status='C')
+        self.client.login(username='dash@test.com', password='password')
+
+    def test_dashboards_render_batch_counts(self):
+        for name in ['consultant_dashboard', 'trainer_dashboard', 'batch_coordination_dashboard']:
+            with self.subTest(name=name):
+                response = self.client.get(reverse(name))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['total_batches'], 2)
+                self.assertEqual(response.context['in_progress_batches'], 1)
+                self.assertEqual(response.context['completed_batches'], 1)
+
+    def test_placement_dashboard_counts(self):
+        for i, status in enumerate(['C', 'C', 'P']):
+            student = Student.objects.create(
+                first_name=f'Pool{i}', email=f'pool{i}@test.com', mode_of_class='ON', week_type='WD',
+                course_status=status, pl_required=True, mock_interview_completed=(i == 0),
+            )
+            Placement.objects.create(student=student, is_active=status != 'P')
+
+        response = self.client.get(reverse('placement_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_placement_pool'], 3)
+        self.assertEqual(response.context['total_placed'], 1)
+        self.assertEqual(response.context['actively_seeking_completed'], 2)
+        self.assertEqual(response.context['mock_interviews_completed'], 1)
+        self.assertEqual(response.context['completed_but_no_resume'], 2)
+        self.assertEqual(response.context['resumes_to_collect_count'], 2)
@@ -6,6 +6,7 @@ urlpatterns = [
     path('logout/', logout_view, name='logout'),
     path('admin_dashboard/', admin_dashboard, name='admin_dashboard'),
     path('staff_dashboard/', staff_dashboard, name='staff_dashboard'),
+    path('metrics/history/', metrics_history, name='metrics_history'),
     path('consultant_dashboard/', consultant_dashboard, name='consultant_dashboard'),
     path('placement_dashboard/', placement_dashboard, name='placement_dashboard'),
     path('trainer_dashboard/', trainer_dashboard, name='trainer_dashboard'),
@@ -5,7 +5,8 @@ import pyotp
 from .forms import TwoFactorForm
 
 from consultantdb.models import Achievement, Goal
-from .models import CustomUser
+from .models import CustomUser, DailyMetricsSnapshot, MetricsRefreshRun
+from .dashboard import DashboardMetrics, get_batch_status_counts, get_consultant_performance
 from settingsdb.models import UserSettings
 from .forms import UserForm, UserUpdateForm, PasswordChangeForm, PasswordResetForm
 
@@ -30,8 +31,6 @@ from django.db.models import Sum, Q, F
 from batchdb.models import Batch
 from django.db.models.functions import TruncMonth, Coalesce
 from studentsdb.models import Student
-from paymentdb.models import Payment
-from settingsdb.models import TransactionLog
 from placementdb.models import Placement
 from placementdrive.models import Company
 from datetime import datetime
@@ -108,273 +107,52 @@ def mark_notification_read(request, notification_id):
 @login_required
 @user_passes_test(is_admin)
 def admin_dashboard(request):
-    # Basic Statistics
-    total_students = Student.objects.count()
-    total_pending_amount = Payment.objects.exclude(student__course_status__in=['R', 'D']).aggregate(total_pending=Sum('total_pending_amount'))['total_pending'] or 0
-    active_trainers = Trainer.objects.count()  # Count all trainers since there's no active status
-
-    # Get placement rate using course_status field
-    total_completed = Student.objects.filter(course_status='C').count()
-    total_placed = Student.objects.filter(course_status='P').count()
-    placement_rate = (total_placed / total_completed * 100) if total_completed > 0 else 0
-
-    # Monthly student enrollment
-    now = timezone.now()
-    six_months_ago = now - timedelta(days=180)
-    monthly_enrollments = (
-        Student.objects
-        .filter(enrollment_date__gte=six_months_ago)
-        .annotate(month=TruncMonth('enrollment_date'))
-        .values('month')
-        .annotate(count=Count('id'))
-        .order_by('month')
-    )
-
-    enrollment_data = [
-        {'month': item['month'].strftime('%Y-%m'), 'count': item['count']}
-        for item in monthly_enrollments
-    ]
-
-    # Monthly pending amounts for the last 6 months
-    monthly_pending_data = {}
-    
-    # Initialize months to ensure all 6 months are present in the chart
-    current_date = now.date()
-    for _ in range(6):
-        month_key = current_date.strftime('%Y-%m')
-        monthly_pending_data[month_key] = 0
-        # Go to the first day of the current month, then subtract one day to get the last day of the previous month
-        first_day_of_month = current_date.replace(day=1)
-        current_date = first_day_of_month - timedelta(days=1)
-
-    pending_payments = Payment.objects.filter(total_pending_amount__gt=0).exclude(student__course_status__in=['R', 'D'])
-
-    for payment in pending_payments:
-        for i in range(1, 5):
-            due_date = getattr(payment, f'emi_{i}_date')
-            amount = getattr(payment, f'emi_{i}_amount')
-            paid_amount = getattr(payment, f'emi_{i}_paid_amount')
-
-            if due_date and amount and not paid_amount and six_months_ago.date() <= due_date <= now.date():
-                month_key = due_date.strftime('%Y-%m')
-                if month_key in monthly_pending_data:
-                    monthly_pending_data[month_key] += float(amount)
-
-    monthly_pending_data = [
-        {'month': key, 'amount': value}
-        for key, value in sorted(monthly_pending_data.items())
-    ]
-
-    # Weekly Statistics
-    one_week_ago = now - timedelta(days=7)
-    weekly_students = Student.objects.filter(enrollment_date__gte=one_week_ago).count()
-    weekly_payments = Payment.objects.filter(student__enrollment_date__gte=one_week_ago).aggregate(
-        total=Sum('amount_paid')
-    )['total'] or 0
-
-    # Recent Activities and Students
-    recent_activities = TransactionLog.objects.order_by('-timestamp')[:10]
-    recent_students = Student.objects.order_by('-enrollment_date')[:5]
-
-    # Fetch upcoming payments
-    pending_payments = Payment.objects.filter(total_pending_amount__gt=0).exclude(student__course_status__in=['R', 'D']).select_related('student', 'student__consultant')
-    
-    # Get all unique course IDs from the students in pending payments
-    student_course_ids = [p.student.course_id for p in pending_payments if p.student and p.student.course_id]
-    
-    # Fetch all relevant courses in a single query
-    from coursedb.models import Course
-    courses = Course.objects.filter(id__in=student_course_ids)
-    course_map = {course.id: course.course_name for course in courses}
-
-    upcoming_payments_list = []
-    today = timezone.now().date()
-
-    for payment in pending_payments:
-        for i in range(1, 5):
-            due_date = getattr(payment, f'emi_{i}_date')
-            amount = getattr(payment, f'emi_{i}_amount')
-            paid_amount = getattr(payment, f'emi_{i}_paid_amount')
-
-            if due_date and amount and not paid_amount:
-                total_paid_by_student = payment.amount_paid or 0
-                for j in range(1, 5):
-                    total_paid_by_student += getattr(payment, f'emi_{j}_paid_amount') or 0
-                
-                course_name = course_map.get(payment.student.course_id, 'N/A') if payment.student else 'N/A'
-
-                upcoming_payments_list.append({
-                    'student_id': payment.student.student_id,
-                    'student_name': f"{payment.student.first_name} {payment.student.last_name or ''}",
-                    'mobile': payment.student.phone,
-                    'course': course_name,
-                    'consultant': payment.student.consultant.name if payment.student.consultant else 'N/A',
-                    'emi_number': i,
-                    'course_fee': payment.total_fees or 0,
-                    'amount': amount,
-                    'paid': total_paid_by_student,
-                    'due_date': due_date,
-                })
-                break
-
-
-    # Sort all upcoming payments by due date and take the first 5.
-    upcoming_payments_list.sort(key=lambda x: x['due_date'])
-    upcoming_payments = upcoming_payments_list[:5]
-
-    import json
-    from django.core.serializers.json import DjangoJSONEncoder
-
-    context = {
-        'total_students': total_students,
-        'total_pending_amount': total_pending_amount,
-        'active_trainers': active_trainers,
-        'placement_rate': round(placement_rate, 1),
-        'weekly_students': weekly_students,
-        'weekly_payments': weekly_payments,
-        'monthly_pending': json.dumps(monthly_pending_data, cls=DjangoJSONEncoder),
-        'enrollment_data': json.dumps(enrollment_data, cls=DjangoJSONEncoder),
-        'recent_activities': recent_activities,
-        'recent_students': recent_students,
-        'upcoming_payments': upcoming_payments,
-    }
+    context = DashboardMetrics.get().as_context()
     return render(request, 'accounts/admin_dashboard.html', context)
 
 @login_required
 @user_passes_test(is_staff)
 def staff_dashboard(request):
-    # Basic Statistics
-    total_students = Student.objects.count()
-    total_pending_amount = Payment.objects.exclude(student__course_status__in=['R', 'D']).aggregate(total_pending=Sum('total_pending_amount'))['total_pending'] or 0
-    active_trainers = Trainer.objects.count()  # Count all trainers since there's no active status
-
-    # Get placement rate using course_status field
-    total_completed = Student.objects.filter(course_status='C').count()
-    total_placed = Student.objects.filter(course_status='P').count()
-    placement_rate = (total_placed / total_completed * 100) if total_completed > 0 else 0
+    context = DashboardMetrics.get().as_context()
+    return render(request, 'accounts/staff_dashboard.html', context)
 
-    # Monthly student enrollment
-    now = timezone.now()
-    six_months_ago = now - timedelta(days=180)
-    monthly_enrollments = (
-        Student.objects
-        .filter(enrollment_date__gte=six_months_ago)
-        .annotate(month=TruncMonth('enrollment_date'))
+@login_required
+@user_passes_test(is_admin)
+def metrics_history(request):
+    """Monthly cohort trends from DailyMetricsSnapshot, for charts beyond the dashboards' six months."""
+    try:
+        months = min(max(int(request.GET.get('months', 24)), 1), 120)
+    except ValueError:
+        months = 24
+    start = (timezone.localdate().replace(day=1) - timedelta(days=31 * (months - 1))).replace(day=1)
+    rows = (
+        DailyMetricsSnapshot.objects.filter(date__gte=start)
+        .annotate(month=TruncMonth('date'))
         .values('month')
-        .annotate(count=Count('id'))
+        .annotate(
+            enrollments=Sum('enrollments'),
+            completed=Sum('completed'),
+            placed=Sum('placed'),
+            revenue=Sum('revenue'),
+            pending=Sum('pending_amount'),
+        )
         .order_by('month')
     )
-
-    enrollment_data = [
-        {'month': item['month'].strftime('%Y-%m'), 'count': item['count']}
-        for item in monthly_enrollments
-    ]
-
-    # Monthly pending amounts for the last 6 months
-    monthly_pending_data = {}
-    
-    # Initialize months to ensure all 6 months are present in the chart
-    current_date = now.date()
-    for _ in range(6):
-        month_key = current_date.strftime('%Y-%m')
-        monthly_pending_data[month_key] = 0
-        # Go to the first day of the current month, then subtract one day to get the last day of the previous month
-        first_day_of_month = current_date.replace(day=1)
-        current_date = first_day_of_month - timedelta(days=1)
-
-    pending_payments = Payment.objects.filter(total_pending_amount__gt=0).exclude(student__course_status__in=['R', 'D'])
-
-    for payment in pending_payments:
-        for i in range(1, 5):
-            due_date = getattr(payment, f'emi_{i}_date')
-            amount = getattr(payment, f'emi_{i}_amount')
-            paid_amount = getattr(payment, f'emi_{i}_paid_amount')
-
-            if due_date and amount and not paid_amount and six_months_ago.date() <= due_date <= now.date():
-                month_key = due_date.strftime('%Y-%m')
-                if month_key in monthly_pending_data:
-                    monthly_pending_data[month_key] += float(amount)
-
-    monthly_pending_data = [
-        {'month': key, 'amount': value}
-        for key, value in sorted(monthly_pending_data.items())
-    ]
-
-    # Weekly Statistics
-    one_week_ago = now - timedelta(days=7)
-    weekly_students = Student.objects.filter(enrollment_date__gte=one_week_ago).count()
-    weekly_payments = Payment.objects.filter(student__enrollment_date__gte=one_week_ago).aggregate(
-        total=Sum('amount_paid')
-    )['total'] or 0
-
-    # Recent Activities and Students
-    recent_activities = TransactionLog.objects.order_by('-timestamp')[:10]
-    recent_students = Student.objects.order_by('-enrollment_date')[:5]
-    
-    # Fetch upcoming payments
-    pending_payments = Payment.objects.filter(total_pending_amount__gt=0).exclude(student__course_status__in=['R', 'D']).select_related('student', 'student__consultant')
-
-    # Get all unique course IDs from the students in pending payments
-    student_course_ids = [p.student.course_id for p in pending_payments if p.student and p.student.course_id]
-    
-    # Fetch all relevant courses in a single query
-    from coursedb.models import Course
-    courses = Course.objects.filter(id__in=student_course_ids)
-    course_map = {course.id: course.course_name for course in courses}
-
-    upcoming_payments_list = []
-    today = timezone.now().date()
-
-    for payment in pending_payments:
-        for i in range(1, 5):
-            due_date = getattr(payment, f'emi_{i}_date')
-            amount = getattr(payment, f'emi_{i}_amount')
-            paid_amount = getattr(payment, f'emi_{i}_paid_amount')
-
-            if due_date and amount and not paid_amount:
-                total_paid_by_student = payment.amount_paid or 0
-                for j in range(1, 5):
-                    total_paid_by_student += getattr(payment, f'emi_{j}_paid_amount') or 0
-
-                course_name = course_map.get(payment.student.course_id, 'N/A') if payment.student else 'N/A'
-
-                upcoming_payments_list.append({
-                    'student_id': payment.student.student_id,
-                    'student_name': f"{payment.student.first_name} {payment.student.last_name or ''}",
-                    'mobile': payment.student.phone,
-                    'course': course_name,
-                    'consultant': payment.student.consultant.name if payment.student.consultant else 'N/A',
-                    'emi_number': i,
-                    'course_fee': payment.total_fees or 0,
-                    'amount': amount,
-                    'paid': total_paid_by_student,
-                    'due_date': due_date,
-                })
-                break
-    # Sort all upcoming payments by due date and take the first 5.
-    upcoming_payments_list.sort(key=lambda x: x['due_date'])
-    upcoming_payments = upcoming_payments_list[:5]
-
-    # Notifications
-    notifications_data = get_unread_mentions(request.user)
-
-    import json
-    from django.core.serializers.json import DjangoJSONEncoder
-
-    context = {
-        'total_students': total_students,
-        'total_pending_amount': total_pending_amount,
-        'active_trainers': active_trainers,
-        'placement_rate': round(placement_rate, 1),
-        'weekly_students': weekly_students,
-        'weekly_payments': weekly_payments,
-        'monthly_pending': json.dumps(monthly_pending_data, cls=DjangoJSONEncoder),
-        'enrollment_data': json.dumps(enrollment_data, cls=DjangoJSONEncoder),
-        'recent_activities': recent_activities,
-        'recent_students': recent_students,
-        'upcoming_payments': upcoming_payments,
-    }
-    return render(request, 'accounts/staff_dashboard.html', context)
+    last_run = MetricsRefreshRun.last_finished()
+    return JsonResponse({
+        'refreshed_at': last_run.finished_at if last_run else None,
+        'results': [
+            {
+                'month': row['month'].strftime('%Y-%m'),
+                'enrollments': row['enrollments'],
+                'completed': row['completed'],
+                'placed': row['placed'],
+                'revenue': float(row['revenue']),
+                'pending': float(row['pending']),
+            }
+            for row in rows
+        ],
+    })
 
 @login_required
 @user_passes_test(is_consultant)
@@ -478,7 +256,6 @@ def consultant_dashboard(request):
     if hasattr(request.user, 'consultant_profile'):
         # Consultant user → only their data
         consultant = request.user.consultant_profile.consultant
-        from django.db.models import Q
         # Base query for students belonging to this consultant
         student_qs = Student.objects.filter(Q(consultant=consultant) | Q(created_by=request.user)).distinct()
         total_students = student_qs.count()
@@ -488,79 +265,10 @@ def consultant_dashboard(request):
             selected_year = int(request.GET.get('year', timezone.now().year))
         except ValueError:
             selected_year = timezone.now().year
-            
-        performance_data = []
-        months = range(1, 13)
-        previous_month_revenue = 0
-        
-        for month in months:
-            # Get students joined in this month/year
-            # Using enrollment_date as the joining date
-            monthly_students = student_qs.filter(
-                enrollment_date__year=selected_year,
-                enrollment_date__month=month
-            )
-            
-            joinings_count = monthly_students.count()
-            
-            # Calculate revenue and pending for this cohort
-            # Revenue = amount_paid + all emi_paid_amounts
-            # Pending = total_pending_amount
-            
-            total_revenue = 0
-            total_pending = 0
-            
-            if joinings_count > 0:
-                payments = Payment.objects.filter(student__in=monthly_students)
-                
-                # Aggregate revenue
-                # We need to sum up all paid components
-                payment_aggs = payments.aggregate(
-                    initial=Sum('amount_paid'),
-                    e1=Sum('emi_1_paid_amount'),
-                    e2=Sum('emi_2_paid_amount'),
-                    e3=Sum('emi_3_paid_amount'),
-                    e4=Sum('emi_4_paid_amount')
-                )
-
-                # Exclude refunded and discontinued students from pending amount
-                pending_aggs = payments.exclude(student__course_status__in=['R', 'D']).aggregate(
-                    pending=Sum('total_pending_amount')
-                )
-                
-                total_revenue = (
-                    (payment_aggs['initial'] or 0) +
-                    (payment_aggs['e1'] or 0) +
-                    (payment_aggs['e2'] or 0) +
-                    (payment_aggs['e3'] or 0) +
-                    (payment_aggs['e4'] or 0)
-                )
-                total_pending = pending_aggs['pending'] or 0
-
-            # Calculate Growth %
-            growth_percentage = 0
-            if previous_month_revenue > 0:
-                growth_percentage = ((total_revenue - previous_month_revenue) / previous_month_revenue) * 100
-            elif previous_month_revenue == 0 and total_revenue > 0:
-                growth_percentage = 100 # 100% growth if starting from 0
-            
-            # For January, growth compared to Dec of prev year is tricky without fetching it.
-            # Usually dashboards just show 0 or N/A for first entry if no context.
-            # However, logic above sets it based on 'previous_month_revenue' variable which updates in loop.
-            # So Jan will always compare against 0 (initial value), effectively showing 100% if > 0.
-            # To fix this, we'd need Dec of prev year. For now, let's accept this limitation or handle Jan separately.
-            if month == 1:
-                growth_percentage = 0 # Reset for Jan as we don't have prev year Dec data in this loop
-
-            performance_data.append({
-                'month_name': timezone.datetime(selected_year, month, 1).strftime('%B'),
-                'joinings': joinings_count,
-                'revenue': total_revenue,
-                'pending': total_pending,
-                'growth': round(growth_percentage, 2)
-            })
-            
-            previous_month_revenue = total_revenue
+        # get_consultant_performance builds dates from it (and the year before)
+        selected_year = min(max(selected_year, 2000), timezone.now().year + 1)
+
+        performance_data = get_consultant_performance(consultant, request.user, selected_year)
 
     elif request.user.is_superuser:
         # Super admin → all data
@@ -572,13 +280,15 @@ def consultant_dashboard(request):
         selected_year = timezone.now().year
         performance_data = []
 
+    batch_counts = get_batch_status_counts(all_batches_for_stats)
+
     context = {
         'total_students': total_students,
-        'total_batches': all_batches_for_stats.count(),
-        'yts_batches': all_batches_for_stats.filter(batch_status='YTS').count(),
-        'in_progress_batches': all_batches_for_stats.filter(batch_status='IP').count(),
-        'hold_batches': all_batches_for_stats.filter(batch_status='H').count(),
-        'completed_batches': all_batches_for_stats.filter(batch_status='C').count(),
+        'total_batches': batch_counts['total'],
+        'yts_batches': batch_counts['yts'],
+        'in_progress_batches': batch_counts['ip'],
+        'hold_batches': batch_counts['hold'],
+        'completed_batches': batch_counts['completed'],
         'total_trainers': trainers.count(),
         'handovers': handovers.count(),
         'trainers': trainers,
@@ -686,12 +396,13 @@ def trainer_dashboard(request):
     import json
     from django.core.serializers.json import DjangoJSONEncoder
 
+    batch_counts = get_batch_status_counts(all_batches_for_stats)
     context = {
-        'total_batches': all_batches_for_stats.count(),
-        'yts_batches': all_batches_for_stats.filter(batch_status='YTS').count(),
-        'in_progress_batches': all_batches_for_stats.filter(batch_status='IP').count(),
-        'hold_batches': all_batches_for_stats.filter(batch_status='H').count(),
-        'completed_batches': all_batches_for_stats.filter(batch_status='C').count(),
+        'total_batches': batch_counts['total'],
+        'yts_batches': batch_counts['yts'],
+        'in_progress_batches': batch_counts['ip'],
+        'hold_batches': batch_counts['hold'],
+        'completed_batches': batch_counts['completed'],
         'handovers': handovers.count(),
         'batches_data': json.dumps(batches_data, cls=DjangoJSONEncoder),
         'notifications_data': json.dumps(notifications_data, cls=DjangoJSONEncoder),
@@ -709,41 +420,64 @@ def placement_dashboard(request):
     
     # Resume Shared Status Counts
     from placementdrive.models import ResumeSharedStatus
-    total_resume_shared = ResumeSharedStatus.objects.count()
-    position_closed_count = ResumeSharedStatus.objects.filter(status='position_closed').count()
-    not_shortlisted_count = ResumeSharedStatus.objects.filter(status='not_shortlisted').count()
-    no_response_count = ResumeSharedStatus.objects.filter(status='no_response').count()
-    moved_to_interview_count = ResumeSharedStatus.objects.filter(status='interview_stage').count()
+    resume_counts = ResumeSharedStatus.objects.aggregate(
+        total=Count('id'),
+        position_closed=Count('id', filter=Q(status='position_closed')),
+        not_shortlisted=Count('id', filter=Q(status='not_shortlisted')),
+        no_response=Count('id', filter=Q(status='no_response')),
+        moved_to_interview=Count('id', filter=Q(status='interview_stage')),
+    )
+    total_resume_shared = resume_counts['total']
+    position_closed_count = resume_counts['position_closed']
+    not_shortlisted_count = resume_counts['not_shortlisted']
+    no_response_count = resume_counts['no_response']
+    moved_to_interview_count = resume_counts['moved_to_interview']
     pending_count = total_resume_shared - (position_closed_count + not_shortlisted_count + no_response_count + moved_to_interview_count)
 
     # Overall Stats
-    total_placement_pool = placements.count()
-    total_placed = placements.filter(student__course_status='P').count()
-    
-    # Actively seeking students for the main stat card
-    actively_seeking_stat = placements.filter(is_active=True)
-    
-    # Separate counts for actively seeking
-    actively_seeking_completed = actively_seeking_stat.filter(student__course_status='C').count()
-    actively_seeking_in_progress = actively_seeking_stat.filter(student__course_status='IP').count()
-    actively_seeking_yts = actively_seeking_stat.filter(student__course_status='YTS').count()
-    
-    actively_seeking_count = actively_seeking_stat.count()
-    
+    placement_counts = placements.aggregate(
+        pool=Count('id'),
+        placed=Count('id', filter=Q(student__course_status='P')),
+        # Actively seeking students for the main stat card, split by course status
+        seeking=Count('id', filter=Q(is_active=True)),
+        seeking_completed=Count('id', filter=Q(is_active=True, student__course_status='C')),
+        seeking_in_progress=Count('id', filter=Q(is_active=True, student__course_status='IP')),
+        seeking_yts=Count('id', filter=Q(is_active=True, student__course_status='YTS')),
+    )
+    total_placement_pool = placement_counts['pool']
+    total_placed = placement_counts['placed']
+    actively_seeking_completed = placement_counts['seeking_completed']
+    actively_seeking_in_progress = placement_counts['seeking_in_progress']
+    actively_seeking_yts = placement_counts['seeking_yts']
+    actively_seeking_count = placement_counts['seeking']
+
     placement_rate = ((total_placed / total_placement_pool) * 100) if total_placement_pool > 0 else 0
-    active_drives_count = drives.count()
-    
-    # Correctly count scheduled and completed interviews
-    interviews_scheduled = Company.objects.filter(progress='interview_scheduling').count()
-    interviews_completed_count = Company.objects.filter(progress='interview_completed').count()
-    onboarding_call_done_count = Student.objects.filter(onboardingcalldone=True).count()
-    interview_questions_shared_count = Student.objects.filter(interviewquestion_shared=True).count()
-    resume_templates_shared_count = Student.objects.filter(resume_template_shared=True).count()
 
-    # New stats for mock interviews, placement sessions, and certificates
-    mock_interviews_completed_count = Student.objects.filter(mock_interview_completed=True).count()
-    placement_sessions_completed_count = Student.objects.filter(placement_session_completed=True).count()
-    certificates_issued_count = Student.objects.filter(certificate_issued=True).count()
+    # Correctly count scheduled and completed interviews
+    drive_counts = drives.aggregate(
+        total=Count('id'),
+        interviews_scheduled=Count('id', filter=Q(progress='interview_scheduling')),
+        interviews_completed=Count('id', filter=Q(progress='interview_completed')),
+    )
+    active_drives_count = drive_counts['total']
+    interviews_scheduled = drive_counts['interviews_scheduled']
+    interviews_completed_count = drive_counts['interviews_completed']
+
+    # Preparation steps, mock interviews, placement sessions and certificates
+    student_counts = Student.objects.aggregate(
+        onboarding_call_done=Count('id', filter=Q(onboardingcalldone=True)),
+        interview_questions_shared=Count('id', filter=Q(interviewquestion_shared=True)),
+        resume_templates_shared=Count('id', filter=Q(resume_template_shared=True)),
+        mock_interviews_completed=Count('id', filter=Q(mock_interview_completed=True)),
+        placement_sessions_completed=Count('id', filter=Q(placement_session_completed=True)),
+        certificates_issued=Count('id', filter=Q(certificate_issued=True)),
+    )
+    onboarding_call_done_count = student_counts['onboarding_call_done']
+    interview_questions_shared_count = student_counts['interview_questions_shared']
+    resume_templates_shared_count = student_counts['resume_templates_shared']
+    mock_interviews_completed_count = student_counts['mock_interviews_completed']
+    placement_sessions_completed_count = student_counts['placement_sessions_completed']
+    certificates_issued_count = student_counts['certificates_issued']
 
     # --- Refined Resume Statistics ---
     # 1. Start with students who need placement and are in an active course status.
@@ -758,22 +492,16 @@ def placement_dashboard(request):
         Q(placement__isnull=True) | Q(placement__resume_link__isnull=True) | Q(placement__resume_link='')
     )
     
-    # 3. Calculate the total and segregated counts.
+    # 3. Segregate them; the paginators below count each list.
     students_no_resume_list = students_no_resume.select_related('placement')
-    
-    resumes_to_collect_count = students_no_resume_list.count()
-    
+
     completed_but_no_resume_list = students_no_resume_list.filter(course_status='C')
     in_progress_80_99_no_resume_list = students_no_resume_list.filter(course_status='IP', course_percentage__gte=80, course_percentage__lt=99)
     in_progress_50_80_no_resume_list = students_no_resume_list.filter(course_status='IP', course_percentage__gte=50, course_percentage__lt=80)
     in_progress_below_50_no_resume_list = students_no_resume_list.filter(course_status='IP', course_percentage__lt=50)
     yts_no_resume_list = students_no_resume_list.filter(course_status='YTS')
 
-    completed_but_no_resume = completed_but_no_resume_list.count()
-    in_progress_80_99_no_resume = in_progress_80_99_no_resume_list.count()
-    in_progress_50_80_no_resume = in_progress_50_80_no_resume_list.count()
-    in_progress_below_50_no_resume = in_progress_below_50_no_resume_list.count()
-    yts_no_resume = yts_no_resume_list.count()
+    resumes_to_collect_count = students_no_resume.count()
 
     # --- Pagination for Resume Lists ---
     def paginate_queryset(queryset, page_param, per_page=10):
@@ -792,6 +520,12 @@ def placement_dashboard(request):
     progress_below_50_paginated = paginate_queryset(in_progress_below_50_no_resume_list, 'progress_below_50_page')
     yts_paginated = paginate_queryset(yts_no_resume_list, 'yts_page')
 
+    # The paginators have counted each list already
+    completed_but_no_resume = completed_paginated.paginator.count
+    in_progress_80_99_no_resume = progress_80_99_paginated.paginator.count
+    in_progress_50_80_no_resume = progress_50_80_paginated.paginator.count
+    in_progress_below_50_no_resume = progress_below_50_paginated.paginator.count
+    yts_no_resume = yts_paginated.paginator.count
 
     # Table Data
     from placementdrive.models import InterviewStudent
@@ -807,14 +541,14 @@ def placement_dashboard(request):
     # Manually fetch courses for all student lists
     from coursedb.models import Course
     
-    # Collect all course_ids from all relevant student querysets
+    # Collect the course_ids of the students shown (only the current page of each list)
     all_student_lists = [
         recently_placed_students,
-        completed_but_no_resume_list,
-        in_progress_80_99_no_resume_list,
-        in_progress_50_80_no_resume_list,
-        in_progress_below_50_no_resume_list,
-        yts_no_resume_list
+        completed_paginated,
+        progress_80_99_paginated,
+        progress_50_80_paginated,
+        progress_below_50_paginated,
+        yts_paginated,
     ]
     
     all_course_ids = set()
@@ -981,13 +715,14 @@ def batch_coordination_dashboard(request):
     trainers = Trainer.objects.all()
     trainers_data = [{'id': t.id, 'name': t.name} for t in trainers]
     
+    batch_counts = get_batch_status_counts(all_batches_for_stats)
     context = {
         'total_students': Student.objects.count(),
-        'total_batches': all_batches_for_stats.count(),
-        'yts_batches': all_batches_for_stats.filter(batch_status='YTS').count(),
-        'in_progress_batches': all_batches_for_stats.filter(batch_status='IP').count(),
-        'hold_batches': all_batches_for_stats.filter(batch_status='H').count(),
-        'completed_batches': all_batches_for_stats.filter(batch_status='C').count(),
+        'total_batches': batch_counts['total'],
+        'yts_batches': batch_counts['yts'],
+        'in_progress_batches': batch_counts['ip'],
+        'hold_batches': batch_counts['hold'],
+        'completed_batches': batch_counts['completed'],
         'total_trainers': trainers.count(),
         'handovers': handovers.count(),
         'trainers': trainers,
@@ -1139,7 +874,6 @@ def password_change(request):
 
 import random
 import string
-from django.conf import settings
 from datetime import timedelta
 from .utils import send_otp_email
 
@@ -0,0 +1,71 @@
+"""
+Rows of the batch Excel exports.
+
+export_batches() loads batches with their course and trainer joined in and
+their active students prefetched, so a chunk of batches costs two queries
+however many students it holds. Students who left a batch (inactive
+BatchStudent rows) are not exported.
+"""
+from django.db.models import Prefetch
+
+from .models import Batch, BatchStudent
+
+BATCH_EXPORT_COLUMNS = ['Batch ID', 'Course', 'Trainer', 'Start Date', 'End Date', 'Slot Time', 'Status', 'Days', 'Student ID', 'Student Name', 'Email', 'Phone']
+BATCH_EXPORT_COLORS = ['FFFFCC', 'CCFFCC', 'CCFFFF', 'FFCCFF', 'CCE5FF', 'FFDDAA']
+
+
+def export_batches(queryset=None):
+    """``queryset`` (all batches by default) ready for batch_export_rows()."""
+    if queryset is None:
+        queryset = Batch.objects.all()
+    memberships = BatchStudent.objects.filter(is_active=True).select_related('student').order_by('pk')
+    return queryset.select_related('course', 'trainer').prefetch_related(
+        Prefetch('batchstudent_set', queryset=memberships, to_attr='active_memberships')
+    )
+
+
+def batch_columns(batch):
+    return [
+        batch.batch_id,
+        batch.course.course_name if batch.course else 'N/A',
+        batch.trainer.name if batch.trainer else 'N/A',
+        batch.start_date.strftime('%d-%m-%Y'),
+        batch.end_date.strftime('%d-%m-%Y'),
+        batch.get_slottime,
+        batch.get_batch_status_display(),
+        ', '.join(batch.days),
+    ]
+
+
+def student_columns(student):
+    return [student.student_id, f"{student.first_name} {student.last_name or ''}", student.email, student.phone]
+
+
+def batch_export_rows(batches, repeat_batch=True):
+    """
+    One row per active student of each batch from export_batches(), or a
+    single row for a batch without any. With ``repeat_batch`` off, the batch
+    columns are only filled on a batch's first row.
+    """
+    for batch in batches:
+        info = batch_columns(batch)
+        blank = [''] * len(info)
+        if not batch.active_memberships:
+            yield info + [None] * 4
+        for position, membership in enumerate(batch.active_memberships):
+            yield (info if repeat_batch or not position else blank) + student_columns(membership.student)
+
+
+def batch_group_fill():
+    """Row fill that moves to the next color whenever the Batch ID changes."""
+    from openpyxl.styles import PatternFill
+
+    fills = [PatternFill(start_color=color, end_color=color, fill_type="solid") for color in BATCH_EXPORT_COLORS]
+    state = {'batch_id': object(), 'index': -1}
+
+    def row_fill(row):
+        if row[0] != state['batch_id']:
+            state['batch_id'] = row[0]
+            state['index'] += 1
+        return fills[state['index'] % len(fills)]
+    return row_fill
@@ -0,0 +1,151 @@
+"""
+Bulk import of batches from the download_batch_template() sheet, run as a
+core.jobs import job.
+
+Each chunk of rows is committed in its own transaction and every row in its
+own savepoint, so a row the database rejects is reported with an
+``error_reason`` without undoing the rest of its chunk.
+"""
+from collections import Counter
+from datetime import datetime
+
+import pandas as pd
+from django.db import transaction
+
+REQUIRED_COLUMNS = [
+    'module_name', 'batch_type', 'trainer', 'start_date', 'end_date', 'time_slot', 'students'
+]
+
+CHUNK_SIZE = 500
+
+
+def _sheet_batch_id(row):
+    """The batch_id column of an import row, stripped, or None when blank."""
+    value = row.get('batch_id')
+    if pd.notna(value) and str(value).strip():
+        return str(value).strip()
+    return None
+
+
+def _student_ids(row):
+    return [student_id.strip() for student_id in str(row['students']).split(',')]
+
+
+def import_batch_frame(df):
+    """
+    Create the batches of ``df`` (one sheet chunk) with their students.
+    Returns ``(created_count, error_rows)``; each error row is the sheet row
+    plus ``error_reason``.
+    """
+    from coursedb.models import Course
+    from placementdb.models import Placement
+    from studentsdb.models import Student
+    from trainersdb.models import Trainer
+    from .models import Batch
+
+    error_rows = []
+    success_count = 0
+
+    courses = {
+        course.course_name: course
+        for course in Course.objects.filter(
+            course_name__in={str(name).strip() for name in df['module_name'].dropna()}
+        ).select_related('category')
+    }
+    students_by_id = Student.objects.in_bulk(
+        {student_id for _, row in df.iterrows() if pd.notna(row['students']) for student_id in _student_ids(row)},
+        field_name='student_id',
+    )
+
+    with transaction.atomic():
+        # Reserve the generated batch IDs of each course in one allocation.
+        needed = Counter(
+            str(row['module_name']).strip() for _, row in df.iterrows()
+            if str(row['module_name']).strip() in courses and not _sheet_batch_id(row)
+        )
+        reserved_ids = {
+            name: iter(Batch.reserve_batch_ids(courses[name].category, courses[name], count))
+            for name, count in needed.items()
+        }
+
+        for index, row in df.iterrows():
+            try:
+                with transaction.atomic():
+                    module_name = row['module_name']
+                    batch_type = row['batch_type']
+                    trainer_name = row['trainer']
+                    start_date_str = str(row['start_date']).split(' ')[0]
+                    end_date_str = str(row['end_date']).split(' ')[0]
+                    time_slot = row['time_slot']
+                    student_ids_str = row['students']
+
+                    if not all([module_name, batch_type, trainer_name, start_date_str, end_date_str, time_slot, student_ids_str]):
+                        raise ValueError("All fields are mandatory.")
+
+                    try:
+                        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+                        end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+                    except ValueError:
+                        raise ValueError("Invalid date format. Use YYYY-MM-DD.")
+
+                    trainer, _ = Trainer.objects.get_or_create(name=trainer_name)
+
+                    batch_id = _sheet_batch_id(row)
+                    if batch_id:
+                        if Batch.objects.filter(batch_id=batch_id).exists():
+                            raise ValueError(f"Batch with ID '{batch_id}' already exists.")
+                        batch = Batch(batch_id=batch_id)
+                    else:
+                        batch = Batch()
+
+                    course = courses.get(str(module_name).strip())
+                    if course:
+                        batch.course = course
+                        if not batch.batch_id:
+                            batch.batch_id = next(reserved_ids[course.course_name])
+
+                    batch.module_name = module_name
+                    batch.batch_type = batch_type
+                    batch.trainer = trainer
+                    batch.start_date = start_date
+                    batch.end_date = end_date
+                    batch.time_slot = time_slot
+                    batch.save()
+
+                    students = []
+                    for student_id in _student_ids(row):
+                        if student_id not in students_by_id:
+                            raise ValueError(f"Student with ID {student_id} not found.")
+                        students.append(students_by_id[student_id])
+
+                    batch.students.set(students)
+
+                    for student in students:
+                        if student.pl_required:
+                            Placement.objects.get_or_create(student=student)
+
+                success_count += 1
+
+            except Exception as e:
+                error_row = row.to_dict()
+                error_row['error_reason'] = str(e)
+                error_rows.append(error_row)
+
+    return success_count, error_rows
+
+
+def run_import_job(job, progress):
+    """core.jobs handler: import the job's sheet CHUNK_SIZE rows at a time."""
+    from core.jobs import ImportJobError, iter_sheet_frames, open_workbook, sheet_columns, sheet_row_count
+
+    workbook = open_workbook(job)
+    try:
+        worksheet = workbook.worksheets[0]
+        if not all(column in sheet_columns(worksheet) for column in REQUIRED_COLUMNS):
+            raise ImportJobError(f"Batch Excel file must contain the following columns: {', '.join(REQUIRED_COLUMNS)}")
+        progress.set_total(sheet_row_count(worksheet))
+        for frame in iter_sheet_frames(worksheet, CHUNK_SIZE):
+            created, error_rows = import_batch_frame(frame)
+            progress.advance(len(frame), created, error_rows)
+    finally:
+        workbook.close()
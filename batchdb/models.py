@@ -1,7 +1,9 @@
 from django.db import models
+from core.mixins import FieldTrackerMixin
 from django.utils import timezone
 from django.conf import settings
 from django.db import transaction
+from core.sequences import allocate, codes_in_use
 from trainersdb.models import Trainer
 from coursedb.models import Course, CourseCategory
 from studentsdb.models import Student
@@ -18,7 +20,35 @@ except ImportError:
     # For Django versions < 3.1
     JSONField = PostgresJSONField
 
-class Batch(models.Model):
+def alpha_series(number):
+    """
+    Letter series of the number-th batch of a prefix: 1 -> AA, 26 -> AZ,
+    676 -> ZZ, then three letters from 677 -> AAA up to ZZZ, and so on.
+    """
+    index = number - 1
+    width = 2
+    while index >= 26 ** width:
+        index -= 26 ** width
+        width += 1
+    letters = []
+    for _ in range(width):
+        index, digit = divmod(index, 26)
+        letters.append(string.ascii_uppercase[digit])
+    return ''.join(reversed(letters))
+
+
+def series_number(series):
+    """Inverse of alpha_series(); 0 for anything that is not a letter series."""
+    if len(series) < 2 or not all(c in string.ascii_uppercase for c in series):
+        return 0
+    index = sum(26 ** width for width in range(2, len(series)))
+    value = 0
+    for c in series:
+        value = value * 26 + string.ascii_uppercase.index(c)
+    return index + value + 1
+
+
+class Batch(FieldTrackerMixin, models.Model):
     STATUS_CHOICES = [
         ('YTS', 'Yet to Start'),
         ('IP', 'In Progress'),
@@ -77,39 +107,39 @@ class Batch(models.Model):
             return f"{self.start_time.strftime('%I:%M %p')} - {self.end_time.strftime('%I:%M %p')}"
         return "Not Set"
 
+    @staticmethod
+    def batch_id_prefix(category, course):
+        """<CategoryInitial><last two characters of the course code>"""
+        course_code = course.code[-2:].upper() if course.code else 'XX'
+        return f"{category.name[0].upper()}{course_code}"
+
+    @classmethod
+    def reserve_batch_ids(cls, category, course, count):
+        """
+        ``count`` new batch IDs <prefix><AlphaSeries> for the course, taken in
+        one allocation from the prefix's counter in core.Sequence. The counter
+        row is locked only until the surrounding transaction ends, and is
+        seeded from the highest series already used by the prefix.
+        """
+        prefix = cls.batch_id_prefix(category, course)
+
+        def last_used():
+            suffixes = (
+                batch_id[len(prefix):]
+                for batch_id in cls.objects.filter(batch_id__startswith=prefix).values_list('batch_id', flat=True)
+            )
+            return max((series_number(suffix) for suffix in suffixes), default=0)
+
+        def taken(values):
+            return codes_in_use(cls.objects.all(), 'batch_id', (f"{prefix}{alpha_series(number)}" for number in values))
+
+        numbers = allocate(f'batchdb.batch_id:{prefix}', count, seed=last_used, taken=taken)
+        return [f"{prefix}{alpha_series(number)}" for number in numbers]
+
     @classmethod
     def generate_batch_id(cls, category, course):
-        """Generate a unique batch ID following the format <CategoryInitial><CourseCode><AlphaSeries2>"""
-        with transaction.atomic():
-            # Lock the table to prevent race conditions
-            # Get the category initial
-            category_initial = category.name[0].upper()
-            
-            # Get the course code (assuming it's stored in the course model)
-            course_code = course.code[-2:].upper() if course.code else 'XX'
-            
-            # Find the last batch with this category and course combination
-            last_batch = cls.objects.filter(
-                course__category=category,
-                course=course
-            ).select_for_update().order_by('batch_id').last()
-            
-            if last_batch and last_batch.batch_id:
-                # Extract the alpha series from the last batch ID
-                try:
-                    alpha_series = last_batch.batch_id[-2:]
-                    # Convert alpha series to next in sequence (AA -> AB, AZ -> BA, etc.)
-                    if alpha_series[1] == 'Z':
-                        next_series = alpha_series[0] + 'A' if alpha_series[0] != 'Z' else 'AA'
-                    else:
-                        next_series = alpha_series[0] + chr(ord(alpha_series[1]) + 1)
-                except (IndexError, ValueError):
-                    next_series = 'AA'
-            else:
-                next_series = 'AA'
-            
-            # Construct the new batch ID
-            return f"{category_initial}{course_code}{next_series}"
+        """Generate a unique batch ID following the format <CategoryInitial><CourseCode><AlphaSeries>"""
+        return cls.reserve_batch_ids(category, course, 1)[0]
 
     def save(self, *args, **kwargs):
         is_new = self.pk is None
@@ -173,7 +203,7 @@ class Batch(models.Model):
             )
 
 
-class BatchStudent(models.Model):
+class BatchStudent(FieldTrackerMixin, models.Model):
     """Through model for tracking student batch history"""
     batch = models.ForeignKey(Batch, on_delete=models.CASCADE)
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
@@ -330,7 +360,7 @@ class BatchTransaction(models.Model):
         return transaction
 
 
-class TrainerHandover(models.Model):
+class TrainerHandover(FieldTrackerMixin, models.Model):
     """Model for tracking trainer handovers in batches"""
     STATUS_CHOICES = [
         ('PENDING', 'Pending'),
@@ -438,7 +468,7 @@ class TrainerHandover(models.Model):
         ).update(status='EXPIRED')
 
 
-class TransferRequest(models.Model):
+class TransferRequest(FieldTrackerMixin, models.Model):
     """Model for student transfer requests between batches"""
     STATUS_CHOICES = [
         ('PENDING', 'Pending'),
@@ -6,7 +6,7 @@ from rest_framework import status
 from datetime import datetime, timedelta
 from .models import (
     Batch, BatchStudent, TransferRequest, 
-    BatchTransaction, TrainerHandover
+    BatchTransaction, TrainerHandover, alpha_series, series_number
 )
 from studentsdb.models import Student
 from trainersdb.models import Trainer
@@ -98,6 +98,103 @@ class BatchModelTestCase(TestCase):
         self.assertEqual(new_count, initial_count + 1)
 
 
+class BatchIdAllocatorTestCase(TestCase):
+    def setUp(self):
+        self.category = CourseCategory.objects.create(name='Allocator Category')
+        self.course = Course.objects.create(course_name='Allocator Course', category=self.category, total_duration=30)
+        self.prefix = Batch.batch_id_prefix(self.category, self.course)
+
+    def _create_batch(self, **kwargs):
+        today = datetime.now().date()
+        return Batch.objects.create(course=self.course, start_date=today, end_date=today, **kwargs)
+
+    def test_series_overflows_to_three_letters(self):
+        pairs = [(1, 'AA'), (26, 'AZ'), (27, 'BA'), (676, 'ZZ'), (677, 'AAA'), (17576 + 676, 'ZZZ'), (17576 + 677, 'AAAA')]
+        for number, series in pairs:
+            self.assertEqual(alpha_series(number), series)
+            self.assertEqual(series_number(series), number)
+        self.assertEqual(series_number('A1'), 0)
+
+    def test_allocation_continues_after_existing_ids(self):
+        self._create_batch(batch_id=f'{self.prefix}ZY')
+        self.assertEqual(self._create_batch().batch_id, f'{self.prefix}ZZ')
+        self.assertEqual(self._create_batch().batch_id, f'{self.prefix}AAA')
+
+    def test_courses_sharing_a_prefix_share_the_series(self):
+        twin_category = CourseCategory.objects.create(name='Another Category')
+        twin = Course.objects.create(course_name='Twin Course', category=twin_category, total_duration=30)
+        twin.code = 'X' + self.course.code[-2:]
+        twin.save()
+        self.assertEqual(Batch.batch_id_prefix(twin_category, twin), self.prefix)
+
+        first = self._create_batch().batch_id
+        reserved = Batch.reserve_batch_ids(twin_category, twin, 3)
+        self.assertEqual([first] + reserved, [f'{self.prefix}{s}' for s in ('AA', 'AB', 'AC', 'AD')])
+
+
+class BatchExportTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='export@test.com', name='Exporter', role='staff', password='pass12345')
+        self.client.force_login(self.user)
+        category = CourseCategory.objects.create(name='Export Category')
+        self.course = Course.objects.create(course_name='Export Course', category=category, total_duration=30)
+        self.trainer = Trainer.objects.create(name='Export Trainer')
+        self.count = 0
+
+    def _create_batches(self, count, students=2):
+        today = datetime.now().date()
+        batches = []
+        for _ in range(count):
+            batch = Batch.objects.create(course=self.course, trainer=self.trainer, start_date=today, end_date=today)
+            for _ in range(students):
+                self.count += 1
+                student = Student.objects.create(first_name=f'Export{self.count}', mode_of_class='ON', week_type='WD')
+                BatchStudent.objects.create(batch=batch, student=student)
+            batches.append(batch)
+        return batches
+
+    def _export(self, url):
+        from io import BytesIO
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from openpyxl import load_workbook
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+            content = b''.join(response.streaming_content)
+        return load_workbook(BytesIO(content)).active, len(queries)
+
+    def test_all_batches_export_skips_inactive_students_and_colors_each_batch(self):
+        first, second = self._create_batches(2)
+        left = first.batchstudent_set.first()
+        BatchStudent.objects.filter(pk=left.pk).update(is_active=False)
+
+        sheet, _ = self._export(reverse('batchdb:export_all_batches_data'))
+        rows = list(sheet.iter_rows(min_row=2, values_only=True))
+        self.assertEqual([row[0] for row in rows], [first.batch_id, second.batch_id, second.batch_id])
+        self.assertNotIn(left.student.student_id, [row[8] for row in rows])
+        self.assertEqual(rows[0][1:3], ('Export Course', 'Export Trainer'))
+        colors = [sheet.cell(row=row, column=1).fill.fgColor.rgb for row in range(2, 5)]
+        self.assertNotEqual(colors[0], colors[1])
+        self.assertEqual(colors[1], colors[2])
+        self.assertEqual({cell.fill.fgColor.rgb for cell in sheet[3]}, {colors[1]})
+
+    def test_export_query_count_does_not_grow_with_batches(self):
+        self._create_batches(3)
+        _, small = self._export(reverse('batchdb:export_all_batches_data'))
+        self._create_batches(12, students=3)
+        _, large = self._export(reverse('batchdb:export_all_batches_data'))
+        self.assertEqual(small, large)
+
+    def test_single_batch_export(self):
+        batch, = self._create_batches(1, students=3)
+        sheet, queries = self._export(reverse('batchdb:export_batch_data', args=[batch.pk]))
+        rows = list(sheet.iter_rows(min_row=2, values_only=True))
+        self.assertEqual([row[0] for row in rows], [batch.batch_id, None, None])
+        self.assertEqual(len([row for row in rows if row[8]]), 3)
+        _, more = self._export(reverse('batchdb:export_batch_data', args=[self._create_batches(1, students=8)[0].pk]))
+        self.assertEqual(queries, more)
+
+
 class TransferRequestTestCase(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(
@@ -295,6 +392,32 @@ class BatchAPITestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data['results']), 1)
     
+    def test_batch_list_is_cursor_paginated(self):
+        """Test following keyset cursors through the batch list"""
+        for offset in range(1, 3):
+            Batch.objects.create(
+                course=self.course,
+                trainer=self.trainer,
+                start_date=datetime.now().date(),
+                end_date=(datetime.now() + timedelta(days=30)).date(),
+                created_at=self.batch.created_at - timedelta(days=offset),
+            )
+        url = reverse('batchdb_api:batch-list')
+
+        first = self.client.get(url, {'page_size': 2})
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(first.data['results']), 2)
+        self.assertIsNone(first.data['previous'])
+
+        second = self.client.get(first.data['next'])
+        self.assertEqual(len(second.data['results']), 1)
+        self.assertIsNone(second.data['next'])
+        seen = [row['id'] for row in first.data['results'] + second.data['results']]
+        self.assertEqual(seen, list(Batch.objects.order_by('-created_at', '-id').values_list('id', flat=True)))
+
+        back = self.client.get(second.data['previous'])
+        self.assertEqual([row['id'] for row in back.data['results']], seen[:2])
+
     def test_batch_detail(self):
         """Test retrieving batch detail"""
         url = reverse('batchdb_api:batch-detail', args=[self.batch.id])
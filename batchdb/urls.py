@@ -14,7 +14,6 @@ urlpatterns = [
     path('<int:pk>/update/', views.update_batch, name='update_batch'),
     path('import/', views.import_batches, name='import_batches'),
     path('template/', views.download_batch_template, name='download_batch_template'),
-    path('error-report/', views.download_error_report_batch, name='download_error_report_batch'),
     path('<int:pk>/delete/', views.delete_batch, name='delete_batch'),
     path('batch/<int:pk>/report/', views.batch_report, name='batch_report'),
     path('batch/<int:pk>/remove-student/<int:student_id>/', views.remove_student_from_batch, name='remove_student_from_batch'),
@@ -16,7 +16,11 @@ from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from core.pagination import KeysetPagination, KeysetPaginator, keyset_query_params
 from core.permissions import IsBatchCoordinator, IsStaff, IsTrainer
+from core.exports import EXPORT_CHUNK_SIZE, Sheet, xlsx_response
+from core.jobs import enqueue_import
+from core.search import search_q
 from django.views.decorators.csrf import csrf_exempt
 
 # Model imports
@@ -37,20 +41,23 @@ from .serializers import (
 )
 
 # Form imports
+from .exports import BATCH_EXPORT_COLUMNS, batch_export_rows, batch_group_fill, export_batches
 from .forms import BatchCreationForm, BatchUpdateForm, BatchFilterForm
 
 import json
 import pandas as pd
-from io import BytesIO
-from openpyxl.styles import PatternFill
 
 from coursedb.models import Course, CourseCategory
 from trainersdb.models import Trainer
 from studentsdb.models import Student
-from placementdb.models import Placement
 
 # Request Management API Endpoints
 
+def _enrolled_student_q(term):
+    # Batches with a matching student, as a subquery so no DISTINCT is needed.
+    students = Student.objects.filter(search_q(term, ('first_name', 'last_name')))
+    return Q(pk__in=BatchStudent.objects.filter(student__in=students).values('batch_id'))
+
 def batch_list(request):
     user = request.user
     if hasattr(user, 'trainer_profile'):
@@ -72,13 +79,9 @@ def batch_list(request):
         percentage_max = form.cleaned_data.get('percentage_max')
 
         if query:
-            batch_list = batch_list.filter(
-                Q(students__first_name__icontains=query) |
-                Q(students__last_name__icontains=query) |
-                Q(batch_id__icontains=query) |
-                Q(course__course_name__icontains=query) |
-                Q(trainer__name__icontains=query)
-            ).distinct()
+            batch_list = batch_list.filter(search_q(
+                query, ('batch_id', 'course__course_name', 'trainer__name'), extra=_enrolled_student_q,
+            ))
         
         if courses:
             batch_list = batch_list.filter(course__in=courses).distinct()
@@ -110,24 +113,12 @@ def batch_list(request):
         if percentage_max is not None:
             batch_list = batch_list.filter(batch_percentage__lte=percentage_max)
 
-    paginator = Paginator(batch_list, 10)
-    page = request.GET.get('page')
-
-    try:
-        batches = paginator.page(page)
-    except PageNotAnInteger:
-        batches = paginator.page(1)
-    except EmptyPage:
-        batches = paginator.page(paginator.num_pages)
+    batches = KeysetPaginator(batch_list, 10).page_from_request(request)
 
-    qs = request.GET.copy()
-    if 'page' in qs:
-        qs.pop('page')
-    querystring = qs.urlencode()
     return render(request, 'batchdb/batch_list.html', {
         'batches': batches,
         'form': form,
-        'querystring': querystring
+        'querystring': keyset_query_params(request),
     })
 
 @login_required
@@ -198,76 +189,79 @@ def update_batch(request, pk):
             if not (request.user.is_superuser or request.user.role in allowed_roles_for_start):
                 batch.start_date = Batch.objects.get(pk=batch.pk).start_date
 
-            batch.updated_by = request.user
-            batch.save()
-            form.save_m2m()
-
-            # Process per-student updates: course_percentage and course_status
-            updated_count = 0
-            status_values = {choice[0] for choice in Student.COURSE_STATUS_CHOICES}
-            for bs in active_batch_students:
-                student = bs.student
-                perc_key = f"student_{student.id}_percentage"
-                status_key = f"student_{student.id}_status"
-                remarks_key = f"student_{student.id}_remarks"
-                perc_val = request.POST.get(perc_key)
-                status_val = request.POST.get(status_key)
-                remarks_val = request.POST.get(remarks_key, '') or ''
-
-                changed = False
-                old_percentage = student.course_percentage
-                old_status = student.course_status
-                # Update percentage if provided and valid
-                if perc_val is not None and perc_val != "":
-                    try:
-                        perc_float = float(perc_val)
-                        # Clamp between 0 and 100
-                        if perc_float < 0:
-                            perc_float = 0
-                        if perc_float > 100:
-                            perc_float = 100
-                        if student.course_percentage != perc_float:
-                            student.course_percentage = perc_float
-                            changed = True
-                    except ValueError:
-                        # Ignore invalid percentage input
-                        pass
-
-                # Update status if provided and valid choice
-                if status_val and status_val in status_values and student.course_status != status_val:
-                    student.course_status = status_val
-                    changed = True
-
-                # Remarks persist even if no percentage/status change
-                remarks_old = bs.update_remarks or ''
-                remarks_new = (remarks_val or '').strip()
-                remarks_changed = remarks_new != remarks_old
-                if remarks_changed:
-                    bs.update_remarks = remarks_new
-                    bs.save(update_fields=['update_remarks'])
-
-                if changed:
-                    student.save()
-                if changed or remarks_changed:
-                    updated_count += 1
-                    change_details = {
-                        'student_id': student.student_id,
-                        'name': f"{student.first_name} {student.last_name or ''}".strip(),
-                        'percentage_old': old_percentage,
-                        'percentage_new': float(student.course_percentage) if student.course_percentage is not None else None,
-                        'status_old': old_status,
-                        'status_new': student.course_status,
-                    }
+            # One transaction so the pending-payment sync for the batch and its
+            # students runs once, on commit.
+            with transaction.atomic():
+                batch.updated_by = request.user
+                batch.save()
+                form.save_m2m()
+
+                # Process per-student updates: course_percentage and course_status
+                updated_count = 0
+                status_values = {choice[0] for choice in Student.COURSE_STATUS_CHOICES}
+                for bs in active_batch_students:
+                    student = bs.student
+                    perc_key = f"student_{student.id}_percentage"
+                    status_key = f"student_{student.id}_status"
+                    remarks_key = f"student_{student.id}_remarks"
+                    perc_val = request.POST.get(perc_key)
+                    status_val = request.POST.get(status_key)
+                    remarks_val = request.POST.get(remarks_key, '') or ''
+
+                    changed = False
+                    old_percentage = student.course_percentage
+                    old_status = student.course_status
+                    # Update percentage if provided and valid
+                    if perc_val is not None and perc_val != "":
+                        try:
+                            perc_float = float(perc_val)
+                            # Clamp between 0 and 100
+                            if perc_float < 0:
+                                perc_float = 0
+                            if perc_float > 100:
+                                perc_float = 100
+                            if student.course_percentage != perc_float:
+                                student.course_percentage = perc_float
+                                changed = True
+                        except ValueError:
+                            # Ignore invalid percentage input
+                            pass
+
+                    # Update status if provided and valid choice
+                    if status_val and status_val in status_values and student.course_status != status_val:
+                        student.course_status = status_val
+                        changed = True
+
+                    # Remarks persist even if no percentage/status change
+                    remarks_old = bs.update_remarks or ''
+                    remarks_new = (remarks_val or '').strip()
+                    remarks_changed = remarks_new != remarks_old
                     if remarks_changed:
-                        change_details['remarks_old'] = remarks_old
-                        change_details['remarks_new'] = remarks_new
-                    BatchTransaction.log_transaction(
-                        batch=batch,
-                        transaction_type='STUDENT_UPDATED',
-                        user=request.user,
-                        details=change_details,
-                        affected_students=[student]
-                    )
+                        bs.update_remarks = remarks_new
+                        bs.save(update_fields=['update_remarks'])
+
+                    if changed:
+                        student.save()
+                    if changed or remarks_changed:
+                        updated_count += 1
+                        change_details = {
+                            'student_id': student.student_id,
+                            'name': f"{student.first_name} {student.last_name or ''}".strip(),
+                            'percentage_old': old_percentage,
+                            'percentage_new': float(student.course_percentage) if student.course_percentage is not None else None,
+                            'status_old': old_status,
+                            'status_new': student.course_status,
+                        }
+                        if remarks_changed:
+                            change_details['remarks_old'] = remarks_old
+                            change_details['remarks_new'] = remarks_new
+                        BatchTransaction.log_transaction(
+                            batch=batch,
+                            transaction_type='STUDENT_UPDATED',
+                            user=request.user,
+                            details=change_details,
+                            affected_students=[student]
+                        )
 
             if updated_count:
                 messages.success(request, f"Updated {updated_count} student(s) for batch {batch.batch_id}.")
@@ -376,6 +370,7 @@ class BatchViewSet(viewsets.ModelViewSet):
     queryset = Batch.objects.all()
     serializer_class = BatchSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['batch_id', 'course__name', 'trainer__name']
     ordering_fields = ['start_date', 'end_date', 'created_at', 'batch_id']
@@ -730,6 +725,7 @@ class BatchTransactionViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = BatchTransaction.objects.all()
     serializer_class = BatchTransactionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['batch__batch_id', 'transaction_type']
     ordering_fields = ['timestamp']
@@ -997,111 +993,11 @@ def import_batches(request):
             messages.error(request, "No batch file was uploaded.")
             return redirect('batchdb:batch_list')
 
-        try:
-            df = pd.read_excel(excel_file)
-        except Exception as e:
-            messages.error(request, f"Error reading batch Excel file: {e}")
-            return redirect('batchdb:batch_list')
-
-        required_columns = [
-            'module_name', 'batch_type', 'trainer', 'start_date', 'end_date', 'time_slot', 'students'
-        ]
-        if not all(col in df.columns for col in required_columns):
-            messages.error(request, f"Batch Excel file must contain the following columns: {', '.join(required_columns)}")
-            return redirect('batchdb:batch_list')
-
-        error_rows = []
-        success_count = 0
-
-        with transaction.atomic():
-            for index, row in df.iterrows():
-                try:
-                    module_name = row['module_name']
-                    batch_type = row['batch_type']
-                    trainer_name = row['trainer']
-                    start_date_str = str(row['start_date']).split(' ')[0]
-                    end_date_str = str(row['end_date']).split(' ')[0]
-                    time_slot = row['time_slot']
-                    student_ids_str = row['students']
-
-                    if not all([module_name, batch_type, trainer_name, start_date_str, end_date_str, time_slot, student_ids_str]):
-                        raise ValueError("All fields are mandatory.")
-                    
-                    student_ids = str(student_ids_str).split(',')
-
-                    try:
-                        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-                        end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
-                    except ValueError:
-                        raise ValueError("Invalid date format. Use YYYY-MM-DD.")
-
-                    trainer, _ = Trainer.objects.get_or_create(name=trainer_name)
-                    
-                    batch_id_from_sheet = row.get('batch_id')
-                    if pd.notna(batch_id_from_sheet) and str(batch_id_from_sheet).strip():
-                        batch_id = str(batch_id_from_sheet).strip()
-                        if Batch.objects.filter(batch_id=batch_id).exists():
-                            raise ValueError(f"Batch with ID '{batch_id}' already exists.")
-                        batch = Batch(batch_id=batch_id)
-                    else:
-                        batch = Batch()
-
-                    batch.module_name = module_name
-                    batch.batch_type = batch_type
-                    batch.trainer = trainer
-                    batch.start_date = start_date
-                    batch.end_date = end_date
-                    batch.time_slot = time_slot
-                    batch.save()
-
-                    students = []
-                    for student_id in student_ids:
-                        student_id = student_id.strip()
-                        try:
-                            student = Student.objects.get(student_id=student_id)
-                            students.append(student)
-                        except Student.DoesNotExist:
-                            raise ValueError(f"Student with ID {student_id} not found.")
-                    
-                    batch.students.set(students)
-
-                    for student in students:
-                        if student.pl_required:
-                            Placement.objects.get_or_create(student=student)
-
-                    success_count += 1
-
-                except Exception as e:
-                    error_row = row.to_dict()
-                    error_row['error_reason'] = str(e)
-                    error_rows.append(error_row)
-
-        if error_rows:
-            request.session['error_rows_batch'] = error_rows
-            messages.warning(request, f"Successfully created {success_count} batches. {len(error_rows)} records had errors.")
-            return redirect('download_error_report_batch')
-        else:
-            messages.success(request, f"Successfully created {success_count} batches.")
-            return redirect('batchdb:batch_list')
+        job = enqueue_import('batches', excel_file, request.user)
+        return redirect('import_job_detail', pk=job.pk)
 
     return render(request, 'batchdb/import_batches.html')
 
-@login_required
-def download_error_report_batch(request):
-    error_rows = request.session.get('error_rows_batch', [])
-    if not error_rows:
-        messages.error(request, "No error report to download.")
-        return redirect('batchdb:batch_list')
-
-    df = pd.DataFrame(error_rows)
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="batch_error_report.csv"'
-    df.to_csv(response, index=False)
-
-    del request.session['error_rows_batch']
-
-    return response
-
 @login_required
 def batch_report(request, pk):
     batch = get_object_or_404(Batch, pk=pk)
@@ -1414,115 +1310,22 @@ def reject_request(request, request_id):
 
 @login_required
 def export_batch_data(request, batch_id):
-    try:
-        batch = Batch.objects.get(id=batch_id)
-    except Batch.DoesNotExist:
+    batch = export_batches(Batch.objects.filter(id=batch_id)).first()
+    if batch is None:
         messages.error(request, "Batch not found.")
         return redirect('batchdb:batch_list')
 
-    # Prepare data for export
-    data = {
-        'Batch ID': [batch.batch_id],
-        'Course': [batch.course.course_name if batch.course else 'N/A'],
-        'Trainer': [batch.trainer.name if batch.trainer else 'N/A'],
-        'Start Date': [batch.start_date.strftime('%d-%m-%Y')],
-        'End Date': [batch.end_date.strftime('%d-%m-%Y')],
-        'Slot Time': [batch.get_slottime],
-        'Status': [batch.get_batch_status_display()],
-        'Days': [', '.join(batch.days)],
-    }
-
-    # Student details
-    students = batch.students.all()
-    if students:
-        student_data = {
-            'Student ID': [s.student_id for s in students],
-            'Student Name': [f"{s.first_name} {s.last_name or ''}" for s in students],
-            'Email': [s.email for s in students],
-            'Phone': [s.phone for s in students],
-        }
-        max_len = max(len(v) for v in student_data.values())
-        for k, v in data.items():
-            v.extend([''] * (max_len - len(v)))
-        data.update(student_data)
-
-    # Create a DataFrame
-    df = pd.DataFrame(data)
-
-    # Create an Excel response
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = f'attachment; filename="{batch.batch_id}_details.xlsx"'
-    df.to_excel(response, index=False)
-
-    return response
+    sheet = Sheet('Sheet1', BATCH_EXPORT_COLUMNS, batch_export_rows([batch], repeat_batch=False))
+    return xlsx_response(f"{batch.batch_id}_details.xlsx", [sheet])
 
 @login_required
 def export_all_batches_data(request):
-    batches = Batch.objects.all().order_by('batch_id')
+    batches = export_batches().order_by('batch_id')
     
     if not batches.exists():
         messages.error(request, "No batches to export.")
         return redirect('batchdb:batch_list')
 
-    all_batches_data = []
-    batch_row_map = {}
-    current_row = 1
-
-    for batch in batches:
-        batch_info = {
-            'Batch ID': batch.batch_id,
-            'Course': batch.course.course_name if batch.course else 'N/A',
-            'Trainer': batch.trainer.name if batch.trainer else 'N/A',
-            'Start Date': batch.start_date.strftime('%d-%m-%Y'),
-            'End Date': batch.end_date.strftime('%d-%m-%Y'),
-            'Slot Time': batch.get_slottime,
-            'Status': batch.get_batch_status_display(),
-            'Days': ', '.join(batch.days),
-        }
-
-        students = batch.students.all()
-        start_row = current_row
-        
-        if students:
-            for student in students:
-                student_info = batch_info.copy()
-                student_info.update({
-                    'Student ID': student.student_id,
-                    'Student Name': f"{student.first_name} {student.last_name or ''}",
-                    'Email': student.email,
-                    'Phone': student.phone,
-                })
-                all_batches_data.append(student_info)
-                current_row += 1
-        else:
-            all_batches_data.append(batch_info)
-            current_row += 1
-            
-        batch_row_map[batch.id] = (start_row, current_row - 1)
-
-    df = pd.DataFrame(all_batches_data)
-    column_order = ['Batch ID', 'Course', 'Trainer', 'Start Date', 'End Date', 'Slot Time', 'Status', 'Days', 'Student ID', 'Student Name', 'Email', 'Phone']
-    df = df.reindex(columns=column_order)
-
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='All Batches')
-        workbook = writer.book
-        worksheet = writer.sheets['All Batches']
-
-        colors = ['FFFFCC', 'CCFFCC', 'CCFFFF', 'FFCCFF', 'CCE5FF', 'FFDDAA']
-        color_index = 0
-
-        for batch_id, (start_row, end_row) in batch_row_map.items():
-            fill_color = PatternFill(start_color=colors[color_index % len(colors)],
-                                     end_color=colors[color_index % len(colors)],
-                                     fill_type="solid")
-            for row in range(start_row + 1, end_row + 2):
-                for col in range(1, len(column_order) + 1):
-                    worksheet.cell(row=row, column=col).fill = fill_color
-            color_index += 1
-
-    output.seek(0)
-    response = HttpResponse(output, content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename="all_batches_details.xlsx"'
-    return response
+    rows = batch_export_rows(batches.iterator(chunk_size=EXPORT_CHUNK_SIZE))
+    sheet = Sheet('All Batches', BATCH_EXPORT_COLUMNS, rows, batch_group_fill())
+    return xlsx_response('all_batches_details.xlsx', [sheet])
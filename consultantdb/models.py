@@ -1,7 +1,9 @@
 from django.db import models
+from core.mixins import FieldTrackerMixin
+from core.sequences import next_code
 from django.conf import settings
 
-class Consultant(models.Model):
+class Consultant(FieldTrackerMixin, models.Model):
     consultant_id = models.CharField(max_length=10, unique=True, blank=True)
     name = models.CharField(max_length=100)
     country_code = models.CharField(max_length=5, default="+91")
@@ -20,12 +22,7 @@ class Consultant(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.consultant_id:
-            last_consultant = Consultant.objects.order_by('id').last()
-            if last_consultant and last_consultant.consultant_id and last_consultant.consultant_id.startswith('CON'):
-                last_id = int(last_consultant.consultant_id.replace('CON', ''))
-                self.consultant_id = f'CON{last_id + 1:04d}'
-            else:
-                self.consultant_id = 'CON0001'
+            self.consultant_id = next_code(Consultant.objects.all(), 'consultant_id', 'CON')
         super().save(*args, **kwargs)
 
 class ConsultantProfile(models.Model):
@@ -35,7 +32,7 @@ class ConsultantProfile(models.Model):
     def __str__(self):
         return f"Profile of {self.user.name}"
 
-class Goal(models.Model):
+class Goal(FieldTrackerMixin, models.Model):
     consultant = models.ForeignKey(Consultant, on_delete=models.CASCADE, related_name='goals')
     title = models.CharField(max_length=255)
     description = models.TextField()
@@ -45,7 +42,7 @@ class Goal(models.Model):
     def __str__(self):
         return self.title
 
-class Achievement(models.Model):
+class Achievement(FieldTrackerMixin, models.Model):
     consultant = models.ForeignKey(Consultant, on_delete=models.CASCADE, related_name='achievements')
     title = models.CharField(max_length=255)
     description = models.TextField()
@@ -14,9 +14,10 @@ from channels.auth import AuthMiddlewareStack
 from channels.routing import ProtocolTypeRouter, URLRouter
 django_asgi_app = get_asgi_application()
 from studentsdb.routing import websocket_urlpatterns
+from core.routing import websocket_urlpatterns as core_websocket_urlpatterns
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
     "websocket": AuthMiddlewareStack(
-        URLRouter(websocket_urlpatterns)
+        URLRouter(websocket_urlpatterns + core_websocket_urlpatterns)
     ),
 })
@@ -0,0 +1,34 @@
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.contrib.auth.models import AnonymousUser
+
+from .jobs import can_view_job, group_name
+from .models import ImportJob
+
+
+class ImportJobConsumer(AsyncJsonWebsocketConsumer):
+    """Streams one import job's progress, as published by core.jobs."""
+
+    async def connect(self):
+        self.job_id = int(self.scope['url_route']['kwargs']['job_id'])
+        self.group_name = group_name(self.job_id)
+        payload = await self.get_payload(self.scope.get('user', AnonymousUser()))
+        if payload is None:
+            await self.close()
+            return
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        await self.send_json(payload)
+
+    async def disconnect(self, code):
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def job_progress(self, event):
+        await self.send_json(event['payload'])
+
+    @database_sync_to_async
+    def get_payload(self, user):
+        job = ImportJob.objects.filter(pk=self.job_id).first()
+        if job is None or not can_view_job(user, job):
+            return None
+        return job.progress_payload()
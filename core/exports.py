@@ -0,0 +1,108 @@
+"""
+Constant-memory CSV and Excel downloads.
+
+Rows are pulled from querysets with ``.iterator(chunk_size=...)`` and
+written as they arrive, so neither the rows nor the finished file are held
+in memory:
+
+    csv_response()     streams the CSV to the client line by line
+    xlsx_response()    writes an openpyxl write-only workbook to a temporary
+                       file and streams that back in blocks
+
+An XLSX is a zip whose directory is only known once every sheet is written,
+so it cannot be sent before it is finished; write-only mode at least keeps
+each sheet on disk rather than as a tree of cell objects.
+"""
+import csv
+import datetime
+import tempfile
+from collections import namedtuple
+from decimal import Decimal
+
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+
+EXPORT_CHUNK_SIZE = 2000
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# One worksheet of an xlsx_response(). ``rows`` is any iterable of value
+# sequences; ``row_fill``, if given, maps each row to a PatternFill or None.
+Sheet = namedtuple('Sheet', ['title', 'header', 'rows', 'row_fill'], defaults=[None])
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to the csv writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+def csv_response(filename, header, rows):
+    """A streamed CSV download of ``header`` followed by ``rows``."""
+    writer = csv.writer(_Echo())
+
+    def lines():
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(lines(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def excel_value(value):
+    """``value`` as something openpyxl can store in a cell."""
+    if value is None or isinstance(value, (str, int, float, Decimal, datetime.date, datetime.time)):
+        if isinstance(value, datetime.datetime) and timezone.is_aware(value):
+            return timezone.make_naive(value, datetime.timezone.utc)
+        return value
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    return str(value)
+
+
+def write_xlsx(file, sheets):
+    """Write ``sheets`` to ``file`` as a workbook, one row at a time."""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+
+    workbook = Workbook(write_only=True)
+    for sheet in sheets:
+        worksheet = workbook.create_sheet(title=sheet.title)
+        worksheet.append(list(sheet.header))
+        for row in sheet.rows:
+            values = [excel_value(value) for value in row]
+            fill = sheet.row_fill(row) if sheet.row_fill else None
+            if fill is not None:
+                values = [_filled(WriteOnlyCell(worksheet, value=value), fill) for value in values]
+            worksheet.append(values)
+    workbook.save(file)
+
+
+def _filled(cell, fill):
+    cell.fill = fill
+    return cell
+
+
+def xlsx_response(filename, sheets):
+    """An Excel download of ``sheets`` (Sheet tuples), built on disk and streamed."""
+    file = tempfile.TemporaryFile()
+    try:
+        write_xlsx(file, sheets)
+    except BaseException:
+        file.close()
+        raise
+    file.seek(0)
+    return FileResponse(file, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+
+def model_sheet(title, queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Every concrete column of ``queryset``'s rows, headed by attribute name as
+    ``.values()`` would key them (``course_id``, not ``course``).
+    """
+    fields = [field.attname for field in queryset.model._meta.concrete_fields]
+    rows = queryset.order_by('pk').values_list(*fields).iterator(chunk_size=chunk_size)
+    return Sheet(title, fields, rows)
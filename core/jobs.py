@@ -0,0 +1,307 @@
+"""
+Background runner for spreadsheet imports.
+
+An upload view stores the file as a core.ImportJob and returns straight
+away; the rows are worked through later by the handler registered for the
+job's kind in HANDLERS. Depending on settings.IMPORT_JOB_MODE, jobs are run:
+
+    'thread'    by a small thread pool in the web process, started once the
+                job's row is committed
+    'worker'    by ``manage.py run_import_jobs``, which polls for pending jobs
+
+Handlers read the upload a chunk at a time and commit each chunk in its own
+transaction, reporting through a JobProgress. Every report is stored on the
+job and pushed to the ``import_job_<id>`` channel group, which the progress
+page listens to.
+
+Each report also refreshes the job's ``updated_at``. A RUNNING job that has
+not reported for IMPORT_JOB_STALE_AFTER seconds lost its runner (a restart
+or a crash) and is marked FAILED by fail_stale_jobs(). It is not re-queued,
+because its committed chunks would be imported twice.
+"""
+import csv
+import io
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from itertools import islice
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.files import File
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import ImportJob
+
+logger = logging.getLogger(__name__)
+
+MODE_THREAD = 'thread'
+MODE_WORKER = 'worker'
+
+CHUNK_SIZE = 500
+
+HANDLERS = {
+    'students': 'studentsdb.importer.run_import_job',
+    'batches': 'batchdb.importer.run_import_job',
+    'courses': 'coursedb.importer.run_import_job',
+    'student_courses': 'settingsdb.importer.run_student_courses_job',
+    'data': 'settingsdb.importer.run_data_import_job',
+}
+
+
+class ImportJobError(Exception):
+    """Raised by a handler to fail the whole job with a message for the user."""
+
+
+def get_job_mode():
+    return getattr(settings, 'IMPORT_JOB_MODE', MODE_THREAD)
+
+
+def group_name(job_id):
+    return f"import_job_{job_id}"
+
+
+class JobProgress:
+    """Counters and error rows of a running job, saved after every chunk."""
+
+    def __init__(self, job):
+        self.job = job
+        self._error_file = None
+        self._error_writer = None
+
+    def set_total(self, total):
+        self.job.total_rows = total
+        self._save('total_rows')
+
+    def advance(self, rows, created, error_rows=()):
+        """Record a committed chunk of ``rows`` sheet rows."""
+        for error_row in error_rows:
+            self._write_error(error_row)
+        self.job.processed_rows += rows
+        self.job.success_count += created
+        self.job.error_count += len(error_rows)
+        self._save('processed_rows', 'success_count', 'error_count')
+
+    def finish(self, message=''):
+        self._store_errors()
+        self.job.status = 'COMPLETED'
+        self.job.message = message or self._summary()
+        self.job.finished_at = timezone.now()
+        self._save('status', 'message', 'finished_at', 'error_file')
+
+    def fail(self, message):
+        self._store_errors()
+        self.job.status = 'FAILED'
+        self.job.message = message
+        self.job.finished_at = timezone.now()
+        self._save('status', 'message', 'finished_at', 'error_file')
+
+    def _summary(self):
+        summary = f"Imported {self.job.success_count} of {self.job.processed_rows} rows."
+        if self.job.error_count:
+            summary += f" {self.job.error_count} rows had errors."
+        return summary
+
+    def _write_error(self, error_row):
+        if self._error_writer is None:
+            self._error_file = tempfile.TemporaryFile(mode='w+', newline='', encoding='utf-8')
+            self._error_writer = csv.DictWriter(self._error_file, fieldnames=list(error_row), extrasaction='ignore')
+            self._error_writer.writeheader()
+        self._error_writer.writerow(error_row)
+
+    def _store_errors(self):
+        if self._error_file is None:
+            return
+        self._error_file.seek(0)
+        data = io.BytesIO(self._error_file.read().encode('utf-8'))
+        self._error_file.close()
+        self._error_file = self._error_writer = None
+        self.job.error_file.save(f"import_{self.job.pk}_errors.csv", File(data), save=False)
+
+    def _save(self, *fields):
+        self.job.updated_at = timezone.now()
+        ImportJob.objects.filter(pk=self.job.pk).update(
+            **{field: getattr(self.job, field) for field in fields + ('updated_at',)}
+        )
+        publish(self.job)
+
+
+def publish(job):
+    """Push the job's progress to everyone watching it; never fails the job."""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(
+            group_name(job.pk), {'type': 'job_progress', 'payload': job.progress_payload()}
+        )
+    except Exception:
+        logger.warning("Could not publish progress of import job %s", job.pk, exc_info=True)
+
+
+def chunked(iterable, size=CHUNK_SIZE):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def count_csv_rows(job):
+    with job.file.open('rb') as handle:
+        return sum(1 for _ in csv.DictReader(io.TextIOWrapper(handle, encoding='utf-8-sig', newline='')))
+
+
+def iter_csv_rows(job):
+    """The rows of a CSV upload as dicts, read a line at a time."""
+    with job.file.open('rb') as handle:
+        yield from csv.DictReader(io.TextIOWrapper(handle, encoding='utf-8-sig', newline=''))
+
+
+def open_workbook(job):
+    """The upload as a read-only openpyxl workbook, which loads rows lazily."""
+    from openpyxl import load_workbook
+    return load_workbook(job.file.open('rb'), read_only=True, data_only=True)
+
+
+def sheet_row_count(worksheet):
+    """Data rows of ``worksheet`` from its stored dimensions, or None if unknown."""
+    return max(worksheet.max_row - 1, 0) if worksheet.max_row else None
+
+
+def iter_sheet_frames(worksheet, chunk_size=CHUNK_SIZE):
+    """
+    The data rows of ``worksheet`` as DataFrames of up to ``chunk_size`` rows,
+    using the first row as the header. Blank rows are skipped.
+    """
+    import pandas as pd
+
+    rows = worksheet.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return
+    columns = [str(name).strip() if name is not None else '' for name in header]
+    rows = (row for row in rows if any(value is not None and value != '' for value in row))
+    for chunk in chunked(rows, chunk_size):
+        yield pd.DataFrame([row[:len(columns)] for row in chunk], columns=columns)
+
+
+def sheet_columns(worksheet):
+    header = next(worksheet.iter_rows(max_row=1, values_only=True), ())
+    return [str(name).strip() for name in header if name is not None]
+
+
+def can_view_job(user, job):
+    """Jobs are visible to whoever uploaded them and to admins."""
+    if not user.is_authenticated:
+        return False
+    return job.created_by_id == user.pk or user.is_superuser or getattr(user, 'role', '') == 'admin'
+
+
+def enqueue_import(kind, upload, user):
+    """Store ``upload`` as a pending job of ``kind`` and schedule it."""
+    job = ImportJob.objects.create(
+        kind=kind, file=upload, original_name=getattr(upload, 'name', '') or '', created_by=user,
+    )
+    if get_job_mode() == MODE_THREAD:
+        transaction.on_commit(lambda: _get_executor().submit(_run_in_thread, job.pk))
+    return job
+
+
+def claim_job(job_id):
+    """Mark a pending job as running; False if another runner got it first."""
+    now = timezone.now()
+    return bool(ImportJob.objects.filter(pk=job_id, status='PENDING').update(
+        status='RUNNING', started_at=now, updated_at=now,
+    ))
+
+
+def stale_jobs():
+    """RUNNING jobs that have not reported progress for IMPORT_JOB_STALE_AFTER seconds."""
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'IMPORT_JOB_STALE_AFTER', 15 * 60))
+    return ImportJob.objects.filter(status='RUNNING', updated_at__lt=cutoff)
+
+
+def fail_stale_jobs(queryset=None):
+    """Mark the stale jobs in ``queryset`` (all by default) FAILED; returns how many."""
+    failed = 0
+    for job in (queryset if queryset is not None else stale_jobs()):
+        now = timezone.now()
+        fields = {
+            'status': 'FAILED', 'finished_at': now, 'updated_at': now,
+            'message': "The import stopped before finishing (its runner was restarted). "
+                       f"{job.processed_rows} rows were processed; check them before uploading the rest again.",
+        }
+        # Conditional, in case the runner was only slow and reported in the meantime.
+        if stale_jobs().filter(pk=job.pk).update(**fields):
+            for field, value in fields.items():
+                setattr(job, field, value)
+            publish(job)
+            failed += 1
+    return failed
+
+
+def run_job(job):
+    """Run a claimed job to completion, recording any failure on the job."""
+    from settingsdb.signals import set_current_user
+
+    job.refresh_from_db()
+    progress = JobProgress(job)
+    publish(job)
+    set_current_user(job.created_by)
+    try:
+        import_string(HANDLERS[job.kind])(job, progress)
+    except ImportJobError as e:
+        progress.fail(str(e))
+    except Exception as e:
+        logger.exception("Import job %s failed", job.pk)
+        progress.fail(f"Import failed: {e}")
+    else:
+        progress.finish()
+    finally:
+        set_current_user(None)
+    return job
+
+
+def run_pending_jobs(limit=None):
+    """Claim and run pending jobs oldest first; returns how many were run."""
+    fail_stale_jobs()
+    run = 0
+    while limit is None or run < limit:
+        job_id = ImportJob.objects.filter(status='PENDING').order_by('created_at', 'pk').values_list('pk', flat=True).first()
+        if job_id is None:
+            break
+        if claim_job(job_id):
+            run_job(ImportJob.objects.get(pk=job_id))
+            run += 1
+    return run
+
+
+def _run_in_thread(job_id):
+    close_old_connections()
+    try:
+        if claim_job(job_id):
+            run_job(ImportJob.objects.get(pk=job_id))
+    except Exception:
+        logger.exception("Import job %s could not be run", job_id)
+    finally:
+        close_old_connections()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # First job since this process started: runs of a previous process are gone.
+            fail_stale_jobs()
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMPORT_JOB_THREADS', 2), thread_name_prefix='import-job',
+            )
+        return _executor
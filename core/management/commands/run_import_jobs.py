@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.jobs import run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = 'Runs pending import jobs, polling for new ones until stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run the jobs pending now and exit.')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between polls when idle.')
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            count = run_pending_jobs()
+            if count:
+                self.stdout.write(f"Ran {count} import job(s)")
+            if options['once']:
+                break
+            if not count:
+                time.sleep(options['interval'])
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+from core.search import create_trigram_indexes, drop_trigram_indexes
+
+# Frozen copy of core.search.SEARCH_INDEXES at the time of this migration.
+INDEXES = [
+    ('studentsdb_student', 'first_name'),
+    ('studentsdb_student', 'last_name'),
+    ('studentsdb_student', 'email'),
+    ('studentsdb_student', 'phone'),
+    ('studentsdb_student', 'student_id'),
+    ('batchdb_batch', 'batch_id'),
+    ('coursedb_course', 'course_name'),
+    ('trainersdb_trainer', 'name'),
+    ('consultantdb_consultant', 'name'),
+    ('paymentdb_payment', 'payment_id'),
+]
+
+
+def create_indexes(apps, schema_editor):
+    create_trigram_indexes(schema_editor, INDEXES)
+
+
+def drop_indexes(apps, schema_editor):
+    drop_trigram_indexes(schema_editor, INDEXES)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('studentsdb', '0014_conversationmessage_mentions'),
+        ('batchdb', '0011_alter_batch_batch_status'),
+        ('coursedb', '0005_alter_course_total_duration_and_more'),
+        ('trainersdb', '0003_trainer_last_update_remarks_trainer_last_updated_at_and_more'),
+        ('consultantdb', '0001_initial'),
+        ('paymentdb', '0005_pendingpaymentrecord_student_seq'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
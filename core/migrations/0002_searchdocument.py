@@ -0,0 +1,46 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:33
+
+from django.db import migrations, models
+
+from core.search import create_trigram_indexes, drop_trigram_indexes
+
+INDEXES = [('core_searchdocument', 'text')]
+
+
+def create_indexes(apps, schema_editor):
+    create_trigram_indexes(schema_editor, INDEXES)
+
+
+def drop_indexes(apps, schema_editor):
+    drop_trigram_indexes(schema_editor, INDEXES)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_trigram_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity_type', models.CharField(choices=[('student', 'Student'), ('batch', 'Batch'), ('trainer', 'Trainer'), ('company', 'Company'), ('payment', 'Payment')], max_length=10)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('subtitle', models.CharField(blank=True, max_length=255)),
+                ('url', models.CharField(max_length=255)),
+                ('text', models.TextField()),
+                ('course_id', models.IntegerField(blank=True, null=True)),
+                ('consultant_id', models.IntegerField(blank=True, null=True)),
+                ('status', models.CharField(blank=True, max_length=50)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['entity_type', 'title'], name='core_searchdoc_type_title_idx')],
+                'constraints': [models.UniqueConstraint(fields=('entity_type', 'object_id'), name='core_searchdocument_entity_uniq')],
+            },
+        ),
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -1,3 +1,9 @@
+import copy
+from types import SimpleNamespace
+
+from django.db.models import FileField
+
+
 class BreadcrumbMixin:
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -6,3 +12,75 @@ class BreadcrumbMixin:
 
     def get_breadcrumbs(self):
         return []
+
+
+class FieldTrackerMixin:
+    """
+    Remembers the column values a model instance was loaded with so changes
+    can be detected at save time without re-reading the row from the database.
+
+    Values are keyed by attname (``course_id`` rather than ``course``). The
+    snapshot is refreshed after every save and refresh_from_db().
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_loaded_values()
+        return instance
+
+    def _snapshot_loaded_values(self, fields=None):
+        snapshot = {}
+        for field in self._meta.concrete_fields:
+            if field.attname not in self.__dict__:
+                continue  # deferred
+            if fields is not None and field.name not in fields and field.attname not in fields:
+                continue
+            value = self.__dict__[field.attname]
+            if isinstance(field, FileField):
+                value = getattr(value, 'name', value) or None
+            elif isinstance(value, (dict, list)):
+                value = copy.deepcopy(value)
+            snapshot[field.attname] = value
+        if fields is None or not hasattr(self, '_loaded_values'):
+            self._loaded_values = snapshot
+        else:
+            self._loaded_values.update(snapshot)
+
+    def has_loaded_values(self):
+        return getattr(self, '_loaded_values', None) is not None
+
+    def get_loaded_state(self):
+        """
+        The loaded values as an attribute namespace, or None when the instance
+        was not loaded from the database or was loaded with deferred fields.
+        """
+        if not self.has_loaded_values():
+            return None
+        if len(self._loaded_values) < len(self._meta.concrete_fields):
+            return None
+        return SimpleNamespace(**self._loaded_values)
+
+    def get_changed_fields(self):
+        """Maps each concrete field changed since load to its ``(old, new)`` values."""
+        if not self.has_loaded_values():
+            return {}
+        changes = {}
+        for field in self._meta.concrete_fields:
+            if field.attname not in self._loaded_values:
+                continue
+            old = self._loaded_values[field.attname]
+            new = getattr(self, field.attname)
+            if isinstance(field, FileField):
+                new = getattr(new, 'name', new) or None
+            if old != new:
+                changes[field.name] = (old, new)
+        return changes
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._snapshot_loaded_values(kwargs.get('update_fields'))
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._snapshot_loaded_values(kwargs.get('fields'))
@@ -0,0 +1,218 @@
+from django.conf import settings
+from django.db import models
+
+
+class SearchDocument(models.Model):
+    """
+    One row per searchable student, batch, trainer, company or payment, kept
+    in sync by core.search_index. ``text`` is a lowercased blob of everything
+    the global search matches on; the facet columns let results be narrowed
+    without joining back to the source tables.
+    """
+    ENTITY_CHOICES = [
+        ('student', 'Student'),
+        ('batch', 'Batch'),
+        ('trainer', 'Trainer'),
+        ('company', 'Company'),
+        ('payment', 'Payment'),
+    ]
+
+    entity_type = models.CharField(max_length=10, choices=ENTITY_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    title = models.CharField(max_length=255)
+    subtitle = models.CharField(max_length=255, blank=True)
+    url = models.CharField(max_length=255)
+    text = models.TextField()
+    course_id = models.IntegerField(null=True, blank=True)
+    consultant_id = models.IntegerField(null=True, blank=True)
+    status = models.CharField(max_length=50, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['entity_type', 'object_id'], name='core_searchdocument_entity_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['entity_type', 'title'], name='core_searchdoc_type_title_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_entity_type_display()}: {self.title}"
+
+
+
+class Sequence(models.Model):
+    """
+    Last value handed out for one named counter, e.g. ``student_id``. Rows
+    are locked and advanced by core.sequences; nothing else writes them.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    last_value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_value}"
+
+
+class ImportJob(models.Model):
+    """
+    One uploaded spreadsheet waiting for, or being worked through by,
+    core.jobs. Handlers commit the rows in chunks and keep the counters
+    current; rejected rows end up in ``error_file``.
+    """
+    KIND_CHOICES = [
+        ('students', 'Students'),
+        ('batches', 'Batches'),
+        ('courses', 'Courses'),
+        ('student_courses', 'Student courses'),
+        ('data', 'Data'),
+    ]
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('COMPLETED', 'Completed'),
+        ('FAILED', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    file = models.FileField(upload_to='import_jobs/')
+    original_name = models.CharField(max_length=255, blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='import_jobs'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Heartbeat: set by every progress save, so a RUNNING job whose runner died goes stale.
+    updated_at = models.DateTimeField(auto_now=True)
+    total_rows = models.PositiveIntegerField(null=True, blank=True)
+    processed_rows = models.PositiveIntegerField(default=0)
+    success_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    error_file = models.FileField(upload_to='import_jobs/errors/', blank=True)
+    message = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='core_importjob_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} import #{self.pk} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in ('COMPLETED', 'FAILED')
+
+    @property
+    def percent(self):
+        if self.is_finished:
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(100, self.processed_rows * 100 // self.total_rows)
+
+    def progress_payload(self):
+        """The job's state as sent to the progress page and its websocket."""
+        return {
+            'id': self.pk,
+            'kind': self.kind,
+            'status': self.status,
+            'total_rows': self.total_rows,
+            'processed_rows': self.processed_rows,
+            'success_count': self.success_count,
+            'error_count': self.error_count,
+            'percent': self.percent,
+            'message': self.message,
+            'has_errors': bool(self.error_file),
+        }
+
+
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_delete
+from .search_index import mark_dirty, source_models
+
+# Documents are rebuilt once per transaction by core.search_index; these
+# receivers only mark what changed. A deleted source leaves nothing to build,
+# so marking it removes its document.
+
+SOURCE_ENTITIES = {model: entity_type for entity_type, model in source_models().items()}
+
+
+def reindex_search_document(sender, instance, **kwargs):
+    mark_dirty(SOURCE_ENTITIES[sender], [instance.pk])
+
+
+def reindex_dependent_documents(sender, instance, **kwargs):
+    # Payment documents carry the student's name and batch documents the
+    # trainer's. Runs before deletes too, while the relation still resolves.
+    from batchdb.models import Batch
+    from paymentdb.models import Payment
+    entity_type = SOURCE_ENTITIES[sender]
+    if entity_type == 'student':
+        mark_dirty('payment', Payment.objects.filter(student_id=instance.pk).values_list('pk', flat=True))
+    elif entity_type == 'trainer':
+        mark_dirty('batch', Batch.objects.filter(trainer_id=instance.pk).values_list('pk', flat=True))
+
+
+def _name_changed(instance, created, field):
+    # Without the loaded values the old name is unknown, so assume it changed.
+    return not created and (not instance.has_loaded_values() or field in instance.get_changed_fields())
+
+
+def _reindex_course_documents(course_id):
+    from batchdb.models import Batch
+    from studentsdb.models import Student
+    mark_dirty('student', Student.objects.filter(course_id=course_id).values_list('pk', flat=True))
+    mark_dirty('batch', Batch.objects.filter(course_id=course_id).values_list('pk', flat=True))
+
+
+def _reindex_consultant_documents(consultant_id):
+    from studentsdb.models import Student
+    mark_dirty('student', Student.objects.filter(consultant_id=consultant_id).values_list('pk', flat=True))
+
+
+def course_saved(sender, instance, created, **kwargs):
+    # Student and batch documents carry the course name.
+    if _name_changed(instance, created, 'course_name'):
+        _reindex_course_documents(instance.pk)
+
+
+def course_deleted(sender, instance, **kwargs):
+    # Student.course_id is a plain column, so students keep a deleted course's id.
+    _reindex_course_documents(instance.pk)
+
+
+def consultant_saved(sender, instance, created, **kwargs):
+    # Student documents carry the consultant name.
+    if _name_changed(instance, created, 'name'):
+        _reindex_consultant_documents(instance.pk)
+
+
+def consultant_deleted(sender, instance, **kwargs):
+    # Runs before the students' consultant is set to NULL.
+    _reindex_consultant_documents(instance.pk)
+
+
+def populate_search_index(sender, using, **kwargs):
+    # SearchDocument only holds derived rows, so after a migrate that leaves it
+    # empty (the one creating it, or one on a restored database) it is filled
+    # from the source tables.
+    from .search_index import rebuild_search_index
+    if sender.name != 'core' or using != 'default' or SearchDocument.objects.exists():
+        return
+    if any(model.objects.exists() for model in SOURCE_ENTITIES):
+        rebuild_search_index()
+
+
+for _model, _entity_type in SOURCE_ENTITIES.items():
+    post_save.connect(reindex_search_document, sender=_model, dispatch_uid=f'search_document_save_{_entity_type}')
+    post_delete.connect(reindex_search_document, sender=_model, dispatch_uid=f'search_document_delete_{_entity_type}')
+    post_save.connect(reindex_dependent_documents, sender=_model, dispatch_uid=f'search_dependents_save_{_entity_type}')
+    pre_delete.connect(reindex_dependent_documents, sender=_model, dispatch_uid=f'search_dependents_delete_{_entity_type}')
+
+post_save.connect(course_saved, sender='coursedb.Course', dispatch_uid='search_dependents_save_course')
+pre_delete.connect(course_deleted, sender='coursedb.Course', dispatch_uid='search_dependents_delete_course')
+post_save.connect(consultant_saved, sender='consultantdb.Consultant', dispatch_uid='search_dependents_save_consultant')
+pre_delete.connect(consultant_deleted, sender='consultantdb.Consultant', dispatch_uid='search_dependents_delete_consultant')
+post_migrate.connect(populate_search_index, dispatch_uid='search_index_populate')
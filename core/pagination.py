@@ -0,0 +1,259 @@
+"""
+Keyset (cursor) pagination shared by the list views and the API.
+
+Pages are addressed by the ordering key of their boundary rows, encoded as an
+opaque cursor, instead of by page number. Every page is one indexed seek plus
+``LIMIT per_page + 1``, so page N costs the same as page 1 and no COUNT(*) is
+needed; ``approximate_count`` is there for templates that still want a total.
+"""
+import base64
+import binascii
+import json
+from datetime import date, time
+from decimal import Decimal
+from uuid import UUID
+
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+CURSOR_PARAMS = ('after', 'before', 'page')
+
+# Below this many estimated rows an exact COUNT(*) is cheap enough to run.
+EXACT_COUNT_THRESHOLD = 10000
+
+
+def _encode_value(value):
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    raise TypeError(f'Cannot encode {type(value).__name__} in a cursor')
+
+
+def _resolve_field(model, path):
+    field = None
+    for name in path.split('__'):
+        if field is not None:
+            model = field.related_model
+        field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+    return field
+
+
+class KeysetPage:
+    """
+    One page of rows plus the cursors of its neighbours. The cursors are taken
+    when the page is built, so views may replace ``object_list`` with rows
+    prepared for display.
+    """
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next and bool(object_list)
+        self._has_previous = has_previous and bool(object_list)
+        self.next_cursor = paginator.encode_cursor(object_list[-1]) if self._has_next else None
+        self.previous_cursor = paginator.encode_cursor(object_list[0]) if self._has_previous else None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+
+class KeysetPaginator:
+    """
+    Paginates ``queryset`` by ``ordering``, a sequence of field names like
+    ``order_by()`` takes. The primary key is appended as a tie-breaker when it
+    is not already part of the key, so every cursor is unique. Key fields must
+    not be nullable.
+    """
+
+    def __init__(self, queryset, per_page, ordering=('-id',)):
+        self.queryset = queryset
+        self.per_page = per_page
+        model = queryset.model
+        keys = []
+        for name in ordering:
+            path = name.lstrip('-')
+            keys.append((path, name.startswith('-'), _resolve_field(model, path)))
+        if not any(field.primary_key and '__' not in path for path, _, field in keys):
+            descending = keys[-1][1] if keys else True
+            keys.append((model._meta.pk.name, descending, model._meta.pk))
+        self.keys = keys
+
+    @property
+    def ordering(self):
+        return [f'-{path}' if descending else path for path, descending, _ in self.keys]
+
+    def _key_values(self, obj):
+        values = []
+        for path, _, field in self.keys:
+            *relations, name = path.split('__')
+            target = obj
+            for relation in relations:
+                target = getattr(target, relation)
+            values.append(getattr(target, field.attname if name != 'pk' else 'pk'))
+        return values
+
+    def encode_cursor(self, obj):
+        raw = json.dumps(self._key_values(obj), default=_encode_value, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        """Key values of a cursor, or None when it is missing or malformed."""
+        if not cursor:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+            if not isinstance(values, list) or len(values) != len(self.keys):
+                return None
+            decoded = [field.to_python(value) for (_, _, field), value in zip(self.keys, values)]
+        except (ValueError, TypeError, ValidationError, binascii.Error, UnicodeDecodeError):
+            return None
+        return None if None in decoded else decoded
+
+    def _seek(self, values, forward):
+        # (k1, k2, ...) beyond (v1, v2, ...) in key order, as
+        # k1 > v1 OR (k1 = v1 AND k2 > v2) OR ... with per-key direction.
+        condition = Q()
+        equal = {}
+        for (path, descending, _), value in zip(self.keys, values):
+            lookup = 'lt' if descending == forward else 'gt'
+            condition |= Q(**equal, **{f'{path}__{lookup}': value})
+            equal[path] = value
+        return condition
+
+    def page(self, after=None, before=None):
+        """
+        Rows following the ``after`` cursor, or preceding the ``before``
+        cursor, or the first page when neither decodes.
+        """
+        before_values = self.decode_cursor(before)
+        after_values = self.decode_cursor(after) if before_values is None else None
+
+        if before_values is not None:
+            reverse = [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+            rows = list(
+                self.queryset.filter(self._seek(before_values, forward=False))
+                .order_by(*reverse)[:self.per_page + 1]
+            )
+            has_previous = len(rows) > self.per_page
+            return KeysetPage(rows[:self.per_page][::-1], self, True, has_previous)
+
+        queryset = self.queryset.order_by(*self.ordering)
+        if after_values is not None:
+            queryset = queryset.filter(self._seek(after_values, forward=True))
+        rows = list(queryset[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        return KeysetPage(rows[:self.per_page], self, has_next, after_values is not None)
+
+    def page_from_request(self, request):
+        return self.page(after=request.GET.get('after'), before=request.GET.get('before'))
+
+    @cached_property
+    def approximate_count(self):
+        return approximate_count(self.queryset)
+
+
+def approximate_count(queryset, threshold=EXACT_COUNT_THRESHOLD):
+    """
+    Row count of ``queryset``. On PostgreSQL the planner's estimate is used
+    when it exceeds ``threshold``, so large filtered lists are not scanned
+    twice; smaller results and other backends get an exact COUNT(*).
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        estimate = int(plan[0]['Plan']['Plan Rows'])
+        if estimate > threshold:
+            return estimate
+    return queryset.count()
+
+
+def keyset_query_params(request):
+    """The request's query string without pagination parameters, for page links."""
+    params = request.GET.copy()
+    for name in CURSOR_PARAMS:
+        params.pop(name, None)
+    return params.urlencode()
+
+
+class KeysetPagination(BasePagination):
+    """
+    DRF pagination backed by KeysetPaginator. Pages follow the ordering already
+    applied to the queryset (including OrderingFilter's), falling back to
+    ``-id``; responses carry ``next``/``previous`` links and ``results``.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_ordering(self, queryset):
+        ordering = [name for name in queryset.query.order_by if isinstance(name, str)]
+        return ordering or ['-id']
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        paginator = KeysetPaginator(queryset, self.get_page_size(request), self.get_ordering(queryset))
+        self.page = paginator.page(
+            after=request.query_params.get('after'),
+            before=request.query_params.get('before'),
+        )
+        return list(self.page)
+
+    def _link(self, param, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        for name in CURSOR_PARAMS:
+            url = remove_query_param(url, name)
+        return replace_query_param(url, param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self._link('after', self.page.next_cursor),
+            'previous': self._link('before', self.page.previous_cursor),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,6 @@
+from django.urls import re_path
+from .consumers import ImportJobConsumer
+
+websocket_urlpatterns = [
+    re_path(r'^ws/import-jobs/(?P<job_id>\d+)/$', ImportJobConsumer.as_asgi()),
+]
@@ -0,0 +1,81 @@
+"""
+Search-box filtering shared by the list views.
+
+search_q() turns a search string into one Q: every whitespace-separated term
+must match (case-insensitively, anywhere) at least one of the given fields, so
+"ravi btr00" finds student BTR0042 Ravi. The lookups are plain ``icontains``,
+which Django renders as ``UPPER(col::text) LIKE UPPER('%term%')`` on
+PostgreSQL. The migration in core creates pg_trgm GIN indexes on exactly
+those expressions for SEARCH_INDEXES, so the planner can answer the searches
+from the index instead of scanning. Other backends (SQLite in development
+and tests) run the same lookups unindexed.
+"""
+from functools import reduce
+from operator import and_, or_
+
+from django.db.models import Q
+
+# Terms beyond this are ignored; each one adds an AND over every field.
+MAX_TERMS = 5
+
+# (table, column) pairs that get a trigram index on PostgreSQL.
+SEARCH_INDEXES = [
+    ('studentsdb_student', 'first_name'),
+    ('studentsdb_student', 'last_name'),
+    ('studentsdb_student', 'email'),
+    ('studentsdb_student', 'phone'),
+    ('studentsdb_student', 'student_id'),
+    ('batchdb_batch', 'batch_id'),
+    ('coursedb_course', 'course_name'),
+    ('trainersdb_trainer', 'name'),
+    ('consultantdb_consultant', 'name'),
+    ('paymentdb_payment', 'payment_id'),
+    ('core_searchdocument', 'text'),
+]
+
+
+def search_terms(query):
+    return (query or '').split()[:MAX_TERMS]
+
+
+def search_q(query, fields, extra=None):
+    """
+    Q matching rows where each term of ``query`` is contained in one of
+    ``fields`` (lookup paths such as ``'student__first_name'``). ``extra``,
+    if given, maps a term to one more Q to OR in, e.g. a ``pk__in`` subquery
+    that avoids joining a to-many relation. An empty query matches everything.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return Q()
+    per_term = []
+    for term in terms:
+        alternatives = [Q(**{f'{field}__icontains': term}) for field in fields]
+        if extra is not None:
+            alternatives.append(extra(term))
+        per_term.append(reduce(or_, alternatives))
+    return reduce(and_, per_term)
+
+
+def trigram_index_name(table, column):
+    return f'{table}_{column}_trgm'[:63]
+
+
+def create_trigram_indexes(schema_editor, indexes):
+    """Creates the pg_trgm extension and GIN indexes; a no-op off PostgreSQL."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    quote = schema_editor.quote_name
+    for table, column in indexes:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {quote(trigram_index_name(table, column))} '
+            f'ON {quote(table)} USING gin ((UPPER({quote(column)}::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(schema_editor, indexes):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, column in indexes:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {schema_editor.quote_name(trigram_index_name(table, column))}')
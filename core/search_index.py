@@ -0,0 +1,224 @@
+"""
+Maintenance of the SearchDocument table behind the global search.
+
+Each entity type has a builder that turns a chunk of source rows into
+documents with one query per related table. The post_save/post_delete
+receivers in core.models only mark ids as dirty; everything marked inside one
+transaction is rebuilt once from transaction.on_commit, like
+paymentdb.pending_sync does for pending payment records. Outside a transaction
+the documents are rebuilt immediately. Renaming a course, consultant, student
+or trainer marks the documents that embed the name. ``rebuild_search_index``
+rebuilds the whole table; migrate runs it when it leaves the table empty.
+"""
+from threading import local
+
+from django.db import transaction
+from django.urls import reverse
+
+_state = local()
+
+BULK_BATCH_SIZE = 500
+
+# Columns rewritten when an existing document is rebuilt.
+DOCUMENT_FIELDS = ['title', 'subtitle', 'url', 'text', 'course_id', 'consultant_id', 'status', 'updated_at']
+
+
+def _text(*parts):
+    return ' '.join(str(part) for part in parts if part).lower()
+
+
+def _course_names(course_ids):
+    from coursedb.models import Course
+    return dict(Course.objects.filter(id__in={cid for cid in course_ids if cid}).values_list('id', 'course_name'))
+
+
+def _student_documents(ids):
+    from studentsdb.models import Student
+    students = list(Student.objects.filter(id__in=ids).select_related('consultant'))
+    courses = _course_names(s.course_id for s in students)
+    for s in students:
+        name = f"{s.first_name} {s.last_name or ''}".strip()
+        course = courses.get(s.course_id)
+        consultant = s.consultant.name if s.consultant else None
+        yield s.pk, {
+            'title': f"{s.student_id} - {name}",
+            'subtitle': ' · '.join(filter(None, [course, s.get_course_status_display()])),
+            'url': reverse('student_report', args=[s.student_id]),
+            'text': _text(s.student_id, name, s.email, s.phone, course, consultant),
+            'course_id': s.course_id,
+            'consultant_id': s.consultant_id,
+            'status': s.course_status,
+        }
+
+
+def _batch_documents(ids):
+    from batchdb.models import Batch
+    for b in Batch.objects.filter(id__in=ids).select_related('course', 'trainer'):
+        course = b.course.course_name if b.course else None
+        trainer = b.trainer.name if b.trainer else None
+        yield b.pk, {
+            'title': b.batch_id,
+            'subtitle': ' · '.join(filter(None, [course, trainer, b.get_batch_status_display()])),
+            'url': reverse('batchdb:batch_report', args=[b.pk]),
+            'text': _text(b.batch_id, course, trainer, b.get_batch_type_display()),
+            'course_id': b.course_id,
+            'consultant_id': None,
+            'status': b.batch_status,
+        }
+
+
+def _trainer_documents(ids):
+    from trainersdb.models import Trainer
+    for t in Trainer.objects.filter(id__in=ids):
+        yield t.pk, {
+            'title': f"{t.trainer_id} - {t.name}",
+            'subtitle': t.get_employment_type_display(),
+            'url': reverse('update_trainer', args=[t.pk]),
+            'text': _text(t.trainer_id, t.name, t.email, t.phone_number),
+            'course_id': None,
+            'consultant_id': None,
+            'status': 'active' if t.is_active else 'inactive',
+        }
+
+
+def _company_documents(ids):
+    from placementdrive.models import Company
+    for c in Company.objects.filter(id__in=ids):
+        yield c.pk, {
+            'title': f"{c.company_code} - {c.company_name}",
+            'subtitle': ' · '.join(filter(None, [c.spoc, c.get_progress_display()])),
+            'url': reverse('company_update', args=[c.pk]),
+            'text': _text(c.company_code, c.company_name, c.spoc, c.email, c.mobile, c.location, c.other_location),
+            'course_id': None,
+            'consultant_id': None,
+            'status': c.progress,
+        }
+
+
+def _payment_documents(ids):
+    from paymentdb.models import Payment
+    for p in Payment.objects.filter(id__in=ids).select_related('student'):
+        s = p.student
+        name = f"{s.first_name} {s.last_name or ''}".strip()
+        pending = p.total_pending_amount or 0
+        yield p.pk, {
+            'title': f"{p.payment_id} - {name}",
+            'subtitle': f"{s.student_id} · Pending {pending}",
+            'url': reverse('payment_update', args=[p.payment_id]),
+            'text': _text(p.payment_id, s.student_id, name, s.phone),
+            'course_id': s.course_id,
+            'consultant_id': s.consultant_id,
+            'status': 'Pending' if pending > 0 else 'Paid',
+        }
+
+
+BUILDERS = {
+    'student': _student_documents,
+    'batch': _batch_documents,
+    'trainer': _trainer_documents,
+    'company': _company_documents,
+    'payment': _payment_documents,
+}
+
+
+def source_models():
+    """Entity type -> source model, in BUILDERS order."""
+    from batchdb.models import Batch
+    from paymentdb.models import Payment
+    from placementdrive.models import Company
+    from studentsdb.models import Student
+    from trainersdb.models import Trainer
+    return {'student': Student, 'batch': Batch, 'trainer': Trainer, 'company': Company, 'payment': Payment}
+
+
+def index_documents(entity_type, ids):
+    """
+    Rebuild the documents of ``entity_type`` for ``ids`` and drop those whose
+    source row no longer exists. Returns ``(written, deleted)``.
+    """
+    from django.utils import timezone
+    from .models import SearchDocument
+
+    ids = set(ids)
+    if not ids:
+        return 0, 0
+    now = timezone.now()
+    documents = [
+        SearchDocument(entity_type=entity_type, object_id=pk, updated_at=now, **fields)
+        for pk, fields in BUILDERS[entity_type](ids)
+    ]
+    if documents:
+        SearchDocument.objects.bulk_create(
+            documents,
+            batch_size=BULK_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['entity_type', 'object_id'],
+            update_fields=DOCUMENT_FIELDS,
+        )
+    missing = ids - {document.object_id for document in documents}
+    deleted = 0
+    if missing:
+        deleted, _ = SearchDocument.objects.filter(entity_type=entity_type, object_id__in=missing).delete()
+    return len(documents), deleted
+
+
+class _DirtySet:
+    """Ids per entity type touched inside one transaction, indexed by its on_commit hook."""
+
+    def __init__(self):
+        self.ids = {}
+
+    def flush(self):
+        if getattr(_state, 'dirty', None) is self:
+            _state.dirty = None
+        for entity_type, ids in self.ids.items():
+            index_documents(entity_type, ids)
+
+    def is_pending(self, connection):
+        return any(hook[1] == self.flush for hook in connection.run_on_commit)
+
+
+def _current_dirty_set():
+    connection = transaction.get_connection()
+    dirty = getattr(_state, 'dirty', None)
+    if dirty is None or not dirty.is_pending(connection):
+        dirty = _DirtySet()
+        _state.dirty = dirty
+        transaction.on_commit(dirty.flush)
+    return dirty
+
+
+def mark_dirty(entity_type, ids):
+    """Schedule a rebuild of the ``entity_type`` documents for ``ids``."""
+    if not transaction.get_connection().in_atomic_block:
+        index_documents(entity_type, ids)
+        return
+    _current_dirty_set().ids.setdefault(entity_type, set()).update(ids)
+
+
+def rebuild_search_index(entity_types=None, chunk_size=BULK_BATCH_SIZE):
+    """
+    Rebuild every document of ``entity_types`` (all by default) in chunks of
+    source ids and delete orphaned documents. Returns ``{entity_type: written}``.
+    """
+    from .models import SearchDocument
+
+    written = {}
+    for entity_type, model in source_models().items():
+        if entity_types and entity_type not in entity_types:
+            continue
+        count = 0
+        last_id = 0
+        while True:
+            ids = list(
+                model.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+            )
+            if not ids:
+                break
+            count += index_documents(entity_type, ids)[0]
+            last_id = ids[-1]
+        SearchDocument.objects.filter(entity_type=entity_type).exclude(
+            object_id__in=model.objects.values('pk')
+        ).delete()
+        written[entity_type] = count
+    return written
@@ -0,0 +1,104 @@
+"""
+Counters behind the human-readable codes (BTR0001, PMT0001, TRN0001, ...).
+
+Each code series is a row in core.Sequence. allocate() locks that row with
+SELECT ... FOR UPDATE and advances it, so concurrent creates wait for each
+other instead of reading the same "last" row and colliding on the unique
+code, and a whole block of values costs the same queries as one. The lock
+is held until the surrounding transaction ends; a rollback returns the values.
+
+A series is seeded the first time it is used from the highest code already
+stored, so existing data keeps counting where it left off. Codes can still be
+stored without the series (forms, data imports, restored backups), so each
+allocation also checks its values against the table and, if any is taken,
+re-seeds past the highest stored code.
+"""
+import re
+
+from django.db import transaction
+
+
+def allocate(name, count=1, seed=None, taken=None):
+    """
+    Reserve ``count`` consecutive values of sequence ``name`` and return them
+    as a range. ``seed`` is called when the sequence does not exist yet, to
+    get the value it starts after, and again if ``taken(values)`` reports
+    that a value was already stored behind the sequence's back.
+    """
+    from .models import Sequence
+
+    if count < 1:
+        return range(0)
+    with transaction.atomic():
+        sequence = Sequence.objects.select_for_update().filter(name=name).first()
+        if sequence is None:
+            sequence, _ = Sequence.objects.get_or_create(
+                name=name, defaults={'last_value': seed() if seed else 0}
+            )
+            sequence = Sequence.objects.select_for_update().get(pk=sequence.pk)
+        start = sequence.last_value + 1
+        if taken is not None and seed is not None and taken(range(start, start + count)):
+            start = max(sequence.last_value, seed()) + 1
+        sequence.last_value = start + count - 1
+        sequence.save(update_fields=['last_value'])
+    return range(start, start + count)
+
+
+def max_code_number(queryset, field, prefix):
+    """Highest N among ``field`` values of the form ``prefix`` + digits, or 0."""
+    pattern = re.compile(rf'^{re.escape(prefix)}(\d+)$')
+    highest = 0
+    for code in queryset.filter(**{f'{field}__startswith': prefix}).values_list(field, flat=True).iterator():
+        match = pattern.match(code or '')
+        if match:
+            highest = max(highest, int(match.group(1)))
+    return highest
+
+
+def codes_in_use(queryset, field, codes, chunk_size=500):
+    """Whether any of ``codes`` is already stored in ``field`` of ``queryset``."""
+    codes = list(codes)
+    return any(
+        queryset.filter(**{f'{field}__in': codes[i:i + chunk_size]}).exists()
+        for i in range(0, len(codes), chunk_size)
+    )
+
+
+def reserve_codes(queryset, field, prefix, count, width=4, name=None):
+    """
+    ``count`` new codes ``prefix`` + zero-padded number for ``field`` of the
+    rows in ``queryset``. The sequence is named after the model, field and
+    prefix unless ``name`` is given.
+    """
+    def format_code(number):
+        return f'{prefix}{number:0{width}d}'
+
+    name = name or f'{queryset.model._meta.label_lower}.{field}:{prefix}'
+    numbers = allocate(
+        name, count,
+        seed=lambda: max_code_number(queryset, field, prefix),
+        taken=lambda values: codes_in_use(queryset, field, map(format_code, values)),
+    )
+    return [format_code(number) for number in numbers]
+
+
+def next_code(queryset, field, prefix, width=4, name=None):
+    """A single code from reserve_codes()."""
+    return reserve_codes(queryset, field, prefix, 1, width, name)[0]
+
+
+def claim_codes(queryset, field, prefix, codes, name=None):
+    """
+    Record that ``codes`` were stored as given (e.g. from an import sheet), so
+    reserve_codes() never hands them out. A sequence that has not been seeded
+    yet needs nothing: its seed will see the stored codes.
+    """
+    from .models import Sequence
+
+    pattern = re.compile(rf'^{re.escape(prefix)}(\d+)$')
+    numbers = [int(match.group(1)) for match in map(pattern.match, (code or '' for code in codes)) if match]
+    if not numbers:
+        return
+    name = name or f'{queryset.model._meta.label_lower}.{field}:{prefix}'
+    highest = max(numbers)
+    Sequence.objects.filter(name=name, last_value__lt=highest).update(last_value=highest)
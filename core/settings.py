@@ -2,6 +2,7 @@
 
 from pathlib import Path
 import os
+import sys
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -96,6 +97,28 @@ else:
         }
     }
 
+# Cached dashboard figures and filter options are invalidated on writes, so
+# every process (web workers, run_import_jobs, management commands) must
+# share the cache. Set CACHE_URL to a Redis database of its own (not the one
+# the channel layer uses) for that. Without it each process keeps its own
+# copy, which the short TTLs of those caches bound. Tests always use a local
+# cache, since they clear it.
+CACHE_URL = os.environ.get('CACHE_URL')
+TESTING = sys.argv[1:2] == ['test']
+if CACHE_URL and not TESTING:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
 
 # Database configuration from environment variables
 DATABASES = {
@@ -150,6 +173,25 @@ LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'home'
 LOGOUT_REDIRECT_URL = 'login'
 
+# Audit trail (settingsdb.TransactionLog) write strategy: 'sync', 'deferred' or 'background'
+AUDIT_LOG_MODE = os.environ.get('AUDIT_LOG_MODE', 'deferred')
+# Store only diffs for UPDATE rows of models without an explicit policy (see settingsdb/audit_policy.py)
+AUDIT_LOG_DIFF_ONLY = os.environ.get('AUDIT_LOG_DIFF_ONLY', 'False').lower() == 'true'
+# Per-model overrides: {'app_label.ModelName': {'enabled': False, 'exclude': [...], 'sample_rate': 0.1, ...}}
+AUDIT_LOG_POLICIES = {}
+
+# How uploaded imports (core.ImportJob) are run: 'thread' in the web process, or 'worker' by manage.py run_import_jobs
+IMPORT_JOB_MODE = os.environ.get('IMPORT_JOB_MODE', 'thread')
+IMPORT_JOB_THREADS = int(os.environ.get('IMPORT_JOB_THREADS', 2))
+# A RUNNING job without a progress save for this many seconds is marked FAILED (its runner died)
+IMPORT_JOB_STALE_AFTER = int(os.environ.get('IMPORT_JOB_STALE_AFTER', 15 * 60))
+
+# Largest SQL backup settingsdb's import_db_backup accepts, in MB
+DB_BACKUP_MAX_UPLOAD_MB = int(os.environ.get('DB_BACKUP_MAX_UPLOAD_MB', 1024))
+
+# Seconds the admin/staff dashboard figures are cached (accounts/dashboard.py); model saves also clear them
+DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL', 60))
+
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
@@ -0,0 +1,409 @@
+import asyncio
+import csv
+import io
+import tempfile
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.sql import emit_post_migrate_signal
+from django.db.models import Q
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from batchdb.models import Batch, BatchStudent
+from batchdb.views import _enrolled_student_q
+from paymentdb.models import Payment
+from studentsdb.models import Student
+from trainersdb.models import Trainer
+from consultantdb.models import Consultant
+from coursedb.models import Course, CourseCategory
+from .exports import Sheet, csv_response, model_sheet, xlsx_response
+from .jobs import group_name, run_pending_jobs
+from .models import ImportJob, SearchDocument, Sequence
+from .pagination import KeysetPaginator, approximate_count
+from .search import search_q
+from .search_index import rebuild_search_index
+from .sequences import allocate, reserve_codes
+
+
+class KeysetPaginatorTest(TestCase):
+    def setUp(self):
+        for i in range(25):
+            Student.objects.create(
+                first_name=f'Keyset{i}', last_name='Student', email=f'keyset{i}@example.com',
+                phone=f'93000000{i:02d}', mode_of_class='ON', week_type='WD',
+                course_status='IP' if i % 3 else 'C',
+            )
+
+    def _walk_forward(self, paginator):
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(after=pages[-1].next_cursor))
+        return pages
+
+    def test_forward_and_backward_pages_cover_the_ordering(self):
+        paginator = KeysetPaginator(Student.objects.all(), 10)
+        pages = self._walk_forward(paginator)
+
+        expected = list(Student.objects.order_by('-id').values_list('id', flat=True))
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual([s.id for page in pages for s in page], expected)
+        self.assertFalse(pages[0].has_previous())
+
+        previous = paginator.page(before=pages[2].previous_cursor)
+        self.assertEqual([s.id for s in previous], [s.id for s in pages[1]])
+        self.assertTrue(previous.has_next())
+        self.assertTrue(previous.has_previous())
+        first = paginator.page(before=previous.previous_cursor)
+        self.assertEqual([s.id for s in first], [s.id for s in pages[0]])
+        self.assertFalse(first.has_previous())
+
+    def test_mixed_direction_ordering_with_ties(self):
+        paginator = KeysetPaginator(Student.objects.all(), 4, ('course_status', '-enrollment_date'))
+        self.assertEqual(paginator.ordering, ['course_status', '-enrollment_date', '-id'])
+
+        walked = [s.id for page in self._walk_forward(paginator) for s in page]
+        self.assertEqual(walked, list(
+            Student.objects.order_by('course_status', '-enrollment_date', '-id').values_list('id', flat=True)
+        ))
+
+    def test_deep_page_costs_one_query(self):
+        paginator = KeysetPaginator(Student.objects.all(), 10)
+        cursor = self._walk_forward(paginator)[1].next_cursor
+        with self.assertNumQueries(1):
+            page = paginator.page(after=cursor)
+        self.assertEqual(len(page), 5)
+
+    def test_malformed_cursor_falls_back_to_first_page(self):
+        paginator = KeysetPaginator(Student.objects.all(), 10)
+        first = [s.id for s in paginator.page()]
+        for cursor in ('not-a-cursor', 'W10=', 'WzEsMl0='):
+            self.assertEqual([s.id for s in paginator.page(after=cursor)], first)
+
+    def test_approximate_count_is_exact_for_small_results(self):
+        self.assertEqual(approximate_count(Student.objects.filter(course_status='C')), 9)
+
+
+class SearchTest(TestCase):
+    def setUp(self):
+        names = [('Ravi', 'Kumar'), ('Ravi', 'Shankar'), ('Priya', 'Kumar')]
+        self.students = [
+            Student.objects.create(
+                first_name=first, last_name=last, email=f'{first}.{last}@example.com'.lower(),
+                phone=f'91230000{i:02d}', mode_of_class='ON', week_type='WD',
+            )
+            for i, (first, last) in enumerate(names)
+        ]
+
+    def _names(self, query):
+        fields = ('first_name', 'last_name', 'email', 'phone', 'student_id')
+        return sorted(
+            f'{s.first_name} {s.last_name}' for s in Student.objects.filter(search_q(query, fields))
+        )
+
+    def test_every_term_must_match_some_field(self):
+        self.assertEqual(self._names('ravi'), ['Ravi Kumar', 'Ravi Shankar'])
+        self.assertEqual(self._names('RAVI kumar'), ['Ravi Kumar'])
+        self.assertEqual(self._names(f'kumar {self.students[2].student_id}'), ['Priya Kumar'])
+        self.assertEqual(len(self._names('  ')), 3)
+        self.assertEqual(search_q('', ['first_name']), Q())
+
+    def test_related_matches_do_not_duplicate_rows(self):
+        batch = Batch.objects.create(batch_id='SRCH01', start_date=date(2025, 1, 1), end_date=date(2025, 2, 1))
+        for student in self.students:
+            BatchStudent.objects.create(batch=batch, student=student)
+
+        matches = Batch.objects.filter(search_q('kumar', ('batch_id',), extra=_enrolled_student_q))
+        self.assertEqual(list(matches), [batch])
+        self.assertFalse(Batch.objects.filter(search_q('nobody', ('batch_id',), extra=_enrolled_student_q)).exists())
+
+
+class GlobalSearchTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='search@test.com', name='Search', role='staff', password='password'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student = Student.objects.create(
+                first_name='Meena', last_name='Raghavan', email='meena@example.com',
+                phone='9444000001', mode_of_class='ON', week_type='WD', course_status='IP',
+            )
+            self.payment = Payment.objects.create(student=self.student, total_fees=1000, amount_paid=400)
+            self.trainer = Trainer.objects.create(name='Meena Trainer', employment_type='FT')
+            self.batch = Batch.objects.create(
+                batch_id='GS01', trainer=self.trainer, start_date=date(2025, 1, 1), end_date=date(2025, 2, 1),
+            )
+
+    def _search(self, **params):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('global_search'), params)
+        self.assertEqual(response.status_code, 200)
+        return {
+            group['text']: [hit['text'] for hit in group['children']]
+            for group in response.json()['results']
+        }
+
+    def test_signals_keep_documents_in_sync(self):
+        self.assertEqual(
+            sorted(SearchDocument.objects.values_list('entity_type', flat=True)),
+            ['batch', 'payment', 'student', 'trainer'],
+        )
+        document = SearchDocument.objects.get(entity_type='payment', object_id=self.payment.pk)
+        self.assertEqual(document.status, 'Pending')
+        self.assertIn('meena raghavan', document.text)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.last_name = 'Sundar'
+            self.student.save()
+        document.refresh_from_db()
+        self.assertIn('meena sundar', document.text)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.trainer.delete()
+        self.assertFalse(SearchDocument.objects.filter(entity_type='trainer').exists())
+        self.assertNotIn('meena', SearchDocument.objects.get(entity_type='batch').text)
+
+    def test_endpoint_groups_hits_and_applies_facets(self):
+        self.assertEqual(self._search(q='meena'), {
+            'Student': [f'{self.student.student_id} - Meena Raghavan'],
+            'Batch': ['GS01'],
+            'Trainer': [f'{self.trainer.trainer_id} - Meena Trainer'],
+            'Payment': [f'{self.payment.payment_id} - Meena Raghavan'],
+        })
+        self.assertEqual(list(self._search(q='meena', type='payment', status='Pending')), ['Payment'])
+        self.assertEqual(list(self._search(q='MEENA 9444')), ['Student', 'Payment'])
+        self.assertEqual(sum(len(hits) for hits in self._search(q='meena', limit=2).values()), 2)
+        self.assertEqual(self._search(q=' '), {})
+
+        self.client.force_login(self.user)
+        with self.assertNumQueries(3):  # session, user, search
+            self.client.get(reverse('global_search'), {'q': 'meena'})
+
+    def test_course_and_consultant_renames_reach_dependent_documents(self):
+        category = CourseCategory.objects.create(name='Programming')
+        course = Course.objects.create(course_name='Python Basics', category=category, total_duration=40)
+        consultant = Consultant.objects.create(name='Kavya', phone_number='9444000002', email='kavya@example.com')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.course_id = course.pk
+            self.student.consultant = consultant
+            self.student.save()
+            self.batch.course = course
+            self.batch.save()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            course.course_name = 'Advanced Python'
+            course.save()
+            consultant.name = 'Kavya Iyer'
+            consultant.save()
+        student_document = SearchDocument.objects.get(entity_type='student')
+        self.assertIn('Advanced Python', student_document.subtitle)
+        self.assertIn('kavya iyer', student_document.text)
+        self.assertIn('Advanced Python', SearchDocument.objects.get(entity_type='batch').subtitle)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            consultant.delete()
+        self.assertNotIn('kavya', SearchDocument.objects.get(entity_type='student').text)
+
+    def test_migrate_fills_an_empty_index(self):
+        SearchDocument.objects.all().delete()
+        emit_post_migrate_signal(verbosity=0, interactive=False, db='default')
+        self.assertEqual(SearchDocument.objects.count(), 4)
+
+    def test_rebuild_restores_and_prunes_documents(self):
+        SearchDocument.objects.filter(entity_type='student').delete()
+        SearchDocument.objects.create(entity_type='student', object_id=999999, title='Gone', url='/', text='gone')
+
+        written = rebuild_search_index(chunk_size=1)
+        self.assertEqual(written, {'student': 1, 'batch': 1, 'trainer': 1, 'company': 0, 'payment': 1})
+        self.assertEqual(
+            list(SearchDocument.objects.filter(entity_type='student').values_list('object_id', flat=True)),
+            [self.student.pk],
+        )
+
+
+class SequenceTest(TestCase):
+    def _student(self, index, **kwargs):
+        return Student.objects.create(
+            first_name=f'Seq{index}', email=f'seq{index}@example.com', phone=f'95000000{index:02d}',
+            mode_of_class='ON', week_type='WD', **kwargs
+        )
+
+    def test_codes_continue_from_existing_data_and_are_never_reused(self):
+        self._student(1, student_id='BTR0041')
+        self._student(2, student_id='LEGACY7')
+        self.assertEqual(self._student(3).student_id, 'BTR0042')
+        latest = self._student(4)
+        self.assertEqual(latest.student_id, 'BTR0043')
+        latest.delete()
+        self.assertEqual(self._student(5).student_id, 'BTR0044')
+        self.assertEqual(Sequence.objects.get(name='studentsdb.student.student_id:BTR').last_value, 44)
+
+    def test_codes_stored_outside_the_sequence_are_skipped(self):
+        self.assertEqual(self._student(1).student_id, 'BTR0001')
+        # Stored as given (forms, the data import, a restored backup): the counter is still at 1.
+        self._student(2, student_id='BTR0002')
+        self._student(3, student_id='BTR0050')
+        self.assertEqual(self._student(4).student_id, 'BTR0051')
+        self.assertEqual(self._student(5).student_id, 'BTR0052')
+
+    def test_block_reservation_is_contiguous_and_constant_cost(self):
+        allocate('test.block', seed=lambda: 9)
+        with self.assertNumQueries(5):  # savepoint, lock, taken check, update, release
+            block = reserve_codes(Student.objects.all(), 'student_id', 'BTR', 500, name='test.block')
+        self.assertEqual(block[0], 'BTR0011')
+        self.assertEqual(block[-1], 'BTR0510')
+        self.assertEqual(len(set(block)), 500)
+        self.assertEqual(list(allocate('test.block', 2)), [511, 512])
+
+    def test_course_codes_are_counted_per_category(self):
+        first = CourseCategory.objects.create(name='Seq Category A')
+        second = CourseCategory.objects.create(name='Seq Category B')
+        codes = [
+            Course.objects.create(course_name=f'Seq Course {i}', category=category, total_duration=10).code
+            for i, category in enumerate([first, first, second])
+        ]
+        self.assertEqual(codes, [f'{first.code}001', f'{first.code}002', f'{second.code}001'])
+        self.assertEqual(int(second.code[1:]), int(first.code[1:]) + 1)
+
+
+@override_settings(IMPORT_JOB_MODE='worker')
+class ImportJobTest(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        User = get_user_model()
+        self.user = User.objects.create_user(email='jobs@example.com', name='Jobs', role='staff', password='pass12345')
+        self.client.force_login(self.user)
+        category = CourseCategory.objects.create(name='Jobs')
+        Course.objects.create(course_name='Job Course', category=category, total_duration=30)
+
+    def _workbook(self, rows, name='upload.xlsx'):
+        import pandas as pd
+        buffer = io.BytesIO()
+        pd.DataFrame(rows).to_excel(buffer, index=False)
+        return SimpleUploadedFile(name, buffer.getvalue())
+
+    def _batch_row(self, student_id, **overrides):
+        row = {
+            'module_name': 'Job Course', 'batch_type': 'Regular', 'trainer': 'Job Trainer',
+            'start_date': '2025-08-01', 'end_date': '2025-10-01', 'time_slot': '9:00 AM - 10:30 AM',
+            'students': student_id,
+        }
+        row.update(overrides)
+        return row
+
+    def test_upload_returns_before_rows_are_imported(self):
+        student = Student.objects.create(first_name='Job', mode_of_class='ON', week_type='WD')
+        upload = self._workbook([self._batch_row(student.student_id), self._batch_row('BTR9999')])
+
+        response = self.client.post(reverse('batchdb:import_batches'), {'excel_file': upload})
+
+        job = ImportJob.objects.get()
+        self.assertRedirects(response, reverse('import_job_detail', args=[job.pk]))
+        self.assertEqual((job.kind, job.status, job.created_by), ('batches', 'PENDING', self.user))
+        self.assertFalse(Batch.objects.exists())
+
+        self.assertEqual(run_pending_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'COMPLETED')
+        self.assertEqual((job.total_rows, job.processed_rows, job.success_count, job.error_count), (2, 2, 1, 1))
+        self.assertEqual(Batch.objects.get().students.get(), student)
+
+        response = self.client.get(reverse('import_job_errors', args=[job.pk]))
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([(row['students'], row['error_reason']) for row in rows],
+                         [('BTR9999', 'Student with ID BTR9999 not found.')])
+        self.assertEqual(self.client.get(reverse('import_job_status', args=[job.pk])).json()['percent'], 100)
+
+    def test_progress_is_published_per_chunk(self):
+        rows = [self._batch_row('BTR9999') for _ in range(3)]
+        job = ImportJob.objects.create(kind='batches', file=self._workbook(rows), created_by=self.user)
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(group_name(job.pk), channel)
+
+        with patch('batchdb.importer.CHUNK_SIZE', 2):
+            run_pending_jobs()
+
+        received = []
+        while True:
+            try:
+                received.append(async_to_sync(asyncio.wait_for)(layer.receive(channel), 1)['payload'])
+            except asyncio.TimeoutError:
+                break
+        processed = [payload['processed_rows'] for payload in received if payload['status'] == 'RUNNING']
+        self.assertIn(2, processed)
+        self.assertEqual(received[-1]['status'], 'COMPLETED')
+        self.assertEqual(received[-1]['error_count'], 3)
+
+    def test_missing_columns_fail_the_job(self):
+        response = self.client.post(reverse('import_students'), {'excel_file': self._workbook([{'first_name': 'Only'}])})
+        self.assertEqual(response.status_code, 302)
+
+        run_pending_jobs()
+        job = ImportJob.objects.get()
+        self.assertEqual(job.status, 'FAILED')
+        self.assertIn('must contain the following columns', job.message)
+        self.assertFalse(job.error_file)
+
+    def test_jobs_are_private_to_their_uploader(self):
+        job = ImportJob.objects.create(kind='batches', file=self._workbook([]), created_by=self.user)
+        other = get_user_model().objects.create_user(email='other@example.com', name='Other', role='staff', password='pass12345')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(reverse('import_job_detail', args=[job.pk])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('import_job_status', args=[job.pk])).status_code, 404)
+
+
+    def test_stale_running_jobs_are_failed(self):
+        job = ImportJob.objects.create(kind='batches', file=self._workbook([self._batch_row('BTR9999')]), created_by=self.user)
+        ImportJob.objects.filter(pk=job.pk).update(status='RUNNING', processed_rows=500)
+        live = ImportJob.objects.create(kind='batches', file=self._workbook([self._batch_row('BTR9999')]), created_by=self.user)
+        ImportJob.objects.filter(pk=live.pk).update(status='RUNNING')
+
+        # Still reporting: left alone.
+        self.assertEqual(self.client.get(reverse('import_job_status', args=[job.pk])).json()['status'], 'RUNNING')
+
+        ImportJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        payload = self.client.get(reverse('import_job_status', args=[job.pk])).json()
+        self.assertEqual(payload['status'], 'FAILED')
+        self.assertIn('500 rows were processed', payload['message'])
+
+        ImportJob.objects.filter(pk=live.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        run_pending_jobs()
+        live.refresh_from_db()
+        self.assertEqual(live.status, 'FAILED')
+        self.assertIsNotNone(live.finished_at)
+
+class ExportTest(TestCase):
+    def _workbook(self, response):
+        from openpyxl import load_workbook
+        return load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+
+    def test_csv_response_streams_rows(self):
+        response = csv_response('rows.csv', ['a', 'b'], iter([(1, 'x'), (2, 'y, z')]))
+        self.assertTrue(response.streaming)
+        self.assertEqual(b''.join(response.streaming_content).decode(), 'a,b\r\n1,x\r\n2,"y, z"\r\n')
+
+    def test_model_sheet_writes_every_column(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            student = Student.objects.create(first_name='Export', email='export@example.com', mode_of_class='ON', week_type='WD')
+        sheet = self._workbook(xlsx_response('students.xlsx', [model_sheet('Students', Student.objects.all())]))['Students']
+        rows = list(sheet.iter_rows(values_only=True))
+        self.assertIn('course_id', rows[0])
+        record = dict(zip(rows[0], rows[1]))
+        self.assertEqual((record['id'], record['student_id'], record['first_name']), (student.pk, student.student_id, 'Export'))
+        self.assertEqual(len(rows), 2)
+
+    def test_row_fill_styles_whole_rows(self):
+        from openpyxl.styles import PatternFill
+        fill = PatternFill(start_color='FFFFCC', end_color='FFFFCC', fill_type='solid')
+        sheet = Sheet('Data', ['key', 'value'], [('a', 1), ('b', 2)], lambda row: fill if row[0] == 'a' else None)
+        worksheet = self._workbook(xlsx_response('data.xlsx', [sheet]))['Data']
+        self.assertEqual([cell.fill.fgColor.rgb for cell in worksheet[2]], ['00FFFFCC', '00FFFFCC'])
+        self.assertEqual([cell.fill.fill_type for cell in worksheet[3]], [None, None])
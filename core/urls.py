@@ -2,10 +2,14 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from .views import home
+from .views import global_search, home, import_job_detail, import_job_errors, import_job_status
 
 urlpatterns = [
     path('', home, name='home'),
+    path('search/', global_search, name='global_search'),
+    path('import-jobs/<int:pk>/', import_job_detail, name='import_job_detail'),
+    path('import-jobs/<int:pk>/status/', import_job_status, name='import_job_status'),
+    path('import-jobs/<int:pk>/errors/', import_job_errors, name='import_job_errors'),
     path('admin/', admin.site.urls),
     path('accounts/', include('accounts.urls')), 
     path('students/', include('studentsdb.urls')),
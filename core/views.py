@@ -1,7 +1,100 @@
-from django.shortcuts import render
+from django.contrib.auth.decorators import login_required
+from django.http import FileResponse, Http404, JsonResponse
+from django.shortcuts import get_object_or_404, render
+
+from .jobs import can_view_job, fail_stale_jobs, group_name, stale_jobs
+from .models import ImportJob, SearchDocument
+from .search import search_q
+
+GLOBAL_SEARCH_LIMIT = 10
+GLOBAL_SEARCH_MAX_LIMIT = 50
 
 def home(request):
     return render(request, 'home.html')
 
 def custom_404(request, exception):
-    return render(request, '404.html', status=404)
\ No newline at end of file
+    return render(request, '404.html', status=404)
+
+def _int_param(request, name):
+    try:
+        return int(request.GET[name])
+    except (KeyError, ValueError):
+        return None
+
+@login_required
+def global_search(request):
+    """
+    Top matches across students, batches, trainers, companies and payments
+    from the SearchDocument table, in select2's grouped ``results`` format.
+    Optional ``type``, ``course``, ``consultant`` and ``status`` parameters
+    narrow the hits; ``limit`` caps them (at most GLOBAL_SEARCH_MAX_LIMIT).
+    """
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'results': []})
+
+    documents = SearchDocument.objects.filter(search_q(query, ('text',)))
+    entity_type = request.GET.get('type')
+    if entity_type:
+        documents = documents.filter(entity_type=entity_type)
+    course_id = _int_param(request, 'course')
+    if course_id is not None:
+        documents = documents.filter(course_id=course_id)
+    consultant_id = _int_param(request, 'consultant')
+    if consultant_id is not None:
+        documents = documents.filter(consultant_id=consultant_id)
+    status = request.GET.get('status')
+    if status:
+        documents = documents.filter(status=status)
+
+    limit = _int_param(request, 'limit') or GLOBAL_SEARCH_LIMIT
+    limit = max(1, min(limit, GLOBAL_SEARCH_MAX_LIMIT))
+    hits = documents.order_by('title', 'id').values(
+        'entity_type', 'object_id', 'title', 'subtitle', 'url'
+    )[:limit]
+
+    groups = {}
+    for hit in hits:
+        groups.setdefault(hit['entity_type'], []).append({
+            'id': f"{hit['entity_type']}:{hit['object_id']}",
+            'text': hit['title'],
+            'subtitle': hit['subtitle'],
+            'url': hit['url'],
+        })
+    results = [
+        {'text': label, 'children': groups[value]}
+        for value, label in SearchDocument.ENTITY_CHOICES if value in groups
+    ]
+    return JsonResponse({'results': results})
+
+
+def _get_job(request, pk):
+    job = get_object_or_404(ImportJob.objects.select_related('created_by'), pk=pk)
+    if not can_view_job(request.user, job):
+        raise Http404
+    if job.status == 'RUNNING' and fail_stale_jobs(stale_jobs().filter(pk=job.pk)):
+        job.refresh_from_db()
+    return job
+
+@login_required
+def import_job_detail(request, pk):
+    """Progress page of an import job; updates arrive over its websocket."""
+    job = _get_job(request, pk)
+    return render(request, 'core/import_job.html', {
+        'job': job,
+        'payload': job.progress_payload(),
+        'group': group_name(job.pk),
+    })
+
+@login_required
+def import_job_status(request, pk):
+    """The job's progress as JSON, for clients without a websocket."""
+    return JsonResponse(_get_job(request, pk).progress_payload())
+
+@login_required
+def import_job_errors(request, pk):
+    """The rows the job rejected, as the CSV the handler wrote."""
+    job = _get_job(request, pk)
+    if not job.error_file:
+        raise Http404
+    return FileResponse(job.error_file.open('rb'), as_attachment=True, filename=f"import_{job.pk}_errors.csv")
@@ -0,0 +1,105 @@
+"""
+Import of courses, their modules and topics from a CSV with one row per
+topic, run as a core.jobs import job.
+
+Rows are committed CHUNK_SIZE at a time, each in its own savepoint, so a
+rejected row is reported with its ``Errors`` without undoing the others.
+"""
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+REQUIRED_COLUMNS = [
+    'Category Name', 'Category Code', 'Course Name', 'Course Code', 'Total Duration',
+    'Module Name', 'Module Duration', 'Has Topics', 'Topic Name', 'Topic Duration',
+]
+
+CHUNK_SIZE = 500
+
+
+def import_course_row(row, line, courses):
+    """
+    Create or update the course, module and topic of one CSV row. ``courses``
+    caches what earlier rows already wrote, by course code.
+    """
+    from .forms import CourseCategoryForm, CourseForm
+    from .models import Course, CourseCategory, CourseModule, Topic
+
+    course_code = row['Course Code']
+    if course_code not in courses:
+        category_form = CourseCategoryForm({'name': row['Category Name'], 'code': row['Category Code']})
+        if not category_form.is_valid():
+            raise ValidationError(f"Row {line}: Category validation error: {category_form.errors.as_json()}")
+        category, _ = CourseCategory.objects.get_or_create(code=row['Category Code'], defaults={'name': row['Category Name']})
+
+        course_data_for_form = {
+            'course_name': row['Course Name'],
+            'code': course_code,
+            'category': category.pk,
+            'total_duration': row['Total Duration'],
+            'course_type': 'Course'
+        }
+        course_form = CourseForm(course_data_for_form)
+        if not course_form.is_valid():
+            raise ValidationError(f"Row {line}: Course validation error: {course_form.errors.as_json()}")
+
+        course, created = Course.objects.update_or_create(
+            code=course_code,
+            defaults=course_form.cleaned_data
+        )
+        courses[course_code] = {'instance': course, 'modules': {}}
+
+    course_data = courses[course_code]
+    module_name = row['Module Name']
+    if module_name and module_name not in course_data['modules']:
+        module_form_data = {
+            'name': module_name,
+            'module_duration': row['Module Duration'],
+            'has_topics': row['Has Topics'].lower() == 'true'
+        }
+        module, created = CourseModule.objects.update_or_create(
+            course=course_data['instance'],
+            name=module_name,
+            defaults=module_form_data
+        )
+        course_data['modules'][module_name] = {'instance': module, 'topics': set()}
+
+    module_data = course_data['modules'][module_name]
+    topic_name = row['Topic Name']
+    if topic_name and topic_name not in module_data['topics']:
+        topic_form_data = {
+            'name': topic_name,
+            'topic_duration': row['Topic Duration']
+        }
+        Topic.objects.update_or_create(
+            module=module_data['instance'],
+            name=topic_name,
+            defaults=topic_form_data
+        )
+        module_data['topics'].add(topic_name)
+
+
+def run_import_job(job, progress):
+    """core.jobs handler: import the job's CSV CHUNK_SIZE rows at a time."""
+    from core.jobs import ImportJobError, chunked, count_csv_rows, iter_csv_rows
+
+    total = count_csv_rows(job)
+    progress.set_total(total)
+    courses = {}
+    line = 1
+    for chunk in chunked(iter_csv_rows(job), CHUNK_SIZE):
+        if line == 1 and not all(column in chunk[0] for column in REQUIRED_COLUMNS):
+            raise ImportJobError(f"CSV file must contain the following columns: {', '.join(REQUIRED_COLUMNS)}")
+        errors = []
+        created = 0
+        with transaction.atomic():
+            for row in chunk:
+                line += 1
+                try:
+                    with transaction.atomic():
+                        import_course_row(row, line, courses)
+                    created += 1
+                except Exception as e:
+                    # The row's writes were rolled back; rebuild its course from the next row.
+                    courses.pop(row.get('Course Code'), None)
+                    errors.append({**row, 'Errors': str(e)})
+        progress.advance(len(chunk), created, errors)
@@ -1,8 +1,10 @@
 from django.db import models
+from core.mixins import FieldTrackerMixin
+from core.sequences import next_code
 from django.core.validators import MinValueValidator
 from django.utils.translation import gettext_lazy as _
 
-class CourseCategory(models.Model):
+class CourseCategory(FieldTrackerMixin, models.Model):
     name = models.CharField(max_length=255, unique=True)
     code = models.CharField(max_length=10, unique=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -16,15 +18,10 @@ class CourseCategory(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.code:
-            last_category = CourseCategory.objects.order_by('id').last()
-            if last_category:
-                last_id = int(last_category.code[1:])
-                self.code = 'C' + str(last_id + 1)
-            else:
-                self.code = 'C1'
+            self.code = next_code(CourseCategory.objects.all(), 'code', 'C', width=0)
         super().save(*args, **kwargs)
 
-class Course(models.Model):
+class Course(FieldTrackerMixin, models.Model):
     COURSE_TYPE_CHOICES = [
         ('Course', 'Course'),
         ('Module', 'Module'),
@@ -49,17 +46,10 @@ class Course(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.code:
-            last_course = Course.objects.filter(category=self.category).order_by('id').last()
-            category_code = self.category.code
-            if last_course:
-                last_id = int(last_course.code[len(category_code):])
-                new_id = last_id + 1
-            else:
-                new_id = 1
-            self.code = f"{category_code}{new_id:03d}" 
+            self.code = next_code(Course.objects.filter(category=self.category), 'code', self.category.code, width=3)
         super().save(*args, **kwargs)
 
-class CourseModule(models.Model):
+class CourseModule(FieldTrackerMixin, models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='modules')
     name = models.CharField(max_length=255)
     module_duration = models.DecimalField(
@@ -75,7 +65,7 @@ class CourseModule(models.Model):
     def __str__(self):
         return f"{self.name} ({self.course.course_name})"
 
-class Topic(models.Model):
+class Topic(FieldTrackerMixin, models.Model):
     module = models.ForeignKey(CourseModule, on_delete=models.CASCADE, related_name='topics')
     name = models.CharField(max_length=255)
     topic_duration = models.DecimalField(
@@ -3,12 +3,13 @@ from django.contrib import messages
 from django.http import JsonResponse
 from django.core.exceptions import ValidationError
 import csv
-import io
 from django.http import HttpResponse
 from django.contrib.auth.decorators import user_passes_test
 from django.db.models import Q
 from .models import Course, CourseCategory, CourseModule, Topic
 from .forms import CourseForm, CourseCategoryForm
+from core.exports import EXPORT_CHUNK_SIZE, csv_response
+from core.jobs import enqueue_import
 from django.db import transaction
 from django.core.paginator import Paginator
 from django.contrib.auth.decorators import login_required
@@ -323,58 +324,25 @@ def get_next_course_code(request):
 def is_admin(user):
     return user.is_authenticated and user.is_superuser
 
+def _course_csv_rows():
+    courses = Course.objects.select_related('category').prefetch_related('modules__topics').order_by('pk')
+    for course in courses.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        course_columns = [course.category.code, course.category.name, course.code, course.course_name, course.total_duration]
+        modules = course.modules.all()
+        if not modules:
+            yield course_columns + ['', '', '', '', '']
+        for module in modules:
+            module_columns = course_columns + [module.name, module.module_duration, module.has_topics]
+            topics = module.topics.all()
+            if not topics:
+                yield module_columns + ['', '']
+            for topic in topics:
+                yield module_columns + [topic.name, topic.topic_duration]
+
 @user_passes_test(is_admin)
 def export_courses_csv(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="courses.csv"'
-
-    writer = csv.writer(response)
-    writer.writerow(['Category Code', 'Category Name', 'Course Code', 'Course Name', 'Total Duration', 'Module Name', 'Module Duration', 'Has Topics', 'Topic Name', 'Topic Duration'])
-
-    for course in Course.objects.all():
-        if course.modules.exists():
-            for module in course.modules.all():
-                if module.topics.exists():
-                    for topic in module.topics.all():
-                        writer.writerow([
-                            course.category.code,
-                            course.category.name,
-                            course.code,
-                            course.course_name,
-                            course.total_duration,
-                            module.name,
-                            module.module_duration,
-                            module.has_topics,
-                            topic.name,
-                            topic.topic_duration
-                        ])
-                else:
-                    writer.writerow([
-                        course.category.code,
-                        course.category.name,
-                        course.code,
-                        course.course_name,
-                        course.total_duration,
-                        module.name,
-                        module.module_duration,
-                        module.has_topics,
-                        '',
-                        ''
-                    ])
-        else:
-            writer.writerow([
-                course.category.code,
-                course.category.name,
-                course.code,
-                course.course_name,
-                course.total_duration,
-                '',
-                '',
-                '',
-                '',
-                ''
-            ])
-    return response
+    header = ['Category Code', 'Category Name', 'Course Code', 'Course Name', 'Total Duration', 'Module Name', 'Module Duration', 'Has Topics', 'Topic Name', 'Topic Duration']
+    return csv_response('courses.csv', header, _course_csv_rows())
 
 @user_passes_test(is_admin)
 def import_courses_csv(request):
@@ -384,88 +352,8 @@ def import_courses_csv(request):
             messages.error(request, 'This is not a CSV file')
             return redirect('coursedb:course_list')
 
-        data_set = csv_file.read().decode('UTF-8')
-        io_string = io.StringIO(data_set)
-        reader = csv.DictReader(io_string)
-        rows = list(reader)
-        errors = []
-
-        try:
-            with transaction.atomic():
-                courses = {}
-                for i, row in enumerate(rows):
-                    try:
-                        course_code = row['Course Code']
-                        if course_code not in courses:
-                            category_form = CourseCategoryForm({'name': row['Category Name'], 'code': row['Category Code']})
-                            if not category_form.is_valid():
-                                raise ValidationError(f"Row {i+2}: Category validation error: {category_form.errors.as_json()}")
-                            category, _ = CourseCategory.objects.get_or_create(code=row['Category Code'], defaults={'name': row['Category Name']})
-
-                            course_data_for_form = {
-                                'course_name': row['Course Name'],
-                                'code': course_code,
-                                'category': category.pk,
-                                'total_duration': row['Total Duration'],
-                                'course_type': 'Course'
-                            }
-                            course_form = CourseForm(course_data_for_form)
-                            if not course_form.is_valid():
-                                raise ValidationError(f"Row {i+2}: Course validation error: {course_form.errors.as_json()}")
-                            
-                            course, created = Course.objects.update_or_create(
-                                code=course_code,
-                                defaults=course_form.cleaned_data
-                            )
-                            courses[course_code] = {'instance': course, 'modules': {}}
-
-                        course_data = courses[course_code]
-                        module_name = row['Module Name']
-                        if module_name and module_name not in course_data['modules']:
-                            module_form_data = {
-                                'name': module_name,
-                                'module_duration': row['Module Duration'],
-                                'has_topics': row['Has Topics'].lower() == 'true'
-                            }
-                            module, created = CourseModule.objects.update_or_create(
-                                course=course_data['instance'],
-                                name=module_name,
-                                defaults=module_form_data
-                            )
-                            course_data['modules'][module_name] = {'instance': module, 'topics': set()}
-
-                        module_data = course_data['modules'][module_name]
-                        topic_name = row['Topic Name']
-                        if topic_name and topic_name not in module_data['topics']:
-                            topic_form_data = {
-                                'name': topic_name,
-                                'topic_duration': row['Topic Duration']
-                            }
-                            Topic.objects.update_or_create(
-                                module=module_data['instance'],
-                                name=topic_name,
-                                defaults=topic_form_data
-                            )
-                            module_data['topics'].add(topic_name)
-                    except Exception as e:
-                        row['Errors'] = str(e)
-                        errors.append(row)
-
-                if errors:
-                    raise ValidationError("Errors found during import.")
-
-            messages.success(request, "Courses imported successfully.")
-            return redirect('coursedb:course_list')
-
-        except ValidationError:
-            response = HttpResponse(content_type='text/csv')
-            response['Content-Disposition'] = 'attachment; filename="import_errors.csv"'
-            
-            fieldnames = list(rows[0].keys()) + ['Errors']
-            writer = csv.DictWriter(response, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(errors)
-            return response
+        job = enqueue_import('courses', csv_file, request.user)
+        return redirect('import_job_detail', pk=job.pk)
 
     return render(request, 'coursedb/import_form.html')
 @login_required
@@ -1,237 +1,592 @@
 #!/usr/bin/env python3
-import os
-import sys
-import subprocess
+"""
+Database backup to an rclone remote.
+
+Each run writes one backup set to BACKUP_DIR and uploads it:
+
+  * the dump (pg_dump -Fc, or mysqldump) is piped through gzip as it is
+    produced, so no uncompressed copy ever touches the disk;
+  * every file's size and SHA-256 go into BACKUP_DIR/manifest.json, which is
+    uploaded next to the backups;
+  * uploads are retried with backoff, and sets a previous run failed to upload
+    are uploaded first on the next run;
+  * backups past BACKUP_RETENTION_DAYS are deleted with a single
+    ``rclone delete --files-from-raw`` call.
+
+With --incremental (PostgreSQL only) the append-heavy tables in
+INCREMENTAL_TABLES are not dumped in full every time. Every set still has a
+complete main dump of all other tables, taken without those tables' rows.
+Each of those tables gets a COPY file with only the rows added since the
+previous set. A set restores together with its chain: the sets from the
+last full set up to and including itself. Restore the chosen set's main
+dump, then the COPY files of every set in its chain, oldest first.
+``db_backup.py --restore-plan [SET_ID]`` prints the commands in order.
+
+The high-water marks, COPY files and main dump of a set come from one
+exported REPEATABLE READ snapshot. A row whose id was allocated before a
+set's marks were read but which committed after that set's snapshot is
+invisible to that set. To catch such rows, each COPY file starts
+INCREMENTAL_OVERLAP ids below the previous mark; the restore skips the
+rows it already has. A transaction still open when more than
+INCREMENTAL_OVERLAP newer ids had committed would still be missed.
+Start a chain with --full regularly to bound that.
+
+Any rclone remote works, including a local directory for testing, e.g.
+RCLONE_CONFIG_LOCALBACKUP_TYPE=local RCLONE_REMOTE=localbackup RCLONE_BACKUP_DIR=/tmp/backups.
+"""
+import argparse
 import datetime
+import gzip
+import hashlib
+import json
 import logging
-from dotenv import load_dotenv
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('/var/www/btreeadminportal/db_backup.log'),
-        logging.StreamHandler()
-    ]
-)
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+
 logger = logging.getLogger(__name__)
 
-# Load .env
-env_path = '/var/www/btreeadminportal/.env'
-if not os.path.exists(env_path):
-    logger.error(f".env file not found at {env_path}")
-    sys.exit(1)
-load_dotenv(env_path)
-
-# Environment variables
-DB_ENGINE = os.getenv('DB_ENGINE')
-DB_NAME = os.getenv('DB_NAME')
-DB_USER = os.getenv('DB_USER')
-DB_PASSWORD = os.getenv('DB_PASSWORD')
-DB_HOST = os.getenv('DB_HOST')
-DB_PORT = os.getenv('DB_PORT', '5432')
-BACKUP_DIR = os.getenv('BACKUP_DIR')
-BACKUP_RETENTION_DAYS = int(os.getenv('BACKUP_RETENTION_DAYS', 30))
-RCLONE_REMOTE = os.getenv('RCLONE_REMOTE')
-RCLONE_BACKUP_DIR = os.getenv('RCLONE_BACKUP_DIR')
-
-# Validate required environment variables
-required_vars = ['DB_ENGINE', 'DB_NAME', 'DB_USER', 'DB_PASSWORD', 'DB_HOST', 
+ENV_PATH = '/var/www/btreeadminportal/.env'
+LOG_PATH = '/var/www/btreeadminportal/db_backup.log'
+
+# Tables that only ever grow; --incremental dumps just their new rows.
+INCREMENTAL_TABLES = ['settingsdb_transactionlog', 'studentsdb_conversationmessage', 'batchdb_batchtransaction']
+
+# Ids each incremental COPY re-reads below the previous set's mark (see above).
+INCREMENTAL_OVERLAP = 1000
+
+MANIFEST_NAME = 'manifest.json'
+BLOCK_SIZE = 1024 * 1024
+GZIP_LEVEL = 6
+
+REQUIRED_VARS = ['DB_ENGINE', 'DB_NAME', 'DB_USER', 'DB_PASSWORD', 'DB_HOST',
                  'BACKUP_DIR', 'RCLONE_REMOTE', 'RCLONE_BACKUP_DIR']
-missing_vars = [var for var in required_vars if not os.getenv(var)]
-if missing_vars:
-    logger.error(f"Missing required environment variables: {', '.join(missing_vars)}")
-    sys.exit(1)
-
-# Ensure backup dir exists
-try:
-    os.makedirs(BACKUP_DIR, exist_ok=True)
-    logger.info(f"Using backup directory: {BACKUP_DIR}")
-except Exception as e:
-    logger.error(f"Failed to create backup directory {BACKUP_DIR}: {e}")
-    sys.exit(1)
-
-def create_db_backup():
-    timestamp = datetime.datetime.now().strftime('%Y-%m-%d_%H-%M')
-    backup_file = os.path.join(BACKUP_DIR, f"{DB_NAME}_{timestamp}.sql")
-    compressed_file = f"{backup_file}.gz"
-    
+
+
+class BackupError(Exception):
+    pass
+
+
+@dataclass
+class Config:
+    db_engine: str
+    db_name: str
+    db_user: str
+    db_password: str
+    db_host: str
+    db_port: str
+    backup_dir: str
+    retention_days: int
+    rclone_remote: str
+    rclone_backup_dir: str
+    upload_attempts: int = 5
+    upload_backoff: float = 5.0
+
+    @classmethod
+    def from_env(cls, environ=os.environ):
+        missing_vars = [var for var in REQUIRED_VARS if not environ.get(var)]
+        if missing_vars:
+            raise BackupError(f"Missing required environment variables: {', '.join(missing_vars)}")
+        return cls(
+            db_engine=environ['DB_ENGINE'],
+            db_name=environ['DB_NAME'],
+            db_user=environ['DB_USER'],
+            db_password=environ['DB_PASSWORD'],
+            db_host=environ['DB_HOST'],
+            db_port=environ.get('DB_PORT', '5432'),
+            backup_dir=environ['BACKUP_DIR'],
+            retention_days=int(environ.get('BACKUP_RETENTION_DAYS', 30)),
+            rclone_remote=environ['RCLONE_REMOTE'],
+            rclone_backup_dir=environ['RCLONE_BACKUP_DIR'],
+            upload_attempts=int(environ.get('BACKUP_UPLOAD_ATTEMPTS', 5)),
+            upload_backoff=float(environ.get('BACKUP_UPLOAD_BACKOFF', 5)),
+        )
+
+    @property
+    def is_postgres(self):
+        return 'postgresql' in self.db_engine.lower()
+
+    @property
+    def remote_path(self):
+        return f"{self.rclone_remote}:{self.rclone_backup_dir}"
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.backup_dir, MANIFEST_NAME)
+
+    def pg_env(self):
+        env = os.environ.copy()
+        env['PGPASSWORD'] = self.db_password
+        return env
+
+    def pg_connection_args(self):
+        return ['-h', self.db_host, '-p', self.db_port, '-U', self.db_user, '-d', self.db_name]
+
+
+# --- Manifest --------------------------------------------------------------
+
+def load_manifest(config):
     try:
-        if 'postgresql' in DB_ENGINE.lower():
-            logger.info(f"Creating PostgreSQL backup for database {DB_NAME}")
-            env = os.environ.copy()
-            env['PGPASSWORD'] = DB_PASSWORD
-            cmd = [
-                'pg_dump',
-                '-h', DB_HOST,
-                '-p', DB_PORT,
-                '-U', DB_USER,
-                '-d', DB_NAME,
-                '--no-owner',  # Avoid ownership issues during restore
-                '--no-acl'     # Don't include access privileges
-            ]
-            with open(backup_file, 'wb') as f:
-                subprocess.run(cmd, env=env, stdout=f, check=True)
-        elif 'mysql' in DB_ENGINE.lower():
-            logger.info(f"Creating MySQL backup for database {DB_NAME}")
-            cmd = [
-                'mysqldump',
-                f"--host={DB_HOST}",
-                f"--port={DB_PORT}",
-                f"--user={DB_USER}",
-                f"--password={DB_PASSWORD}",
-                '--single-transaction',
-                '--routines',
-                '--triggers',
-                '--events',
-                DB_NAME
-            ]
-            with open(backup_file, 'wb') as f:
-                subprocess.run(cmd, stdout=f, check=True)
-        else:
-            logger.error(f"Unsupported database engine: {DB_ENGINE}")
-            return None
-
-        # Check if the backup file was created and has content
-        if not os.path.exists(backup_file) or os.path.getsize(backup_file) == 0:
-            logger.error(f"Backup file is empty or was not created: {backup_file}")
-            return None
-            
-        # Compress using gzip
-        logger.info(f"Compressing backup file: {backup_file}")
-        subprocess.run(['gzip', '-f', backup_file], check=True)
-        
-        if not os.path.exists(compressed_file):
-            logger.error(f"Compression failed, compressed file not found: {compressed_file}")
-            return None
-            
-        logger.info(f"Backup created and compressed: {compressed_file}")
-        return compressed_file
-        
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Database backup command failed: {e}")
-        # Clean up any partial backup file
-        if os.path.exists(backup_file):
-            os.remove(backup_file)
-        if os.path.exists(compressed_file):
-            os.remove(compressed_file)
-        return None
-    except Exception as e:
-        logger.error(f"Unexpected error during backup creation: {e}")
-        # Clean up any partial backup file
-        if os.path.exists(backup_file):
-            os.remove(backup_file)
-        if os.path.exists(compressed_file):
-            os.remove(compressed_file)
+        with open(config.manifest_path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'sets': []}
+
+
+def save_manifest(config, manifest):
+    """Write the manifest through a temporary file so a crash never leaves half of it."""
+    tmp_path = f"{config.manifest_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, config.manifest_path)
+
+
+# --- Dumping ---------------------------------------------------------------
+
+def stream_compressed(cmd, target, env=None):
+    """
+    Run ``cmd`` and gzip its stdout into ``target`` block by block. Returns
+    the size and SHA-256 of the compressed file. A failed command removes
+    ``target`` and raises BackupError.
+    """
+    digest = hashlib.sha256()
+
+    class _Hashing:
+        # gzip writes through this, so the checksum is taken in the same pass.
+        def __init__(self, raw):
+            self.raw = raw
+
+        def write(self, data):
+            digest.update(data)
+            return self.raw.write(data)
+
+        def flush(self):
+            self.raw.flush()
+
+    # stderr goes to a file: a full pipe would stall the dump while we only read stdout.
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE, stderr=errors)
+        try:
+            with open(target, 'wb') as raw:
+                with gzip.GzipFile(filename='', mode='wb', fileobj=_Hashing(raw), compresslevel=GZIP_LEVEL, mtime=0) as out:
+                    for block in iter(lambda: process.stdout.read(BLOCK_SIZE), b''):
+                        out.write(block)
+            if process.wait() != 0:
+                errors.seek(0)
+                message = errors.read().decode(errors='replace').strip()
+                raise BackupError(f"{cmd[0]} exited with {process.returncode}: {message}")
+        except BaseException:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            if os.path.exists(target):
+                os.remove(target)
+            raise
+        finally:
+            process.stdout.close()
+    return {'size': os.path.getsize(target), 'sha256': digest.hexdigest()}
+
+
+def file_entry(path, stats, **extra):
+    return {'name': os.path.basename(path), **stats, **extra}
+
+
+def main_dump_command(config, exclude_table_data=(), snapshot=None):
+    if config.is_postgres:
+        cmd = ['pg_dump', *config.pg_connection_args(), '-Fc', '-Z0', '--no-owner', '--no-acl']
+        if snapshot:
+            cmd.append(f"--snapshot={snapshot}")
+        for table in exclude_table_data:
+            cmd.append(f"--exclude-table-data={table}")
+        return cmd
+    if 'mysql' in config.db_engine.lower():
+        return [
+            'mysqldump',
+            f"--host={config.db_host}",
+            f"--port={config.db_port}",
+            f"--user={config.db_user}",
+            f"--password={config.db_password}",
+            '--single-transaction',
+            '--routines',
+            '--triggers',
+            '--events',
+            config.db_name,
+        ]
+    raise BackupError(f"Unsupported database engine: {config.db_engine}")
+
+
+def psql_command(config, sql, snapshot=None):
+    """psql running ``sql``, inside the exported ``snapshot`` if given."""
+    cmd = ['psql', *config.pg_connection_args(), '-X', '-A', '-t', '-q', '-v', 'ON_ERROR_STOP=1']
+    if snapshot:
+        cmd += ['-c', 'BEGIN ISOLATION LEVEL REPEATABLE READ', '-c', f"SET TRANSACTION SNAPSHOT '{snapshot}'"]
+    cmd += ['-c', sql]
+    if snapshot:
+        cmd += ['-c', 'COMMIT']
+    return cmd
+
+
+class ExportedSnapshot:
+    """
+    A psql session holding a REPEATABLE READ transaction open, whose
+    snapshot other sessions (pg_dump --snapshot, psql_command) can share.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.process = None
+        self.id = None
+
+    def __enter__(self):
+        cmd = ['psql', *self.config.pg_connection_args(), '-X', '-A', '-t', '-q', '-v', 'ON_ERROR_STOP=1']
+        self.process = subprocess.Popen(
+            cmd, env=self.config.pg_env(), stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+        )
+        self.process.stdin.write("BEGIN ISOLATION LEVEL REPEATABLE READ;\nSELECT pg_export_snapshot();\n")
+        self.process.stdin.flush()
+        self.id = self.process.stdout.readline().strip()
+        if not self.id:
+            self.__exit__(None, None, None)
+            raise BackupError("Could not export a snapshot")
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            self.process.stdin.write("COMMIT;\n")
+            self.process.stdin.close()
+        except (BrokenPipeError, ValueError):
+            pass
+        self.process.wait()
+        self.process.stdout.close()
+
+
+def high_water_marks(config, tables, snapshot=None):
+    """The highest id of each table, as seen by ``snapshot``."""
+    marks = {}
+    for table in tables:
+        result = subprocess.run(
+            psql_command(config, f"SELECT COALESCE(MAX(id), 0) FROM {table}", snapshot),
+            env=config.pg_env(), capture_output=True, text=True, check=True,
+        )
+        marks[table] = int(result.stdout.strip() or 0)
+    return marks
+
+
+def previous_high_water(manifest):
+    """
+    High-water marks of the newest set, or None when it has none (so the
+    next incremental set has no chain to extend and starts a full one).
+    """
+    if not manifest['sets']:
         return None
+    return manifest['sets'][-1].get('high_water')
+
+
+def create_backup_set(config, manifest, incremental=False, full=False):
+    """
+    Dump the database into a new set of files in BACKUP_DIR and add the set
+    to ``manifest``. ``incremental`` splits out INCREMENTAL_TABLES; ``full``
+    makes their COPY files start from the first row again.
+    """
+    timestamp = datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+    split = incremental and config.is_postgres
+    if incremental and not split:
+        logger.warning("Incremental dumps need PostgreSQL; taking a full dump")
+
+    previous = None if full or not split else previous_high_water(manifest)
+    kind = 'incremental' if previous is not None else 'full'
+    backup_set = {
+        'id': timestamp,
+        'kind': kind,
+        'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'files': [],
+        'uploaded': False,
+    }
 
-def upload_to_gdrive(file_path):
-    remote_path = f"{RCLONE_REMOTE}:{RCLONE_BACKUP_DIR}"
+    extension = 'dump.gz' if config.is_postgres else 'sql.gz'
+    main_file = os.path.join(config.backup_dir, f"{config.db_name}_{timestamp}_{kind}.{extension}")
+    logger.info(f"Creating {kind} backup of database {config.db_name}: {os.path.basename(main_file)}")
+    env = config.pg_env() if config.is_postgres else None
     try:
-        # Use rclone with explicit parameters to avoid backup-dir issues
-        # First, create the destination directory if it doesn't exist
-        mkdir_cmd = ['rclone', 'mkdir', remote_path]
+        if split:
+            with ExportedSnapshot(config) as snapshot:
+                marks = high_water_marks(config, INCREMENTAL_TABLES, snapshot.id)
+                backup_set['high_water'] = marks
+                stats = stream_compressed(main_dump_command(config, INCREMENTAL_TABLES, snapshot.id), main_file, env)
+                backup_set['files'].append(file_entry(main_file, stats))
+                for table in INCREMENTAL_TABLES:
+                    low = max(previous.get(table, 0) - INCREMENTAL_OVERLAP, 0) if previous else 0
+                    high = marks[table]
+                    copy_file = os.path.join(config.backup_dir, f"{config.db_name}_{timestamp}_{table}.copy.gz")
+                    sql = f"COPY (SELECT * FROM {table} WHERE id > {low} AND id <= {high} ORDER BY id) TO STDOUT"
+                    stats = stream_compressed(psql_command(config, sql, snapshot.id), copy_file, env)
+                    backup_set['files'].append(file_entry(copy_file, stats, table=table, rows=[low, high]))
+                    logger.info(f"Dumped {table} rows {low + 1}..{high}")
+        else:
+            stats = stream_compressed(main_dump_command(config), main_file, env)
+            backup_set['files'].append(file_entry(main_file, stats))
+    except BaseException:
+        # A set is only usable whole; drop the files already written.
+        for f in backup_set['files']:
+            path = os.path.join(config.backup_dir, f['name'])
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+
+    manifest['sets'].append(backup_set)
+    save_manifest(config, manifest)
+    total = sum(f['size'] for f in backup_set['files'])
+    logger.info(f"Backup set {timestamp} written: {len(backup_set['files'])} file(s), {total} bytes")
+    return backup_set
+
+
+# --- Restore ---------------------------------------------------------------
+
+def restore_chain(sets, set_id=None):
+    """
+    The sets needed to restore ``set_id`` (the newest set by default): the
+    newest full set at or before it, then every set up to and including it.
+    """
+    sets = sorted(sets, key=lambda s: s['created_at'])
+    if not sets:
+        raise BackupError("The manifest lists no backup sets")
+    ids = [s['id'] for s in sets]
+    if set_id is not None and set_id not in ids:
+        raise BackupError(f"Unknown backup set {set_id}")
+    last = ids.index(set_id) if set_id is not None else len(sets) - 1
+    first = last
+    while first > 0 and sets[first]['kind'] != 'full':
+        first -= 1
+    return sets[first:last + 1]
+
+
+def restore_files(sets, set_id=None):
+    """
+    Files to restore, in order: the main dump of the restored set (it holds
+    every other table as of that set), then the COPY files of each set of
+    its chain, oldest first.
+    """
+    chain = restore_chain(sets, set_id)
+    main = [f for f in chain[-1]['files'] if 'table' not in f]
+    return main + [f for backup_set in chain for f in backup_set['files'] if 'table' in f]
+
+
+def restore_commands(config, sets, set_id=None):
+    """Shell commands restoring ``set_id`` into an empty database named like the source."""
+    commands = []
+    for f in restore_files(sets, set_id):
+        if 'table' not in f:
+            restore = 'pg_restore --no-owner -d' if config.is_postgres else 'mysql'
+            commands.append(f"gunzip -c {f['name']} | {restore} {config.db_name}")
+            continue
+        table = f['table']
+        # COPY files overlap (INCREMENTAL_OVERLAP), so rows already restored are skipped.
+        commands.append(
+            f"gunzip -c {f['name']} | psql -d {config.db_name} -v ON_ERROR_STOP=1"
+            f" -c 'CREATE TEMP TABLE restore_rows (LIKE {table})'"
+            f" -c '\\copy restore_rows FROM pstdin'"
+            f" -c 'INSERT INTO {table} SELECT * FROM restore_rows ON CONFLICT (id) DO NOTHING'"
+        )
+    if config.is_postgres:
+        for table in INCREMENTAL_TABLES:
+            commands.append(
+                f"psql -d {config.db_name} -c \"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"COALESCE(MAX(id), 1)) FROM {table}\""
+            )
+    return commands
+
+
+# --- Upload and retention --------------------------------------------------
+
+def rclone(*args, **kwargs):
+    return subprocess.run(['rclone', *args], check=True, **kwargs)
+
+
+def upload_file(config, path, sleep=time.sleep):
+    """
+    Copy ``path`` to the remote, retrying with exponential backoff. rclone
+    skips a file whose size and checksum already match the remote, so a
+    retry after a partial failure only sends what is missing.
+    """
+    target = f"{config.remote_path}/{os.path.basename(path)}"
+    for attempt in range(1, config.upload_attempts + 1):
         try:
-            subprocess.run(mkdir_cmd, check=True)
-            logger.info(f"Ensured remote directory exists: {remote_path}")
-        except subprocess.CalledProcessError:
-            logger.warning(f"Could not create directory {remote_path}, it may already exist")
-        
-        # Use copyto instead of copy to be more explicit about the destination
-        filename = os.path.basename(file_path)
-        cmd = ['rclone', 'copyto', file_path, f"{remote_path}/{filename}", '--no-traverse']
-        subprocess.run(cmd, check=True)
-        logger.info(f"Backup uploaded to Google Drive: {filename}")
-        
-        # Delete the local file after successful upload
-        os.remove(file_path)
-        logger.info(f"Local backup file removed: {file_path}")
-        return True
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Failed to upload backup: {e}")
-        return False
+            rclone('copyto', path, target, '--retries', '3', '--low-level-retries', '10', '--checksum')
+            return True
+        except subprocess.CalledProcessError as e:
+            logger.warning(f"Upload of {os.path.basename(path)} failed (attempt {attempt}/{config.upload_attempts}): {e}")
+            if attempt < config.upload_attempts:
+                sleep(config.upload_backoff * 2 ** (attempt - 1))
+    return False
+
 
-def cleanup_old_backups():
-    remote_path = f"{RCLONE_REMOTE}:{RCLONE_BACKUP_DIR}"
+def upload_pending_sets(config, manifest, sleep=time.sleep):
+    """
+    Upload every set not uploaded yet, oldest first, removing local files
+    once their set is on the remote. Returns False if any set is left.
+    """
     try:
-        # First, ensure the remote directory exists
-        mkdir_cmd = ['rclone', 'mkdir', remote_path]
-        try:
-            subprocess.run(mkdir_cmd, check=True)
-            logger.info(f"Ensured remote directory exists: {remote_path}")
-        except subprocess.CalledProcessError:
-            # Directory likely already exists, continue
-            pass
-            
-        # List all files in the backup directory with a more reliable command
-        list_cmd = ['rclone', 'lsf', remote_path, '--format', 'tp']
-        result = subprocess.run(list_cmd, capture_output=True, text=True)
-        
-        if result.returncode != 0 or not result.stdout.strip():
-            logger.info(f"No files found in remote directory or directory is empty")
-            return True  # No files to clean up
-        
-        # Calculate the cutoff date
-        cutoff_date = datetime.datetime.now() - datetime.timedelta(days=BACKUP_RETENTION_DAYS)
-        cutoff_str = cutoff_date.strftime('%Y-%m-%d')
-        
-        # Process each file
-        deleted_count = 0
-        for line in result.stdout.splitlines():
-            parts = line.strip().split(';')
-            if len(parts) != 2:
-                continue
-                
-            timestamp, filename = parts
-            # Extract date from filename (format: DBNAME_YYYY-MM-DD_HH-MM.sql.gz)
-            try:
-                date_part = filename.split('_')[1]  # Extract YYYY-MM-DD part
-                if date_part < cutoff_str:
-                    # Delete the file with a more explicit command
-                    delete_cmd = ['rclone', 'delete', f"{remote_path}/{filename}", '--no-traverse']
-                    subprocess.run(delete_cmd, check=True)
-                    deleted_count += 1
-                    logger.info(f"Deleted old backup: {filename}")
-            except (IndexError, ValueError) as e:
-                logger.warning(f"Could not parse date from filename: {filename}, error: {e}")
-        
-        logger.info(f"Cleaned up {deleted_count} backups older than {BACKUP_RETENTION_DAYS} days from Drive")
+        rclone('mkdir', config.remote_path)
+    except subprocess.CalledProcessError:
+        logger.warning(f"Could not create directory {config.remote_path}, it may already exist")
+
+    ok = True
+    for backup_set in manifest['sets']:
+        if backup_set['uploaded']:
+            continue
+        paths = [os.path.join(config.backup_dir, f['name']) for f in backup_set['files']]
+        missing = [path for path in paths if not os.path.exists(path)]
+        if missing:
+            logger.error(f"Backup set {backup_set['id']} cannot be uploaded, missing: {', '.join(missing)}")
+            ok = False
+            continue
+        if all(upload_file(config, path, sleep) for path in paths):
+            backup_set['uploaded'] = True
+            save_manifest(config, manifest)
+            for path in paths:
+                os.remove(path)
+            logger.info(f"Backup set {backup_set['id']} uploaded")
+        else:
+            ok = False
+            logger.warning(f"Backup set {backup_set['id']} kept locally for the next run")
+    return ok
+
+
+def sets_to_prune(sets, cutoff):
+    """
+    Sets created before ``cutoff`` that no kept set needs. An incremental set
+    is only restorable with the full set it builds on and every set between,
+    so the newest full set at or before the oldest kept set is kept too.
+    """
+    sets = sorted(sets, key=lambda s: s['created_at'])
+    kept = [i for i, s in enumerate(sets) if s['created_at'] >= cutoff]
+    if not kept:
+        # Keep the newest chain, however old, rather than nothing.
+        kept = [len(sets) - 1] if sets else []
+    first = kept[0] if kept else len(sets)
+    while first > 0 and sets[first]['kind'] != 'full':
+        first -= 1
+    return sets[:first]
+
+
+def legacy_backups_to_prune(config, names, cutoff_date):
+    """Backups from before the manifest (DBNAME_YYYY-MM-DD_HH-MM.sql.gz) older than ``cutoff_date``."""
+    prefix = f"{config.db_name}_"
+    old = []
+    for name in names:
+        if not name.startswith(prefix) or not name.endswith('.sql.gz'):
+            continue
+        date_part = name[len(prefix):].split('_')[0]
+        if len(date_part) == 10 and date_part < cutoff_date:
+            old.append(name)
+    return old
+
+
+def cleanup_old_backups(config, manifest, now=None):
+    """Delete expired backups from the remote with one rclone call."""
+    now = now or datetime.datetime.now()
+    cutoff = now - datetime.timedelta(days=config.retention_days)
+    uploaded = [s for s in manifest['sets'] if s['uploaded']]
+    expired = sets_to_prune(uploaded, cutoff.isoformat(timespec='seconds'))
+    names = [f['name'] for s in expired for f in s['files']]
+
+    known = {f['name'] for s in manifest['sets'] for f in s['files']}
+    try:
+        listing = rclone('lsf', config.remote_path, '--files-only', capture_output=True, text=True).stdout.split()
+    except subprocess.CalledProcessError:
+        listing = []
+    names += legacy_backups_to_prune(config, [n for n in listing if n not in known], cutoff.strftime('%Y-%m-%d'))
+
+    if not names:
+        logger.info("No backups to clean up")
         return True
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+        f.write('\n'.join(names) + '\n')
+        list_path = f.name
+    try:
+        rclone('delete', config.remote_path, '--files-from-raw', list_path)
     except subprocess.CalledProcessError as e:
-        logger.error(f"Failed cleanup on Drive: {e}")
+        logger.error(f"Failed cleanup on remote: {e}")
         return False
+    finally:
+        os.remove(list_path)
 
-def main():
-    logger.info("Starting database backup process")
-    
-    # Step 1: Create database backup
-    backup_file = create_db_backup()
-    if not backup_file:
-        logger.error("Backup creation failed, exiting")
-        sys.exit(1)
-    
-    # Step 2: Upload to Google Drive
-    upload_success = upload_to_gdrive(backup_file)
-    if not upload_success:
-        logger.error("Upload to Google Drive failed")
-        logger.warning(f"Local backup file remains at: {backup_file}")
-        # Don't exit here - still try to clean up old backups
-    
-    # Step 3: Clean up old backups (even if upload failed)
-    cleanup_success = cleanup_old_backups()
-    if not cleanup_success:
-        logger.warning("Failed to clean up old backups from Google Drive")
-    
-    # Final status
-    if upload_success and cleanup_success:
+    expired_ids = {s['id'] for s in expired}
+    manifest['sets'] = [s for s in manifest['sets'] if s['id'] not in expired_ids]
+    save_manifest(config, manifest)
+    logger.info(f"Cleaned up {len(names)} backup file(s) older than {config.retention_days} days")
+    return True
+
+
+# --- Entry point -----------------------------------------------------------
+
+def run(config, incremental=False, full=False, sleep=time.sleep):
+    os.makedirs(config.backup_dir, exist_ok=True)
+    manifest = load_manifest(config)
+
+    created = True
+    try:
+        create_backup_set(config, manifest, incremental=incremental, full=full)
+    except (BackupError, subprocess.CalledProcessError, OSError) as e:
+        logger.error(f"Backup creation failed: {e}")
+        created = False
+
+    # Also uploads sets an earlier run could not.
+    upload_success = upload_pending_sets(config, manifest, sleep)
+    cleanup_success = cleanup_old_backups(config, manifest)
+    if os.path.exists(config.manifest_path):
+        upload_file(config, config.manifest_path, sleep)
+
+    if created and upload_success and cleanup_success:
         logger.info("Database backup process completed successfully")
     else:
         logger.warning("Database backup process completed with warnings or errors")
-        if not upload_success:
-            logger.warning("The current backup was not uploaded to Google Drive")
-        if not cleanup_success:
-            logger.warning("Old backups were not cleaned up from Google Drive")
+    return created and upload_success
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--incremental', action='store_true',
+                        help='Dump only new rows of the append-heavy tables (PostgreSQL).')
+    parser.add_argument('--full', action='store_true',
+                        help='With --incremental, start a new chain with complete copies of those tables.')
+    parser.add_argument('--restore-plan', nargs='?', const='', metavar='SET_ID',
+                        help='Print the commands restoring a set (the newest by default) and exit.')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[logging.FileHandler(LOG_PATH), logging.StreamHandler()],
+    )
+    if not os.path.exists(ENV_PATH):
+        logger.error(f".env file not found at {ENV_PATH}")
+        sys.exit(1)
+    from dotenv import load_dotenv
+    load_dotenv(ENV_PATH)
+
+    try:
+        config = Config.from_env()
+    except BackupError as e:
+        logger.error(str(e))
+        sys.exit(1)
+
+    if args.restore_plan is not None:
+        try:
+            commands = restore_commands(config, load_manifest(config)['sets'], args.restore_plan or None)
+        except BackupError as e:
+            logger.error(str(e))
+            sys.exit(1)
+        print('\n'.join(commands))
+        return
+
+    logger.info("Starting database backup process")
+    if not run(config, incremental=args.incremental, full=args.full):
+        sys.exit(1)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,3 @@
+-- Test SQL file
+CREATE TABLE test_table (id INTEGER PRIMARY KEY, name TEXT);
+INSERT INTO test_table VALUES (1, 'Test');
\ No newline at end of file
@@ -1,6 +1,9 @@
+import time
+
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from paymentdb.models import Payment, PendingPaymentRecord
+from paymentdb.pending_sync import rebuild_pending_records
 
 class Command(BaseCommand):
     help = 'Backfills PendingPaymentRecord for YTS and IP students with pending amounts'
@@ -8,6 +11,11 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('--dry-run', action='store_true')
         parser.add_argument('--limit', type=int)
+        parser.add_argument(
+            '--bulk', action='store_true',
+            help='Rebuild records with set-based queries and bulk writes, one transaction per chunk.',
+        )
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Payments per chunk in --bulk mode.')
 
     def handle(self, *args, **options):
         dry_run = options.get('dry_run')
@@ -15,6 +23,8 @@ class Command(BaseCommand):
         payments = Payment.objects.select_related('student').filter(
             student__course_status__in=['YTS', 'IP', 'H', 'D']
         )
+        if options.get('bulk'):
+            return self.handle_bulk(payments.order_by('id'), limit, options['chunk_size'], dry_run)
         if limit:
             payments = payments[:limit]
         created = 0
@@ -25,7 +35,7 @@ class Command(BaseCommand):
                 pending_calc = p.calculate_total_pending()
                 if p.total_pending_amount != pending_calc and not dry_run:
                     p.total_pending_amount = pending_calc
-                    p.save(update_fields=['total_pending_amount'])
+                    p.save(update_fields=['total_pending_amount', 'updated_at'])
                 if pending_calc <= 0:
                     skipped += 1
                     continue
@@ -44,3 +54,33 @@ class Command(BaseCommand):
                 else:
                     created += 1
         self.stdout.write(self.style.SUCCESS(f'Created: {created}, Updated: {updated}, Skipped: {skipped}'))
+
+    def handle_bulk(self, payments, limit, chunk_size, dry_run):
+        if chunk_size < 1:
+            self.stderr.write(self.style.ERROR('--chunk-size must be at least 1.'))
+            return
+        if limit:
+            payments = payments[:limit]
+        payment_ids = list(payments.values_list('id', flat=True))
+        chunks = [payment_ids[i:i + chunk_size] for i in range(0, len(payment_ids), chunk_size)]
+        self.stdout.write(f'Rebuilding {len(payment_ids)} payments in {len(chunks)} chunk(s)'
+                          f'{" (dry run)" if dry_run else ""}.')
+
+        created = updated = skipped = fixed = 0
+        started = time.monotonic()
+        for number, chunk in enumerate(chunks, start=1):
+            chunk_started = time.monotonic()
+            with transaction.atomic():
+                c, u, s, f = rebuild_pending_records(chunk, dry_run=dry_run)
+            created += c
+            updated += u
+            skipped += s
+            fixed += f
+            self.stdout.write(
+                f'Chunk {number}/{len(chunks)}: {len(chunk)} payments, created {c}, updated {u}, '
+                f'skipped {s}, totals fixed {f} in {time.monotonic() - chunk_started:.2f}s'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Created: {created}, Updated: {updated}, Skipped: {skipped}, Totals fixed: {fixed} '
+            f'in {time.monotonic() - started:.2f}s'
+        ))
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:07
+
+import core.utils
+import django.db.models.deletion
+from django.db import migrations, models
+
+BACKFILL_CHUNK_SIZE = 2000
+
+
+def backfill_installments(apps, schema_editor):
+    Payment = apps.get_model('paymentdb', 'Payment')
+    PaymentInstallment = apps.get_model('paymentdb', 'PaymentInstallment')
+    columns = []
+    for i in range(1, 5):
+        columns += [f'emi_{i}_amount', f'emi_{i}_date', f'emi_{i}_paid_amount', f'emi_{i}_paid_date', f'emi_{i}_proof']
+
+    installments = []
+    for row in Payment.objects.order_by('id').values('id', *columns).iterator(chunk_size=BACKFILL_CHUNK_SIZE):
+        for i in range(1, 5):
+            if row[f'emi_{i}_amount'] is None:
+                continue
+            installments.append(PaymentInstallment(
+                payment_id=row['id'],
+                seq=i,
+                amount=row[f'emi_{i}_amount'],
+                due_date=row[f'emi_{i}_date'],
+                paid_amount=row[f'emi_{i}_paid_amount'],
+                paid_date=row[f'emi_{i}_paid_date'],
+                proof=row[f'emi_{i}_proof'] or None,
+            ))
+        if len(installments) >= BACKFILL_CHUNK_SIZE:
+            PaymentInstallment.objects.bulk_create(installments)
+            installments = []
+    PaymentInstallment.objects.bulk_create(installments)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('paymentdb', '0003_pendingpaymentrecord_trainer_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentInstallment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.PositiveSmallIntegerField()),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('due_date', models.DateField(blank=True, null=True)),
+                ('paid_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('paid_date', models.DateField(blank=True, null=True)),
+                ('proof', models.ImageField(blank=True, null=True, upload_to=core.utils.timestamp_upload_to)),
+                ('payment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='installments', to='paymentdb.payment')),
+            ],
+            options={
+                'ordering': ['payment', 'seq'],
+                'indexes': [models.Index(fields=['due_date', 'paid_amount'], name='paymentdb_inst_due_paid_idx')],
+                'constraints': [models.UniqueConstraint(fields=('payment', 'seq'), name='unique_payment_installment_seq')],
+            },
+        ),
+        migrations.RunPython(backfill_installments, migrations.RunPython.noop),
+    ]
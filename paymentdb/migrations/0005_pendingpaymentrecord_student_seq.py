@@ -0,0 +1,42 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+BACKFILL_CHUNK_SIZE = 2000
+
+
+def backfill_student_seq(apps, schema_editor):
+    PendingPaymentRecord = apps.get_model('paymentdb', 'PendingPaymentRecord')
+    records = []
+    for pk, code in PendingPaymentRecord.objects.order_by('id').values_list('id', 'student_code').iterator(
+        chunk_size=BACKFILL_CHUNK_SIZE
+    ):
+        if code and code.startswith('BTR') and code[3:].isdigit():
+            records.append(PendingPaymentRecord(id=pk, student_seq=int(code[3:])))
+        if len(records) >= BACKFILL_CHUNK_SIZE:
+            PendingPaymentRecord.objects.bulk_update(records, ['student_seq'])
+            records = []
+    PendingPaymentRecord.objects.bulk_update(records, ['student_seq'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('paymentdb', '0004_paymentinstallment'),
+        ('studentsdb', '0014_conversationmessage_mentions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pendingpaymentrecord',
+            name='student_seq',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='pendingpaymentrecord',
+            index=models.Index(fields=['status', '-student_seq', '-id'], name='paymentdb_pending_seq_idx'),
+        ),
+        migrations.RunPython(backfill_student_seq, migrations.RunPython.noop),
+    ]
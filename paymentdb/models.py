@@ -1,9 +1,12 @@
 from django.db import models
+from django.db.models.functions import Now
+from core.mixins import FieldTrackerMixin
+from core.sequences import next_code
 from django.utils import timezone
 from dateutil.relativedelta import relativedelta
 from core.utils import timestamp_upload_to
 
-class Payment(models.Model):
+class Payment(FieldTrackerMixin, models.Model):
     EMI_CHOICES = [
         ('NONE', 'None'),
         ('1', '1 EMI'),
@@ -57,6 +60,7 @@ class Payment(models.Model):
     emi_4_updated_by = models.ForeignKey('accounts.CustomUser', on_delete=models.SET_NULL, null=True, blank=True, related_name='updated_emi_4')
 
     total_pending_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True, db_default=Now(), db_index=True)
 
     def calculate_total_pending(self):
         """Calculate the total pending amount from unpaid EMIs."""
@@ -75,7 +79,7 @@ class Payment(models.Model):
 
         # Handle carry-forward logic before saving
         if self.pk:
-            original = type(self).objects.get(pk=self.pk)
+            original = self.get_loaded_state() or type(self).objects.get(pk=self.pk)
             for i in range(1, 5): # Iterate up to EMI 4
                 # Check if a payment was made for this specific EMI in this transaction
                 if (getattr(self, f'emi_{i}_paid_amount') or 0) > (getattr(original, f'emi_{i}_paid_amount') or 0):
@@ -107,9 +111,7 @@ class Payment(models.Model):
         
         # Generate payment ID if not exists
         if not self.payment_id:
-            last = Payment.objects.order_by('-id').first()
-            next_id = int(last.payment_id.replace('PMT', '')) + 1 if last and last.payment_id else 1
-            self.payment_id = f'PMT{next_id:04d}'
+            self.payment_id = next_code(Payment.objects.all(), 'payment_id', 'PMT')
 
         # Validate EMI amounts based on EMI type
         max_emis = int(self.emi_type) if self.emi_type in ['1', '2', '3', '4'] else 0
@@ -127,7 +129,50 @@ class Payment(models.Model):
 
         # Update total pending amount
         self.total_pending_amount = self.calculate_total_pending()
+        emi_changed = not self.has_loaded_values() or any(
+            name.startswith('emi_') for name in self.get_changed_fields()
+        )
         super().save(*args, **kwargs)
+        if emi_changed:
+            self.sync_installments()
+
+    def sync_installments(self):
+        """Mirrors the emi_N_* columns into this payment's PaymentInstallment rows."""
+        wanted = {}
+        for i in range(1, 5):
+            amount = getattr(self, f'emi_{i}_amount')
+            if amount is None:
+                continue
+            wanted[i] = {
+                'amount': amount,
+                'due_date': getattr(self, f'emi_{i}_date'),
+                'paid_amount': getattr(self, f'emi_{i}_paid_amount'),
+                'paid_date': getattr(self, f'emi_{i}_paid_date'),
+                'proof': getattr(self, f'emi_{i}_proof').name or None,
+            }
+
+        existing = {installment.seq: installment for installment in self.installments.all()}
+        stale = [seq for seq in existing if seq not in wanted]
+        if stale:
+            self.installments.filter(seq__in=stale).delete()
+
+        to_create = []
+        to_update = []
+        for seq, values in wanted.items():
+            installment = existing.get(seq)
+            if installment is None:
+                to_create.append(PaymentInstallment(payment=self, seq=seq, **values))
+                continue
+            current = {name: getattr(installment, name) for name in values}
+            current['proof'] = installment.proof.name or None
+            if current != values:
+                for name, value in values.items():
+                    setattr(installment, name, value)
+                to_update.append(installment)
+        if to_create:
+            PaymentInstallment.objects.bulk_create(to_create)
+        if to_update:
+            PaymentInstallment.objects.bulk_update(to_update, PaymentInstallment.MIRRORED_FIELDS)
 
     def get_payment_status(self):
         if self.total_pending_amount > 0:
@@ -191,10 +236,54 @@ class Payment(models.Model):
         current_emi_amount = getattr(self, f'emi_{emi_number}_amount')
         return bool(current_emi_amount) and not self.is_emi_fully_paid(emi_number)
 
-class PendingPaymentRecord(models.Model):
+class PaymentInstallment(models.Model):
+    """
+    One EMI of a payment, kept in step with the Payment.emi_N_* columns by
+    Payment.sync_installments() so due-date questions can be answered with a
+    single indexed query.
+    """
+    MIRRORED_FIELDS = ['amount', 'due_date', 'paid_amount', 'paid_date', 'proof']
+
+    payment = models.ForeignKey(Payment, on_delete=models.CASCADE, related_name='installments')
+    seq = models.PositiveSmallIntegerField()
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    due_date = models.DateField(blank=True, null=True)
+    paid_amount = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    paid_date = models.DateField(blank=True, null=True)
+    proof = models.ImageField(upload_to=timestamp_upload_to, blank=True, null=True)
+
+    class Meta:
+        ordering = ['payment', 'seq']
+        constraints = [
+            models.UniqueConstraint(fields=['payment', 'seq'], name='unique_payment_installment_seq'),
+        ]
+        indexes = [
+            models.Index(fields=['due_date', 'paid_amount'], name='paymentdb_inst_due_paid_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.payment} - EMI {self.seq}"
+
+    @classmethod
+    def unpaid(cls):
+        """Installments with an amount due and nothing paid against them yet."""
+        return cls.objects.filter(
+            models.Q(paid_amount__isnull=True) | models.Q(paid_amount=0),
+            amount__gt=0,
+        )
+
+def student_code_seq(student_code):
+    """Numeric part of a 'BTR0042' style student code; 0 for anything else."""
+    if student_code and student_code.startswith('BTR') and student_code[3:].isdigit():
+        return int(student_code[3:])
+    return 0
+
+class PendingPaymentRecord(FieldTrackerMixin, models.Model):
     payment = models.OneToOneField('paymentdb.Payment', on_delete=models.CASCADE, related_name='pending_record')
     student = models.ForeignKey('studentsdb.Student', on_delete=models.CASCADE)
     student_code = models.CharField(max_length=10)
+    # student_code's number, so lists can sort newest students first in SQL.
+    student_seq = models.PositiveIntegerField(default=0)
     student_name = models.CharField(max_length=200)
     mobile = models.CharField(max_length=15, null=True, blank=True)
     batch_code = models.CharField(max_length=50, null=True, blank=True)
@@ -219,31 +308,46 @@ class PendingPaymentRecord(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-student_seq', '-id'], name='paymentdb_pending_seq_idx'),
+        ]
+
     def refresh_from_sources(self):
         s = self.payment.student
+        active_bs = s.batchstudent_set.filter(is_active=True).select_related('batch__trainer').first()
+        self.fill_from_sources(self.payment, active_bs, s.course.course_name if s.course else None)
+
+    def fill_from_sources(self, payment, active_bs, course_name):
+        """
+        Copies the denormalized columns from already loaded source rows: the
+        payment (with its student), the student's active BatchStudent (with
+        batch and trainer) and the course name.
+        """
+        s = payment.student
         self.student = s
         self.student_code = s.student_id
+        self.student_seq = student_code_seq(s.student_id)
         self.student_name = f"{s.first_name} {s.last_name or ''}"
         self.mobile = s.phone
-        active_bs = s.batchstudent_set.filter(is_active=True).select_related('batch').first()
         self.batch_code = active_bs.batch.batch_id if active_bs else None
         self.batch_type = active_bs.batch.batch_type if active_bs else None
         self.course_id = s.course_id
-        self.course_name = s.course.course_name if s.course else None
+        self.course_name = course_name
         self.course_status = s.course_status
-        total_paid = self.payment.amount_paid or 0
+        total_paid = payment.amount_paid or 0
         for i in range(1, 5):
-            total_paid += getattr(self.payment, f'emi_{i}_paid_amount') or 0
-        self.total_fee = self.payment.total_fees or 0
+            total_paid += getattr(payment, f'emi_{i}_paid_amount') or 0
+        self.total_fee = payment.total_fees or 0
         self.amount_paid = total_paid
-        self.pending_amount = self.payment.total_pending_amount or 0
-        next_emi = self.payment.get_next_payable_emi()
+        self.pending_amount = payment.total_pending_amount or 0
+        next_emi = payment.get_next_payable_emi()
         self.next_emi_number = next_emi
         if next_emi:
-            amount = getattr(self.payment, f'emi_{next_emi}_amount') or 0
-            paid = getattr(self.payment, f'emi_{next_emi}_paid_amount') or 0
+            amount = getattr(payment, f'emi_{next_emi}_amount') or 0
+            paid = getattr(payment, f'emi_{next_emi}_paid_amount') or 0
             self.next_emi_amount = amount - paid
-            self.next_due_date = getattr(self.payment, f'emi_{next_emi}_date')
+            self.next_due_date = getattr(payment, f'emi_{next_emi}_date')
         else:
             self.next_emi_amount = None
             self.next_due_date = None
@@ -252,113 +356,30 @@ class PendingPaymentRecord(models.Model):
         self.trainer_type = (active_bs.batch.trainer.employment_type if active_bs and active_bs.batch and active_bs.batch.trainer else (s.trainer.employment_type if s.trainer else None))
         self.course_percentage = s.course_percentage
 
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from studentsdb.models import Student
 from batchdb.models import Batch, BatchStudent
+from .pending_sync import invalidate_pending_filter_options, mark_dirty
+
+# Pending records are recomputed once per transaction by paymentdb.pending_sync;
+# these receivers only mark what changed.
 
 @receiver(post_save, sender=Payment)
 def sync_pending_record(sender, instance, created, **kwargs):
-    try:
-        record = instance.pending_record
-    except PendingPaymentRecord.DoesNotExist:
-        record = None
-    if instance.total_pending_amount > 0:
-        if record is None:
-            record = PendingPaymentRecord.objects.create(payment=instance, student=instance.student, course_status=instance.student.course_status)
-        record.refresh_from_sources()
-        record.status = 'Pending'
-        updated_user = None
-        for i in range(1, 5):
-            u = getattr(instance, f'emi_{i}_updated_by')
-            if u:
-                updated_user = u
-        record.edited_by = updated_user
-        if record.created_by is None and updated_user:
-            record.created_by = updated_user
-        record.save()
-    else:
-        if record:
-            record.refresh_from_sources()
-            record.status = 'Paid'
-            record.pending_amount = 0
-            record.next_emi_number = None
-            record.next_emi_amount = None
-            record.next_due_date = None
-            record.save()
+    mark_dirty(payment_ids=[instance.pk])
 
 @receiver(post_save, sender=Student)
 def sync_pending_record_on_student_change(sender, instance, **kwargs):
-    payments = Payment.objects.filter(student=instance)
-    for p in payments:
-        try:
-            record = p.pending_record
-        except PendingPaymentRecord.DoesNotExist:
-            record = None
-        if p.total_pending_amount > 0:
-            if record is None:
-                record = PendingPaymentRecord.objects.create(payment=p, student=p.student, course_status=p.student.course_status)
-            record.refresh_from_sources()
-            record.status = 'Pending'
-            record.save()
-        else:
-            if record:
-                record.refresh_from_sources()
-                record.status = 'Paid'
-                record.pending_amount = 0
-                record.next_emi_number = None
-                record.next_emi_amount = None
-                record.next_due_date = None
-                record.save()
+    mark_dirty(student_ids=[instance.pk])
 
 @receiver(post_save, sender=BatchStudent)
 def sync_pending_record_on_batchstudent_change(sender, instance, **kwargs):
-    student = instance.student
-    payments = Payment.objects.filter(student=student)
-    for p in payments:
-        try:
-            record = p.pending_record
-        except PendingPaymentRecord.DoesNotExist:
-            record = None
-        if p.total_pending_amount > 0:
-            if record is None:
-                record = PendingPaymentRecord.objects.create(payment=p, student=p.student, course_status=p.student.course_status)
-            record.refresh_from_sources()
-            record.status = 'Pending'
-            record.save()
-        else:
-            if record:
-                record.refresh_from_sources()
-                record.status = 'Paid'
-                record.pending_amount = 0
-                record.next_emi_number = None
-                record.next_emi_amount = None
-                record.next_due_date = None
-                record.save()
+    mark_dirty(student_ids=[instance.student_id])
 
 @receiver(post_save, sender=Batch)
 def sync_pending_record_on_batch_change(sender, instance, **kwargs):
-    active_students = instance.batchstudent_set.filter(is_active=True).select_related('student')
-    for bs in active_students:
-        student = bs.student
-        payments = Payment.objects.filter(student=student)
-        for p in payments:
-            try:
-                record = p.pending_record
-            except PendingPaymentRecord.DoesNotExist:
-                record = None
-            if p.total_pending_amount > 0:
-                if record is None:
-                    record = PendingPaymentRecord.objects.create(payment=p, student=p.student, course_status=p.student.course_status)
-                record.refresh_from_sources()
-                record.status = 'Pending'
-                record.save()
-            else:
-                if record:
-                    record.refresh_from_sources()
-                    record.status = 'Paid'
-                    record.pending_amount = 0
-                    record.next_emi_number = None
-                    record.next_emi_amount = None
-                    record.next_due_date = None
-                    record.save()
+    mark_dirty(batch_ids=[instance.pk])
+
+post_save.connect(invalidate_pending_filter_options, sender=PendingPaymentRecord, dispatch_uid='pending_filter_options_save')
+post_delete.connect(invalidate_pending_filter_options, sender=PendingPaymentRecord, dispatch_uid='pending_filter_options_delete')
@@ -0,0 +1,355 @@
+"""
+Deferred, coalesced synchronisation of PendingPaymentRecord rows.
+
+The post_save receivers in paymentdb.models only mark payments, students or
+batches as dirty. Everything marked inside one transaction is recomputed once,
+from transaction.on_commit, with one query per source table for the whole
+dirty set, so editing a batch of 30 students costs a fixed number of queries.
+Outside a transaction the sync runs immediately, as before.
+
+The filter dropdowns of the pending payments list are derived from the same
+rows; get_pending_filter_options() caches them until a record is written.
+"""
+from decimal import Decimal
+from threading import local
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+_state = local()
+
+BULK_BATCH_SIZE = 500
+
+FILTER_OPTIONS_CACHE_KEY = 'paymentdb:pending_filter_options'
+# Bounds staleness where the cache is per process (see CACHES in core/settings.py).
+FILTER_OPTIONS_TTL = 60
+
+# Columns rewritten on every sync; feedback and created_by are user-owned.
+SYNCED_FIELDS = [
+    'student', 'student_code', 'student_seq', 'student_name', 'mobile', 'batch_code', 'batch_type',
+    'course_id', 'course_name', 'course_status', 'total_fee', 'amount_paid',
+    'pending_amount', 'next_emi_number', 'next_emi_amount', 'next_due_date',
+    'consultant_name', 'trainer_name', 'trainer_type', 'course_percentage',
+    'status', 'edited_by', 'created_by', 'updated_at',
+]
+
+# The bulk rebuild leaves the editor columns alone, like refresh_from_sources().
+REBUILT_FIELDS = [name for name in SYNCED_FIELDS if name not in ('edited_by', 'created_by')]
+
+
+class _DirtySet:
+    """Ids touched inside one transaction, synced by its on_commit hook."""
+
+    def __init__(self):
+        self.payment_ids = set()
+        self.student_ids = set()
+        self.batch_ids = set()
+
+    def flush(self):
+        if getattr(_state, 'dirty', None) is self:
+            _state.dirty = None
+        sync_pending_records(
+            payment_ids=self.payment_ids,
+            student_ids=self.student_ids,
+            batch_ids=self.batch_ids,
+        )
+
+    def is_pending(self, connection):
+        # on_commit hooks are dropped on rollback; a set whose hook is gone
+        # belongs to a transaction that never committed.
+        return any(hook[1] == self.flush for hook in connection.run_on_commit)
+
+
+def _current_dirty_set():
+    connection = transaction.get_connection()
+    dirty = getattr(_state, 'dirty', None)
+    if dirty is None or not dirty.is_pending(connection):
+        dirty = _DirtySet()
+        _state.dirty = dirty
+        transaction.on_commit(dirty.flush)
+    return dirty
+
+
+def mark_dirty(payment_ids=(), student_ids=(), batch_ids=()):
+    """
+    Schedule a resync of the pending records behind the given ids. Payments
+    marked directly also take their ``edited_by`` from the latest EMI editor.
+    """
+    if not transaction.get_connection().in_atomic_block:
+        sync_pending_records(payment_ids, student_ids, batch_ids)
+        return
+    dirty = _current_dirty_set()
+    dirty.payment_ids.update(payment_ids)
+    dirty.student_ids.update(student_ids)
+    dirty.batch_ids.update(batch_ids)
+
+
+def _last_emi_editor_id(payment):
+    editor_id = None
+    for i in range(1, 5):
+        user_id = getattr(payment, f'emi_{i}_updated_by_id')
+        if user_id:
+            editor_id = user_id
+    return editor_id
+
+
+def sync_pending_records(payment_ids=(), student_ids=(), batch_ids=()):
+    """
+    Recompute PendingPaymentRecord rows for the given payments, every payment
+    of the given students and every payment of the active students of the
+    given batches. Returns ``(created, updated)``.
+    """
+    from batchdb.models import BatchStudent
+    from coursedb.models import Course
+    from .models import Payment, PendingPaymentRecord
+
+    payment_ids = set(payment_ids)
+    student_ids = set(student_ids)
+    if batch_ids:
+        student_ids.update(
+            BatchStudent.objects.filter(batch_id__in=batch_ids, is_active=True)
+            .values_list('student_id', flat=True)
+        )
+    if not payment_ids and not student_ids:
+        return 0, 0
+
+    payments = list(
+        Payment.objects.filter(Q(id__in=payment_ids) | Q(student_id__in=student_ids))
+        .select_related('student__consultant', 'student__trainer')
+    )
+    if not payments:
+        return 0, 0
+
+    records = {
+        record.payment_id: record
+        for record in PendingPaymentRecord.objects.filter(payment__in=payments)
+    }
+
+    student_pks = {payment.student_id for payment in payments}
+    active_batch_students = {}
+    for bs in (BatchStudent.objects.filter(student_id__in=student_pks, is_active=True)
+               .select_related('batch__trainer').order_by('id')):
+        active_batch_students.setdefault(bs.student_id, bs)
+
+    course_ids = {payment.student.course_id for payment in payments if payment.student.course_id}
+    course_names = dict(Course.objects.filter(id__in=course_ids).values_list('id', 'course_name'))
+
+    now = timezone.now()
+    to_create = []
+    to_update = []
+    for payment in payments:
+        record = records.get(payment.id)
+        if payment.total_pending_amount <= 0 and record is None:
+            continue
+
+        is_new = record is None
+        if is_new:
+            record = PendingPaymentRecord(payment=payment)
+        record.fill_from_sources(
+            payment,
+            active_batch_students.get(payment.student_id),
+            course_names.get(payment.student.course_id),
+        )
+        record.updated_at = now
+
+        if payment.total_pending_amount > 0:
+            record.status = 'Pending'
+            if payment.id in payment_ids:
+                editor_id = _last_emi_editor_id(payment)
+                record.edited_by_id = editor_id
+                if record.created_by_id is None and editor_id:
+                    record.created_by_id = editor_id
+        else:
+            record.status = 'Paid'
+            record.pending_amount = 0
+            record.next_emi_number = None
+            record.next_emi_amount = None
+            record.next_due_date = None
+
+        (to_create if is_new else to_update).append(record)
+
+    if to_create:
+        PendingPaymentRecord.objects.bulk_create(to_create, batch_size=BULK_BATCH_SIZE)
+    if to_update:
+        PendingPaymentRecord.objects.bulk_update(to_update, SYNCED_FIELDS, batch_size=BULK_BATCH_SIZE)
+    if to_create or to_update:
+        invalidate_pending_filter_options()
+    return len(to_create), len(to_update)
+
+
+def _money(expression):
+    return Coalesce(expression, Value(Decimal('0')), output_field=DecimalField(max_digits=10, decimal_places=2))
+
+
+def total_paid_expression(prefix=''):
+    """Initial payment plus every EMI paid amount; ``prefix`` reaches Payment through a relation."""
+    total = _money(F(f'{prefix}amount_paid'))
+    for i in range(1, 5):
+        total = total + _money(F(f'{prefix}emi_{i}_paid_amount'))
+    return total
+
+
+def pending_amount_expression():
+    """SQL equivalent of Payment.calculate_total_pending()."""
+    return F('total_fees') - total_paid_expression()
+
+
+def _emi_payable(i):
+    # Mirrors Payment.get_next_payable_emi(): the first EMI with an amount
+    # that is not fully paid.
+    paid = f'emi_{i}_paid_amount'
+    return Q(**{f'emi_{i}_amount__gt': 0}) & (
+        Q(**{f'{paid}__isnull': True}) | Q(**{f'{paid}__lt': F(f'emi_{i}_amount')})
+    )
+
+
+def annotate_pending_sources(queryset):
+    """
+    Annotates a Payment queryset with every derived PendingPaymentRecord
+    column, computed in the database: totals, the next payable EMI and the
+    names taken from the student's active batch, course, consultant and
+    trainer.
+    """
+    from batchdb.models import BatchStudent
+    from coursedb.models import Course
+
+    active_bs = BatchStudent.objects.filter(student_id=OuterRef('student_id'), is_active=True).order_by('id')
+    course_name = Course.objects.filter(pk=OuterRef('student__course_id')).values('course_name')[:1]
+
+    return queryset.annotate(
+        calc_amount_paid=total_paid_expression(),
+        calc_pending=pending_amount_expression(),
+        calc_next_emi_number=Case(
+            *[When(_emi_payable(i), then=Value(i)) for i in range(1, 5)],
+            output_field=IntegerField(),
+        ),
+        calc_next_emi_amount=Case(
+            *[When(_emi_payable(i), then=F(f'emi_{i}_amount') - _money(F(f'emi_{i}_paid_amount')))
+              for i in range(1, 5)],
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        ),
+        calc_next_due_date=Case(*[When(_emi_payable(i), then=F(f'emi_{i}_date')) for i in range(1, 5)]),
+        src_batch_code=Subquery(active_bs.values('batch__batch_id')[:1]),
+        src_batch_type=Subquery(active_bs.values('batch__batch_type')[:1]),
+        src_course_name=Subquery(course_name),
+        src_consultant_name=F('student__consultant__name'),
+        src_trainer_name=Coalesce(
+            Subquery(active_bs.values('batch__trainer__name')[:1]), F('student__trainer__name'),
+        ),
+        src_trainer_type=Coalesce(
+            Subquery(active_bs.values('batch__trainer__employment_type')[:1]), F('student__trainer__employment_type'),
+        ),
+    )
+
+
+def rebuild_pending_records(payment_ids, dry_run=False):
+    """
+    Set-based counterpart of refresh_from_sources() used by the backfill
+    command. Corrects Payment.total_pending_amount and rebuilds the pending
+    record of every given payment that still has dues, without loading model
+    instances. Returns ``(created, updated, skipped, totals_fixed)``.
+    """
+    from .models import Payment, PendingPaymentRecord, student_code_seq
+
+    now = timezone.now()
+    payments = Payment.objects.filter(id__in=payment_ids)
+    stale_totals = payments.exclude(total_pending_amount=pending_amount_expression())
+    if dry_run:
+        totals_fixed = stale_totals.count()
+    else:
+        totals_fixed = stale_totals.update(total_pending_amount=pending_amount_expression(), updated_at=now)
+
+    rows = annotate_pending_sources(payments).values(
+        'id', 'student_id', 'total_fees', 'student__student_id', 'student__first_name',
+        'student__last_name', 'student__phone', 'student__course_id', 'student__course_status',
+        'student__course_percentage', 'calc_amount_paid', 'calc_pending', 'calc_next_emi_number',
+        'calc_next_emi_amount', 'calc_next_due_date', 'src_batch_code', 'src_batch_type',
+        'src_course_name', 'src_consultant_name', 'src_trainer_name', 'src_trainer_type',
+    )
+    existing = dict(
+        PendingPaymentRecord.objects.filter(payment_id__in=payment_ids).values_list('payment_id', 'id')
+    )
+
+    to_create = []
+    to_update = []
+    skipped = 0
+    for row in rows:
+        if row['calc_pending'] <= 0:
+            skipped += 1
+            continue
+        record = PendingPaymentRecord(
+            pk=existing.get(row['id']),
+            payment_id=row['id'],
+            student_id=row['student_id'],
+            student_code=row['student__student_id'],
+            student_seq=student_code_seq(row['student__student_id']),
+            student_name=f"{row['student__first_name']} {row['student__last_name'] or ''}",
+            mobile=row['student__phone'],
+            batch_code=row['src_batch_code'],
+            batch_type=row['src_batch_type'],
+            course_id=row['student__course_id'],
+            course_name=row['src_course_name'],
+            course_status=row['student__course_status'],
+            total_fee=row['total_fees'] or 0,
+            amount_paid=row['calc_amount_paid'],
+            pending_amount=row['calc_pending'],
+            next_emi_number=row['calc_next_emi_number'],
+            next_emi_amount=row['calc_next_emi_amount'],
+            next_due_date=row['calc_next_due_date'],
+            consultant_name=row['src_consultant_name'],
+            trainer_name=row['src_trainer_name'],
+            trainer_type=row['src_trainer_type'],
+            course_percentage=row['student__course_percentage'],
+            status='Pending',
+            updated_at=now,
+        )
+        (to_update if record.pk else to_create).append(record)
+
+    if not dry_run:
+        if to_create:
+            PendingPaymentRecord.objects.bulk_create(to_create, batch_size=BULK_BATCH_SIZE)
+        if to_update:
+            PendingPaymentRecord.objects.bulk_update(to_update, REBUILT_FIELDS, batch_size=BULK_BATCH_SIZE)
+        if to_create or to_update:
+            invalidate_pending_filter_options()
+    return len(to_create), len(to_update), skipped, totals_fixed
+
+
+def get_pending_filter_options():
+    """
+    Distinct batch codes, trainer and consultant names and editors of pending
+    records, for the pending payments filter dropdowns. Cached until a record
+    is written; editor names are at most FILTER_OPTIONS_TTL seconds old.
+    """
+    from django.contrib.auth import get_user_model
+    from .models import PendingPaymentRecord
+
+    options = cache.get(FILTER_OPTIONS_CACHE_KEY)
+    if options is None:
+        pending = PendingPaymentRecord.objects.filter(status='Pending')
+
+        def distinct_values(field):
+            return list(
+                pending.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+                .values_list(field, flat=True).distinct().order_by(field)
+            )
+
+        options = {
+            'batch_codes': distinct_values('batch_code'),
+            'trainer_names': distinct_values('trainer_name'),
+            'consultant_names': distinct_values('consultant_name'),
+            'updated_by_users': list(
+                get_user_model().objects.filter(id__in=pending.values('edited_by'))
+                .order_by('name').values('id', 'name', 'email')
+            ),
+        }
+        cache.set(FILTER_OPTIONS_CACHE_KEY, options, FILTER_OPTIONS_TTL)
+    return options
+
+
+def invalidate_pending_filter_options(**kwargs):
+    # Clear after commit so a concurrent request cannot re-cache stale options.
+    transaction.on_commit(lambda: cache.delete(FILTER_OPTIONS_CACHE_KEY))
@@ -1,3 +1,297 @@
+from datetime import date
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from batchdb.models import Batch, BatchStudent
+from consultantdb.models import Consultant
+from coursedb.models import Course, CourseCategory
+from studentsdb.models import Student
+from trainersdb.models import Trainer
+from accounts.dashboard import get_pending_installments_by_month, get_upcoming_payments
+from .models import Payment, PaymentInstallment, PendingPaymentRecord
+from .pending_sync import FILTER_OPTIONS_CACHE_KEY, REBUILT_FIELDS, _DirtySet
+
+
+class PendingRecordSyncTest(TestCase):
+    def _create_student(self, index, pending=True):
+        student = Student.objects.create(
+            first_name=f'Pending{index}', last_name='Student', email=f'pending{index}@example.com',
+            phone=f'90000000{index:02d}', mode_of_class='ON', week_type='WD',
+        )
+        Payment.objects.create(
+            student=student, total_fees=1000, amount_paid=200 if pending else 1000,
+            emi_type='1' if pending else 'NONE', emi_1_amount=800 if pending else None,
+        )
+        return student
+
+    def _create_batch(self, size):
+        batch = Batch.objects.create(batch_id=f'TB{size:02d}', start_date=date(2025, 1, 1), end_date=date(2025, 3, 1))
+        for i in range(size):
+            BatchStudent.objects.create(batch=batch, student=self._create_student(size * 10 + i))
+        return batch
+
+    def test_record_is_written_once_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                student = self._create_student(1)
+                payment = Payment.objects.get(student=student)
+                payment.emi_1_paid_amount = 300
+                payment.save()
+                self.assertFalse(PendingPaymentRecord.objects.exists())
+
+        record = PendingPaymentRecord.objects.get(payment=payment)
+        self.assertEqual(record.status, 'Pending')
+        self.assertEqual(record.student_code, student.student_id)
+        self.assertEqual(record.mobile, student.phone)
+        self.assertEqual(record.amount_paid, 500)
+        self.assertEqual(record.next_emi_number, 1)
+        self.assertEqual(record.next_emi_amount, 500)
+
+    def test_fully_paid_payment_marks_existing_record_paid(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            student = self._create_student(2)
+        with self.captureOnCommitCallbacks(execute=True):
+            payment = Payment.objects.get(student=student)
+            payment.emi_1_paid_amount = 800
+            payment.save()
+
+        record = PendingPaymentRecord.objects.get(payment=payment)
+        self.assertEqual(record.status, 'Paid')
+        self.assertEqual(record.pending_amount, 0)
+        self.assertIsNone(record.next_emi_number)
+
+    def test_rolled_back_changes_are_not_synced(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self._create_student(3)
+                    raise ValueError('rollback')
+            except ValueError:
+                pass
+
+        self.assertFalse(PendingPaymentRecord.objects.exists())
+
+    def _sync_queries_for_batch_edit(self, size):
+        with self.captureOnCommitCallbacks(execute=True):
+            batch = self._create_batch(size)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                batch.batch_status = 'IP'
+                batch.save()
+                for student in Student.objects.filter(batchstudent__batch=batch):
+                    student.course_percentage = 50
+                    student.save()
+
+        flushes = [cb for cb in callbacks if isinstance(getattr(cb, '__self__', None), _DirtySet)]
+        self.assertEqual(len(flushes), 1)
+        with CaptureQueriesContext(connection) as queries:
+            flushes[0]()
+        self.assertEqual(
+            PendingPaymentRecord.objects.filter(student__batchstudent__batch=batch, course_percentage=50).count(),
+            size,
+        )
+        return len(queries)
+
+    def test_batch_edit_sync_query_count_is_constant(self):
+        self.assertEqual(self._sync_queries_for_batch_edit(3), self._sync_queries_for_batch_edit(6))
+
+
+class BulkBackfillTest(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._create_sources()
+
+    def _create_sources(self):
+        category = CourseCategory.objects.create(name='Data')
+        course = Course.objects.create(course_name='Data Science', category=category, total_duration=40)
+        trainer = Trainer.objects.create(name='Batch Trainer', employment_type='FT')
+        consultant = Consultant.objects.create(name='Closer', phone_number='9000000000', email='closer@example.com')
+        self.batch = Batch.objects.create(course=course, trainer=trainer, start_date=date(2025, 1, 1), end_date=date(2025, 3, 1))
+
+        self.payments = []
+        for i in range(3):
+            student = Student.objects.create(
+                first_name=f'Bulk{i}', last_name='Student' if i else None, email=f'bulk{i}@example.com',
+                phone=f'91000000{i:02d}', mode_of_class='ON', week_type='WD', course_id=course.id,
+                course_status='IP', consultant=consultant,
+            )
+            if i < 2:
+                BatchStudent.objects.create(batch=self.batch, student=student)
+            self.payments.append(Payment.objects.create(
+                student=student, total_fees=3000, amount_paid=1000, emi_type='2',
+                emi_1_amount=1000, emi_1_paid_amount=1000, emi_1_date=date(2025, 2, 1),
+                emi_2_amount=1000, emi_2_paid_amount=250 * i, emi_2_date=date(2025, 3, 1),
+            ))
+
+    def _expected(self, payment):
+        record = PendingPaymentRecord(payment=payment)
+        record.refresh_from_sources()
+        return {name: getattr(record, name) for name in REBUILT_FIELDS if name not in ('status', 'updated_at')}
+
+    def test_bulk_rebuild_matches_refresh_from_sources(self):
+        expected = {payment.pk: self._expected(payment) for payment in self.payments}
+        PendingPaymentRecord.objects.filter(payment=self.payments[0]).delete()
+        PendingPaymentRecord.objects.filter(payment=self.payments[1]).update(batch_code='STALE', amount_paid=0)
+        Payment.objects.filter(pk=self.payments[2].pk).update(total_pending_amount=0)
+
+        out = StringIO()
+        call_command('backfill_pending_records', '--bulk', '--chunk-size', '2', stdout=out)
+
+        self.assertIn('Chunk 2/2', out.getvalue())
+        self.assertIn('Created: 1, Updated: 2, Skipped: 0, Totals fixed: 1', out.getvalue())
+        for payment in self.payments:
+            record = PendingPaymentRecord.objects.get(payment=payment)
+            self.assertEqual(record.status, 'Pending')
+            for name, value in expected[payment.pk].items():
+                self.assertEqual(getattr(record, name), value, name)
+        self.assertEqual(PendingPaymentRecord.objects.get(payment=self.payments[1]).trainer_name, 'Batch Trainer')
+
+    def test_bulk_dry_run_writes_nothing(self):
+        PendingPaymentRecord.objects.all().delete()
+        out = StringIO()
+        call_command('backfill_pending_records', '--bulk', '--dry-run', stdout=out)
+
+        self.assertIn('Created: 3', out.getvalue())
+        self.assertFalse(PendingPaymentRecord.objects.exists())
+
+
+class PaymentInstallmentTest(TestCase):
+    def setUp(self):
+        self.student = Student.objects.create(
+            first_name='Emi', last_name='Student', email='emi@example.com', phone='9200000000',
+            mode_of_class='ON', week_type='WD',
+        )
+        self.payment = Payment.objects.create(
+            student=self.student, total_fees=3000, amount_paid=1000, emi_type='2',
+            emi_1_amount=1000, emi_1_date=date(2025, 2, 10),
+            emi_2_amount=1000, emi_2_date=date(2025, 3, 10),
+        )
+
+    def _installments(self):
+        return list(self.payment.installments.values_list('seq', 'amount', 'due_date', 'paid_amount'))
+
+    def test_installments_mirror_emi_columns(self):
+        self.assertEqual(self._installments(), [
+            (1, 1000, date(2025, 2, 10), None),
+            (2, 1000, date(2025, 3, 10), None),
+        ])
+
+        payment = Payment.objects.get(pk=self.payment.pk)
+        payment.emi_1_paid_amount = 1000
+        payment.emi_1_paid_date = date(2025, 2, 9)
+        payment.save()
+        self.assertEqual(self._installments()[0], (1, 1000, date(2025, 2, 10), 1000))
+
+        payment.emi_type = 'NONE'
+        payment.emi_2_amount = None
+        payment.save()
+        self.assertEqual([seq for seq, *_ in self._installments()], [1])
+
+    def test_unchanged_emis_skip_installment_sync(self):
+        payment = Payment.objects.get(pk=self.payment.pk)
+        payment.gst_bill = True
+        with self.assertNumQueries(1):
+            payment.save()
+
+    def test_migration_backfills_existing_payments(self):
+        PaymentInstallment.objects.all().delete()
+        migration = import_module('paymentdb.migrations.0004_paymentinstallment')
+        migration.backfill_installments(apps, None)
+        self.assertEqual([seq for seq, *_ in self._installments()], [1, 2])
+
+    def test_due_date_queries_use_unpaid_installments(self):
+        payment = Payment.objects.get(pk=self.payment.pk)
+        payment.emi_1_paid_amount = 1000
+        payment.save()
+
+        self.assertEqual(
+            get_pending_installments_by_month(date(2025, 1, 1), date(2025, 6, 30)),
+            {'2025-03': 1000.0},
+        )
+        upcoming = get_upcoming_payments()
+        self.assertEqual([(row['student_id'], row['emi_number']) for row in upcoming], [(self.student.student_id, 2)])
+        self.assertEqual(upcoming[0]['paid'], 2000)
+
+
+class PaymentListViewTest(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        User.objects.create_user(email='payments@test.com', name='Payments', role='admin', password='pass12345')
+        self.created = 0
+
+    def _add_payments(self, count):
+        for _ in range(count):
+            i = self.created
+            self.created += 1
+            student = Student.objects.create(
+                first_name=f'List{i}', last_name='Payer', email=f'payer{i}@example.com',
+                phone=f'96000000{i:02d}', mode_of_class='ON', week_type='WD',
+            )
+            Payment.objects.create(student=student, total_fees=1000, amount_paid=1000 if i % 2 else 400)
+
+    def _get_list(self):
+        self.client.login(username='payments@test.com', password='pass12345')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('payment_list'))
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_status_is_annotated_for_the_page_only(self):
+        self._add_payments(3)
+        response, small = self._get_list()
+        statuses = {p.student.first_name: p.status for p in response.context['payments']}
+        self.assertEqual(statuses, {'List0': 'Pending', 'List1': 'Paid', 'List2': 'Pending'})
+
+        self._add_payments(20)
+        response, large = self._get_list()
+        self.assertEqual(len(response.context['payments']), 10)
+        self.assertEqual(small, large)
+
+
+class PendingPaymentsListViewTest(TestCase):
+    def setUp(self):
+        get_user_model().objects.create_user(email='pending@test.com', name='Pending', role='staff', password='pass12345')
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(12):
+                student = Student.objects.create(
+                    first_name=f'Due{i}', last_name='Student', email=f'due{i}@example.com',
+                    phone=f'98000000{i:02d}', mode_of_class='ON', week_type='WD', course_status='IP',
+                )
+                Payment.objects.create(student=student, total_fees=1000, amount_paid=100)
+        # A code past BTR9999 sorts last as text but first by number.
+        PendingPaymentRecord.objects.filter(student__first_name='Due0').update(student_code='BTR10000', student_seq=10000)
+        cache.delete(FILTER_OPTIONS_CACHE_KEY)
+        self.client.login(username='pending@test.com', password='pass12345')
+
+    def test_rows_are_ordered_by_student_number_in_sql(self):
+        response = self.client.get(reverse('pending_payments'))
+        codes = [row['student_id'] for row in response.context['rows']]
+        self.assertEqual(codes[0], 'BTR10000')
+        self.assertEqual(len(codes), 10)
+        self.assertEqual(codes[1:], sorted(codes[1:], reverse=True))
+
+        second = self.client.get(reverse('pending_payments'), {'after': response.context['rows'].next_cursor})
+        self.assertEqual(len(second.context['rows']), 2)
+
+    def test_filter_options_are_cached_until_a_record_changes(self):
+        self.client.get(reverse('pending_payments'))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('pending_payments'))
+        self.assertFalse([q for q in queries if 'DISTINCT' in q['sql']])
 
-# Create your tests here.
+        with self.captureOnCommitCallbacks(execute=True):
+            record = PendingPaymentRecord.objects.first()
+            record.batch_code = 'NEWBATCH'
+            record.save()
+        response = self.client.get(reverse('pending_payments'))
+        self.assertEqual(response.context['batch_codes'], ['NEWBATCH'])
@@ -2,19 +2,20 @@ from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.db import transaction
-from django.db.models import Q, F, Sum
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.db.models import Q, F, Sum, Case, When, Value, CharField
 from django.http import JsonResponse
 import json
 from datetime import datetime
 from django.views import View
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.contrib.auth import get_user_model
 
-from .models import Payment, PendingPaymentRecord
+from .models import Payment, PaymentInstallment, PendingPaymentRecord
+from .pending_sync import get_pending_filter_options
 from studentsdb.models import Student
 from .forms import PaymentForm, PaymentUpdateForm
 from coursedb.models import Course
+from core.pagination import KeysetPaginator, keyset_query_params
+from core.search import search_q
 
 @login_required
 def payment_list(request):
@@ -34,12 +35,9 @@ def payment_list(request):
     course_status = request.GET.get('course_status', '').strip()
 
     if search:
-        payments = payments.filter(
-            Q(student__first_name__icontains=search) |
-            Q(student__last_name__icontains=search) |
-            Q(student__consultant__name__icontains=search) |
-            Q(payment_id__icontains=search)
-        )
+        payments = payments.filter(search_q(
+            search, ('student__first_name', 'student__last_name', 'student__consultant__name', 'payment_id'),
+        ))
 
     if emi_type in ['NONE', '2', '3', '4']:
         payments = payments.filter(emi_type=emi_type)
@@ -57,53 +55,24 @@ def payment_list(request):
     filtered_pending_amount = 0
     # Filter by pending EMI date range if specified
     if date_from and date_to:
-        pending_emi_query = Q()
-        for i in range(1, 5):
-            # An EMI is pending if its due date is in the range and it's not paid at all.
-            is_pending_in_range = Q(
-                **{f'emi_{i}_date__gte': date_from, f'emi_{i}_date__lte': date_to},
-                **{f'emi_{i}_amount__isnull': False},
-                **{f'emi_{i}_paid_amount__isnull': True}
-            )
-            pending_emi_query |= is_pending_in_range
-        
-        # Filter for payments that have a pending EMI in the date range and are currently pending.
-        filtered_payments = payments.filter(pending_emi_query, total_pending_amount__gt=0).distinct()
-        
-        # Calculate the pending amount for the filtered date range
-        for payment in filtered_payments:
-            for i in range(1, 5):
-                emi_date = getattr(payment, f'emi_{i}_date')
-                if emi_date and date_from <= emi_date.strftime('%Y-%m-%d') <= date_to:
-                    paid_amount = getattr(payment, f'emi_{i}_paid_amount')
-                    if paid_amount is None:
-                        emi_amount = getattr(payment, f'emi_{i}_amount') or 0
-                        filtered_pending_amount += emi_amount
-
-        payments = filtered_payments
+        # Unpaid EMIs due in the range, answered from the installment index.
+        pending_installments = PaymentInstallment.unpaid().filter(
+            due_date__range=(date_from, date_to),
+            payment__in=payments.filter(total_pending_amount__gt=0),
+        )
+        payments = payments.filter(id__in=pending_installments.values('payment_id'))
+        filtered_pending_amount = pending_installments.aggregate(total=Sum('amount'))['total'] or 0
 
     # Calculate total pending amount
     total_pending_amount = Payment.objects.filter(total_pending_amount__gt=0).exclude(student__course_status__in=['R', 'D']).aggregate(Sum('total_pending_amount'))['total_pending_amount__sum'] or 0
 
-    # Process payments to include status
-    processed_payments = []
-    for payment in payments:
-        payment.status = payment.get_payment_status()
-        processed_payments.append(payment)
-
-    paginator = Paginator(processed_payments, 10)  # Show 10 payments per page
-    page = request.GET.get('page')
-
-    try:
-        payments_page = paginator.page(page)
-    except PageNotAnInteger:
-        payments_page = paginator.page(1)
-    except EmptyPage:
-        payments_page = paginator.page(paginator.num_pages)
-
-    query_params = request.GET.copy()
-    if 'page' in query_params:
-        del query_params['page']
+    # Same rule as Payment.get_payment_status(), computed in SQL for the page rows only
+    payments = payments.annotate(status=Case(
+        When(total_pending_amount__gt=0, then=Value('Pending')),
+        default=Value('Paid'),
+        output_field=CharField(),
+    ))
+    payments_page = KeysetPaginator(payments, 10).page_from_request(request)  # Show 10 payments per page
 
     context = {
         'payments': payments_page,
@@ -130,7 +99,7 @@ def payment_list(request):
         'student_status': student_status,
         'date_from': date_from,
         'date_to': date_to,
-        'query_params': query_params.urlencode(),
+        'query_params': keyset_query_params(request),
     }
     return render(request, 'paymentdb/payment_list.html', context)
 
@@ -357,8 +326,11 @@ class PendingPaymentsListView(LoginRequiredMixin, UserPassesTestMixin, View):
         except ValueError:
             pass
 
+        qs = qs.select_related('edited_by')
+        page_obj = KeysetPaginator(qs, per_page, ('-student_seq', '-id')).page_from_request(request)
+
         rows = []
-        for rec in qs:
+        for rec in page_obj:
             student = rec.student
             rows.append({
                 'record_id': rec.id,
@@ -385,51 +357,10 @@ class PendingPaymentsListView(LoginRequiredMixin, UserPassesTestMixin, View):
                 'updated_by_name': rec.edited_by.name if rec.edited_by else None,
                 'updated_at': rec.updated_at,
             })
-
-        rows.sort(key=lambda r: int(r['student_id'][3:]) if r['student_id'] and r['student_id'].startswith('BTR') else 0, reverse=True)
-
-        paginator = Paginator(rows, per_page)
-        page = request.GET.get('page')
-        try:
-            page_obj = paginator.page(page)
-        except PageNotAnInteger:
-            page_obj = paginator.page(1)
-        except EmptyPage:
-            page_obj = paginator.page(paginator.num_pages)
-
-        query_params = request.GET.copy()
-        if 'page' in query_params:
-            del query_params['page']
+        page_obj.object_list = rows
 
         courses = Course.objects.all().order_by('course_name')
-        batch_codes = list(
-            PendingPaymentRecord.objects.filter(status='Pending')
-            .exclude(batch_code__isnull=True)
-            .exclude(batch_code='')
-            .values_list('batch_code', flat=True)
-            .distinct()
-            .order_by('batch_code')
-        )
-        trainer_names = list(
-            PendingPaymentRecord.objects.filter(status='Pending')
-            .exclude(trainer_name__isnull=True)
-            .exclude(trainer_name='')
-            .values_list('trainer_name', flat=True)
-            .distinct()
-            .order_by('trainer_name')
-        )
-        consultant_names = list(
-            PendingPaymentRecord.objects.filter(status='Pending')
-            .exclude(consultant_name__isnull=True)
-            .exclude(consultant_name='')
-            .values_list('consultant_name', flat=True)
-            .distinct()
-            .order_by('consultant_name')
-        )
-
-        User = get_user_model()
-        updated_by_ids = PendingPaymentRecord.objects.filter(status='Pending').values_list('edited_by', flat=True).distinct()
-        updated_by_users = User.objects.filter(id__in=updated_by_ids).order_by('name')
+        filter_options = get_pending_filter_options()
 
         context = {
             'rows': page_obj,
@@ -437,7 +368,7 @@ class PendingPaymentsListView(LoginRequiredMixin, UserPassesTestMixin, View):
             'course_statuses': [('YTS', 'Yet to Start'), ('IP', 'In Progress'), ('D', 'Discontinued'), ('H', 'Hold')],
             'batch_types': [('WD', 'Weekday'), ('WE', 'Weekend'), ('WDWE', 'Weekday & Weekend'), ('Hybrid', 'Hybrid')],
             'per_page': per_page,
-            'query_params': query_params.urlencode(),
+            'query_params': keyset_query_params(request),
             'q': q,
             'student_id': student_id,
             'mobile': mobile,
@@ -452,10 +383,10 @@ class PendingPaymentsListView(LoginRequiredMixin, UserPassesTestMixin, View):
             'due_to': due_to,
             'course_pct_min': course_pct_min,
             'course_pct_max': course_pct_max,
-            'batch_codes': batch_codes,
-            'trainer_names': trainer_names,
-            'consultant_names': consultant_names,
-            'updated_by_users': updated_by_users,
+            'batch_codes': filter_options['batch_codes'],
+            'trainer_names': filter_options['trainer_names'],
+            'consultant_names': filter_options['consultant_names'],
+            'updated_by_users': filter_options['updated_by_users'],
             'trainer_types': [('FT', 'Full Time'), ('FL', 'Freelancer')],
             'updated_by': updated_by,
             'updated_from': updated_from,
@@ -1,8 +1,9 @@
 from django.db import models
+from core.mixins import FieldTrackerMixin
 from studentsdb.models import Student
 from placementdrive.models import Company
 
-class Placement(models.Model):
+class Placement(FieldTrackerMixin, models.Model):
     student = models.OneToOneField(Student, on_delete=models.CASCADE, related_name='placement')
     resume_link = models.FileField(upload_to='resumes/', blank=True, null=True)
     std_professional_photo = models.ImageField(upload_to='professional_photos/', blank=True, null=True)
@@ -15,7 +16,11 @@ class Placement(models.Model):
         return f"{self.student.student_id} - Placement"
     
     def save(self, *args, **kwargs):
-        if self.pk:
+        if self.pk and self.has_loaded_values():
+            old_resume = self._loaded_values.get('resume_link')
+            if old_resume and self.resume_link and self.resume_link.name != old_resume:
+                self.resume_link.storage.delete(old_resume)
+        elif self.pk:
             try:
                 old_instance = Placement.objects.get(pk=self.pk)
                 if old_instance.resume_link and self.resume_link and self.resume_link != old_instance.resume_link:
@@ -24,7 +29,7 @@ class Placement(models.Model):
                 pass
         super().save(*args, **kwargs)
 
-class CompanyInterview(models.Model):
+class CompanyInterview(FieldTrackerMixin, models.Model):
     ROUND_CHOICES = [
         ('virtual', 'Virtual'),
         ('aptitude', 'Aptitude'),
@@ -1,3 +1,59 @@
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from batchdb.models import Batch, BatchStudent
+from coursedb.models import Course, CourseCategory
+from studentsdb.models import Student
+from trainersdb.models import Trainer
+from .models import Placement
+
+
+class PlacementListQueryTest(TestCase):
+    def setUp(self):
+        get_user_model().objects.create_user(email='placements@test.com', name='Placements', role='admin', password='pass12345')
+        category = CourseCategory.objects.create(name='Testing')
+        self.course = Course.objects.create(course_name='Selenium', category=category, total_duration=30)
+        trainer = Trainer.objects.create(name='Placement Trainer', employment_type='FT')
+        self.batches = [
+            Batch.objects.create(course=self.course, trainer=trainer, start_date=date(2025, 1, 1), end_date=date(2025, 3, 1))
+            for _ in range(2)
+        ]
+        self.created = 0
+
+    def _add_placements(self, count):
+        for _ in range(count):
+            i = self.created
+            self.created += 1
+            student = Student.objects.create(
+                first_name=f'Place{i}', last_name='Student', email=f'place{i}@example.com',
+                phone=f'97000000{i:02d}', mode_of_class='ON', week_type='WD', course_id=self.course.id,
+            )
+            Placement.objects.get_or_create(student=student)
+            BatchStudent.objects.create(batch=self.batches[0], student=student, is_active=False)
+            BatchStudent.objects.create(batch=self.batches[1], student=student)
+
+    def _get_list(self):
+        self.client.login(username='placements@test.com', password='pass12345')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('placementdb:placement_list'))
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_query_count_is_independent_of_table_size(self):
+        # Both sizes span several pages, so the pagination block renders each time.
+        self._add_placements(12)
+        _, small = self._get_list()
 
-# Create your tests here.
+        self._add_placements(20)
+        response, large = self._get_list()
+        placements = response.context['placements']
+        self.assertEqual(len(placements), 10)
+        self.assertEqual(small, large)
+        self.assertEqual(placements[0].active_batch_ids, [self.batches[1].id])
+        self.assertEqual(len(placements[0].unique_batches), 2)
+        self.assertContains(response, 'Selenium')
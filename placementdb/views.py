@@ -6,15 +6,19 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from .forms import PlacementUpdateForm, PlacementFilterForm, CompanyInterviewForm, PlacedStudentsFilterForm
-from django.db.models import Q, Count
+from django.db.models import Q, Count, Prefetch, prefetch_related_objects
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from placementdrive.models import Company
+from batchdb.models import Batch, BatchStudent
 import json
 from django.http import JsonResponse
+from core.pagination import KeysetPaginator, keyset_query_params
+
+PLACEMENT_ORDERING = ('-student__student_id', '-id')
 
 @login_required
 def placement_list(request):
-    placements = Placement.objects.select_related('student').prefetch_related('student__batches', 'student__batches__trainer').all().order_by('-student__student_id').annotate(interview_count=Count('student__interview_statuses__interview__company', distinct=True))
+    placements = Placement.objects.select_related('student').all().order_by('-student__student_id').annotate(interview_count=Count('student__interview_statuses__interview__company', distinct=True))
     form = PlacementFilterForm(request.GET)
 
     if form.is_valid():
@@ -96,33 +100,28 @@ def placement_list(request):
         if course_end_to:
             placements = placements.filter(student__end_date__lte=course_end_to)
 
-    # Process batches to get unique trainers and batch IDs
-    for placement in placements:
+    placements_paginated = KeysetPaginator(placements, 10, PLACEMENT_ORDERING).page_from_request(request)
+
+    # Process batches to get unique trainers and batch IDs, for this page's rows only
+    students = [placement.student for placement in placements_paginated]
+    prefetch_related_objects(
+        students,
+        Prefetch('batches', queryset=Batch.objects.select_related('trainer')),
+        Prefetch('batchstudent_set', queryset=BatchStudent.objects.filter(is_active=True), to_attr='active_batch_links'),
+    )
+    Student.attach_courses(students)
+    for placement in placements_paginated:
         batches = placement.student.batches.all()
         unique_trainers = {batch.trainer for batch in batches if batch.trainer}
         unique_batches = {batch for batch in batches}
         placement.unique_trainers = list(unique_trainers)
         placement.unique_batches = list(unique_batches)
-        placement.active_batch_ids = list(placement.student.batchstudent_set.filter(is_active=True).values_list('batch_id', flat=True))
-
-    paginator = Paginator(placements, 10)
-    page = request.GET.get('page')
-
-    try:
-        placements_paginated = paginator.page(page)
-    except PageNotAnInteger:
-        placements_paginated = paginator.page(1)
-    except EmptyPage:
-        placements_paginated = paginator.page(paginator.num_pages)
-
-    query_params = request.GET.copy()
-    if 'page' in query_params:
-        del query_params['page']
+        placement.active_batch_ids = [link.batch_id for link in placement.student.active_batch_links]
 
     return render(request, 'placementdb/placement_list.html', {
         'placements': placements_paginated,
         'form': form,
-        'query_params': query_params.urlencode(),
+        'query_params': keyset_query_params(request),
     })
 
 @login_required
@@ -197,24 +196,12 @@ def pending_resumes_list(request):
         if course_end_to:
             placements = placements.filter(student__end_date__lte=course_end_to)
 
-    paginator = Paginator(placements, 10)
-    page = request.GET.get('page')
-
-    try:
-        placements = paginator.page(page)
-    except PageNotAnInteger:
-        placements = paginator.page(1)
-    except EmptyPage:
-        placements = paginator.page(paginator.num_pages)
-
-    query_params = request.GET.copy()
-    if 'page' in query_params:
-        del query_params['page']
+    placements = KeysetPaginator(placements, 10, PLACEMENT_ORDERING).page_from_request(request)
 
     return render(request, 'placementdb/placement_list.html', {
         'placements': placements,
         'form': form,
-        'query_params': query_params.urlencode(),
+        'query_params': keyset_query_params(request),
         'list_title': 'Students with Pending Resumes'
     })
 
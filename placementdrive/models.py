@@ -1,11 +1,13 @@
 from django.db import models
+from core.mixins import FieldTrackerMixin
+from core.sequences import next_code
 from django.core.exceptions import ValidationError
 from django.forms import ValidationError
 from django.utils import timezone
 from accounts.models import CustomUser
 from coursedb.models import Course
 
-class Company(models.Model):
+class Company(FieldTrackerMixin, models.Model):
     LOCATION_CHOICES = [
         ('chennai', 'Chennai'),
         ('bangalore', 'Bangalore'),
@@ -79,17 +81,10 @@ class Company(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.company_code:
-            last_company = Company.objects.all().order_by('id').last()
-            if not last_company:
-                self.company_code = 'COMP0001'
-            else:
-                last_code = last_company.company_code
-                last_number = int(last_code.replace('COMP', ''))
-                new_number = last_number + 1
-                self.company_code = f'COMP{new_number:04d}'
+            self.company_code = next_code(Company.objects.all(), 'company_code', 'COMP')
         super().save(*args, **kwargs)
 
-class ResumeSharedStatus(models.Model):
+class ResumeSharedStatus(FieldTrackerMixin, models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('position_closed', 'Position Closed'),
@@ -112,7 +107,7 @@ class ResumeSharedStatus(models.Model):
     class Meta:
         ordering = ['-created_at']
 
-class Interview(models.Model):
+class Interview(FieldTrackerMixin, models.Model):
     ROUND_CHOICES = [
         ('aptitude', 'Aptitude'),
         ('gd',"Group Discussion"),
@@ -156,7 +151,7 @@ class Interview(models.Model):
         return f"Interview for {self.applying_role} at {self.company.company_name} on {self.interview_date}"
 from studentsdb.models import Student
 
-class InterviewStudent(models.Model):
+class InterviewStudent(FieldTrackerMixin, models.Model):
     STATUS_CHOICES = [
         ('in_progress', 'In Progress'),
         ('not_attended','Not Attended'),
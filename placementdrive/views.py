@@ -7,6 +7,7 @@ from studentsdb.models import Student
 from coursedb.models import Course
 from placementdb.models import CompanyInterview
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from core.pagination import KeysetPaginator, keyset_query_params
 from django.db.models import Q, Prefetch, Subquery, OuterRef, DateTimeField
 from django.db.models.functions import Coalesce, Greatest, TruncDate
 from django.contrib import messages
@@ -130,19 +131,7 @@ def company_list(request):
                 
             companies = companies.filter(query).distinct()
 
-    paginator = Paginator(companies, 10)
-    page = request.GET.get('page')
-
-    try:
-        companies = paginator.page(page)
-    except PageNotAnInteger:
-        companies = paginator.page(1)
-    except EmptyPage:
-        companies = paginator.page(paginator.num_pages)
-
-    query_params = request.GET.copy()
-    if 'page' in query_params:
-        del query_params['page']
+    companies = KeysetPaginator(companies, 10, ('-created_at', '-id')).page_from_request(request)
 
     for company in companies:
         print( company.progress, company.resume_shared_statuses.exists())
@@ -216,7 +205,7 @@ def company_list(request):
     return render(request, 'placementdrive/company_list.html', {
         'companies': companies,
         'form': form,
-        'query_params': query_params.urlencode(),
+        'query_params': keyset_query_params(request),
     })
 
 @login_required
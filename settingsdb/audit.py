@@ -0,0 +1,169 @@
+"""
+Buffered writer for TransactionLog rows.
+
+The audit signals in settingsdb.signals hand every change record to
+record_change() instead of inserting it straight away. Depending on
+settings.AUDIT_LOG_MODE the records are:
+
+    'sync'        written immediately, one INSERT per change (legacy behaviour)
+    'deferred'    buffered per transaction / request and written with a single
+                  bulk_create once the transaction commits or the request ends
+    'background'  buffered like 'deferred', then handed to a worker thread that
+                  performs the bulk_create outside the request
+"""
+import atexit
+import logging
+import queue
+import threading
+from threading import local
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .log_descriptions import describe_activity
+from .models import TransactionLog
+
+logger = logging.getLogger(__name__)
+
+MODE_SYNC = 'sync'
+MODE_DEFERRED = 'deferred'
+MODE_BACKGROUND = 'background'
+
+BULK_BATCH_SIZE = 500
+
+_state = local()
+
+
+def get_audit_mode():
+    return getattr(settings, 'AUDIT_LOG_MODE', MODE_DEFERRED)
+
+
+class _CommitBatch:
+    """
+    Audit entries recorded inside one savepoint (or the transaction itself,
+    outside any), written by an on_commit hook registered in that savepoint.
+    Django drops the hook if the savepoint rolls back, and the entries with it.
+    """
+
+    def __init__(self, savepoint_ids):
+        self.savepoint_ids = savepoint_ids
+        self.entries = []
+
+    def flush(self):
+        entries, self.entries = self.entries, []
+        batches = getattr(_state, 'batches', {})
+        if batches.get(self.savepoint_ids) is self:
+            del batches[self.savepoint_ids]
+        write_entries(entries)
+
+    def is_pending(self, connection):
+        # A batch whose hook is gone belongs to work that never committed, so
+        # it must not be reused.
+        return any(hook[1] == self.flush for hook in reversed(connection.run_on_commit))
+
+
+def _current_batch(connection):
+    """The batch for the savepoint active on ``connection``, registering a new one if needed."""
+    key = tuple(connection.savepoint_ids)
+    # Keep only the batches of enclosing savepoints: any other savepoint has
+    # been released (its hook stays registered) or rolled back (hook dropped).
+    batches = {
+        ids: batch for ids, batch in getattr(_state, 'batches', {}).items()
+        if key[:len(ids)] == ids
+    }
+    _state.batches = batches
+    batch = batches.get(key)
+    if batch is None or not batch.is_pending(connection):
+        batch = batches[key] = _CommitBatch(key)
+        transaction.on_commit(batch.flush)
+    return batch
+
+
+class _BackgroundWriter(threading.Thread):
+    """Single daemon thread that drains queued entry lists into the database."""
+
+    def __init__(self):
+        super().__init__(name='audit-log-writer', daemon=True)
+        self.queue = queue.Queue()
+
+    def submit(self, entries):
+        self.queue.put(entries)
+
+    def run(self):
+        while True:
+            entries = self.queue.get()
+            try:
+                close_old_connections()
+                TransactionLog.objects.bulk_create(entries, batch_size=BULK_BATCH_SIZE)
+            except Exception:
+                logger.exception("Failed to write %d audit log entries", len(entries))
+            finally:
+                close_old_connections()
+                self.queue.task_done()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _get_background_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = _BackgroundWriter()
+            _writer.start()
+        return _writer
+
+
+def wait_for_background_writes():
+    """Block until the background writer has stored everything queued so far."""
+    if _writer is not None and _writer.is_alive():
+        _writer.queue.join()
+
+
+atexit.register(wait_for_background_writes)
+
+
+def write_entries(entries):
+    if not entries:
+        return
+    if get_audit_mode() == MODE_BACKGROUND:
+        _get_background_writer().submit(entries)
+    else:
+        TransactionLog.objects.bulk_create(entries, batch_size=BULK_BATCH_SIZE)
+
+
+def record_change(user, table_name, object_id, action, changes):
+    """Queue one TransactionLog entry according to the configured audit mode."""
+    entry = TransactionLog(
+        user=user,
+        table_name=table_name,
+        object_id=object_id,
+        action=action,
+        changes=changes,
+        description=describe_activity(table_name, action, changes),
+    )
+
+    if get_audit_mode() == MODE_SYNC:
+        entry.save()
+        return
+
+    connection = transaction.get_connection()
+    if connection.in_atomic_block:
+        _current_batch(connection).entries.append(entry)
+    elif getattr(_state, 'request_entries', None) is not None:
+        # Autocommit writes inside a request are already durable; collect
+        # their audit rows and write them together when the request ends.
+        _state.request_entries.append(entry)
+    else:
+        write_entries([entry])
+
+
+def begin_request():
+    _state.request_entries = []
+
+
+def end_request():
+    entries = getattr(_state, 'request_entries', None)
+    _state.request_entries = None
+    write_entries(entries)
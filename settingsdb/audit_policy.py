@@ -0,0 +1,79 @@
+"""
+Declarative registry of which models and fields are written to TransactionLog.
+
+Models without an entry are audited in full. Entries in AUDIT_POLICIES can be
+overridden (or new ones added) from settings.AUDIT_LOG_POLICIES, a dict of
+``'app_label.ModelName' -> AuditPolicy keyword arguments``.
+"""
+import random
+
+from django.conf import settings
+
+
+class AuditPolicy:
+    """
+    How changes to one model are audited.
+
+    enabled       write TransactionLog rows for this model at all
+    fields        only these fields are stored (None means every field)
+    exclude       fields that are never stored, e.g. secrets
+    diff_only     UPDATE rows keep just the diff plus ``identify_by`` instead of
+                  a full snapshot; None falls back to settings.AUDIT_LOG_DIFF_ONLY
+    identify_by   fields always stored so the row can be described later
+    sample_rate   fraction (0-1) of CREATE/UPDATE events kept; deletes are
+                  always logged
+    """
+
+    def __init__(self, enabled=True, fields=None, exclude=(), diff_only=None,
+                 identify_by=(), sample_rate=1.0):
+        self.enabled = enabled
+        self.fields = set(fields) if fields is not None else None
+        self.exclude = set(exclude)
+        self.diff_only = diff_only
+        self.identify_by = tuple(identify_by)
+        self.sample_rate = sample_rate
+
+    def audits_field(self, name):
+        if name in self.exclude:
+            return False
+        return self.fields is None or name in self.fields or name in self.identify_by
+
+    def stores_diff_only(self):
+        if self.diff_only is None:
+            return getattr(settings, 'AUDIT_LOG_DIFF_ONLY', False)
+        return self.diff_only
+
+    def should_sample(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+
+DEFAULT_POLICY = AuditPolicy()
+
+AUDIT_POLICIES = {
+    # High-churn chat tables; the messages themselves are the record.
+    'studentsdb.StudentConversation': AuditPolicy(enabled=False),
+    'studentsdb.MessageReadStatus': AuditPolicy(enabled=False),
+    # Derived from Payment/Student/Batch, or already an audit table.
+    'paymentdb.PendingPaymentRecord': AuditPolicy(enabled=False),
+    'paymentdb.PaymentInstallment': AuditPolicy(enabled=False),
+    'accounts.DailyMetricsSnapshot': AuditPolicy(enabled=False),
+    'accounts.MetricsRefreshRun': AuditPolicy(enabled=False),
+    'batchdb.BatchTransaction': AuditPolicy(enabled=False),
+    # Framework bookkeeping.
+    'sessions.Session': AuditPolicy(enabled=False),
+    'admin.LogEntry': AuditPolicy(enabled=False),
+    'accounts.CustomUser': AuditPolicy(exclude=('password', 'last_login', 'totp_secret')),
+    # Frequently edited records keep diffs plus what format_activity_description needs.
+    'studentsdb.Student': AuditPolicy(diff_only=True, identify_by=('student_id', 'first_name', 'last_name'), exclude=('updated_at',)),
+    'paymentdb.Payment': AuditPolicy(diff_only=True, identify_by=('payment_id', 'student'), exclude=('updated_at',)),
+    'batchdb.Batch': AuditPolicy(diff_only=True, identify_by=('batch_id', 'course')),
+    'batchdb.BatchStudent': AuditPolicy(diff_only=True, identify_by=('batch', 'student', 'is_active')),
+}
+
+
+def get_audit_policy(model):
+    label = model._meta.label
+    overrides = getattr(settings, 'AUDIT_LOG_POLICIES', {})
+    if label in overrides:
+        return AuditPolicy(**overrides[label])
+    return AUDIT_POLICIES.get(label, DEFAULT_POLICY)
@@ -1,15 +1,61 @@
+"""
+Restore of SQL backups (pg_dump plain-text output) into the current database.
+
+The dump is never held in memory. iter_sql_statements() reads the file line
+by line and yields one statement at a time; the data of a ``COPY ... FROM
+stdin`` block is yielded as a lazy iterator of rows, which import_sql_backup()
+inserts IMPORT_BATCH_SIZE rows per ``executemany``. Only rows of the tables in
+backup_tables() are restored: schema statements, sequence updates and the
+rows of other tables (migrations, content types, sessions) are skipped.
+
+clear_backup_tables() empties those tables beforehand with raw SQL, a single
+TRUNCATE ... CASCADE on PostgreSQL and one DELETE per table elsewhere, so no
+model signals run and no object is loaded. Neither step goes through the
+models, so the data derived from those tables is redone by
+reset_derived_data() afterwards: the code counters (core.Sequence) are
+dropped, to be re-seeded from the restored codes, and the global search
+index is rebuilt.
+"""
 import re
-import csv
 import os
-import tempfile
 import subprocess
+from collections import namedtuple
+from django.apps import apps
 from django.db import connections, transaction
 from django.conf import settings
-import sqlparse
 import logging
 
 logger = logging.getLogger(__name__)
 
+IMPORT_BATCH_SIZE = 1000
+
+# Models whose tables a backup restores, most dependent first. Tables with a
+# foreign key to any of them are restored too (see backup_tables()).
+BACKUP_MODELS = [
+    'placementdrive.InterviewStudent',
+    'batchdb.BatchStudent', 'batchdb.BatchTransaction', 'batchdb.TrainerHandover', 'batchdb.TransferRequest',
+    'placementdb.CompanyInterview', 'placementdrive.Interview',
+    'batchdb.Batch', 'coursedb.CourseModule', 'coursedb.Topic', 'paymentdb.Payment', 'placementdb.Placement',
+    'placementdrive.ResumeSharedStatus', 'studentsdb.Student',
+    'consultantdb.ConsultantProfile', 'consultantdb.Goal', 'consultantdb.Achievement', 'coursedb.Course',
+    'settingsdb.UserSettings', 'settingsdb.DBBackupImport', 'settingsdb.TransactionLog',
+    'accounts.CustomUser', 'consultantdb.Consultant', 'coursedb.CourseCategory', 'settingsdb.SourceOfJoining',
+    'settingsdb.PaymentAccount', 'placementdrive.Company', 'trainersdb.Trainer',
+]
+
+# A statement as yielded by iter_sql_statements(). For ``COPY ... FROM stdin``
+# ``copy_rows`` iterates the block's rows as lists of values (None for NULL).
+SQLStatement = namedtuple('SQLStatement', ['sql', 'copy_rows'], defaults=[None])
+
+# Next character that can change the scanner's state outside quotes and comments.
+_SPECIAL = re.compile(r"""'|"|;|--|/\*|\$(?:[A-Za-z_][A-Za-z0-9_]*)?\$""")
+_E_STRING_END = re.compile(r"\\.|'", re.DOTALL)
+_COPY_FROM_STDIN = re.compile(r'^COPY\s+([\w."]+)\s*\(([^)]*)\)\s+FROM\s+stdin', re.IGNORECASE)
+_INSERT_INTO = re.compile(r'^INSERT\s+INTO\s+((?:"?\w+"?\.)?"?(\w+)"?)', re.IGNORECASE)
+_COPY_ESCAPE = re.compile(r'\\(x[0-9a-fA-F]{1,2}|[0-7]{1,3}|.)')
+_COPY_ESCAPES = {'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t', 'v': '\v'}
+
+
 def get_current_db_engine():
     """
     Detect the current database engine being used by Django.
@@ -25,391 +71,334 @@ def get_current_db_engine():
     else:
         return 'unknown'
 
-def parse_sql_file(file_path):
+
+def _unquote(identifier):
+    """Last part of a possibly schema-qualified, possibly quoted identifier."""
+    return identifier.split('.')[-1].strip().strip('"')
+
+
+def _copy_value(match):
+    escape = match.group(1)
+    if escape[0] == 'x':
+        return chr(int(escape[1:], 16))
+    if escape[0] in '01234567':
+        return chr(int(escape, 8))
+    return _COPY_ESCAPES.get(escape, escape)
+
+
+def decode_copy_line(line):
+    """The values of one line of COPY text-format data."""
+    values = line.rstrip('\n').rstrip('\r').split('\t')
+    return [
+        None if value == r'\N' else _COPY_ESCAPE.sub(_copy_value, value) if '\\' in value else value
+        for value in values
+    ]
+
+
+def _copy_rows(lines):
+    for line in lines:
+        if line.rstrip('\r\n') == '\\.':
+            return
+        yield decode_copy_line(line)
+
+
+def iter_sql_statements(handle):
     """
-    Parse a SQL file and return a list of SQL statements.
+    Yield the statements of the SQL text in ``handle`` as SQLStatement
+    tuples, reading one line at a time. Comments are dropped; quoted
+    strings, quoted identifiers and dollar-quoted bodies may span lines.
+
+    A COPY block's ``copy_rows`` reads from ``handle`` itself, so it must be
+    consumed before the next statement is asked for (whatever is left of it
+    is skipped then).
     """
-    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-        sql_content = f.read()
-    
-    # Log the size of the file for debugging
-    logger.info(f"Parsing SQL file with {len(sql_content)} characters")
-    
-    # Parse the SQL content into individual statements
-    statements = sqlparse.split(sql_content)
-    valid_statements = [stmt for stmt in statements if stmt.strip()]
-    
-    logger.info(f"Found {len(valid_statements)} SQL statements in file")
-    
-    # Log a sample of statements for debugging
-    if valid_statements:
-        logger.debug(f"First statement: {valid_statements[0][:100]}...")
-        if len(valid_statements) > 1:
-            logger.debug(f"Second statement: {valid_statements[1][:100]}...")
-    
-    return valid_statements
-
-def convert_postgres_to_sqlite(sql_statement):
+    lines = iter(handle)
+    buffer = []
+    closing = None  # what ends the quote or comment the scanner is inside
+    for line in lines:
+        position = 0
+        while position < len(line):
+            if closing is not None:
+                if closing == "E'":
+                    match = _E_STRING_END.search(line, position)
+                    while match and match.group() != "'":
+                        match = _E_STRING_END.search(line, match.end())
+                    end = match.end() if match else -1
+                else:
+                    end = line.find(closing, position)
+                    end = end + len(closing) if end != -1 else -1
+                if end == -1:
+                    if closing != '*/':
+                        buffer.append(line[position:])
+                    break
+                if closing != '*/':
+                    buffer.append(line[position:end])
+                position = end
+                closing = None
+                continue
+
+            match = _SPECIAL.search(line, position)
+            if match is None:
+                buffer.append(line[position:])
+                break
+            token = match.group()
+            if token == '--':
+                buffer.append(line[position:match.start()] + '\n')
+                break
+            if token == '/*':
+                buffer.append(line[position:match.start()] + ' ')
+                closing = '*/'
+            elif token == ';':
+                buffer.append(line[position:match.start()])
+                sql = ''.join(buffer).strip()
+                buffer = []
+                if sql:
+                    copy = _COPY_FROM_STDIN.match(sql)
+                    if copy:
+                        rows = _copy_rows(lines)
+                        yield SQLStatement(sql, rows)
+                        for _ in rows:
+                            pass
+                        break  # COPY data starts on the next line
+                    yield SQLStatement(sql)
+            else:
+                buffer.append(line[position:match.end()])
+                if token == "'" and match.start() > 0 and line[match.start() - 1] in 'eE' and (
+                        match.start() == 1 or not (line[match.start() - 2].isalnum() or line[match.start() - 2] == '_')):
+                    closing = "E'"
+                else:
+                    closing = token
+            position = match.end()
+
+    sql = ''.join(buffer).strip()
+    if sql:
+        yield SQLStatement(sql)
+
+
+def backup_tables():
     """
-    Convert PostgreSQL SQL statements to SQLite compatible format.
+    Tables restored from a backup, most dependent first: those of
+    BACKUP_MODELS and of every model (many-to-many tables included) with a
+    foreign key to one of them, as TRUNCATE ... CASCADE would reach them.
     """
-    # Log the original SQL for debugging
-    logger.debug(f"Converting PostgreSQL SQL to SQLite: {sql_statement[:100]}...")
-    
-    # Skip comments and empty statements
-    if not sql_statement.strip() or sql_statement.strip().startswith('--'):
-        return None
-        
-    # Skip PostgreSQL-specific operations that don't apply to SQLite
-    if re.search(r'\bCREATE\s+SEQUENCE\b|\bALTER\s+SEQUENCE\b|\bSELECT\s+setval\b|\bCREATE\s+INDEX\b|\bALTER\s+INDEX\b|\bCOMMENT\s+ON\b|\bSET\s+\w+\b|\bset_config\b|\bSELECT\s+set_config\b', sql_statement, flags=re.IGNORECASE):
-        logger.debug(f"Skipping PostgreSQL-specific statement: {sql_statement[:100]}...")
-        return None
-    
-    # Remove schema references (public.table_name -> table_name)
-    sql = re.sub(r'\b\w+\.(\w+)', r'\1', sql_statement)
-    
-    # Handle CREATE TABLE statements
-    if re.search(r'\bCREATE\s+TABLE\b', sql, flags=re.IGNORECASE):
-        logger.debug(f"Converting CREATE TABLE statement: {sql[:100]}...")
-        # Replace data types
-        sql = re.sub(r'\btimestamp\s+with\s+time\s+zone\b', 'DATETIME', sql, flags=re.IGNORECASE)
-        sql = re.sub(r'\btimestamp\s+without\s+time\s+zone\b', 'DATETIME', sql, flags=re.IGNORECASE)
-        sql = re.sub(r'\btimestamp\b', 'DATETIME', sql, flags=re.IGNORECASE)
-        sql = re.sub(r'\bserial\b', 'INTEGER', sql, flags=re.IGNORECASE)
-        sql = re.sub(r'\bbigserial\b', 'INTEGER', sql, flags=re.IGNORECASE)
-        sql = re.sub(r'\bsmallserial\b', 'INTEGER', sql, flags=re.IGNORECASE)
-        sql = re.sub(r'\binteger\b', 'INTEGER', sql, flags=re.IGNORECASE)
-        sql = re.sub(r'\bbigint\b', 'INTEGER', sql, flags=re.IGNORECASE)
-        sql = re.sub(r'\bsmallint\b', 'INTEGER', sql, flags=re.IGNORECASE)
-        sql = re.sub(r'\breal\b', 'REAL', sql, flags=re.IGNORECASE)
-        sql = re.sub(r'\bdouble\s+precision\b', 'REAL', sql, flags=re.IGNORECASE)
-        sql = re.sub(r'\bnumeric\b', 'REAL', sql, flags=re.IGNORECASE)
-        sql = re.sub(r'\btext\b', 'TEXT', sql, flags=re.IGNORECASE)
-        sql = re.sub(r'\bvarchar\(\d+\)\b', 'TEXT', sql, flags=re.IGNORECASE)
-        sql = re.sub(r'\bchar\(\d+\)\b', 'TEXT', sql, flags=re.IGNORECASE)
-        sql = re.sub(r'\bboolean\b', 'BOOLEAN', sql, flags=re.IGNORECASE)
-        sql = re.sub(r'\bjsonb\b', 'TEXT', sql, flags=re.IGNORECASE)
-        sql = re.sub(r'\bjson\b', 'TEXT', sql, flags=re.IGNORECASE)
-        
-        # Replace PostgreSQL-specific column constraints
-        sql = re.sub(r'\bPRIMARY\s+KEY\s+DEFAULT\s+nextval\([^)]+\)\b', 'PRIMARY KEY AUTOINCREMENT', sql, flags=re.IGNORECASE)
-        sql = re.sub(r'\bDEFAULT\s+nextval\([^)]+\)\b', 'AUTOINCREMENT', sql, flags=re.IGNORECASE)
-        
-        # Remove PostgreSQL-specific table constraints
-        sql = re.sub(r'\bCONSTRAINT\s+\w+\s+FOREIGN\s+KEY[^,;]+', '', sql, flags=re.IGNORECASE)
-        
-        # Remove ON UPDATE/ON DELETE clauses
-        sql = re.sub(r'\bON\s+UPDATE\s+\w+\s+ON\s+DELETE\s+\w+\b', '', sql, flags=re.IGNORECASE)
-        sql = re.sub(r'\bON\s+DELETE\s+\w+\b', '', sql, flags=re.IGNORECASE)
-        sql = re.sub(r'\bON\s+UPDATE\s+\w+\b', '', sql, flags=re.IGNORECASE)
-        
-        # Fix trailing commas before closing parenthesis (common issue after removing constraints)
-        sql = re.sub(r',\s*\)', ')', sql)
-        
-        logger.debug(f"Converted CREATE TABLE result: {sql[:100]}...")
-    
-    # Handle COPY statements
-    elif re.search(r'\bCOPY\b', sql, flags=re.IGNORECASE):
-        logger.debug(f"Converting COPY statement: {sql[:100]}...")
-        
-        # Extract table name and columns from COPY statement
-        copy_match = re.search(r'COPY\s+([\w\.]+)\s+\((.*?)\)\s+FROM\s+stdin;', sql, re.DOTALL | re.IGNORECASE)
-        if not copy_match:
-            return None
-            
-        table_name = copy_match.group(1).split('.')[-1]
-        columns = [col.strip() for col in copy_match.group(2).split(',')]
-        
-        # Extract data from the COPY statement
-        data_lines = sql.splitlines()[1:-1] # Exclude COPY line and '\.'
-        
-        # Generate INSERT statements
-        insert_statements = []
-        for line in data_lines:
-            # Use csv module to handle tab-separated data robustly
-            # This handles escaped characters and quotes better.
-            reader = csv.reader([line], delimiter='\t', quotechar='"')
-            values = next(reader)
-
-            if len(values) != len(columns):
-                logger.warning(f"Skipping line due to column mismatch. Expected {len(columns)}, got {len(values)}. Line: {line}")
+    models = [apps.get_model(label) for label in BACKUP_MODELS]
+    included = set(models)
+    all_models = apps.get_models(include_auto_created=True)
+    added = True
+    while added:
+        added = False
+        for model in all_models:
+            if model in included:
                 continue
+            if any(field.remote_field and field.remote_field.model in included for field in model._meta.concrete_fields):
+                models.insert(0, model)
+                included.add(model)
+                added = True
+    return [model._meta.db_table for model in models]
 
-            formatted_values = []
-            for val in values:
-                if val == r'\N':
-                    formatted_values.append('NULL')
-                else:
-                    # Escape single quotes for SQL
-                    val = val.replace("'", "''")
-                    # Handle boolean values
-                    if val.lower() == 't':
-                        formatted_values.append('1')
-                    elif val.lower() == 'f':
-                        formatted_values.append('0')
-                    else:
-                        formatted_values.append(f"'{val}'")
-            
-            insert_sql = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join(formatted_values)});"
-            insert_statements.append(insert_sql)
-            
-        return "\n".join(insert_statements)
-    
-    return sql
-
-def convert_postgres_to_mysql(sql_statement):
+
+def clear_backup_tables(tables=None):
     """
-    Convert PostgreSQL SQL statements to MySQL compatible format.
+    Empty ``tables`` (backup_tables() by default) with raw SQL, so no model
+    signals fire and no rows are loaded into Python.
     """
-    # Remove schema references (public.table_name -> table_name)
-    sql = re.sub(r'\b\w+\.(\w+)', r'\1', sql_statement)
-    
-    # Replace data types
-    sql = re.sub(r'\btimestamp\s+with\s+time\s+zone\b', 'DATETIME', sql, flags=re.IGNORECASE)
-    sql = re.sub(r'\btimestamp\s+without\s+time\s+zone\b', 'DATETIME', sql, flags=re.IGNORECASE)
-    sql = re.sub(r'\btimestamp\b', 'DATETIME', sql, flags=re.IGNORECASE)
-    sql = re.sub(r'\bserial\b', 'INT AUTO_INCREMENT', sql, flags=re.IGNORECASE)
-    sql = re.sub(r'\bbigserial\b', 'BIGINT AUTO_INCREMENT', sql, flags=re.IGNORECASE)
-    sql = re.sub(r'\bsmallserial\b', 'SMALLINT AUTO_INCREMENT', sql, flags=re.IGNORECASE)
-    sql = re.sub(r'\btext\b', 'LONGTEXT', sql, flags=re.IGNORECASE)
-    sql = re.sub(r'\bjsonb\b', 'JSON', sql, flags=re.IGNORECASE)
-    sql = re.sub(r'\bjson\b', 'JSON', sql, flags=re.IGNORECASE)
-    
-    # Replace PostgreSQL-specific syntax
-    sql = re.sub(r'\bDEFAULT\s+nextval\([^)]+\)\b', 'AUTO_INCREMENT', sql, flags=re.IGNORECASE)
-    
-    # Remove PostgreSQL-specific sequence operations
-    if re.search(r'\bCREATE\s+SEQUENCE\b|\bALTER\s+SEQUENCE\b|\bSELECT\s+setval\b', sql, flags=re.IGNORECASE):
-        return None
-    
-    # Remove PostgreSQL-specific comments
-    if sql.strip().startswith('--'):
-        return None
-    
-    return sql
+    tables = tables or backup_tables()
+    connection = connections['default']
+    quote = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f"TRUNCATE {', '.join(quote(table) for table in tables)} CASCADE")
+            return
+        # SQLite checks its (deferred) foreign keys at commit, by when every
+        # referencing table is empty too; MySQL needs them switched off.
+        with connection.constraint_checks_disabled():
+            for table in tables:
+                cursor.execute(f"DELETE FROM {quote(table)}")
+
+
+def reset_derived_data():
+    """Drop the code counters and rebuild the search index after the backup tables changed wholesale."""
+    from core.models import Sequence
+    from core.search_index import rebuild_search_index
+
+    Sequence.objects.all().delete()
+    written = rebuild_search_index()
+    logger.info(f"Code counters reset; search index rebuilt with {sum(written.values())} documents")
+
+
+def _boolean_columns(table):
+    """Columns of ``table``'s model that hold booleans, which COPY writes as t/f."""
+    for model in apps.get_models(include_auto_created=True):
+        if model._meta.db_table == table:
+            return {
+                field.column for field in model._meta.concrete_fields
+                if field.get_internal_type() == 'BooleanField'
+            }
+    return set()
+
+
+def _insert_rows(cursor, sql, rows, table, errors):
+    """executemany ``rows``; if the batch fails, insert row by row to keep the good ones."""
+    try:
+        with transaction.atomic():
+            cursor.executemany(sql, rows)
+        return len(rows)
+    except Exception:
+        inserted = 0
+        for row in rows:
+            try:
+                with transaction.atomic():
+                    cursor.execute(sql, row)
+                inserted += 1
+            except Exception as e:
+                errors.append(f"Error inserting into {table}: {e}")
+        return inserted
+
+
+def _copy_into(cursor, connection, table, columns, rows, errors):
+    """Insert the rows of a COPY block IMPORT_BATCH_SIZE at a time."""
+    quote = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(columns))
+    sql = f"INSERT INTO {quote(table)} ({', '.join(quote(column) for column in columns)}) VALUES ({placeholders})"
+    boolean_columns = _boolean_columns(table)
+    booleans = [i for i, column in enumerate(columns) if column in boolean_columns]
+    inserted = 0
+    batch = []
+    for row in rows:
+        if len(row) != len(columns):
+            errors.append(f"Skipped a row of {table}: expected {len(columns)} values, got {len(row)}")
+            continue
+        for i in booleans:
+            if row[i] is not None:
+                row[i] = row[i] == 't'
+        batch.append(row)
+        if len(batch) == IMPORT_BATCH_SIZE:
+            inserted += _insert_rows(cursor, sql, batch, table, errors)
+            batch = []
+    if batch:
+        inserted += _insert_rows(cursor, sql, batch, table, errors)
+    return inserted
+
+
+def _execute_insert(cursor, sql, table, errors):
+    """Run one INSERT statement of a ``pg_dump --inserts`` dump."""
+    try:
+        with transaction.atomic():
+            cursor.execute(sql)
+        return 1
+    except Exception as e:
+        errors.append(f"Error inserting into {table}: {e}")
+        return 0
+
+
+def _restore_with_psql(file_path):
+    db_settings = settings.DATABASES['default']
+    env = os.environ.copy()
+    env['PGPASSWORD'] = db_settings['PASSWORD']
+    cmd = [
+        'psql',
+        '-h', db_settings['HOST'],
+        '-p', str(db_settings['PORT']),
+        '-U', db_settings['USER'],
+        '-d', db_settings['NAME'],
+        '-f', file_path
+    ]
+    process = subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr.decode('utf-8', errors='replace'))
+
+
+def count_backup_rows(file_path):
+    """tables_affected of a dump, counted in one streaming pass."""
+    tables_affected = {}
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+        for statement in iter_sql_statements(f):
+            copy = _COPY_FROM_STDIN.match(statement.sql)
+            insert = _INSERT_INTO.match(statement.sql)
+            if copy:
+                entry = tables_affected.setdefault(_unquote(copy.group(1)), {'created': False, 'rows_inserted': 0})
+                entry['rows_inserted'] += sum(1 for _ in statement.copy_rows)
+            elif insert:
+                entry = tables_affected.setdefault(insert.group(2), {'created': False, 'rows_inserted': 0})
+                entry['rows_inserted'] += 1
+    return tables_affected
+
 
 def import_sql_backup(file_path, user):
     """
     Import a SQL backup file into the current database.
-    Detects the current DB engine and converts the SQL statements if necessary.
-    
+
+    PostgreSQL targets load the file with psql. Other engines get the rows of
+    backup_tables() from its COPY blocks and INSERT statements, streamed in
+    a single transaction. Whatever the outcome, reset_derived_data() runs
+    afterwards, as the tables were cleared before the import.
+
     Args:
         file_path: Path to the SQL backup file
         user: The user who initiated the import
-        
+
     Returns:
         tuple: (success, message, tables_affected)
     """
-    current_engine = get_current_db_engine()
-    logger.info(f"Current database engine: {current_engine}")
-    
-    # Assume the backup is from PostgreSQL (most common production DB)
-    source_engine = 'postgresql'
-    
-    # Parse the SQL file
     try:
-        # Log file details for debugging
-        file_size = os.path.getsize(file_path)
-        logger.info(f"SQL file size: {file_size} bytes")
-        
-        # Read the first few lines to check content
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            sample = f.read(1000)
-            logger.debug(f"SQL file sample: {sample}")
-        
-        sql_statements = parse_sql_file(file_path)
-        logger.info(f"Parsed {len(sql_statements)} SQL statements")
-        
-        # Validate that we have statements to process
-        if not sql_statements:
-            logger.warning("No valid SQL statements found in the file")
-            return False, "No valid SQL statements found in the file", {}
-    except Exception as e:
-        logger.error(f"Error parsing SQL file: {str(e)}")
-        return False, f"Error parsing SQL file: {str(e)}", {}
-    
-    # If the current engine is PostgreSQL, we can directly import the backup
-    if current_engine == 'postgresql' and source_engine == 'postgresql':
+        return _import_sql_backup(file_path)
+    finally:
+        try:
+            reset_derived_data()
+        except Exception:
+            logger.exception("Could not reset code counters and search index after the import")
+
+
+def _import_sql_backup(file_path):
+    current_engine = get_current_db_engine()
+    logger.info(f"Current database engine: {current_engine}; SQL file size: {os.path.getsize(file_path)} bytes")
+
+    if current_engine == 'postgresql':
         try:
-            # For PostgreSQL, it's better to use the psql command-line tool
-            db_settings = settings.DATABASES['default']
-            env = os.environ.copy()
-            env['PGPASSWORD'] = db_settings['PASSWORD']
-            
-            cmd = [
-                'psql',
-                '-h', db_settings['HOST'],
-                '-p', db_settings['PORT'],
-                '-U', db_settings['USER'],
-                '-d', db_settings['NAME'],
-                '-f', file_path
-            ]
-            
-            process = subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            stdout, stderr = process.communicate()
-            
-            if process.returncode != 0:
-                error_msg = stderr.decode('utf-8')
-                logger.error(f"Error importing PostgreSQL backup: {error_msg}")
-                return False, f"Error importing PostgreSQL backup: {error_msg}", {}
-                
-            # Extract affected tables from the SQL statements
-            tables_affected = extract_affected_tables(sql_statements)
-            return True, "Backup imported successfully", tables_affected
-            
+            _restore_with_psql(file_path)
+            return True, "Backup imported successfully", count_backup_rows(file_path)
         except Exception as e:
             logger.error(f"Error importing PostgreSQL backup: {str(e)}")
             return False, f"Error importing PostgreSQL backup: {str(e)}", {}
-    
-    # For other engines, we need to convert the SQL statements
-    converted_statements = []
-    tables_affected = {}
-    
-    for stmt in sql_statements:
-        if not stmt.strip():
-            continue
-            
-        # Skip statements that are not relevant for data import
-        if re.search(r'\bCOMMENT\s+ON\b|\bALTER\s+SEQUENCE\b|\bCREATE\s+SEQUENCE\b', stmt, flags=re.IGNORECASE):
-            continue
-            
-        # Extract table name for CREATE TABLE and INSERT statements
-        table_match = re.search(r'\bCREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?["\'`]?([\w\.]+)["\'`]?', stmt, flags=re.IGNORECASE)
-        if table_match:
-            table_name = table_match.group(1).split('.')[-1]  # Remove schema if present
-            if table_name not in tables_affected:
-                tables_affected[table_name] = {'created': True, 'rows_inserted': 0}
-                
-        insert_match = re.search(r'\bINSERT\s+INTO\s+["\'`]?([\w\.]+)["\'`]?', stmt, flags=re.IGNORECASE)
-        if insert_match:
-            table_name = insert_match.group(1).split('.')[-1]  # Remove schema if present
-            if table_name not in tables_affected:
-                tables_affected[table_name] = {'created': False, 'rows_inserted': 0}
-            tables_affected[table_name]['rows_inserted'] += 1
-        
-        # Convert statement based on target engine
-        if current_engine == 'sqlite':
-            converted_stmt = convert_postgres_to_sqlite(stmt)
-        elif current_engine == 'mysql':
-            converted_stmt = convert_postgres_to_mysql(stmt)
-        else:
-            # For unknown engines, keep the statement as is
-            converted_stmt = stmt
-            
-        if converted_stmt:
-            # The conversion might return multiple statements (e.g., for COPY)
-            converted_statements.extend(converted_stmt.splitlines())
-    
-    # Define the correct insertion order based on model dependencies
-    insertion_order = [
-        'accounts_customuser', 'consultantdb_consultant', 'coursedb_coursecategory', 'settingsdb_sourceofjoining',
-        'settingsdb_paymentaccount', 'placementdrive_company', 'trainersdb_trainer',
-        'consultantdb_consultantprofile', 'consultantdb_goal', 'consultantdb_achievement', 'coursedb_course',
-        'settingsdb_usersettings', 'settingsdb_dbbackupimport', 'settingsdb_transactionlog',
-        'batchdb_batch', 'coursedb_coursemodule', 'coursedb_topic', 'paymentdb_payment', 'placementdb_placement',
-        'placementdrive_resumesharedstatus', 'studentsdb_student',
-        'batchdb_batchstudent', 'batchdb_batchtransaction', 'batchdb_trainerhandover', 'batchdb_transferrequest',
-        'placementdb_companyinterview', 'placementdrive_interview',
-        'placementdrive_interviewstudent'
-    ]
 
-    # Group statements by table
-    grouped_statements = {table: [] for table in insertion_order}
-    for stmt in converted_statements:
-        match = re.search(r'INSERT\s+INTO\s+([\w_]+)', stmt, re.IGNORECASE)
-        if match:
-            table_name = match.group(1)
-            if table_name in grouped_statements:
-                grouped_statements[table_name].append(stmt)
-
-    # Execute the converted statements
+    connection = connections['default']
+    restored = set(backup_tables())
+    tables_affected = {}
+    errors = []
+    statement_count = 0
     try:
-        success_count = 0
-        error_count = 0
-        error_messages = []
-        skipped_count = 0
-        
-        # Get database connection
-        connection = connections['default']
-        
-        # Use transaction.atomic() to ensure all statements are committed
-        with transaction.atomic():
-            cursor = connection.cursor()
-            
-            # Log the number of statements to execute
-            logger.info(f"Executing {len(converted_statements)} SQL statements within a transaction")
-
-            # For SQLite, disable foreign keys for the entire import
-            if current_engine == 'sqlite':
-                cursor.execute('PRAGMA foreign_keys = OFF;')
-            
-            for table_name in insertion_order:
-                for i, stmt in enumerate(grouped_statements[table_name]):
-                    if not stmt or not stmt.strip():
-                        skipped_count += 1
-                        continue
-                        
-                    try:
-                        # Log the statement for debugging
-                        logger.debug(f"Executing statement for {table_name}: {stmt[:100]}...")
-                        
-                        cursor.execute(stmt)
-                        success_count += 1
-                            
-                    except Exception as e:
-                        error_count += 1
-                        error_msg = f"Error executing statement for {table_name}: {str(e)}\nStatement: {stmt[:200]}..."
-                        logger.warning(error_msg)
-                        error_messages.append(error_msg)
-                        # Continue with next statement instead of failing completely
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f, transaction.atomic(), \
+                connection.constraint_checks_disabled(), connection.cursor() as cursor:
+            for statement in iter_sql_statements(f):
+                statement_count += 1
+                copy = _COPY_FROM_STDIN.match(statement.sql)
+                insert = _INSERT_INTO.match(statement.sql)
+                if copy:
+                    table = _unquote(copy.group(1))
+                    if table not in restored:
                         continue
-
-            # For SQLite, re-enable foreign keys
-            if current_engine == 'sqlite':
-                cursor.execute('PRAGMA foreign_keys = ON;')
-        
-        # Log summary
-        logger.info(f"SQL import transaction completed: {success_count} statements succeeded, {error_count} failed, {skipped_count} skipped")
-        
-        if error_count > 0:
-            # If there were some errors but also some successes, return partial success
-            if success_count > 0:
-                return True, f"Backup imported with {error_count} errors. {success_count} statements executed successfully.", tables_affected
-            else:
-                # If all statements failed, return failure
-                return False, f"Failed to import backup. All {error_count} statements failed. First error: {error_messages[0] if error_messages else 'Unknown error'}", {}
-        else:
-            return True, f"Backup imported successfully. {success_count} statements executed.", tables_affected
+                    columns = [_unquote(column) for column in copy.group(2).split(',')]
+                    inserted = _copy_into(cursor, connection, table, columns, statement.copy_rows, errors)
+                elif insert and insert.group(2) in restored:
+                    table = insert.group(2)
+                    sql = statement.sql.replace(insert.group(1), connection.ops.quote_name(table), 1)
+                    inserted = _execute_insert(cursor, sql, table, errors)
+                else:
+                    continue
+                entry = tables_affected.setdefault(table, {'created': False, 'rows_inserted': 0})
+                entry['rows_inserted'] += inserted
     except Exception as e:
         logger.error(f"Error importing backup: {str(e)}")
         return False, f"Error importing backup: {str(e)}", {}
 
-def extract_affected_tables(sql_statements):
-    """
-    Extract the tables affected by the SQL statements.
-    
-    Args:
-        sql_statements: List of SQL statements
-        
-    Returns:
-        dict: Dictionary of table names and their status
-    """
-    tables_affected = {}
-    
-    for stmt in sql_statements:
-        # Extract table name for CREATE TABLE statements
-        table_match = re.search(r'\bCREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?["\'`]?([\w\.]+)["\'`]?', stmt, flags=re.IGNORECASE)
-        if table_match:
-            table_name = table_match.group(1).split('.')[-1]  # Remove schema if present
-            if table_name not in tables_affected:
-                tables_affected[table_name] = {'created': True, 'rows_inserted': 0}
-                
-        # Extract table name for INSERT statements
-        insert_match = re.search(r'\bINSERT\s+INTO\s+["\'`]?([\w\.]+)["\'`]?', stmt, flags=re.IGNORECASE)
-        if insert_match:
-            table_name = insert_match.group(1).split('.')[-1]  # Remove schema if present
-            if table_name not in tables_affected:
-                tables_affected[table_name] = {'created': False, 'rows_inserted': 0}
-            tables_affected[table_name]['rows_inserted'] += 1
-    
-    return tables_affected
\ No newline at end of file
+    if not statement_count:
+        return False, "No valid SQL statements found in the file", {}
+    rows = sum(entry['rows_inserted'] for entry in tables_affected.values())
+    logger.info(f"SQL import completed: {rows} rows into {len(tables_affected)} tables, {len(errors)} errors")
+    if errors:
+        for message in errors[:20]:
+            logger.warning(message)
+        if not rows:
+            return False, f"Failed to import backup. All {len(errors)} rows failed. First error: {errors[0]}", {}
+        return True, f"Backup imported with {len(errors)} errors. {rows} rows imported successfully.", tables_affected
+    return True, f"Backup imported successfully. {rows} rows imported.", tables_affected
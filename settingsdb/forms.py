@@ -1,4 +1,5 @@
 from django import forms
+from django.conf import settings
 from .models import SourceOfJoining, PaymentAccount, UserSettings, DBBackupImport
 import os
 
@@ -31,8 +32,9 @@ class DBBackupImportForm(forms.ModelForm):
             if ext != '.sql':
                 raise forms.ValidationError("File extension must be .sql")
             
-            # Check file size (limit to 50MB)
-            if uploaded_file.size > 50 * 1024 * 1024:  # 50MB in bytes
-                raise forms.ValidationError("File size must be under 50MB.")
+            # Check file size (the import streams the file, so large dumps are fine)
+            max_mb = settings.DB_BACKUP_MAX_UPLOAD_MB
+            if uploaded_file.size > max_mb * 1024 * 1024:
+                raise forms.ValidationError(f"File size must be under {max_mb}MB.")
                 
         return uploaded_file
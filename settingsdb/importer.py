@@ -0,0 +1,145 @@
+"""
+core.jobs handlers for the settings imports: the multi-sheet data workbook
+written by export_data() and the student_id/course CSV of
+download_course_template().
+
+Rows are committed CHUNK_SIZE at a time, each in its own savepoint, so a row
+the database rejects is reported in the job's error file while the rest of
+its chunk is kept.
+"""
+import json
+
+import pandas as pd
+from django.db import models, transaction
+
+CHUNK_SIZE = 500
+
+# Sheets of the data workbook in dependency order, with the model each one fills.
+DATA_SHEETS = [
+    ('SourceOfJoining', 'settingsdb.SourceOfJoining'),
+    ('PaymentAccounts', 'settingsdb.PaymentAccount'),
+    ('CourseCategories', 'coursedb.CourseCategory'),
+    ('Courses', 'coursedb.Course'),
+    ('Trainers', 'trainersdb.Trainer'),
+    ('Consultants', 'consultantdb.Consultant'),
+    ('Users', 'accounts.CustomUser'),
+    ('Students', 'studentsdb.Student'),
+    ('Batches', 'batchdb.Batch'),
+    ('Payments', 'paymentdb.Payment'),
+    ('PlacementDrives', 'placementdrive.Company'),
+    ('Placements', 'placementdb.Placement'),
+    ('CompanyInterviews', 'placementdb.CompanyInterview'),
+]
+
+STUDENT_COURSE_COLUMNS = ['student_id', 'course_category', 'course_name']
+
+
+def import_data_row(model, sheet_name, row_data):
+    """update_or_create one row of a data sheet by its ``id``."""
+    if sheet_name == 'Trainers':
+        for field in ['timing_slots', 'commercials']:
+            if field in row_data and isinstance(row_data[field], str):
+                try:
+                    row_data[field] = json.loads(row_data[field].replace("'", '"'))
+                except json.JSONDecodeError:
+                    row_data[field] = []
+
+    for field, value in row_data.items():
+        if isinstance(value, float) and pd.isna(value):
+            row_data[field] = None
+
+    # Separate foreign key fields
+    fk_fields = {}
+    for field in model._meta.fields:
+        if isinstance(field, models.ForeignKey):
+            fk_fields[field.name + '_id'] = row_data.pop(field.name + '_id', None)
+
+    # Create or update the object without the foreign keys
+    obj, created = model.objects.update_or_create(id=row_data.pop('id'), defaults=row_data)
+
+    # Set the foreign keys separately
+    for field, value in fk_fields.items():
+        if value is not None:
+            setattr(obj, field, value)
+    obj.save()
+
+
+def run_data_import_job(job, progress):
+    """core.jobs handler: import every known sheet of a data workbook."""
+    from django.apps import apps
+    from core.jobs import iter_sheet_frames, open_workbook, sheet_row_count
+
+    workbook = open_workbook(job)
+    try:
+        sheets = [(name, label) for name, label in DATA_SHEETS if name in workbook.sheetnames]
+        progress.set_total(sum(sheet_row_count(workbook[name]) or 0 for name, _ in sheets))
+        for sheet_name, label in sheets:
+            model = apps.get_model(label)
+            for frame in iter_sheet_frames(workbook[sheet_name], CHUNK_SIZE):
+                frame = frame.astype(object).where(frame.notna(), None)
+                errors = []
+                created = 0
+                with transaction.atomic():
+                    for row_data in frame.to_dict('records'):
+                        row_id = row_data.get('id')
+                        try:
+                            with transaction.atomic():
+                                import_data_row(model, sheet_name, row_data)
+                            created += 1
+                        except Exception as e:
+                            errors.append({'sheet': sheet_name, 'id': row_id, 'error_reason': str(e)})
+                progress.advance(len(frame), created, errors)
+    finally:
+        workbook.close()
+
+
+def run_student_courses_job(job, progress):
+    """core.jobs handler: set the course of each student listed in the CSV."""
+    from coursedb.models import Course, CourseCategory
+    from core.jobs import chunked, count_csv_rows, iter_csv_rows
+    from studentsdb.models import Student
+
+    progress.set_total(count_csv_rows(job))
+    categories = {}
+    courses = {}
+    for chunk in chunked(iter_csv_rows(job), CHUNK_SIZE):
+        students = Student.objects.in_bulk(
+            {row.get('student_id') for row in chunk if row.get('student_id')}, field_name='student_id',
+        )
+        errors = []
+        updated = 0
+        with transaction.atomic():
+            for row in chunk:
+                student_id = row.get('student_id')
+                course_category_name = row.get('course_category')
+                course_name = row.get('course_name')
+
+                if not all([student_id, course_category_name, course_name]):
+                    errors.append({**row, 'error': 'Missing required fields.'})
+                    continue
+
+                student = students.get(student_id)
+                if student is None:
+                    errors.append({**row, 'error': f'Student with ID {student_id} not found.'})
+                    continue
+                if course_category_name not in categories:
+                    categories[course_category_name] = CourseCategory.objects.filter(name=course_category_name).first()
+                category = categories[course_category_name]
+                if category is None:
+                    errors.append({**row, 'error': f'Course category "{course_category_name}" not found.'})
+                    continue
+                if (category.pk, course_name) not in courses:
+                    courses[category.pk, course_name] = Course.objects.filter(course_name=course_name, category=category).first()
+                course = courses[category.pk, course_name]
+                if course is None:
+                    errors.append({**row, 'error': f'Course "{course_name}" in category "{course_category_name}" not found.'})
+                    continue
+
+                try:
+                    with transaction.atomic():
+                        student.course_id = course.id
+                        student.save()
+                    updated += 1
+                except Exception as e:
+                    errors.append({**row, 'error': str(e)})
+        progress.advance(len(chunk), updated, errors)
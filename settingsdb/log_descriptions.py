@@ -0,0 +1,151 @@
+"""
+Human-readable descriptions of TransactionLog entries.
+
+Descriptions are rendered once, when the log row is written, and stored in
+TransactionLog.description. Values taken from the change data are escaped by
+format_html; the templates only contain trusted markup.
+"""
+from string import Formatter
+
+from django.utils.html import format_html
+
+ACTIVITY_TEMPLATES = {
+    'Student': {
+        'CREATE': "Enrolled new student <strong>{full_name}</strong> with ID <strong>{student_id}</strong>",
+        'UPDATE': "Updated profile for student <strong>{full_name}</strong> (ID: <strong>{student_id}</strong>)",
+        'DELETE': "Removed student <strong>{full_name}</strong> (ID: <strong>{student_id}</strong>)",
+    },
+    'Payment': {
+        'CREATE': "Created new payment record <strong>{payment_id}</strong> for student <strong>{student}</strong>",
+        'UPDATE': "Updated payment details for <strong>{payment_id}</strong> (Student: <strong>{student}</strong>)",
+        'DELETE': "Deleted payment record <strong>{payment_id}</strong> for student <strong>{student}</strong>",
+    },
+    'Batch': {
+        'CREATE': "Created new batch <strong>{batch_id}</strong> for course <strong>{course}</strong>",
+        'UPDATE': "Updated batch <strong>{batch_id}</strong>",
+        'DELETE': "Deleted batch <strong>{batch_id}</strong>",
+    },
+    'Placement': {
+        'CREATE': "Initiated placement process for <strong>{student}</strong>",
+        'UPDATE': "Updated placement status for <strong>{student}</strong>",
+        'DELETE': "Removed placement record for <strong>{student}</strong>",
+    },
+    'Course': {
+        'CREATE': "Added new course <strong>{course_name}</strong> with code <strong>{code}</strong>",
+        'UPDATE': "Updated course details for <strong>{course_name}</strong> (Code: <strong>{code}</strong>)",
+        'DELETE': "Deleted course <strong>{course_name}</strong> (Code: <strong>{code}</strong>)",
+    },
+    'CourseCategory': {
+        'CREATE': "Created new course category <strong>{name}</strong> with code <strong>{code}</strong>",
+        'UPDATE': "Updated course category <strong>{name}</strong>",
+        'DELETE': "Deleted course category <strong>{name}</strong>",
+    },
+    'Consultant': {
+        'CREATE': "Onboarded new consultant <strong>{name}</strong> with ID <strong>{consultant_id}</strong>",
+        'UPDATE': "Updated profile for consultant <strong>{name}</strong> (ID: <strong>{consultant_id}</strong>)",
+        'DELETE': "Removed consultant <strong>{name}</strong> (ID: <strong>{consultant_id}</strong>)",
+    },
+    'Company': {
+        'CREATE': "Registered new company <strong>{company_name}</strong> with code <strong>{company_code}</strong>",
+        'UPDATE': "Updated profile for company <strong>{company_name}</strong> (Code: <strong>{company_code}</strong>)",
+        'DELETE': "Deleted company <strong>{company_name}</strong> (Code: <strong>{company_code}</strong>)",
+    },
+    'Trainer': {
+        'CREATE': "Onboarded new trainer <strong>{name}</strong> with ID <strong>{trainer_id}</strong>",
+        'UPDATE': "Updated profile for trainer <strong>{name}</strong> (ID: <strong>{trainer_id}</strong>)",
+        'DELETE': "Removed trainer <strong>{name}</strong> (ID: <strong>{trainer_id}</strong>)",
+    },
+    'CustomUser': {
+        'CREATE': "Created new user <strong>{name}</strong> with role <strong>{role}</strong>",
+        'UPDATE': "Updated profile for user <strong>{name}</strong>",
+        'DELETE': "Deleted user <strong>{name}</strong>",
+    },
+    'CourseModule': {
+        'CREATE': "Added new module <strong>{name}</strong> to course <strong>{course}</strong>",
+        'UPDATE': "Updated module <strong>{name}</strong> in course <strong>{course}</strong>",
+        'DELETE': "Deleted module <strong>{name}</strong> from course <strong>{course}</strong>",
+    },
+    'Topic': {
+        'CREATE': "Added new topic <strong>{name}</strong> to module <strong>{module}</strong>",
+        'UPDATE': "Updated topic <strong>{name}</strong> in module <strong>{module}</strong>",
+        'DELETE': "Deleted topic <strong>{name}</strong> from module <strong>{module}</strong>",
+    },
+    'ConsultantProfile': {
+        'CREATE': "Linked user <strong>{user}</strong> to consultant profile <strong>{consultant}</strong>",
+        'UPDATE': "Updated consultant profile for <strong>{consultant}</strong>",
+        'DELETE': "Unlinked user from consultant profile <strong>{consultant}</strong>",
+    },
+    'Goal': {
+        'CREATE': "Set new goal '<strong>{title}</strong>' for consultant <strong>{consultant}</strong>",
+        'UPDATE': "Updated goal '<strong>{title}</strong>' for consultant <strong>{consultant}</strong>",
+        'DELETE': "Deleted goal '<strong>{title}</strong>' for consultant <strong>{consultant}</strong>",
+    },
+    'Achievement': {
+        'CREATE': "Recorded new achievement '<strong>{title}</strong>' for consultant <strong>{consultant}</strong>",
+        'UPDATE': "Updated achievement '<strong>{title}</strong>' for consultant <strong>{consultant}</strong>",
+        'DELETE': "Deleted achievement '<strong>{title}</strong>' for consultant <strong>{consultant}</strong>",
+    },
+    'CompanyInterview': {
+        'CREATE': "Scheduled <strong>{interview_round}</strong> interview for <strong>{student}</strong> with <strong>{company}</strong>",
+        'UPDATE': "Updated <strong>{interview_round}</strong> interview details for <strong>{student}</strong> with <strong>{company}</strong>",
+        'DELETE': "Canceled <strong>{interview_round}</strong> interview for <strong>{student}</strong> with <strong>{company}</strong>",
+    },
+    'ResumeSharedStatus': {
+        'CREATE': "Shared resume with <strong>{company}</strong>",
+        'UPDATE': "Updated resume status to <strong>{status}</strong> for company <strong>{company}</strong>",
+        'DELETE': "Deleted resume sharing status for <strong>{company}</strong>",
+    },
+    'Interview': {
+        'CREATE': "Scheduled <strong>{interview_round}</strong> interview for <strong>{applying_role}</strong> at <strong>{company}</strong>",
+        'UPDATE': "Updated <strong>{interview_round}</strong> interview details for <strong>{applying_role}</strong> at <strong>{company}</strong>",
+        'DELETE': "Canceled <strong>{interview_round}</strong> interview for <strong>{applying_role}</strong> at <strong>{company}</strong>",
+    },
+    'InterviewStudent': {
+        'CREATE': "Added <strong>{student}</strong> to the interview for <strong>{interview}</strong>",
+        'UPDATE': "Updated interview status for <strong>{student}</strong> to <strong>{status}</strong> for the <strong>{interview}</strong> role",
+        'DELETE': "Removed <strong>{student}</strong> from the interview for <strong>{interview}</strong>",
+    },
+    'SourceOfJoining': {
+        'CREATE': "Added new joining source: <strong>{name}</strong>",
+        'UPDATE': "Updated joining source to <strong>{name}</strong>",
+        'DELETE': "Deleted joining source: <strong>{name}</strong>",
+    },
+    'PaymentAccount': {
+        'CREATE': "Added new payment account: <strong>{name}</strong>",
+        'UPDATE': "Updated payment account: <strong>{name}</strong>",
+        'DELETE': "Deleted payment account: <strong>{name}</strong>",
+    },
+    'UserSettings': {
+        'CREATE': "Configured initial settings for user <strong>{user}</strong>",
+        'UPDATE': "Updated settings for user <strong>{user}</strong> (2FA is now <strong>{two_factor_status}</strong>)",
+        'DELETE': "Deleted all settings for user <strong>{user}</strong>",
+    },
+}
+
+FALLBACK_VERBS = {
+    'CREATE': 'Created new',
+    'UPDATE': 'Updated',
+    'DELETE': 'Deleted',
+}
+
+
+def _template_value(name, changes):
+    if name == 'full_name':
+        return f"{changes.get('first_name', '') or ''} {changes.get('last_name', '') or ''}".strip()
+    if name == 'two_factor_status':
+        return "enabled" if changes.get('enable_2fa', False) else "disabled"
+    return changes.get(name, 'N/A')
+
+
+def describe_activity(table_name, action, changes):
+    """Returns the safe HTML description for one audit entry."""
+    changes = changes if isinstance(changes, dict) else {}
+    template = ACTIVITY_TEMPLATES.get(table_name, {}).get(action)
+    if template is None:
+        verb = FALLBACK_VERBS.get(action)
+        if verb:
+            return format_html("{} {}", verb, table_name)
+        return format_html("{} {}", action, table_name)
+
+    names = {name for _, name, _, _ in Formatter().parse(template) if name}
+    return format_html(template, **{name: _template_value(name, changes) for name in names})
@@ -0,0 +1,64 @@
+import gzip
+import json
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from settingsdb.models import TransactionLog
+
+
+class Command(BaseCommand):
+    help = 'Archives TransactionLog rows older than N days to gzipped JSONL files and deletes them in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=180, help='Archive logs older than this many days')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--output-dir', help='Defaults to MEDIA_ROOT/log_archives')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        chunk_size = options['chunk_size']
+        output_dir = options.get('output_dir') or os.path.join(settings.MEDIA_ROOT, 'log_archives')
+
+        old_logs = TransactionLog.objects.filter(timestamp__lt=cutoff)
+        if options['dry_run']:
+            self.stdout.write(f'{old_logs.count()} logs older than {cutoff:%Y-%m-%d} would be archived.')
+            return
+
+        os.makedirs(output_dir, exist_ok=True)
+        run_stamp = timezone.now().strftime('%Y%m%d%H%M%S')
+        archived = 0
+        part = 0
+
+        while True:
+            rows = list(
+                old_logs.order_by('id').values(
+                    'id', 'user_id', 'user__email', 'table_name', 'object_id',
+                    'action', 'timestamp', 'changes', 'description',
+                )[:chunk_size]
+            )
+            if not rows:
+                break
+
+            # Each chunk gets its own file, closed before the rows are deleted,
+            # so an interrupted run never loses logs.
+            part += 1
+            path = os.path.join(output_dir, f'transaction_logs_{run_stamp}_part{part:04d}.jsonl.gz')
+            with gzip.open(path, 'wt', encoding='utf-8') as archive:
+                for row in rows:
+                    archive.write(json.dumps(row, cls=DjangoJSONEncoder))
+                    archive.write('\n')
+
+            with transaction.atomic():
+                TransactionLog.objects.filter(id__in=[row['id'] for row in rows]).delete()
+
+            archived += len(rows)
+            self.stdout.write(f'Archived {archived} logs ({os.path.basename(path)})')
+
+        self.stdout.write(self.style.SUCCESS(f'Archived and deleted {archived} logs older than {cutoff:%Y-%m-%d}.'))
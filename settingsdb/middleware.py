@@ -2,6 +2,7 @@
 from django.shortcuts import redirect
 from django.urls import reverse
 from .signals import set_current_user
+from . import audit
 from threading import local
 
 _user = local()
@@ -26,7 +27,13 @@ class CaptureUserMiddleware:
         else:
             set_current_user(None)
             
-        response = self.get_response(request)
+        # Audit rows produced outside a transaction are buffered for the whole
+        # request and written in one batch once the view has finished.
+        audit.begin_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            audit.end_request()
         
         # Clear user after response to avoid leaking user data between requests
         set_current_user(None)
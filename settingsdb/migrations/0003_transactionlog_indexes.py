@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('settingsdb', '0002_dbbackupimport'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transactionlog',
+            index=models.Index(fields=['timestamp'], name='settingsdb__timesta_2d5b9c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transactionlog',
+            index=models.Index(fields=['table_name', 'object_id'], name='settingsdb__table_n_d6445d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transactionlog',
+            index=models.Index(fields=['user', 'timestamp'], name='settingsdb__user_id_29e1eb_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('settingsdb', '0003_transactionlog_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transactionlog',
+            name='description',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
@@ -1,15 +1,16 @@
 from django.db import models
+from core.mixins import FieldTrackerMixin
 from django.conf import settings
 import os
 from datetime import datetime
 
-class SourceOfJoining(models.Model):
+class SourceOfJoining(FieldTrackerMixin, models.Model):
     name = models.CharField(max_length=100, unique=True)
 
     def __str__(self):
         return self.name
 
-class PaymentAccount(models.Model):
+class PaymentAccount(FieldTrackerMixin, models.Model):
     name = models.CharField(max_length=100, unique=True)
 
     def __str__(self):
@@ -28,6 +29,14 @@ class TransactionLog(models.Model):
     action = models.CharField(max_length=10, choices=ACTION_CHOICES)
     timestamp = models.DateTimeField(auto_now_add=True)
     changes = models.JSONField()
+    description = models.TextField(blank=True, default='')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['timestamp']),
+            models.Index(fields=['table_name', 'object_id']),
+            models.Index(fields=['user', 'timestamp']),
+        ]
 
     def __str__(self):
         return f"{self.timestamp} | {self.table_name} | {self.action}"
@@ -35,7 +44,7 @@ class TransactionLog(models.Model):
 
 
 
-class UserSettings(models.Model):
+class UserSettings(FieldTrackerMixin, models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='settings')
     enable_2fa = models.BooleanField(default=False)
 
@@ -8,10 +8,10 @@ from django.db.models.signals import post_save, pre_delete, pre_save
 from django.dispatch import receiver
 from django.forms.models import model_to_dict
 from django.apps import apps
-from .models import TransactionLog
+from .audit import record_change
+from .audit_policy import get_audit_policy
 
 _user = local()
-_old_instance_data = local()
 
 def get_current_user():
     return getattr(_user, 'value', None)
@@ -22,10 +22,38 @@ def set_current_user(user):
 def is_running_migrations():
     return 'makemigrations' in sys.argv or 'migrate' in sys.argv
 
-def serialize_model_instance(instance):
+def _related_display(related_obj):
+    """Prioritize human-readable fields on related objects."""
+    if hasattr(related_obj, 'get_display_name'):
+        return related_obj.get_display_name()
+    elif hasattr(related_obj, 'name'):
+        return related_obj.name
+    elif hasattr(related_obj, 'course_name'):
+        return related_obj.course_name
+    return str(related_obj)
+
+def _serialize_value(field, value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    elif isinstance(value, time):
+        return value.strftime('%H:%M:%S')
+    elif isinstance(value, Decimal):
+        return float(value)
+    elif isinstance(field, FileField):
+        name = getattr(value, 'name', value)
+        if not name:
+            return None
+        try:
+            return field.storage.url(name)
+        except ValueError:
+            return None  # No file associated
+    return value
+
+def serialize_model_instance(instance, policy=None, only=None):
     """
     Serializes a model instance to a dictionary, handling relationships
-    and prioritizing human-readable identifiers.
+    and prioritizing human-readable identifiers. Fields the audit policy
+    excludes, or that are not in ``only`` when given, are skipped.
     """
     data = {}
     for field in instance._meta.get_fields(include_parents=False):
@@ -36,6 +64,10 @@ def serialize_model_instance(instance):
             continue
 
         field_name = field.name
+        if policy is not None and not policy.audits_field(field_name):
+            continue
+        if only is not None and field_name not in only:
+            continue
         if hasattr(instance, field_name):
             if field.is_relation:
                 related_obj = getattr(instance, field_name)
@@ -48,82 +80,114 @@ def serialize_model_instance(instance):
                     data[field_name] = [str(obj) for obj in related_obj.all()]
                     continue
 
-                # Prioritize human-readable fields on related objects
-                if hasattr(related_obj, 'get_display_name'):
-                    data[field_name] = related_obj.get_display_name()
-                elif hasattr(related_obj, 'name'):
-                    data[field_name] = related_obj.name
-                elif hasattr(related_obj, 'course_name'):
-                    data[field_name] = related_obj.course_name
-                else:
-                    data[field_name] = str(related_obj)
-
+                data[field_name] = _related_display(related_obj)
             else:
-                value = getattr(instance, field_name)
-                if isinstance(value, (datetime, date)):
-                    data[field_name] = value.isoformat()
-                elif isinstance(value, time):
-                    data[field_name] = value.strftime('%H:%M:%S')
-                elif isinstance(value, Decimal):
-                    data[field_name] = float(value)
-                elif isinstance(field, FileField):
-                    if value and getattr(value, 'name', None):
-                        try:
-                            data[field_name] = value.url
-                        except ValueError:
-                            data[field_name] = None  # No file associated
-                    else:
-                        data[field_name] = None
-                else:
-                    data[field_name] = value
+                data[field_name] = _serialize_value(field, getattr(instance, field_name))
     return data
 
+def diff_from_loaded_values(instance, new_data):
+    """
+    Builds the UPDATE diff for a FieldTrackerMixin instance from the values it
+    was loaded with. Only a changed foreign key costs a query (to name the old
+    related object); many-to-many fields are saved separately and not diffed.
+    Fields missing from ``new_data`` are not audited and are skipped.
+    """
+    diff = {}
+    for field in instance._meta.concrete_fields:
+        if field.attname not in instance._loaded_values or field.name not in new_data:
+            continue
+        old_raw = instance._loaded_values[field.attname]
+        if field.is_relation:
+            if old_raw == getattr(instance, field.attname):
+                continue
+            old_value = None
+            if old_raw is not None:
+                related_obj = field.related_model._base_manager.filter(pk=old_raw).first()
+                old_value = _related_display(related_obj) if related_obj else str(old_raw)
+        else:
+            old_value = _serialize_value(field, old_raw)
+        new_value = new_data.get(field.name)
+        if old_value != new_value:
+            diff[field.name] = {'old': old_value, 'new': new_value}
+    return diff
+
 
 @receiver(pre_save)
 def capture_old_instance(sender, instance, **kwargs):
     if is_running_migrations() or sender.__name__ == 'TransactionLog':
         return
 
-    if not instance.pk:
-        _old_instance_data.value = None
+    # The previous state is kept on the instance itself so that saves nested
+    # inside another save's signal handlers cannot overwrite each other.
+    instance._audit_old_data = None
+    if not instance.pk or get_current_user() is None:
+        return
+
+    if getattr(instance, '_loaded_values', None) is not None:
+        # FieldTrackerMixin models already hold their loaded state.
+        return
+
+    policy = get_audit_policy(sender)
+    if not policy.enabled:
         return
 
     try:
-        old_instance = sender.objects.get(pk=instance.pk)
-        _old_instance_data.value = serialize_model_instance(old_instance)
+        old_instance = sender._base_manager.get(pk=instance.pk)
+        instance._audit_old_data = serialize_model_instance(old_instance, policy)
     except sender.DoesNotExist:
-        _old_instance_data.value = None
+        pass
 
 @receiver(post_save)
 def track_save(sender, instance, created, **kwargs):
     if is_running_migrations() or sender.__name__ == 'TransactionLog':
         return
 
+    old_data = instance.__dict__.pop('_audit_old_data', None)
+
     user = get_current_user()
     if user is None or not user.pk:
         return
 
+    policy = get_audit_policy(sender)
+    if not policy.enabled or not policy.should_sample():
+        return
+
     app_label = sender._meta.app_label
-    new_data = serialize_model_instance(instance)
-    old_data = getattr(_old_instance_data, 'value', None)
+    loaded_values = getattr(instance, '_loaded_values', None)
+    is_update = not (created or (loaded_values is None and not old_data))
+    diff_only = is_update and policy.stores_diff_only()
+
+    if diff_only and loaded_values is not None:
+        # Only the changed fields (and identifiers) need serializing.
+        only = set(instance.get_changed_fields()) | set(policy.identify_by)
+        new_data = serialize_model_instance(instance, policy, only=only)
+    else:
+        new_data = serialize_model_instance(instance, policy)
 
-    if created or not old_data:
+    if not is_update:
         changes = {'app': app_label, **new_data}
         action = 'CREATE'
     else:
-        diff = {}
-        for key in new_data.keys():
-            old_value = old_data.get(key)
-            new_value = new_data.get(key)
-            if old_value != new_value:
-                diff[key] = {'old': old_value, 'new': new_value}
-        
-        changes = {'app': app_label, 'diff': diff, **new_data}
+        if loaded_values is not None:
+            diff = diff_from_loaded_values(instance, new_data)
+        else:
+            diff = {}
+            for key in new_data.keys():
+                old_value = old_data.get(key)
+                new_value = new_data.get(key)
+                if old_value != new_value:
+                    diff[key] = {'old': old_value, 'new': new_value}
+
+        if diff_only:
+            if not diff:
+                return
+            identity = {key: new_data[key] for key in policy.identify_by if key in new_data}
+            changes = {'app': app_label, 'diff': diff, **identity}
+        else:
+            changes = {'app': app_label, 'diff': diff, **new_data}
         action = 'UPDATE'
 
-    _old_instance_data.value = None
-
-    TransactionLog.objects.create(
+    record_change(
         user=user,
         table_name=sender.__name__,
         object_id=str(instance.pk),
@@ -140,11 +204,15 @@ def track_delete(sender, instance, **kwargs):
     if user is None:
         return
 
+    policy = get_audit_policy(sender)
+    if not policy.enabled:
+        return
+
     app_label = sender._meta.app_label
-    data = serialize_model_instance(instance)
+    data = serialize_model_instance(instance, policy)
     changes = {'app': app_label, **data}
 
-    TransactionLog.objects.create(
+    record_change(
         user=user,
         table_name=sender.__name__,
         object_id=str(instance.pk),
@@ -1,12 +1,25 @@
-from django.test import TestCase, Client
+from django.test import SimpleTestCase, TestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+import gzip
+import hashlib
 import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from io import StringIO
+from unittest import skipUnless
 from unittest.mock import patch, MagicMock
 
-from .models import DBBackupImport
-from .db_utils import get_current_db_engine, import_sql_backup
+import db_backup
+
+from .models import DBBackupImport, SourceOfJoining, PaymentAccount, TransactionLog
+from .db_utils import clear_backup_tables, get_current_db_engine, import_sql_backup, iter_sql_statements
+from .signals import set_current_user
 
 User = get_user_model()
 
@@ -145,3 +158,490 @@ class DBBackupImportTest(TestCase):
         
         # Check that no DBBackupImport record was created
         self.assertEqual(DBBackupImport.objects.count(), 0)
+
+
+class SQLBackupStreamingTest(TestCase):
+    DUMP = (
+        "-- PostgreSQL database dump\n"
+        "SET statement_timeout = 0;\n"
+        "CREATE FUNCTION public.f() RETURNS trigger AS $body$\nBEGIN; RETURN NULL; END;\n$body$ LANGUAGE plpgsql;\n"
+        "/* block; comment */\n"
+        "COPY public.settingsdb_sourceofjoining (id, name) FROM stdin;\n"
+        "1\tWalk-in\n"
+        "2\tTab\\there; and a \\\\ backslash\n"
+        "\\.\n"
+        "COPY public.django_migrations (id, app, name, applied) FROM stdin;\n"
+        "1\tx\ty\t2024-01-01\n"
+        "\\.\n"
+        "COPY public.settingsdb_usersettings (id, enable_2fa, user_id) FROM stdin;\n"
+        "7\tt\t{user_id}\n"
+        "\\.\n"
+        "INSERT INTO public.settingsdb_paymentaccount (id, name) VALUES (3, 'It''s; multi\nline');\n"
+        "SELECT pg_catalog.setval('public.settingsdb_sourceofjoining_id_seq', 2, true);\n"
+    )
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='restore@example.com', name='Restore', role='staff', password='x')
+        handle, self.path = tempfile.mkstemp(suffix='.sql')
+        with os.fdopen(handle, 'w') as f:
+            f.write(self.DUMP.format(user_id=self.user.pk))
+        self.addCleanup(os.remove, self.path)
+
+    def test_statements_are_tokenized_incrementally(self):
+        with open(self.path) as f:
+            statements = list(iter_sql_statements(f))
+        self.assertEqual(len(statements), 7)
+        self.assertTrue(statements[1].sql.startswith('CREATE FUNCTION'))
+        self.assertIn('BEGIN; RETURN NULL; END;', statements[1].sql)
+        # The unread rows of the django_migrations block were skipped.
+        self.assertIsNotNone(statements[3].copy_rows)
+        self.assertIn("'It''s; multi\nline'", statements[5].sql)
+
+        with open(self.path) as f:
+            copy = next(s for s in iter_sql_statements(f) if s.copy_rows is not None)
+            self.assertEqual(list(copy.copy_rows), [['1', 'Walk-in'], ['2', 'Tab\there; and a \\ backslash']])
+
+    def test_import_streams_rows_of_backup_tables(self):
+        success, message, tables = import_sql_backup(self.path, None)
+
+        self.assertTrue(success, message)
+        self.assertEqual(
+            list(SourceOfJoining.objects.order_by('pk').values_list('name', flat=True)),
+            ['Walk-in', 'Tab\there; and a \\ backslash'],
+        )
+        self.assertEqual(PaymentAccount.objects.get(pk=3).name, "It's; multi\nline")
+        self.assertTrue(self.user.settings.enable_2fa)
+        self.assertEqual(tables['settingsdb_sourceofjoining']['rows_inserted'], 2)
+        self.assertNotIn('django_migrations', tables)
+
+    def test_import_resets_code_counters_and_search_index(self):
+        from core.models import SearchDocument, Sequence
+        from studentsdb.models import Student
+
+        with self.captureOnCommitCallbacks(execute=True):
+            student = Student.objects.create(first_name='Gone', mode_of_class='ON', week_type='WD')
+        self.assertTrue(SearchDocument.objects.filter(entity_type='student', object_id=student.pk).exists())
+        clear_backup_tables()
+        # The dump's user settings row points at this user.
+        User.objects.create_user(email='restore@example.com', name='Restore', role='staff', id=self.user.pk)
+
+        import_sql_backup(self.path, None)
+
+        self.assertFalse(Sequence.objects.exists())
+        self.assertFalse(SearchDocument.objects.filter(entity_type='student').exists())
+
+    def test_failing_rows_do_not_drop_their_batch(self):
+        SourceOfJoining.objects.create(pk=2, name='Existing')
+        success, message, tables = import_sql_backup(self.path, None)
+
+        self.assertTrue(success)
+        self.assertIn('1 errors', message)
+        self.assertEqual(tables['settingsdb_sourceofjoining']['rows_inserted'], 1)
+        self.assertTrue(SourceOfJoining.objects.filter(pk=1, name='Walk-in').exists())
+
+    def test_clear_backup_tables_uses_raw_sql(self):
+        set_current_user(self.user)
+        self.addCleanup(set_current_user, None)
+        with self.captureOnCommitCallbacks(execute=True):
+            SourceOfJoining.objects.create(name='Web')
+        with CaptureQueriesContext(connection) as queries:
+            clear_backup_tables()
+
+        # No objects are collected, so no delete signals and no audit entries.
+        self.assertFalse(User.objects.exists())
+        self.assertFalse(SourceOfJoining.objects.exists())
+        self.assertFalse(TransactionLog.objects.exists())
+        self.assertTrue(all(q['sql'].startswith(('DELETE', 'PRAGMA', 'SAVEPOINT', 'RELEASE')) for q in queries.captured_queries))
+
+
+class AuditLogBufferTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='auditor@example.com',
+            name='Auditor',
+            role='staff',
+            password='auditpassword'
+        )
+        set_current_user(self.user)
+
+    def tearDown(self):
+        set_current_user(None)
+
+    def test_entries_written_in_one_batch_on_commit(self):
+        """Audit rows are buffered until commit and inserted together"""
+        with self.captureOnCommitCallbacks() as callbacks:
+            SourceOfJoining.objects.create(name='Walk-in')
+            PaymentAccount.objects.create(name='Bank')
+            self.assertEqual(TransactionLog.objects.count(), 0)
+
+        self.assertEqual(len(callbacks), 1)
+        with self.assertNumQueries(1):
+            callbacks[0]()
+        self.assertEqual(
+            set(TransactionLog.objects.values_list('table_name', flat=True)),
+            {'SourceOfJoining', 'PaymentAccount'}
+        )
+
+    def test_rolled_back_changes_are_not_logged(self):
+        """Entries recorded in a rolled back transaction are discarded"""
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    SourceOfJoining.objects.create(name='Referral')
+                    raise IntegrityError('rollback')
+            except IntegrityError:
+                pass
+            SourceOfJoining.objects.create(name='Website')
+
+        logs = TransactionLog.objects.all()
+        self.assertEqual(logs.count(), 1)
+        self.assertEqual(logs[0].changes['name'], 'Website')
+
+    def test_rolled_back_savepoint_entries_are_discarded(self):
+        """Entries of an inner savepoint that rolls back are not written with the outer transaction's"""
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                SourceOfJoining.objects.create(name='kept')
+                try:
+                    with transaction.atomic():
+                        SourceOfJoining.objects.create(name='rolledback')
+                        raise IntegrityError('rollback')
+                except IntegrityError:
+                    pass
+                with transaction.atomic():
+                    PaymentAccount.objects.create(name='released')
+
+        self.assertEqual(
+            sorted(log.changes['name'] for log in TransactionLog.objects.filter(action='CREATE')),
+            ['kept', 'released'],
+        )
+
+    @override_settings(AUDIT_LOG_MODE='sync')
+    def test_sync_mode_writes_immediately(self):
+        SourceOfJoining.objects.create(name='Newspaper')
+        self.assertEqual(TransactionLog.objects.filter(action='CREATE').count(), 1)
+
+
+class FieldTrackingAuditTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='tracker@example.com',
+            name='Tracker',
+            role='staff',
+            password='trackpassword'
+        )
+        set_current_user(self.user)
+
+    def tearDown(self):
+        set_current_user(None)
+
+    def test_update_does_not_refetch_row(self):
+        """Saving a loaded instance diffs against its snapshot without a SELECT"""
+        with self.captureOnCommitCallbacks(execute=True):
+            source_id = SourceOfJoining.objects.create(name='Walk-in').pk
+            source = SourceOfJoining.objects.get(pk=source_id)
+            source.name = 'Walk-in Centre'
+            with self.assertNumQueries(1):
+                source.save()
+
+        log = TransactionLog.objects.get(action='UPDATE')
+        self.assertEqual(log.changes['diff'], {'name': {'old': 'Walk-in', 'new': 'Walk-in Centre'}})
+
+    def test_snapshot_refreshed_after_save(self):
+        source = SourceOfJoining.objects.create(name='Referral')
+        source = SourceOfJoining.objects.get(pk=source.pk)
+        source.name = 'Friend Referral'
+        source.save()
+        self.assertEqual(source.get_changed_fields(), {})
+        source.name = 'Alumni Referral'
+        self.assertEqual(source.get_changed_fields(), {'name': ('Friend Referral', 'Alumni Referral')})
+
+    def test_nested_saves_keep_their_own_state(self):
+        """Payment saves trigger PendingPaymentRecord saves without clobbering the payment's state"""
+        from studentsdb.models import Student
+        from paymentdb.models import Payment
+
+        with self.captureOnCommitCallbacks(execute=True):
+            student = Student.objects.create(first_name='Nested', last_name='Save', email='nested@example.com', mode_of_class='ON', week_type='WD')
+            Payment.objects.create(student=student, total_fees=1000, amount_paid=200, emi_type='1', emi_1_amount=800)
+            payment = Payment.objects.get(student=student)
+            payment.emi_1_paid_amount = 300
+            payment.save()
+
+        payment_log = TransactionLog.objects.filter(table_name='Payment').latest('id')
+        self.assertEqual(payment_log.action, 'UPDATE')
+        self.assertEqual(payment_log.changes['diff']['emi_1_paid_amount'], {'old': None, 'new': 300.0})
+        self.assertEqual(payment_log.changes['diff']['total_pending_amount'], {'old': 800.0, 'new': 500.0})
+        self.assertEqual(payment_log.changes['payment_id'], payment.payment_id)
+
+
+class AuditPolicyTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='policy@example.com',
+            name='Policy',
+            role='staff',
+            password='policypassword'
+        )
+        set_current_user(self.user)
+
+    def tearDown(self):
+        set_current_user(None)
+
+    def test_disabled_models_are_not_logged(self):
+        from studentsdb.models import Student
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Student.objects.create(first_name='Chat', last_name='User', email='chat@example.com', mode_of_class='ON', week_type='WD')
+
+        tables = set(TransactionLog.objects.values_list('table_name', flat=True))
+        self.assertIn('Student', tables)
+        self.assertNotIn('StudentConversation', tables)
+
+    def test_excluded_fields_are_not_stored(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.create_user(email='secret@example.com', name='Secret', role='staff', password='secretpassword')
+
+        log = TransactionLog.objects.get(table_name='CustomUser')
+        self.assertEqual(log.changes['email'], 'secret@example.com')
+        self.assertNotIn('password', log.changes)
+        self.assertNotIn('totp_secret', log.changes)
+
+    def test_diff_only_update_keeps_identifiers(self):
+        from studentsdb.models import Student
+
+        with self.captureOnCommitCallbacks(execute=True):
+            student = Student.objects.create(first_name='Diff', last_name='Only', email='diff@example.com', mode_of_class='ON', week_type='WD')
+            student = Student.objects.get(pk=student.pk)
+            student.location = 'Chennai'
+            student.save()
+            # Saving again without changes writes nothing
+            student.save()
+
+        log = TransactionLog.objects.get(table_name='Student', action='UPDATE')
+        self.assertEqual(log.changes, {
+            'app': 'studentsdb',
+            'diff': {'location': {'old': None, 'new': 'Chennai'}},
+            'student_id': student.student_id,
+            'first_name': 'Diff',
+            'last_name': 'Only',
+        })
+
+    @override_settings(AUDIT_LOG_POLICIES={'settingsdb.SourceOfJoining': {'sample_rate': 0}})
+    def test_sampled_out_events_are_skipped_but_deletes_are_kept(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            source = SourceOfJoining.objects.create(name='Sampled')
+            source.delete()
+
+        self.assertEqual(
+            list(TransactionLog.objects.values_list('action', flat=True)),
+            ['DELETE']
+        )
+
+
+class TransactionLogMaintenanceTest(TestCase):
+    def setUp(self):
+        self.superuser = User.objects.create_superuser(
+            email='logs@example.com',
+            name='Logs',
+            password='logspassword'
+        )
+        TransactionLog.objects.bulk_create([
+            TransactionLog(user=self.superuser, table_name='Student', object_id=str(i), action='CREATE', changes={'app': 'studentsdb'})
+            for i in range(45)
+        ])
+
+    def test_keyset_pages_cover_every_log_once(self):
+        self.client.login(username='logs@example.com', password='logspassword')
+        seen = []
+        response = self.client.get(reverse('transaction_log'))
+        while True:
+            seen.extend(log.pk for log in response.context['logs'])
+            cursor = response.context['older_cursor']
+            if not cursor:
+                break
+            response = self.client.get(reverse('transaction_log'), {'before': cursor})
+
+        self.assertEqual(len(seen), 45)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+
+        newer = self.client.get(reverse('transaction_log'), {'after': response.context['newer_cursor']})
+        self.assertEqual([log.pk for log in newer.context['logs']], seen[20:40])
+
+    def test_archive_command_writes_jsonl_and_deletes(self):
+        import gzip
+        import json
+        import tempfile
+        from datetime import timedelta
+        from django.core.management import call_command
+        from django.utils import timezone
+
+        old_ids = list(TransactionLog.objects.order_by('id').values_list('id', flat=True)[:30])
+        TransactionLog.objects.filter(id__in=old_ids).update(timestamp=timezone.now() - timedelta(days=400))
+        TransactionLog.objects.filter(id=old_ids[0]).update(description='Archived description')
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            call_command('archive_transaction_logs', days=365, chunk_size=20, output_dir=output_dir, stdout=StringIO())
+            files = sorted(os.listdir(output_dir))
+            archived = {}
+            for name in files:
+                with gzip.open(os.path.join(output_dir, name), 'rt', encoding='utf-8') as archive:
+                    for line in archive:
+                        row = json.loads(line)
+                        archived[row['id']] = row
+
+        self.assertEqual(len(files), 2)
+        self.assertEqual(sorted(archived), old_ids)
+        self.assertEqual(archived[old_ids[0]]['description'], 'Archived description')
+        self.assertEqual(TransactionLog.objects.count(), 15)
+
+
+class ObjectHistoryTest(TestCase):
+    def setUp(self):
+        self.superuser = User.objects.create_superuser(
+            email='history@example.com',
+            name='History',
+            password='historypassword'
+        )
+        set_current_user(self.superuser)
+
+    def tearDown(self):
+        set_current_user(None)
+
+    def test_description_is_stored_and_escaped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            SourceOfJoining.objects.create(name='<b>Ads</b>')
+
+        log = TransactionLog.objects.get(table_name='SourceOfJoining')
+        self.assertEqual(log.description, 'Added new joining source: <strong>&lt;b&gt;Ads&lt;/b&gt;</strong>')
+
+    def test_history_is_cursor_paginated(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            source = SourceOfJoining.objects.create(name='Web')
+            SourceOfJoining.objects.create(name='Other')
+            for name in ['Web 1', 'Web 2', 'Web 3']:
+                source.name = name
+                source.save()
+
+        self.client.login(username='history@example.com', password='historypassword')
+        url = reverse('object_history', args=['SourceOfJoining', source.pk])
+        first = self.client.get(url, {'limit': 3}).json()
+        self.assertEqual([r['action'] for r in first['results']], ['UPDATE', 'UPDATE', 'UPDATE'])
+        self.assertEqual(first['results'][0]['changes'], {'name': {'old': 'Web 2', 'new': 'Web 3'}})
+        self.assertIn('Web 3', first['results'][0]['description'])
+
+        second = self.client.get(url, {'limit': 3, 'before': first['next_cursor']}).json()
+        self.assertEqual([r['action'] for r in second['results']], ['CREATE'])
+        self.assertEqual(second['results'][0]['changes'], {'id': source.pk, 'name': 'Web'})
+        self.assertIsNone(second['next_cursor'])
+
+
+class DbBackupScriptTest(SimpleTestCase):
+    """db_backup.py, the cron script at the repository root."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.config = db_backup.Config(
+            db_engine='django.db.backends.postgresql', db_name='btree', db_user='u', db_password='p',
+            db_host='localhost', db_port='5432', backup_dir=self.tmp, retention_days=30,
+            rclone_remote='remote', rclone_backup_dir='backups', upload_attempts=3, upload_backoff=1,
+        )
+
+    def test_stream_compressed_checksums_gzipped_output(self):
+        target = os.path.join(self.tmp, 'out.gz')
+        cmd = [sys.executable, '-c', "import sys; sys.stdout.buffer.write(b'row\\n' * 500000)"]
+        stats = db_backup.stream_compressed(cmd, target)
+
+        with open(target, 'rb') as f:
+            data = f.read()
+        self.assertEqual(stats['size'], len(data))
+        self.assertEqual(stats['sha256'], hashlib.sha256(data).hexdigest())
+        self.assertEqual(gzip.decompress(data), b'row\n' * 500000)
+
+    def test_stream_compressed_failure_removes_target(self):
+        target = os.path.join(self.tmp, 'out.gz')
+        cmd = [sys.executable, '-c', "import sys; sys.stdout.write('partial'); sys.stderr.write('boom'); sys.exit(2)"]
+        with self.assertRaisesMessage(db_backup.BackupError, 'boom'):
+            db_backup.stream_compressed(cmd, target)
+        self.assertFalse(os.path.exists(target))
+
+    def test_upload_retries_with_backoff(self):
+        failures = [subprocess.CalledProcessError(1, 'rclone')] * 2
+        delays = []
+
+        def rclone(*args):
+            if failures:
+                raise failures.pop()
+
+        with patch.object(db_backup, 'rclone', side_effect=rclone) as mock_rclone:
+            self.assertTrue(db_backup.upload_file(self.config, '/tmp/set.gz', sleep=delays.append))
+        self.assertEqual(mock_rclone.call_count, 3)
+        self.assertEqual(delays, [1, 2])
+
+        with patch.object(db_backup, 'rclone', side_effect=subprocess.CalledProcessError(1, 'rclone')):
+            self.assertFalse(db_backup.upload_file(self.config, '/tmp/set.gz', sleep=delays.append))
+
+    def test_pruning_keeps_the_chain_of_kept_sets(self):
+        sets = [
+            {'id': 'a', 'kind': 'full', 'created_at': '2026-01-01T00:00:00'},
+            {'id': 'b', 'kind': 'full', 'created_at': '2026-01-05T00:00:00'},
+            {'id': 'c', 'kind': 'incremental', 'created_at': '2026-01-06T00:00:00'},
+            {'id': 'd', 'kind': 'incremental', 'created_at': '2026-01-20T00:00:00'},
+        ]
+        pruned = db_backup.sets_to_prune(sets, '2026-01-10T00:00:00')
+        self.assertEqual([s['id'] for s in pruned], ['a'])
+        # Everything expired: the newest chain still stays.
+        pruned = db_backup.sets_to_prune(sets, '2027-01-01T00:00:00')
+        self.assertEqual([s['id'] for s in pruned], ['a'])
+
+        names = ['btree_2025-12-01_02-00.sql.gz', 'btree_2026-02-01_02-00.sql.gz', 'other_2025-01-01_02-00.sql.gz']
+        self.assertEqual(db_backup.legacy_backups_to_prune(self.config, names, '2026-01-01'), names[:1])
+
+    def test_incremental_chain_restarts_after_a_plain_set(self):
+        manifest = {'sets': [{'id': 'a', 'kind': 'full', 'high_water': {'t': 5}}]}
+        self.assertEqual(db_backup.previous_high_water(manifest), {'t': 5})
+        manifest['sets'].append({'id': 'b', 'kind': 'full'})
+        self.assertIsNone(db_backup.previous_high_water(manifest))
+
+    def test_restore_uses_newest_main_dump_and_whole_chain(self):
+        def backup_set(set_id, kind, created_at):
+            return {'id': set_id, 'kind': kind, 'created_at': created_at, 'files': [
+                {'name': f'{set_id}_{kind}.dump.gz'},
+                {'name': f'{set_id}_log.copy.gz', 'table': 'settingsdb_transactionlog'},
+            ]}
+
+        sets = [
+            backup_set('old', 'full', '2026-01-01'),
+            backup_set('base', 'full', '2026-01-07'),
+            backup_set('mon', 'incremental', '2026-01-08'),
+            backup_set('tue', 'incremental', '2026-01-09'),
+        ]
+        self.assertEqual([f['name'] for f in db_backup.restore_files(sets)], [
+            'tue_incremental.dump.gz', 'base_log.copy.gz', 'mon_log.copy.gz', 'tue_log.copy.gz',
+        ])
+        self.assertEqual([s['id'] for s in db_backup.restore_chain(sets, 'mon')], ['base', 'mon'])
+        self.assertEqual([f['name'] for f in db_backup.restore_files(sets, 'old')], ['old_full.dump.gz', 'old_log.copy.gz'])
+        with self.assertRaises(db_backup.BackupError):
+            db_backup.restore_chain(sets, 'missing')
+
+        commands = db_backup.restore_commands(self.config, sets)
+        self.assertTrue(commands[0].startswith('gunzip -c tue_incremental.dump.gz | pg_restore'))
+        self.assertIn('ON CONFLICT (id) DO NOTHING', commands[1])
+
+    @skipUnless(shutil.which('rclone'), 'rclone is not installed')
+    def test_upload_and_cleanup_against_local_remote(self):
+        remote = os.path.join(self.tmp, 'remote')
+        os.makedirs(remote)
+        self.config.rclone_remote = ':local'
+        self.config.rclone_backup_dir = remote
+        path = os.path.join(self.tmp, 'btree_2026-01-01_00-00-00.dump.gz')
+        stats = db_backup.stream_compressed([sys.executable, '-c', "print('dump')"], path)
+        manifest = {'sets': [{
+            'id': 'btree_2026-01-01_00-00-00', 'kind': 'full', 'created_at': '2026-01-01T00:00:00',
+            'files': [db_backup.file_entry(path, stats)], 'uploaded': False,
+        }]}
+        db_backup.upload_pending_sets(self.config, manifest, sleep=lambda seconds: None)
+        self.assertTrue(manifest['sets'][0]['uploaded'])
+        self.assertTrue(os.path.exists(os.path.join(remote, os.path.basename(path))))
+        self.assertFalse(os.path.exists(path))
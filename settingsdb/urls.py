@@ -8,6 +8,7 @@ urlpatterns = [
     path('sources/remove/<int:pk>/', views.remove_source, name='remove_source'),
     path('accounts/remove/<int:pk>/', views.remove_payment_account, name='remove_payment_account'),
     path('logs/', views.transaction_log, name='transaction_log'),
+    path('logs/<str:table_name>/<str:object_id>/', views.object_history, name='object_history'),
     path('export/', views.export_data, name='export_data'),
     path('import/', views.import_data, name='import_data'),
     path('import-db-backup/', views.import_db_backup, name='import_db_backup'),
@@ -3,14 +3,9 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.shortcuts import get_object_or_404, render, redirect
 from .models import SourceOfJoining, PaymentAccount, TransactionLog, UserSettings, DBBackupImport
 from .forms import SourceForm, PaymentAccountForm, UserSettingsForm, DBBackupImportForm
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-import pandas as pd
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
 from io import BytesIO
 import csv
-from django.db import IntegrityError, models, connections
-from django.core.exceptions import ObjectDoesNotExist
-from django.apps import apps
 from django.contrib import messages
 from django.utils import timezone
 
@@ -23,22 +18,17 @@ from paymentdb.models import Payment
 from placementdb.models import Placement, CompanyInterview
 from placementdrive.models import Company
 from accounts.models import CustomUser
+from core.exports import EXPORT_CHUNK_SIZE, csv_response, model_sheet, xlsx_response
+from core.jobs import enqueue_import
+from core.pagination import KeysetPaginator
 import json
-from django.apps import apps
-from batchdb.models import Batch, BatchStudent, BatchTransaction, TrainerHandover, TransferRequest
-from consultantdb.models import Consultant, ConsultantProfile, Goal, Achievement
-from coursedb.models import Course, CourseCategory, CourseModule, Topic
-from paymentdb.models import Payment
-from placementdb.models import Placement, CompanyInterview
-from placementdrive.models import Company, Interview, InterviewStudent, ResumeSharedStatus
-from studentsdb.models import Student
-from trainersdb.models import Trainer
 
 import pyotp
 import qrcode
 import base64
 
-from .db_utils import get_current_db_engine, import_sql_backup
+from .db_utils import clear_backup_tables, get_current_db_engine, import_sql_backup
+from .log_descriptions import describe_activity
 import logging
 
 logger = logging.getLogger(__name__)
@@ -98,138 +88,94 @@ def clean_transaction_data(details_json):
     except Exception as e:
         return f"Error parsing details: {e}"
 
+LOG_PAGE_SIZE = 20
+LOG_ORDERING = ('-timestamp', '-id')
+
 @staff_member_required
 def transaction_log(request):
-    log_list = TransactionLog.objects.select_related('user').order_by('-timestamp')
-    
-    # Pagination
-    paginator = Paginator(log_list, 20)  # Show 20 logs per page
-    page = request.GET.get('page')
-    try:
-        logs = paginator.page(page)
-    except PageNotAnInteger:
-        logs = paginator.page(1)
-    except EmptyPage:
-        logs = paginator.page(paginator.num_pages)
+    """
+    Keyset-paginated log viewer. Pages are addressed by the (timestamp, id) of
+    their boundary rows, so no COUNT(*) or OFFSET scan is needed however large
+    the table grows. ``before`` pages towards older entries, ``after`` towards
+    newer ones.
+    """
+    paginator = KeysetPaginator(TransactionLog.objects.select_related('user'), LOG_PAGE_SIZE, LOG_ORDERING)
+    page = paginator.page(after=request.GET.get('before'), before=request.GET.get('after'))
+    logs = page.object_list
 
     for log in logs:
         log.cleaned_details = clean_transaction_data(log.changes)
-        
-    return render(request, 'settingsdb/transaction_log.html', {'logs': logs})
 
-@staff_member_required
-def export_data(request):
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        models_to_export = {
-            'Students': Student,
-            'Courses': Course,
-            'CourseCategories': CourseCategory,
-            'Trainers': Trainer,
-            'Consultants': Consultant,
-            'Batches': Batch,
-            'Payments': Payment,
-            'Placements': Placement,
-            'CompanyInterviews': CompanyInterview,
-            'PlacementDrives': Company,
-            'Users': CustomUser,
-            'SourceOfJoining': SourceOfJoining,
-            'PaymentAccounts': PaymentAccount,
-        }
-
-        for sheet_name, model in models_to_export.items():
-            data = list(model.objects.all().values())
-            df = pd.DataFrame(data)
-            
-            # Convert datetime columns to timezone-unaware
-            for col in df.columns:
-                if pd.api.types.is_datetime64_any_dtype(df[col]):
-                    df[col] = df[col].dt.tz_localize(None)
-            
-            df.to_excel(writer, sheet_name=sheet_name, index=False)
+    return render(request, 'settingsdb/transaction_log.html', {
+        'logs': logs,
+        'newer_cursor': page.previous_cursor,
+        'older_cursor': page.next_cursor,
+    })
 
-    output.seek(0)
-    response = HttpResponse(
-        output,
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = 'attachment; filename="backup_data.xlsx"'
-    return response
+@staff_member_required
+def object_history(request, table_name, object_id):
+    """
+    Audit history of a single record as JSON, newest first. Served from the
+    (table_name, object_id) index and paged with the same cursor as the log viewer.
+    """
+    try:
+        limit = max(1, min(int(request.GET.get('limit', LOG_PAGE_SIZE)), 100))
+    except ValueError:
+        limit = LOG_PAGE_SIZE
+
+    history = TransactionLog.objects.filter(
+        table_name=table_name, object_id=object_id
+    ).select_related('user')
+    page = KeysetPaginator(history, limit, LOG_ORDERING).page(after=request.GET.get('before'))
+
+    results = []
+    for log in page:
+        changes = log.changes if isinstance(log.changes, dict) else {}
+        if log.action == 'UPDATE':
+            data = changes.get('diff', {})
+        else:
+            data = {key: value for key, value in changes.items() if key != 'app'}
+        results.append({
+            'id': log.id,
+            'timestamp': log.timestamp.isoformat(),
+            'user': log.user.name if log.user else None,
+            'action': log.action,
+            'description': log.description or describe_activity(log.table_name, log.action, changes),
+            'changes': data,
+        })
+
+    return JsonResponse({
+        'table_name': table_name,
+        'object_id': object_id,
+        'results': results,
+        'next_cursor': page.next_cursor,
+    })
 
-from django.db import transaction
+@staff_member_required
+def export_data(request):
+    models_to_export = {
+        'Students': Student,
+        'Courses': Course,
+        'CourseCategories': CourseCategory,
+        'Trainers': Trainer,
+        'Consultants': Consultant,
+        'Batches': Batch,
+        'Payments': Payment,
+        'Placements': Placement,
+        'CompanyInterviews': CompanyInterview,
+        'PlacementDrives': Company,
+        'Users': CustomUser,
+        'SourceOfJoining': SourceOfJoining,
+        'PaymentAccounts': PaymentAccount,
+    }
+    sheets = [model_sheet(sheet_name, model.objects.all()) for sheet_name, model in models_to_export.items()]
+    return xlsx_response('backup_data.xlsx', sheets)
 
 @staff_member_required
 def import_data(request):
     if request.method == 'POST':
-        excel_file = request.FILES['excel_file']
-        xls = pd.ExcelFile(excel_file)
-        
-        with transaction.atomic():
-            sheet_order = [
-                'SourceOfJoining', 'PaymentAccounts', 'CourseCategories', 'Courses',
-                'Trainers', 'Consultants', 'Users', 'Students', 'Batches',
-                'Payments', 'PlacementDrives', 'Placements', 'CompanyInterviews'
-            ]
-            for sheet_name in sheet_order:
-                if sheet_name not in xls.sheet_names:
-                    continue
-                df = pd.read_excel(xls, sheet_name).replace({pd.NaT: None, float('nan'): None})
-                model = None
-                if sheet_name == 'Students': model = Student
-                elif sheet_name == 'Courses': model = Course
-                elif sheet_name == 'CourseCategories': model = CourseCategory
-                elif sheet_name == 'Trainers': model = Trainer
-                elif sheet_name == 'Consultants': model = Consultant
-                elif sheet_name == 'Batches': model = Batch
-                elif sheet_name == 'Payments': model = Payment
-                elif sheet_name == 'Placements': model = Placement
-                elif sheet_name == 'CompanyInterviews': model = CompanyInterview
-                elif sheet_name == 'PlacementDrives': model = Company
-                elif sheet_name == 'Users': model = CustomUser
-                elif sheet_name == 'SourceOfJoining': model = SourceOfJoining
-                elif sheet_name == 'PaymentAccounts': model = PaymentAccount
-
-                if model:
-                    for _, row in df.iterrows():
-                        row_data = row.to_dict()
-                        
-                        if sheet_name == 'Trainers':
-                            for field in ['timing_slots', 'commercials']:
-                                if field in row_data and isinstance(row_data[field], str):
-                                    try:
-                                        row_data[field] = json.loads(row_data[field].replace("'", '"'))
-                                    except json.JSONDecodeError:
-                                        row_data[field] = []
-
-                        # Handle foreign key relationships
-                        for field, value in row_data.items():
-                            if isinstance(value, float) and pd.isna(value):
-                                row_data[field] = None
-                            elif field.endswith('_id') and value is not None:
-                                # This is a simplified approach. A more robust solution would map model names to app labels.
-                                # For now, we'll assume the related model is in the same app or a known app.
-                                pass
-                        try:
-                            # Separate foreign key fields
-                            fk_fields = {}
-                            for field in model._meta.fields:
-                                if isinstance(field, models.ForeignKey):
-                                    fk_fields[field.name + '_id'] = row_data.pop(field.name + '_id', None)
-
-                            # Create or update the object without the foreign keys
-                            obj, created = model.objects.update_or_create(id=row_data.pop('id'), defaults=row_data)
-
-                            # Set the foreign keys separately
-                            for field, value in fk_fields.items():
-                                if value is not None:
-                                    setattr(obj, field, value)
-                            obj.save()
-
-                        except (IntegrityError, ObjectDoesNotExist) as e:
-                            print(f"Error importing row for {sheet_name}: {row_data} - {e}")
-                            continue
-
-        return redirect('settings_dashboard')
+        job = enqueue_import('data', request.FILES['excel_file'], request.user)
+        return redirect('import_job_detail', pk=job.pk)
     return render(request, 'settingsdb/import_data.html')
 
 
@@ -240,46 +186,8 @@ def import_student_courses(request):
         if not csv_file.name.endswith('.csv'):
             return render(request, 'settingsdb/import_courses.html', {'error': 'Please upload a valid CSV file.'})
 
-        try:
-            decoded_file = csv_file.read().decode('utf-8').splitlines()
-            reader = csv.DictReader(decoded_file)
-            errors = []
-            
-            for row in reader:
-                student_id = row.get('student_id')
-                course_category_name = row.get('course_category')
-                course_name = row.get('course_name')
-
-                if not all([student_id, course_category_name, course_name]):
-                    errors.append({**row, 'error': 'Missing required fields.'})
-                    continue
-
-                try:
-                    student = Student.objects.get(student_id=student_id)
-                    category = CourseCategory.objects.get(name=course_category_name)
-                    course = Course.objects.get(course_name=course_name, category=category)
-                    student.course_id = course.id
-                    student.save()
-                except Student.DoesNotExist:
-                    errors.append({**row, 'error': f'Student with ID {student_id} not found.'})
-                except CourseCategory.DoesNotExist:
-                    errors.append({**row, 'error': f'Course category "{course_category_name}" not found.'})
-                except Course.DoesNotExist:
-                    errors.append({**row, 'error': f'Course "{course_name}" in category "{course_category_name}" not found.'})
-
-            if errors:
-                response = HttpResponse(content_type='text/csv')
-                response['Content-Disposition'] = 'attachment; filename="error.csv"'
-                writer = csv.writer(response)
-                writer.writerow(errors[0].keys())
-                for error in errors:
-                    writer.writerow(error.values())
-                return response
-
-        except Exception as e:
-            return render(request, 'settingsdb/import_courses.html', {'error': f'An error occurred: {e}'})
-
-        return redirect('settings_dashboard')
+        job = enqueue_import('student_courses', csv_file, request.user)
+        return redirect('import_job_detail', pk=job.pk)
 
     return render(request, 'settingsdb/import_courses.html')
 
@@ -293,29 +201,17 @@ def download_course_template(request):
 
 @staff_member_required
 def export_student_courses(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="student_courses.csv"'
-
-    writer = csv.writer(response)
-    writer.writerow(['student_id', 'category_name', 'course_name'])
-
-    students = Student.objects.all().prefetch_related('course__category')
-
-    for student in students:
-        if student.course:
-            writer.writerow([
-                student.student_id,
-                student.course.category.name,
-                student.course.course_name
-            ])
-        else:
-            writer.writerow([
-                student.student_id,
-                'N/A',
-                'N/A'
-            ])
-
-    return response
+    courses = {
+        course_id: (category_name, course_name)
+        for course_id, category_name, course_name in Course.objects.values_list('id', 'category__name', 'course_name')
+    }
+    rows = (
+        (student_id, *courses.get(course_id, ('N/A', 'N/A')))
+        for student_id, course_id in Student.objects.order_by('pk').values_list(
+            'student_id', 'course_id'
+        ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    return csv_response('student_courses.csv', ['student_id', 'category_name', 'course_name'], rows)
 
 @login_required
 def manage_2fa(request):
@@ -380,23 +276,6 @@ def is_superuser(user):
 
 @user_passes_test(is_superuser)
 def import_db_backup(request):
-    # Define the models in the correct order for deletion (reverse dependency order)
-    models_to_truncate = [
-        # Level 4
-        InterviewStudent,
-        # Level 3
-        BatchStudent, BatchTransaction, TrainerHandover, TransferRequest,
-        CompanyInterview, Interview,
-        # Level 2
-        Batch, CourseModule, Topic, Payment, Placement,
-        ResumeSharedStatus, Student,
-        # Level 1
-        ConsultantProfile, Goal, Achievement, Course,
-        UserSettings, DBBackupImport, TransactionLog,
-        # Level 0
-        CustomUser, Consultant, CourseCategory, SourceOfJoining,
-        PaymentAccount, Company, Trainer
-    ]
     """
     View for importing database backup (SQL file).
     Only accessible to superusers.
@@ -427,8 +306,7 @@ def import_db_backup(request):
                 from settingsdb.signals import set_current_user
                 set_current_user(None)
                 logger.info("Clearing all existing data before database import...")
-                for model in models_to_truncate:
-                    model.objects.all().delete()
+                clear_backup_tables()
                 logger.info("All data cleared successfully.")
             except Exception as e:
                 logger.error(f"Error clearing data before import: {str(e)}")
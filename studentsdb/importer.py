@@ -0,0 +1,452 @@
+"""
+Bulk import of students from the download_student_template() sheet.
+
+import_student_frame() works on the whole DataFrame at once. The sheet is
+validated column by column, each lookup table (sources, consultants,
+trainers, payment accounts) is resolved with one IN query, duplicates are
+found with one query per unique column, and students, placements, payments
+and installments are inserted with bulk_create in chunks.
+
+bulk_create skips save() and the post_save receivers, so the work those did
+per row is done once for the whole import instead: payment codes come from
+one block reservation, and finish_import() writes the conversations with
+their onboarding message, pending payment records, audit entries, search
+documents and dashboard cache invalidation. Rows that fail are reported with
+an ``error_reason`` and leave nothing behind, as before.
+
+Uploads go through core.jobs: run_import_job() feeds the sheet to
+import_student_frame() a chunk at a time, each chunk in its own transaction.
+"""
+from decimal import Decimal
+
+import pandas as pd
+from django.db import DatabaseError, connection, transaction
+from django.db.models import prefetch_related_objects
+from django.utils import timezone
+
+REQUIRED_COLUMNS = [
+    'student_id', 'first_name', 'last_name', 'email', 'location',
+    'ugdegree', 'ugbranch', 'ugpassout', 'ugpercentage',
+    'pgdegree', 'pgbranch', 'pgpassout', 'pgpercentage',
+    'working_status', 'course_status', 'course_id', 'enrollment_date', 'start_date', 'end_date',
+    'pl_required', 'source_of_joining', 'mode_of_class', 'week_type', 'consultant',
+    'trainer', 'phone', 'payment_account',
+    'total_fees', 'amount_paid', 'emi_type', 'emi_1_amount', 'emi_1_date',
+    'emi_2_amount', 'emi_2_date', 'emi_3_amount', 'emi_3_date'
+]
+
+# Columns that must hold a value on every row.
+MANDATORY_FIELDS = ['student_id', 'first_name', 'total_fees', 'amount_paid', 'mode_of_class', 'week_type', 'payment_account']
+
+EMI_TYPES = {'NONE': 0, '1': 1, '2': 2, '3': 3, '4': 4}
+
+CHUNK_SIZE = 500
+
+# Sender roles whose messages do not count as unread, as in update_conversation_stats.
+INTERNAL_ROLES = {'admin', 'staff', 'batch_coordination', 'consultant', 'trainer', 'placement'}
+
+
+def _value(value):
+    return None if value is None or pd.isna(value) else value
+
+
+def _text(column):
+    """Stripped strings, with NaN and blanks as None."""
+    return pd.Series(
+        [(str(v).strip() or None) if _value(v) is not None else None for v in column],
+        index=column.index, dtype=object,
+    )
+
+
+def _numbers(column):
+    return pd.to_numeric(_text(column), errors='coerce')
+
+
+def _amounts(column):
+    return _numbers(column).map(lambda v: Decimal(str(v)).quantize(Decimal('0.01')) if pd.notna(v) else None)
+
+
+def _dates(column):
+    """Cell text and its YYYY-MM-DD date (None when blank or unparseable)."""
+    text = _text(column)
+    parsed = pd.to_datetime(text.map(lambda v: v.split(' ')[0] if isinstance(v, str) else None), format='%Y-%m-%d', errors='coerce')
+    return text, parsed.map(lambda v: v.date() if pd.notna(v) else None)
+
+
+def _fail(errors, mask, reason):
+    """Record ``reason`` (a string or per-row Series) for rows in ``mask`` without an earlier error."""
+    mask = mask & errors.isna()
+    errors[mask] = reason[mask] if isinstance(reason, pd.Series) else reason
+
+
+def _resolve_names(model, names):
+    """name -> instance for every name, with one IN query and a create per missing name."""
+    wanted = {name for name in names if name}
+    found = {}
+    for obj in model.objects.filter(name__in=wanted).order_by('-id'):
+        found[obj.name] = obj
+    for name in sorted(wanted - found.keys()):
+        found[name] = model.objects.create(name=name)
+    return found
+
+
+def _fetch_pks(model, objects, key):
+    """
+    Set the primary keys of just bulk-created ``objects`` from the unique
+    ``key`` field. Backends that cannot return rows from a bulk insert
+    (MySQL) leave them None, and every later step links rows by pk.
+    """
+    if connection.features.can_return_rows_from_bulk_insert or not objects:
+        return objects
+    attname = model._meta.get_field(key).attname
+    pks = dict(
+        model.objects.filter(**{f'{attname}__in': [getattr(obj, attname) for obj in objects]})
+        .values_list(attname, 'pk')
+    )
+    for obj in objects:
+        obj.pk = pks[getattr(obj, attname)]
+    return objects
+
+
+def _bulk_create(model, objects, rows, errors, key):
+    """
+    bulk_create ``objects`` in chunks. A chunk the database rejects is retried
+    one object at a time so the failing rows (``rows[i]`` for ``objects[i]``)
+    get an error; the created objects are returned, with their primary keys
+    (see _fetch_pks()).
+    """
+    created = []
+    for start in range(0, len(objects), CHUNK_SIZE):
+        chunk = objects[start:start + CHUNK_SIZE]
+        try:
+            with transaction.atomic():
+                created.extend(model.objects.bulk_create(chunk))
+            continue
+        except DatabaseError:
+            pass
+        for offset, obj in enumerate(chunk):
+            try:
+                with transaction.atomic():
+                    created.extend(model.objects.bulk_create([obj]))
+            except DatabaseError as e:
+                errors[rows[start + offset]] = str(e)
+    return _fetch_pks(model, created, key)
+
+
+def validate_frame(frame):
+    """
+    Parse and check every column of the sheet. Returns ``(errors, values)``:
+    a Series holding each failing row's reason (None for good rows) and the
+    parsed columns by name.
+    """
+    from .models import Student
+
+    errors = pd.Series([None] * len(frame), index=frame.index, dtype=object)
+
+    blank = pd.DataFrame({name: _text(frame[name]).isna() for name in MANDATORY_FIELDS})
+    missing = blank.apply(lambda row: ', '.join(row.index[row]), axis=1)
+    _fail(errors, blank.any(axis=1), 'Missing required fields: ' + missing)
+
+    values = {name: _text(frame[name]) for name in (
+        'student_id', 'first_name', 'last_name', 'email', 'location', 'ugdegree', 'ugbranch',
+        'pgdegree', 'pgbranch', 'working_status', 'course_status', 'source_of_joining',
+        'mode_of_class', 'week_type', 'consultant', 'trainer', 'payment_account',
+    )}
+
+    existing = set(Student.objects.filter(student_id__in=set(values['student_id'].dropna()))
+                   .values_list('student_id', flat=True))
+    _fail(errors, values['student_id'].isin(existing), 'Duplicate student_id.')
+    existing = set(Student.objects.filter(email__in=set(values['email'].dropna())).values_list('email', flat=True))
+    _fail(errors, values['email'].isin(existing), 'Duplicate email.')
+
+    course_text = _text(frame['course_id'])
+    values['course_id'] = _numbers(frame['course_id'])
+    _fail(errors, course_text.isna(), 'course_id is required.')
+    _fail(errors, values['course_id'].isna(), 'Invalid course_id.')
+
+    for name in ('phone', 'total_fees', 'amount_paid', 'ugpassout', 'ugpercentage', 'pgpassout', 'pgpercentage'):
+        values[name] = _numbers(frame[name])
+        _fail(errors, _text(frame[name]).notna() & values[name].isna(), f'Invalid {name}.')
+    values['phone'] = values['phone'].map(lambda v: str(int(v)) if pd.notna(v) else None)
+    for name in ('total_fees', 'amount_paid'):
+        values[name] = _amounts(frame[name])
+
+    for name in ('start_date', 'end_date'):
+        text, values[name] = _dates(frame[name])
+        bad = text.notna() & values[name].isna()
+        _fail(errors, bad, f'Invalid {name} ' + text.map(lambda v: f"('{v}'). Use YYYY-MM-DD."))
+
+    emi_text = _text(frame['emi_type']).map(
+        lambda v: 'NONE' if v is None or v.upper() == 'NONE' else (str(int(float(v))) if v.replace('.', '', 1).isdigit() else v)
+    )
+    _fail(errors, ~emi_text.isin(list(EMI_TYPES)), 'Invalid emi_type.')
+    values['emi_type'] = emi_text
+    emi_count = emi_text.map(EMI_TYPES).fillna(0)
+    for i in range(1, 5):
+        if f'emi_{i}_amount' not in frame or f'emi_{i}_date' not in frame:
+            continue
+        in_plan = emi_count >= i
+        amount_text = _text(frame[f'emi_{i}_amount'])
+        amounts = _amounts(frame[f'emi_{i}_amount'])
+        date_text, dates = _dates(frame[f'emi_{i}_date'])
+        _fail(errors, in_plan & amount_text.notna() & amounts.isna(), f'Invalid amount for EMI {i}.')
+        _fail(
+            errors, in_plan & amounts.notna() & date_text.notna() & dates.isna(),
+            date_text.map(lambda v, i=i: f"Invalid date format for EMI {i} ('{v}'). Use YYYY-MM-DD."),
+        )
+        _fail(errors, in_plan & amounts.notna() & date_text.isna(), f'Missing date for EMI {i}.')
+        scheduled = in_plan & amounts.notna() & dates.notna()
+        values[f'emi_{i}_amount'] = amounts.where(scheduled, None)
+        values[f'emi_{i}_date'] = dates.where(scheduled, None)
+
+    # Within the sheet the first good row with a given code or email wins.
+    for name, message in (('student_id', 'Duplicate student_id.'), ('email', 'Duplicate email.')):
+        good = values[name][errors.isna() & values[name].notna()]
+        _fail(errors, good.duplicated(keep='first').reindex(frame.index, fill_value=False), message)
+
+    return errors, values
+
+
+def import_student_frame(df, user=None):
+    """
+    Create the students of an import sheet with their placements, payments
+    and installments. ``user`` defaults to the request's current user.
+    Returns ``(created_count, error_rows)``; each error row is the sheet row
+    as strings plus ``error_reason``.
+    """
+    from consultantdb.models import Consultant
+    from core.sequences import claim_codes, reserve_codes
+    from paymentdb.models import Payment, PaymentInstallment
+    from placementdb.models import Placement
+    from settingsdb.models import PaymentAccount, SourceOfJoining
+    from settingsdb.signals import get_current_user
+    from trainersdb.models import Trainer
+    from .models import Student
+
+    if user is None:
+        user = get_current_user()
+    frame = df.reset_index(drop=True)
+    if frame.empty:
+        return 0, []
+
+    with transaction.atomic():
+        errors, values = validate_frame(frame)
+        good = errors.isna()
+        lookups = {
+            'source_of_joining': _resolve_names(SourceOfJoining, values['source_of_joining'][good]),
+            'consultant': _resolve_names(Consultant, values['consultant'][good]),
+            'trainer': _resolve_names(Trainer, values['trainer'][good]),
+            'payment_account': _resolve_names(PaymentAccount, values['payment_account'][good]),
+        }
+
+        def row_value(name, index):
+            return _value(values[name].at[index])
+
+        rows = list(frame.index[good])
+        students = []
+        for index in rows:
+            students.append(Student(
+                student_id=row_value('student_id', index),
+                first_name=row_value('first_name', index),
+                last_name=row_value('last_name', index) or '',
+                email=row_value('email', index),
+                pl_required=str(frame.at[index, 'pl_required']).strip().lower() == 'yes',
+                location=row_value('location', index),
+                ugdegree=row_value('ugdegree', index),
+                ugbranch=row_value('ugbranch', index),
+                ugpassout=int(row_value('ugpassout', index)) if row_value('ugpassout', index) is not None else None,
+                ugpercentage=row_value('ugpercentage', index),
+                pgdegree=row_value('pgdegree', index),
+                pgbranch=row_value('pgbranch', index),
+                pgpassout=int(row_value('pgpassout', index)) if row_value('pgpassout', index) is not None else None,
+                pgpercentage=row_value('pgpercentage', index),
+                working_status=row_value('working_status', index) or 'NO',
+                course_status=row_value('course_status', index) or 'YTS',
+                course_id=int(row_value('course_id', index)),
+                start_date=row_value('start_date', index),
+                end_date=row_value('end_date', index),
+                source_of_joining=lookups['source_of_joining'].get(row_value('source_of_joining', index)),
+                mode_of_class=row_value('mode_of_class', index),
+                week_type=row_value('week_type', index),
+                consultant=lookups['consultant'].get(row_value('consultant', index)),
+                trainer=lookups['trainer'].get(row_value('trainer', index)),
+                phone=row_value('phone', index),
+            ))
+        row_of = {id(student): index for student, index in zip(students, rows)}
+        students = _bulk_create(Student, students, rows, errors, 'student_id')
+        claim_codes(Student.objects.all(), 'student_id', 'BTR', [student.student_id for student in students])
+
+        codes = reserve_codes(Payment.objects.all(), 'payment_id', 'PMT', len(students))
+        payments = []
+        for student, code in zip(students, codes):
+            index = row_of[id(student)]
+            payment = Payment(
+                payment_id=code,
+                student=student,
+                total_fees=row_value('total_fees', index),
+                amount_paid=row_value('amount_paid', index),
+                emi_type=row_value('emi_type', index),
+                payment_account=lookups['payment_account'].get(row_value('payment_account', index)),
+            )
+            for i in range(1, 5):
+                if f'emi_{i}_amount' in values:
+                    setattr(payment, f'emi_{i}_amount', row_value(f'emi_{i}_amount', index))
+                    setattr(payment, f'emi_{i}_date', row_value(f'emi_{i}_date', index))
+            payment.total_pending_amount = payment.calculate_total_pending()
+            payments.append(payment)
+        payments = _bulk_create(Payment, payments, [row_of[id(p.student)] for p in payments], errors, 'payment_id')
+
+        # A student whose payment was rejected is not imported either.
+        paid_for = {payment.student_id for payment in payments}
+        orphans = [student.pk for student in students if student.pk not in paid_for]
+        if orphans:
+            Student.objects.filter(pk__in=orphans).delete()
+            students = [student for student in students if student.pk in paid_for]
+
+        placements = _fetch_pks(Placement, Placement.objects.bulk_create(
+            [Placement(student=student) for student in students if student.pl_required], batch_size=CHUNK_SIZE,
+        ), 'student')
+        PaymentInstallment.objects.bulk_create([
+            PaymentInstallment(
+                payment=payment, seq=i,
+                amount=getattr(payment, f'emi_{i}_amount'), due_date=getattr(payment, f'emi_{i}_date'),
+            )
+            for payment in payments for i in range(1, 5)
+            if getattr(payment, f'emi_{i}_amount') is not None
+        ], batch_size=CHUNK_SIZE)
+
+        finish_import(students, payments, placements, user)
+
+    failed = errors.notna()
+    error_rows = frame[failed].astype(str).to_dict('records')
+    for error_row, reason in zip(error_rows, errors[failed]):
+        error_row['error_reason'] = reason
+    return len(students), error_rows
+
+
+def run_import_job(job, progress):
+    """core.jobs handler: import the job's sheet CHUNK_SIZE rows at a time."""
+    from core.jobs import ImportJobError, iter_sheet_frames, open_workbook, sheet_columns, sheet_row_count
+
+    workbook = open_workbook(job)
+    try:
+        worksheet = workbook.worksheets[0]
+        missing = [column for column in REQUIRED_COLUMNS if column not in sheet_columns(worksheet)]
+        if missing:
+            raise ImportJobError(f"Excel file must contain the following columns: {', '.join(REQUIRED_COLUMNS)}")
+        progress.set_total(sheet_row_count(worksheet))
+        for frame in iter_sheet_frames(worksheet, CHUNK_SIZE):
+            created, error_rows = import_student_frame(frame, job.created_by)
+            progress.advance(len(frame), created, error_rows)
+    finally:
+        workbook.close()
+
+
+def finish_import(students, payments, placements, user):
+    """
+    The post_save work of freshly bulk-created students, payments and
+    placements, done once for all of them.
+    """
+    from accounts.dashboard import invalidate_dashboard_metrics
+    from core.search_index import mark_dirty
+    from paymentdb.pending_sync import sync_pending_records
+
+    messages = _create_conversations(students, payments, user)
+    sync_pending_records(payment_ids=[payment.pk for payment in payments])
+    if messages:
+        _apply_onboarding_feedback(messages, user)
+    _audit_created([students, placements, payments, messages], user)
+    mark_dirty('student', [student.pk for student in students])
+    mark_dirty('payment', [payment.pk for payment in payments])
+    invalidate_dashboard_metrics()
+
+
+def _create_conversations(students, payments, user):
+    """
+    Every student gets a conversation; with a signed-in importer each one
+    also opens with the onboarding message send_payment_onboarding_message()
+    writes, and the conversation summary update_conversation_stats() keeps.
+    Returns the messages.
+    """
+    from coursedb.models import Course
+    from .models import ConversationMessage, StudentConversation
+
+    onboard = bool(user and getattr(user, 'is_authenticated', False))
+    emi_types = {payment.student_id: payment.emi_type for payment in payments}
+    courses = dict(Course.objects.filter(id__in={s.course_id for s in students}).values_list('id', 'course_name'))
+    now = timezone.now()
+    role = (getattr(user, 'role', '') or '') if onboard else ''
+    internal = onboard and (user.is_staff or user.is_superuser or role.lower() in INTERNAL_ROLES)
+
+    texts = {}
+    conversations = []
+    for student in students:
+        conversation = StudentConversation(student=student)
+        if onboard:
+            emi_type = emi_types.get(student.pk)
+            student_name = f"{student.first_name} {student.last_name or ''}".strip()
+            texts[student.pk] = (
+                f"I have onboarded the student {student_name} - {student.student_id} today for the course "
+                f"{courses.get(student.course_id, 'N/A')} with {emi_type if emi_type != 'NONE' else '0'} EMI split. "
+            )
+            conversation.last_message = texts[student.pk]
+            conversation.last_message_at = now
+            conversation.last_message_by = user
+            conversation.unread_count = 0 if internal else 1
+        conversations.append(conversation)
+    conversations = _fetch_pks(
+        StudentConversation, StudentConversation.objects.bulk_create(conversations, batch_size=CHUNK_SIZE), 'student',
+    )
+    if not onboard:
+        return []
+    # The conversations are new, so each holds just its onboarding message.
+    return _fetch_pks(ConversationMessage, ConversationMessage.objects.bulk_create([
+        ConversationMessage(conversation=conversation, sender=user, sender_role=role,
+                            message=texts[conversation.student_id])
+        for conversation in conversations
+    ], batch_size=CHUNK_SIZE), 'conversation')
+
+
+def _apply_onboarding_feedback(messages, user):
+    """The onboarding message becomes the feedback of the student's pending record."""
+    from paymentdb.models import PendingPaymentRecord
+
+    feedback = {message.conversation.student_id: message.message for message in messages}
+    records = list(PendingPaymentRecord.objects.filter(student_id__in=feedback))
+    for record in records:
+        record.feedback = feedback[record.student_id]
+        record.edited_by = user
+        if record.created_by_id is None:
+            record.created_by = user
+    PendingPaymentRecord.objects.bulk_update(records, ['feedback', 'edited_by', 'created_by'], batch_size=CHUNK_SIZE)
+
+
+def _audit_created(groups, user):
+    """CREATE TransactionLog entries for each group of new instances, as track_save writes them."""
+    from settingsdb.audit import record_change
+    from settingsdb.audit_policy import get_audit_policy
+    from settingsdb.signals import serialize_model_instance
+
+    if user is None or not user.pk:
+        return
+    for instances in groups:
+        if not instances:
+            continue
+        model = type(instances[0])
+        policy = get_audit_policy(model)
+        if not policy.enabled:
+            continue
+        # serialize_model_instance lists many-to-many values; load them in one query each.
+        prefetch_related_objects(instances, *[
+            field.name for field in model._meta.get_fields(include_parents=False) if field.many_to_many
+        ])
+        for instance in instances:
+            if not policy.should_sample():
+                continue
+            record_change(
+                user=user,
+                table_name=model.__name__,
+                object_id=str(instance.pk),
+                action='CREATE',
+                changes={'app': model._meta.app_label, **serialize_model_instance(instance, policy)},
+            )
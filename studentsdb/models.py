@@ -1,4 +1,7 @@
 from django.db import models
+from django.db.models.functions import Now
+from core.mixins import FieldTrackerMixin
+from core.sequences import next_code
 from django.utils import timezone
 from consultantdb.models import Consultant
 from settingsdb.models import SourceOfJoining
@@ -10,7 +13,7 @@ from settingsdb.signals import get_current_user
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
  
-class Student(models.Model):
+class Student(FieldTrackerMixin, models.Model):
     MODE_CHOICES = [
         ('ON', 'Online'),
         ('OFF', 'Offline'),
@@ -72,6 +75,7 @@ class Student(models.Model):
     week_type = models.CharField(max_length=2, choices=WEEK_TYPE)
     consultant = models.ForeignKey(Consultant, on_delete=models.SET_NULL, null=True)
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='created_students')
+    updated_at = models.DateTimeField(auto_now=True, db_default=Now(), db_index=True)
 
     # Placement Status
     mock_interview_completed = models.BooleanField(default=False, blank=True, null=True)
@@ -85,26 +89,35 @@ class Student(models.Model):
     def course(self):
         from coursedb.models import Course
         if self.course_id:
+            cached = self.__dict__.get('_course_cache')
+            if cached is not None and cached.id == self.course_id:
+                return cached
             try:
-                return Course.objects.get(id=self.course_id)
+                self._course_cache = Course.objects.get(id=self.course_id)
             except Course.DoesNotExist:
                 return None
+            return self._course_cache
         return None
 
+    @classmethod
+    def attach_courses(cls, students):
+        """Loads the courses (with categories) of ``students`` in one query for ``student.course``."""
+        from coursedb.models import Course
+        course_ids = {student.course_id for student in students if student.course_id}
+        courses = Course.objects.select_related('category').in_bulk(course_ids)
+        for student in students:
+            if student.course_id in courses:
+                student._course_cache = courses[student.course_id]
+
     def __str__(self):
         return f"{self.student_id} - {self.first_name} {self.last_name}"
 
     def save(self, *args, **kwargs):
         if not self.student_id:
-            last_student = Student.objects.order_by('-id').first()
-            if last_student and last_student.student_id:
-                last_id = int(last_student.student_id.replace('BTR', ''))
-                self.student_id = f'BTR{last_id + 1:04d}'
-            else:
-                self.student_id = 'BTR0001'
+            self.student_id = next_code(Student.objects.all(), 'student_id', 'BTR')
         super().save(*args, **kwargs)
 
-class StudentConversation(models.Model):
+class StudentConversation(FieldTrackerMixin, models.Model):
     student = models.OneToOneField('Student', on_delete=models.CASCADE, related_name='conversation')
     is_priority = models.BooleanField(default=False)
     priority_level = models.IntegerField(default=0)  # 1-5, 0 for none
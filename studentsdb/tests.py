@@ -5,6 +5,13 @@ from channels.testing import WebsocketCommunicator
 from core.asgi import application
 import asyncio
 from django.db.models import Count, Q, F
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from datetime import date
+from batchdb.models import Batch, BatchStudent
+from coursedb.models import Course, CourseCategory
+from trainersdb.models import Trainer
 
 class ConversationModelTests(TestCase):
     def test_conversation_auto_created_on_student_create(self):
@@ -184,3 +191,194 @@ class ConversationHTTPTests(TestCase):
         self.assertEqual(resp2.status_code, 200)
         msgs = resp2.json().get('messages', [])
         self.assertTrue(any(m.get('message') == 'Hello via HTTP' for m in msgs))
+
+
+class StudentListQueryTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email='list@test.com', name='List Tester', role='admin', password='pass12345')
+        category = CourseCategory.objects.create(name='Cloud')
+        self.course = Course.objects.create(course_name='DevOps', category=category, total_duration=30)
+        trainer = Trainer.objects.create(name='List Trainer', employment_type='FT')
+        self.batches = [
+            Batch.objects.create(course=self.course, trainer=trainer, start_date=date(2025, 1, 1), end_date=date(2025, 3, 1))
+            for _ in range(2)
+        ]
+        self.created = 0
+
+    def _add_students(self, count):
+        for _ in range(count):
+            i = self.created
+            self.created += 1
+            student = Student.objects.create(
+                first_name=f'List{i}', last_name='Student', email=f'list{i}@example.com',
+                phone=f'94000000{i:02d}', mode_of_class='ON', week_type='WD', course_id=self.course.id,
+            )
+            BatchStudent.objects.create(batch=self.batches[0], student=student, is_active=False)
+            BatchStudent.objects.create(batch=self.batches[1], student=student)
+
+    def _list_queries(self):
+        self.client.login(username='list@test.com', password='pass12345')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('student_list'))
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_query_count_is_independent_of_table_size(self):
+        self._add_students(3)
+        response, small = self._list_queries()
+        self.assertEqual(len(response.context['students']), 3)
+
+        self._add_students(27)
+        response, large = self._list_queries()
+        self.assertEqual(len(response.context['students']), 10)
+        self.assertEqual(small, large)
+
+        student = response.context['students'][0]
+        self.assertEqual({batch.id for batch in student.unique_batches}, {batch.id for batch in self.batches})
+        self.assertEqual(student.active_batch_ids, [self.batches[1].id])
+        self.assertContains(response, 'DevOps')
+
+
+class StudentImportTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email='import@test.com', name='Importer', role='staff', password='pass12345')
+        category = CourseCategory.objects.create(name='Data')
+        self.course = Course.objects.create(course_name='Analytics', category=category, total_duration=30)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.existing = Student.objects.create(
+                first_name='Existing', email='taken@example.com', phone='9100000000', mode_of_class='ON', week_type='WD',
+            )
+
+    def _row(self, number, **overrides):
+        row = {
+            'student_id': f'BTR{number:04d}', 'first_name': f'Imported{number}', 'last_name': 'Student',
+            'email': f'imported{number}@example.com', 'location': 'Chennai',
+            'ugdegree': None, 'ugbranch': None, 'ugpassout': 2020, 'ugpercentage': 72.5,
+            'pgdegree': None, 'pgbranch': None, 'pgpassout': None, 'pgpercentage': None,
+            'working_status': 'NO', 'course_status': 'YTS', 'course_id': self.course.id,
+            'enrollment_date': '2025-07-18', 'start_date': '2025-07-20', 'end_date': '2025-11-20',
+            'pl_required': 'No', 'source_of_joining': 'Website', 'mode_of_class': 'ON', 'week_type': 'WD',
+            'consultant': 'Import Consultant', 'trainer': 'Import Trainer', 'phone': 9200000000 + number,
+            'payment_account': 'Import Account', 'total_fees': 50000, 'amount_paid': 50000, 'emi_type': 'NONE',
+            'emi_1_amount': None, 'emi_1_date': None, 'emi_2_amount': None, 'emi_2_date': None,
+            'emi_3_amount': None, 'emi_3_date': None,
+        }
+        row.update(overrides)
+        return row
+
+    def _import(self, rows):
+        from .importer import import_student_frame
+        import pandas as pd
+        with self.captureOnCommitCallbacks(execute=True):
+            return import_student_frame(pd.DataFrame(rows), self.user)
+
+    def test_valid_rows_are_created_and_bad_rows_reported(self):
+        from paymentdb.models import Payment, PaymentInstallment, PendingPaymentRecord
+        from placementdb.models import Placement
+        from settingsdb.models import TransactionLog
+        from core.models import SearchDocument
+
+        created, errors = self._import([
+            self._row(500, pl_required='Yes', amount_paid=10000, emi_type=2,
+                      emi_1_amount=20000, emi_1_date='2025-08-15', emi_2_amount=20000, emi_2_date='2025-09-15'),
+            self._row(501),
+            self._row(502, first_name=' ', payment_account=None),
+            self._row(503, email='taken@example.com'),
+            self._row(500, email='other@example.com'),
+            self._row(504, emi_type='1', emi_1_amount=1000, emi_1_date='15/08/2025'),
+            self._row(505, emi_type='1', emi_1_amount=1000),
+        ])
+
+        self.assertEqual(created, 2)
+        self.assertEqual([row['error_reason'] for row in errors], [
+            'Missing required fields: first_name, payment_account',
+            'Duplicate email.',
+            'Duplicate student_id.',
+            "Invalid date format for EMI 1 ('15/08/2025'). Use YYYY-MM-DD.",
+            'Missing date for EMI 1.',
+        ])
+        self.assertEqual(errors[1]['student_id'], 'BTR0503')
+
+        student = Student.objects.select_related('consultant', 'trainer').get(student_id='BTR0500')
+        self.assertEqual((student.consultant.name, student.trainer.name, student.phone), ('Import Consultant', 'Import Trainer', '9200000500'))
+        payment = Payment.objects.get(student=student)
+        self.assertEqual(payment.total_pending_amount, 40000)
+        self.assertEqual(list(payment.installments.values_list('seq', 'amount')), [(1, 20000), (2, 20000)])
+        self.assertTrue(Placement.objects.filter(student=student).exists())
+        self.assertFalse(Placement.objects.filter(student__student_id='BTR0501').exists())
+        self.assertEqual(PaymentInstallment.objects.count(), 2)
+
+        record = PendingPaymentRecord.objects.get(payment=payment)
+        self.assertEqual(record.status, 'Pending')
+        self.assertIn('onboarded the student Imported500 Student - BTR0500', record.feedback)
+        self.assertEqual(record.edited_by, self.user)
+        self.assertEqual(student.conversation.messages.count(), 1)
+        self.assertEqual(student.conversation.unread_count, 0)
+
+        self.assertEqual(TransactionLog.objects.filter(table_name='Student', action='CREATE').count(), 2)
+        self.assertEqual(SearchDocument.objects.filter(entity_type='payment').count(), 2)
+        self.assertEqual(
+            Student.objects.create(first_name='After', mode_of_class='ON', week_type='WD').student_id, 'BTR0502',
+        )
+
+    def test_backends_without_returning_bulk_inserts_get_primary_keys(self):
+        from unittest.mock import patch
+        from paymentdb.models import PendingPaymentRecord
+        from settingsdb.models import TransactionLog
+
+        # can_return_rows_from_bulk_insert is derived from this one
+        with patch.object(connection.features, 'can_return_columns_from_insert', False):
+            created, errors = self._import([self._row(600, pl_required='Yes', amount_paid=10000), self._row(601)])
+
+        self.assertEqual((created, errors), (2, []))
+        student = Student.objects.get(student_id='BTR0600')
+        self.assertTrue(PendingPaymentRecord.objects.filter(student=student).exists())
+        self.assertEqual(student.conversation.messages.count(), 1)
+        self.assertEqual(
+            set(TransactionLog.objects.filter(table_name='Student', action='CREATE').values_list('object_id', flat=True)),
+            {str(pk) for pk in Student.objects.filter(student_id__in=['BTR0600', 'BTR0601']).values_list('pk', flat=True)},
+        )
+        self.assertTrue(TransactionLog.objects.filter(table_name='Placement', object_id=str(student.placement.pk)).exists())
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self._import([self._row(1000)])
+
+        def measure(first, count):
+            rows = [self._row(number) for number in range(first, first + count)]
+            with CaptureQueriesContext(connection) as queries:
+                created, errors = self._import(rows)
+            self.assertEqual((created, errors), (count, []))
+            return len(queries)
+
+        self.assertEqual(measure(1100, 3), measure(1200, 12))
+
+    def test_import_job_reads_the_sheet_in_chunks(self):
+        import io
+        import tempfile
+        from unittest.mock import patch
+        import pandas as pd
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.test import override_settings
+        from core.jobs import run_pending_jobs
+        from core.models import ImportJob
+
+        buffer = io.BytesIO()
+        pd.DataFrame([self._row(700), self._row(701, email='taken@example.com'), self._row(702)]).to_excel(buffer, index=False)
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            job = ImportJob.objects.create(
+                kind='students', file=SimpleUploadedFile('students.xlsx', buffer.getvalue()), created_by=self.user,
+            )
+            with patch('studentsdb.importer.CHUNK_SIZE', 2), self.captureOnCommitCallbacks(execute=True):
+                run_pending_jobs()
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.success_count, job.error_count), ('COMPLETED', 2, 1))
+            with job.error_file.open('rb') as handle:
+                self.assertIn('Duplicate email.', handle.read().decode())
+
+        self.assertEqual(
+            sorted(Student.objects.filter(student_id__startswith='BTR07').values_list('student_id', flat=True)),
+            ['BTR0700', 'BTR0702'],
+        )
+        self.assertEqual(Student.objects.get(student_id='BTR0700').start_date, date(2025, 7, 20))
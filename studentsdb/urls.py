@@ -7,7 +7,6 @@ from .views import (
     delete_student,
     download_student_template,
     import_students,
-    download_error_report,
     delete_all_students,
     student_report, conversation_messages, conversation_send, conversation_upload, get_mentionable_users
 )
@@ -20,7 +19,6 @@ urlpatterns = [
     path('<str:student_id>/delete/', delete_student, name='delete_student'),
     path('import/', import_students, name='import_students'),
     path('template/', download_student_template, name='download_student_template'),
-    path('error-report/', download_error_report, name='download_error_report'),
     path('<str:student_id>/report/', student_report, name='student_report'),
     path('delete-all/', delete_all_students, name='delete_all_students'),
     path('conversation/<int:student_pk>/messages/', conversation_messages, name='conversation_messages'),
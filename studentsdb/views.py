@@ -1,8 +1,5 @@
 from django.shortcuts import render, redirect,get_object_or_404
 
-from consultantdb.models import Consultant
-from settingsdb.models import PaymentAccount, SourceOfJoining
-from trainersdb.models import Trainer
 from .forms import StudentForm, StudentFilterForm
 from .models import Student
 from coursedb.models import Course, CourseCategory
@@ -11,11 +8,15 @@ from paymentdb.forms import PaymentForm
 from placementdb.forms import PlacementUpdateForm
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q, Max, Case, When, BooleanField, Value, IntegerField, Count, F
+from django.db.models import Q, Max, Case, When, BooleanField, Value, IntegerField, Count, F, Prefetch, prefetch_related_objects
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from core.pagination import KeysetPaginator, keyset_query_params
+from core.search import search_q
 from .forms import StudentUpdateForm
+from core.jobs import enqueue_import
 from dateutil.relativedelta import relativedelta
 from placementdb.models import CompanyInterview, Placement
+from batchdb.models import Batch, BatchStudent
 
 import pandas as pd
 from django.http import HttpResponse, JsonResponse
@@ -24,9 +25,10 @@ from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 from .serializers import message_to_dict
 from django.db import transaction
-from datetime import datetime
 from django.contrib.auth import get_user_model
 
+STUDENT_SEARCH_FIELDS = ('first_name', 'last_name', 'email', 'phone', 'student_id')
+
 @login_required
 def student_remarks(request):
     form = StudentFilterForm(request.GET)
@@ -48,13 +50,7 @@ def student_remarks(request):
         if status:
             student_qs = student_qs.filter(**{f'{status}': True})
         if query:
-            student_qs = student_qs.filter(
-                Q(first_name__icontains=query) |
-                Q(last_name__icontains=query) |
-                Q(email__icontains=query) |
-                Q(phone__icontains=query) |
-                Q(student_id__icontains=query)
-            )
+            student_qs = student_qs.filter(search_q(query, STUDENT_SEARCH_FIELDS))
         if course:
             student_qs = student_qs.filter(course_id=course.id)
         elif course_category:
@@ -263,7 +259,8 @@ def student_list(request):
     if hasattr(user, 'consultant_profile'):
         student_list = Student.objects.filter(consultant=user.consultant_profile.consultant).order_by('-id')
     else:
-        student_list = Student.objects.prefetch_related('batches', 'batches__trainer').all().order_by('-id')
+        student_list = Student.objects.all().order_by('-id')
+    student_list = student_list.select_related('consultant')
 
     if form.is_valid():
         query = form.cleaned_data.get('q')
@@ -279,13 +276,7 @@ def student_list(request):
         if status:
             student_list = student_list.filter(**{f'{status}': True})
         if query:
-            student_list = student_list.filter(
-                Q(first_name__icontains=query) |
-                Q(last_name__icontains=query) |
-                Q(email__icontains=query) |
-                Q(phone__icontains=query) |
-                Q(student_id__icontains=query)
-            )
+            student_list = student_list.filter(search_q(query, STUDENT_SEARCH_FIELDS))
         if course:
             student_list = student_list.filter(course_id=course.id)
         elif course_category:
@@ -306,33 +297,27 @@ def student_list(request):
                 student_list = student_list.filter(payment__total_pending_amount__lte=0).distinct()
 
 
-    for student in student_list:
+    students = KeysetPaginator(student_list, 10).page_from_request(request)  # Show 10 students per page
+
+    # Enrich only the rows on this page, with a fixed number of queries.
+    prefetch_related_objects(
+        students.object_list,
+        Prefetch('batches', queryset=Batch.objects.select_related('course', 'trainer')),
+        Prefetch('batchstudent_set', queryset=BatchStudent.objects.filter(is_active=True), to_attr='active_batch_links'),
+    )
+    Student.attach_courses(students.object_list)
+    for student in students:
         batches = student.batches.all()
         unique_trainers = {batch.trainer for batch in batches if batch.trainer}
         unique_batches = {batch for batch in batches}
         student.unique_trainers = list(unique_trainers)
         student.unique_batches = list(unique_batches)
-        student.active_batch_ids = list(student.batchstudent_set.filter(is_active=True).values_list('batch_id', flat=True))
-
-    paginator = Paginator(student_list, 10)  # Show 10 students per page
-    page = request.GET.get('page')
-
-    try:
-        students = paginator.page(page)
-    except PageNotAnInteger:
-        students = paginator.page(1)
-    except EmptyPage:
-        students = paginator.page(paginator.num_pages)
-
-    # Get the query parameters
-    query_params = request.GET.copy()
-    if 'page' in query_params:
-        del query_params['page']
+        student.active_batch_ids = [link.batch_id for link in student.active_batch_links]
 
     return render(request, 'studentsdb/student_list.html', {
         'students': students,
         'form': form,
-        'query_params': query_params.urlencode()
+        'query_params': keyset_query_params(request),
     })
 
 
@@ -496,7 +481,7 @@ def download_student_template(request):
 @login_required
 def import_students(request):
     """
-    Imports students from an Excel file.
+    Queues an Excel file of students as an import job and shows its progress.
     """
     if request.method == 'POST':
         excel_file = request.FILES.get('excel_file')
@@ -504,199 +489,12 @@ def import_students(request):
             messages.error(request, "No file was uploaded.", extra_tags='student_message')
             return redirect('student_list')
 
-        try:
-            df = pd.read_excel(excel_file)
-        except Exception as e:
-            messages.error(request, f"Error reading Excel file: {e}", extra_tags='student_message')
-            return redirect('student_list')
-
-        required_columns = [
-            'student_id', 'first_name', 'last_name', 'email', 'location',
-            'ugdegree', 'ugbranch', 'ugpassout', 'ugpercentage',
-            'pgdegree', 'pgbranch', 'pgpassout', 'pgpercentage',
-            'working_status', 'course_status', 'course_id', 'enrollment_date', 'start_date', 'end_date',
-            'pl_required', 'source_of_joining', 'mode_of_class', 'week_type', 'consultant',
-            'trainer', 'phone', 'payment_account',
-            'total_fees', 'amount_paid', 'emi_type', 'emi_1_amount', 'emi_1_date',
-            'emi_2_amount', 'emi_2_date', 'emi_3_amount', 'emi_3_date'
-        ]
-        if not all(col in df.columns for col in required_columns):
-            messages.error(request, f"Excel file must contain the following columns: {', '.join(required_columns)}", extra_tags='student_message')
-            return redirect('student_list')
-
-        error_rows = []
-        success_count = 0
-
-        for index, row in df.iterrows():
-            try:
-                with transaction.atomic():
-                    student_id = row['student_id']
-                    first_name = row['first_name']
-                    last_name = row['last_name'] if pd.notna(row['last_name']) else ''
-                    email = row.get('email') if pd.notna(row.get('email')) else None
-                    total_fees = row['total_fees']
-                    amount_paid = row['amount_paid']
-                    emi_type = str(row['emi_type'])
-                    pl_required = str(row.get('pl_required', '')).lower() == 'yes'
-                    source_of_joining_name = row.get('source_of_joining')
-                    mode_of_class = row.get('mode_of_class')
-                    week_type = row.get('week_type')
-                    consultant_name = row.get('consultant')
-                    trainer_name = row.get('trainer')
-                    course_id = row.get('course_id')
-                    phone_val = row.get('phone')
-                    if pd.notna(phone_val):
-                        phone = str(int(phone_val))
-                    else:
-                        phone = None
-                    payment_account_name = row.get('payment_account')
-
-                    # Validation
-                    # Enhanced Validation
-                    required_fields = {
-                        'student_id': student_id,
-                        'first_name': first_name,
-                        'total_fees': total_fees,
-                        'amount_paid': amount_paid,
-                        'mode_of_class': mode_of_class,
-                        'week_type': week_type,
-                        'payment_account': payment_account_name
-                    }
-
-                    missing_fields = []
-                    for field, value in required_fields.items():
-                        # Check for None, NaN, or empty strings
-                        if pd.isna(value) or (isinstance(value, str) and not value.strip()):
-                            missing_fields.append(field)
-                    
-                    if missing_fields:
-                        raise ValueError(f"Missing required fields: {', '.join(missing_fields)}")
-
-                    if Student.objects.filter(student_id=student_id).exists():
-                        raise ValueError("Duplicate student_id.")
-
-                    if email and Student.objects.filter(email=email).exists():
-                        raise ValueError("Duplicate email.")
-
-                    # Get or create related objects
-                    source_of_joining = None
-                    if pd.notna(source_of_joining_name) and str(source_of_joining_name).strip():
-                        source_of_joining, _ = SourceOfJoining.objects.get_or_create(name=source_of_joining_name)
-                    
-                    consultant = None
-                    if pd.notna(consultant_name) and consultant_name:
-                        consultant, _ = Consultant.objects.get_or_create(name=consultant_name)
-
-                    trainer = None
-                    if pd.notna(trainer_name) and str(trainer_name).strip():
-                        trainer, _ = Trainer.objects.get_or_create(name=trainer_name)
-                    payment_account, _ = PaymentAccount.objects.get_or_create(name=payment_account_name)
-                    if not pd.notna(course_id):
-                        raise ValueError("course_id is required.")
-
-                    # Clean numeric fields that can be null
-                    ugpassout = row.get('ugpassout') if pd.notna(row.get('ugpassout')) else None
-                    ugpercentage = row.get('ugpercentage') if pd.notna(row.get('ugpercentage')) else None
-                    pgpassout = row.get('pgpassout') if pd.notna(row.get('pgpassout')) else None
-                    pgpercentage = row.get('pgpercentage') if pd.notna(row.get('pgpercentage')) else None
-
-                    # Create Student
-                    student = Student.objects.create(
-                        student_id=student_id,
-                        first_name=first_name,
-                        last_name=last_name,
-                        email=email,
-                        pl_required=pl_required,
-                        location=row.get('location') if pd.notna(row.get('location')) else None,
-                        ugdegree=row.get('ugdegree') if pd.notna(row.get('ugdegree')) else None,
-                        ugbranch=row.get('ugbranch'),
-                        ugpassout=ugpassout,
-                        ugpercentage=ugpercentage,
-                        pgdegree=row.get('pgdegree') if pd.notna(row.get('pgdegree')) else None,
-                        pgbranch=row.get('pgbranch'),
-                        pgpassout=pgpassout,
-                        pgpercentage=pgpercentage,
-                        working_status=row.get('working_status') if pd.notna(row.get('working_status')) else 'NO',
-                        course_status=row.get('course_status', 'YTS'),
-                        course_id=course_id,
-                        start_date=row.get('start_date') if pd.notna(row.get('start_date')) else None,
-                        end_date=row.get('end_date') if pd.notna(row.get('end_date')) else None,
-                        source_of_joining=source_of_joining,
-                        mode_of_class=mode_of_class,
-                        week_type=week_type,
-                        consultant=consultant,
-                        trainer=trainer,
-                        phone=phone,
-                    )
-
-                    if pl_required:
-                        Placement.objects.get_or_create(student=student)
-
-                    # Create Payment
-                    payment = Payment(
-                        student=student,
-                        total_fees=total_fees,
-                        amount_paid=amount_paid,
-                        emi_type=emi_type,
-                        payment_account=payment_account
-                    )
-
-                    if emi_type != 'NONE':
-                        for i in range(1, int(emi_type) + 1):
-                            emi_amount = row.get(f'emi_{i}_amount')
-                            emi_date_val = row.get(f'emi_{i}_date')
-                            
-                            if pd.notna(emi_amount) and pd.notna(emi_date_val):
-                                emi_date_str = str(emi_date_val).split(' ')[0]
-                                try:
-                                    emi_date = datetime.strptime(emi_date_str, '%Y-%m-%d').date()
-                                    setattr(payment, f'emi_{i}_amount', emi_amount)
-                                    setattr(payment, f'emi_{i}_date', emi_date)
-                                except (ValueError, TypeError):
-                                    raise ValueError(f"Invalid date format for EMI {i} ('{emi_date_str}'). Use YYYY-MM-DD.")
-                            elif pd.notna(emi_amount):
-                                raise ValueError(f"Missing date for EMI {i}.")
-                    
-                    payment.save()
-                    success_count += 1
-
-            except Exception as e:
-                error_row = row.astype(str).to_dict()
-                error_row['error_reason'] = str(e)
-                error_rows.append(error_row)
-
-        if error_rows:
-            request.session['error_rows'] = error_rows
-            messages.warning(request, f"Successfully created {success_count} students. {len(error_rows)} records had errors.", extra_tags='student_message')
-            return redirect('download_error_report')
-        else:
-            messages.success(request, f"Successfully created {success_count} students.", extra_tags='student_message')
-            return redirect('student_list')
+        job = enqueue_import('students', excel_file, request.user)
+        return redirect('import_job_detail', pk=job.pk)
 
     return render(request, 'studentsdb/import_students.html')
 
 
-@login_required
-def download_error_report(request):
-    """
-    Downloads a CSV file with the rows that failed during import.
-    """
-    error_rows = request.session.get('error_rows', [])
-    if not error_rows:
-        messages.error(request, "No error report to download.", extra_tags='student_message')
-        return redirect('student_list')
-
-    df = pd.DataFrame(error_rows)
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="error_report.csv"'
-    df.to_csv(response, index=False)
-
-    # Clear the session variable
-    del request.session['error_rows']
-
-    return response
-
-
 @login_required
 def delete_all_students(request):
     """
@@ -1,7 +1,9 @@
 from django.db import models
+from core.mixins import FieldTrackerMixin
+from core.sequences import next_code
 from coursedb.models import Course
 
-class Trainer(models.Model):
+class Trainer(FieldTrackerMixin, models.Model):
     EMPLOYMENT_TYPE_CHOICES = [
         ('FT', 'Full Time'),
         ('FL', 'Freelancer'),
@@ -80,12 +82,7 @@ class Trainer(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.trainer_id:
-            last_trainer = Trainer.objects.order_by('-id').first()
-            if last_trainer and last_trainer.trainer_id:
-                last_id = int(last_trainer.trainer_id.replace('TRN', ''))
-                self.trainer_id = f'TRN{last_id + 1:04d}'
-            else:
-                self.trainer_id = 'TRN0001'
+            self.trainer_id = next_code(Trainer.objects.all(), 'trainer_id', 'TRN')
 
         # Auto-populate mode_of_delivery and availability
         if self.timing_slots: